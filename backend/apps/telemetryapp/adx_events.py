@@ -0,0 +1,430 @@
+"""
+ADX Events Aggregation Service
+
+Server-side aggregation of the Alarms table for the Events page and the
+relay/status widgets.
+
+Instead of shipping raw alarm rows to the browser and binning them there, a
+single KQL query returns event counts per (name, time bucket). Per-name
+counts, severity counts and the timeline histogram are all derived from
+those triples.
+
+Caching Strategy:
+1. The range is split into fixed-size chunks of buckets
+2. Chunks that are fully "closed" (far enough in the past that no more
+   alarms can arrive for them) are cached with a long TTL
+3. Only missing closed chunks and the live tail are queried from ADX
+
+Alarm state series are run-length encoded: ADX drops repeated values with
+prev() change detection and a NumPy pass collapses whatever is left, so only
+state transitions and their durations leave the server.
+"""
+
+import os
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .adx_optimized import (
+    query_adx,
+    escape_kql_string,
+    format_kql_datetime,
+    to_naive_datetime,
+    CACHE_TTL_SECONDS,
+    CACHE_TTL_HISTORICAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Number of histogram buckets the step is chosen to stay under
+EVENTS_TARGET_BUCKETS = int(os.getenv('ADX_EVENTS_TARGET_BUCKETS', 120))
+
+# Largest histogram a request may ask for (dense lists are built per request)
+EVENTS_MAX_BUCKETS = int(os.getenv('ADX_EVENTS_MAX_BUCKETS', 2000))
+
+# Buckets per cached chunk of closed history
+EVENTS_CHUNK_BUCKETS = int(os.getenv('ADX_EVENTS_CHUNK_BUCKETS', 48))
+
+# TTL for closed chunks (they never change once closed)
+EVENTS_CACHE_TTL_CLOSED = int(os.getenv('ADX_EVENTS_CACHE_TTL_CLOSED', 24 * 3600))
+
+# `localtime` is device-local time, which can trail UTC by up to 12 hours.
+# A bucket is only treated as closed once it ended this long ago (server UTC),
+# which also leaves room for late ingestion.
+EVENTS_CLOSED_AFTER_HOURS = float(os.getenv('ADX_EVENTS_CLOSED_AFTER_HOURS', 13))
+
+# Candidate histogram steps in seconds (KQL bin() sizes)
+STEP_LADDER = [
+    60, 5 * 60, 15 * 60, 30 * 60,
+    3600, 3 * 3600, 6 * 3600, 12 * 3600,
+    86400, 7 * 86400,
+]
+
+# KQL bin() on datetimes floors ticks counted from 0001-01-01
+BIN_ORIGIN = datetime.min
+
+SEVERITIES = ('critical', 'warning', 'info')
+
+OUTPUT_FILTERS = ('all', '1', '0')
+
+
+class EventsRequestError(ValueError):
+    """Raised for an events step or range that cannot be served."""
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def get_event_severity(name: str) -> str:
+    """Classify an event name (mirrors getSeverityFromName in Events.tsx)."""
+    lower = (name or '').lower()
+    if any(word in lower for word in ('error', 'fault', 'critical', 'fail')):
+        return 'critical'
+    if 'warn' in lower or 'alarm' in lower:
+        return 'warning'
+    return 'info'
+
+
+def choose_step(start: datetime, end: datetime, target_buckets: int = None) -> int:
+    """Pick the smallest step from the ladder that keeps the bucket count under target."""
+    target_buckets = target_buckets or EVENTS_TARGET_BUCKETS
+    span = max((end - start).total_seconds(), 1)
+    for step in STEP_LADDER:
+        if span / step <= target_buckets:
+            return step
+    return STEP_LADDER[-1]
+
+
+def floor_to_step(value: datetime, step: int) -> datetime:
+    """Floor a datetime to a bin boundary, matching KQL bin()."""
+    offset = int((value - BIN_ORIGIN).total_seconds())
+    return BIN_ORIGIN + timedelta(seconds=offset - offset % step)
+
+
+def format_step(step: int) -> str:
+    """Human-readable step (e.g. '5m', '1h', '1d')."""
+    if step % 86400 == 0:
+        return f"{step // 86400}d"
+    if step % 3600 == 0:
+        return f"{step // 3600}h"
+    if step % 60 == 0:
+        return f"{step // 60}m"
+    return f"{step}s"
+
+
+def _build_counts_query(
+    serial: str,
+    start: datetime,
+    end: datetime,
+    step: int,
+    output_filter: str,
+) -> str:
+    """Counts per (name, bucket) over [start, end]."""
+    output_clause = '' if output_filter == 'all' else f"| where value == {output_filter}"
+    return f"""
+    let s = '{escape_kql_string(serial)}';
+    Alarms
+    | where comms_serial contains s
+    | where localtime between ({format_kql_datetime(start)} .. {format_kql_datetime(end)})
+    {output_clause}
+    | summarize count_ = count() by name, bucket = bin(localtime, {step}s)
+    | project name, bucket, count_
+    """.strip()
+
+
+def _normalize_rows(rows: List[Dict]) -> List[Tuple[str, datetime, int]]:
+    """Convert ADX/cached rows into (name, bucket, count) triples."""
+    triples = []
+    for row in rows:
+        bucket = to_naive_datetime(row.get('bucket'))
+        name = row.get('name')
+        if bucket is None or not name:
+            continue
+        triples.append((name, bucket, int(row.get('count_') or 0)))
+    return triples
+
+
+def _chunk_cache_key(serial: str, output_filter: str, step: int, chunk_start: datetime) -> str:
+    return f"events_chunk:{serial}:{output_filter}:{step}:{chunk_start.isoformat()}"
+
+
+# =============================================================================
+# Events Summary
+# =============================================================================
+
+def query_events_summary(
+    serial: str,
+    start: datetime,
+    end: datetime,
+    output_filter: str = '1',
+    step: Optional[int] = None,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Aggregate Alarms for one device over a time range.
+
+    The range start is snapped down to a bucket boundary so that closed
+    chunks can be shared between requests with different start times.
+
+    Args:
+        serial: Device serial number
+        start: Range start (naive, device-local time)
+        end: Range end (naive, device-local time)
+        output_filter: 'all', '1' (raised) or '0' (cleared)
+        step: Histogram step in seconds (default: chosen from the range)
+        use_cache: Whether to use the closed-chunk cache
+
+    Returns:
+        Dictionary with per-name counts, severity counts and a dense histogram
+
+    Raises:
+        EventsRequestError: step not in STEP_LADDER, or more than
+            EVENTS_MAX_BUCKETS buckets
+    """
+    if step is not None and step not in STEP_LADDER:
+        raise EventsRequestError(f"step_seconds must be one of {', '.join(map(str, STEP_LADDER))}")
+    step = step or choose_step(start, end)
+    first_bucket = floor_to_step(start, step)
+    last_bucket = floor_to_step(end, step)
+    n_buckets = int((last_bucket - first_bucket).total_seconds() // step) + 1
+    if n_buckets > EVENTS_MAX_BUCKETS:
+        raise EventsRequestError(
+            f"{n_buckets} buckets requested (max {EVENTS_MAX_BUCKETS}); use a larger step"
+        )
+
+    chunk_span = step * EVENTS_CHUNK_BUCKETS
+    closed_horizon = floor_to_step(
+        datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=EVENTS_CLOSED_AFTER_HOURS), step
+    )
+
+    # Walk chunk-aligned windows; fully closed ones are cacheable, the rest is live tail
+    triples: List[Tuple[str, datetime, int]] = []
+    stale = False
+    truncation = None
+    missing_chunks: List[datetime] = []
+    cached_chunks = 0
+    tail_start: Optional[datetime] = None
+
+    chunk_start = floor_to_step(first_bucket, chunk_span)
+    while chunk_start <= last_bucket:
+        chunk_end = chunk_start + timedelta(seconds=chunk_span)
+        if chunk_end <= closed_horizon and chunk_end <= last_bucket:
+            cached = cache.get(_chunk_cache_key(serial, output_filter, step, chunk_start)) if use_cache else None
+            if cached is not None:
+                rows = json.loads(cached) if isinstance(cached, str) else cached
+                triples.extend(_normalize_rows(rows))
+                cached_chunks += 1
+            else:
+                missing_chunks.append(chunk_start)
+        else:
+            tail_start = max(chunk_start, first_bucket)
+            break
+        chunk_start = chunk_end
+
+    # One ADX query covers every missing closed chunk plus the live tail
+    query_start = missing_chunks[0] if missing_chunks else tail_start
+    if query_start is not None:
+        query_end = end if tail_start is not None else missing_chunks[-1] + timedelta(seconds=chunk_span)
+        kql_query = _build_counts_query(serial, query_start, query_end, step, output_filter)
+        rows = query_adx(kql_query, use_cache=use_cache, cache_ttl=CACHE_TTL_SECONDS)
+        stale = getattr(rows, 'stale', False)
+        truncation = getattr(rows, 'truncation', None)
+        fresh = _normalize_rows(rows)
+
+        by_chunk: Dict[datetime, List[Dict]] = {c: [] for c in missing_chunks}
+        for name, bucket, count in fresh:
+            chunk = floor_to_step(bucket, chunk_span)
+            if chunk in by_chunk:
+                by_chunk[chunk].append({'name': name, 'bucket': bucket, 'count_': count})
+            elif tail_start is not None and bucket >= tail_start:
+                triples.append((name, bucket, count))
+            # Rows in already-cached chunks that the query happened to span are skipped
+
+        for chunk, rows in by_chunk.items():
+            triples.extend((r['name'], r['bucket'], r['count_']) for r in rows)
+
+        # Stale fallbacks and cut results are never promoted to closed chunks
+        if use_cache and not stale and truncation is None:
+            for chunk, rows in by_chunk.items():
+                cache.set(
+                    _chunk_cache_key(serial, output_filter, step, chunk),
+                    json.dumps(rows, cls=DjangoJSONEncoder),
+                    EVENTS_CACHE_TTL_CLOSED,
+                )
+
+    summary = _summarize(triples, first_bucket, last_bucket, step)
+    summary.update({
+        'serial': serial,
+        'start': first_bucket.isoformat(),
+        'end': end.isoformat(),
+        'step_seconds': step,
+        'step': format_step(step),
+        'output_filter': output_filter,
+        'stale': stale,
+        'cache': {
+            'closed_chunks_cached': cached_chunks,
+            'closed_chunks_queried': len(missing_chunks),
+        },
+    })
+    if truncation is not None:
+        summary.update(truncated=True, truncation=truncation)
+    logger.info(
+        f"Events summary for {serial}: {summary['total']} events, "
+        f"{cached_chunks} cached / {len(missing_chunks)} queried chunks"
+    )
+    return summary
+
+
+def _summarize(
+    triples: List[Tuple[str, datetime, int]],
+    first_bucket: datetime,
+    last_bucket: datetime,
+    step: int,
+) -> Dict[str, Any]:
+    """Derive per-name, per-severity and histogram views from count triples."""
+    n_buckets = int((last_bucket - first_bucket).total_seconds() // step) + 1
+    histogram = {severity: [0] * n_buckets for severity in SEVERITIES}
+    by_name: Dict[str, int] = {}
+    severity_cache: Dict[str, str] = {}
+
+    for name, bucket, count in triples:
+        index = int((bucket - first_bucket).total_seconds() // step)
+        if index < 0 or index >= n_buckets:
+            continue
+        severity = severity_cache.get(name)
+        if severity is None:
+            severity = severity_cache[name] = get_event_severity(name)
+        histogram[severity][index] += count
+        by_name[name] = by_name.get(name, 0) + count
+
+    totals = [sum(values) for values in zip(*(histogram[s] for s in SEVERITIES))]
+    by_severity = {severity: sum(histogram[severity]) for severity in SEVERITIES}
+
+    return {
+        'total': sum(by_severity.values()),
+        'by_name': [
+            {'name': name, 'count': count, 'severity': severity_cache[name]}
+            for name, count in sorted(by_name.items(), key=lambda item: item[1], reverse=True)
+        ],
+        'by_severity': by_severity,
+        'histogram': {
+            'buckets': [
+                (first_bucket + timedelta(seconds=i * step)).isoformat()
+                for i in range(n_buckets)
+            ],
+            'total': totals,
+            **histogram,
+        },
+    }
+
+
+# =============================================================================
+# Run-Length Encoded Alarm State Series
+# =============================================================================
+
+def run_length_encode(values: List[Any]) -> np.ndarray:
+    """
+    Return the indices where a run of identical values starts.
+
+    Numeric values are compared as floats (NaN equals NaN); anything else is
+    compared as Python objects.
+    """
+    if not values:
+        return np.array([], dtype=np.int64)
+
+    try:
+        arr = np.asarray(values, dtype=np.float64)
+        same = (arr[1:] == arr[:-1]) | (np.isnan(arr[1:]) & np.isnan(arr[:-1]))
+    except (TypeError, ValueError):
+        arr = np.asarray(values, dtype=object)
+        same = arr[1:] == arr[:-1]
+
+    changes = np.concatenate(([True], ~same.astype(bool)))
+    return np.flatnonzero(changes)
+
+
+def _build_state_changes_query(serial: str, name: str, start: datetime, end: datetime) -> str:
+    """Alarm samples where the value differs from the previous one, plus the last sample."""
+    return f"""
+    let s = '{escape_kql_string(serial)}';
+    Alarms
+    | where comms_serial contains s
+    | where name has '{escape_kql_string(name)}'
+    | where localtime between ({format_kql_datetime(start)} .. {format_kql_datetime(end)})
+    | project localtime, value
+    | order by localtime asc
+    | extend is_change = row_number() == 1 or value != prev(value), is_last = isnull(next(localtime))
+    | where is_change or is_last
+    | project localtime, value
+    """.strip()
+
+
+def query_alarm_state_series(
+    serial: str,
+    name: str,
+    start: datetime,
+    end: datetime,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Fetch an alarm/status signal as run-length encoded state transitions.
+
+    Args:
+        serial: Device serial number
+        name: Alarm name (matched with KQL 'has', like the widget queries)
+        start: Range start (naive, device-local time)
+        end: Range end (naive, device-local time)
+        use_cache: Whether to use caching
+
+    Returns:
+        Columnar dictionary: transition times, values, and how long each
+        state lasted (until the next transition, or the last sample seen)
+    """
+    closed_horizon = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=EVENTS_CLOSED_AFTER_HOURS)
+    cache_ttl = CACHE_TTL_HISTORICAL if end <= closed_horizon else CACHE_TTL_SECONDS
+
+    kql_query = _build_state_changes_query(serial, name, start, end)
+    rows = query_adx(kql_query, use_cache=use_cache, cache_ttl=cache_ttl)
+
+    samples = [
+        (to_naive_datetime(row.get('localtime')), row.get('value'))
+        for row in rows
+    ]
+    samples = [(t, v) for t, v in samples if t is not None]
+    samples.sort(key=lambda sample: sample[0])
+
+    times = [t for t, _ in samples]
+    values = [v for _, v in samples]
+    starts = run_length_encode(values)
+
+    last_seen = times[-1] if times else None
+    transition_times = [times[i] for i in starts]
+    boundaries = transition_times[1:] + ([last_seen] if last_seen else [])
+    durations = [
+        (boundary - began).total_seconds()
+        for began, boundary in zip(transition_times, boundaries)
+    ]
+
+    return {
+        'serial': serial,
+        'name': name,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'localtime': [t.isoformat() for t in transition_times],
+        'value': [values[i] for i in starts],
+        'duration_seconds': durations,
+        'last_seen': last_seen.isoformat() if last_seen else None,
+        'transitions': len(starts),
+        'rows_received': len(rows),
+        'stale': getattr(rows, 'stale', False),
+    }
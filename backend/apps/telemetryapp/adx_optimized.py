@@ -9,21 +9,35 @@ Cost Optimization Strategies:
 2. Batch multiple telemetry queries into single ADX call
 3. Rate limiting to prevent query storms
 4. Query result deduplication
+5. Circuit breaker with per-query-class timeouts and stale fallback
+6. Freshness-aware TTLs learned from each device's reporting cadence
+
+The azure-kusto SDK (and msal under it) is imported on first use, not at
+module import, so Django startup, management commands and tests that never
+query ADX do not pay for it.
 """
 
 import os
-import json
+import time
 import hashlib
 import logging
+from collections import deque
 from datetime import datetime, timedelta
 from functools import wraps
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
 from threading import Lock
 
-from azure.kusto.data import KustoConnectionStringBuilder, KustoClient
 from django.core.cache import cache
 from django.conf import settings
 
+from . import fast_json, freshness, pools
+from .result_limits import get_limit, apply_limit, kusto_limit_options, is_truncation_error, ResultTooLargeError
+from .query_log import record_query
+from .tracing import span, traced
+
+if TYPE_CHECKING:
+    from azure.kusto.data import KustoClient
+
 logger = logging.getLogger(__name__)
 
 # =============================================================================
@@ -37,6 +51,31 @@ CACHE_TTL_HISTORICAL = int(os.getenv('ADX_CACHE_TTL_HISTORICAL', 300))  # 5 min
 # Rate limiting
 MAX_QUERIES_PER_MINUTE = int(os.getenv('ADX_MAX_QUERIES_PER_MINUTE', 60))
 RATE_LIMIT_WINDOW = 60  # seconds
+# 'memory' limits each worker; 'redis' limits all workers together (shared Redis pool)
+RATE_LIMIT_BACKEND = os.getenv('ADX_RATE_LIMIT_BACKEND', 'memory')
+
+# Circuit breaker
+BREAKER_ENABLED = os.getenv('ADX_BREAKER_ENABLED', 'True') == 'True'
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('ADX_BREAKER_FAILURE_THRESHOLD', 5))  # consecutive failures
+BREAKER_WINDOW = int(os.getenv('ADX_BREAKER_WINDOW', 20))  # recent calls considered for the failure rate
+BREAKER_MIN_CALLS = int(os.getenv('ADX_BREAKER_MIN_CALLS', 10))  # calls needed before the rate applies
+BREAKER_FAILURE_RATE = float(os.getenv('ADX_BREAKER_FAILURE_RATE', 0.5))  # failed or slow share that opens
+BREAKER_SLOW_CALL_RATIO = float(os.getenv('ADX_BREAKER_SLOW_CALL_RATIO', 0.5))  # slow = over this share of timeout
+BREAKER_RECOVERY_SECONDS = int(os.getenv('ADX_BREAKER_RECOVERY_SECONDS', 30))  # open -> half-open
+BREAKER_HALF_OPEN_PROBES = int(os.getenv('ADX_BREAKER_HALF_OPEN_PROBES', 1))  # concurrent probes
+
+# Per-query-class timeouts (seconds). Adaptive timeouts never exceed these.
+QUERY_TIMEOUTS = {
+    'latest': int(os.getenv('ADX_TIMEOUT_LATEST', 10)),
+    'interactive': int(os.getenv('ADX_TIMEOUT_INTERACTIVE', 30)),
+    'historical': int(os.getenv('ADX_TIMEOUT_HISTORICAL', 55)),  # below gunicorn's 60s
+}
+TIMEOUT_MIN_SECONDS = int(os.getenv('ADX_TIMEOUT_MIN', 5))
+TIMEOUT_P95_MULTIPLIER = float(os.getenv('ADX_TIMEOUT_P95_MULTIPLIER', 4))
+
+# Last-good results served (marked stale) when ADX is unavailable
+STALE_TTL_SECONDS = int(os.getenv('ADX_STALE_TTL', 6 * 3600))
+STALE_MAX_ROWS = int(os.getenv('ADX_STALE_MAX_ROWS', 5000))
 
 # Connection settings
 cluster = os.getenv("ADX_CLUSTER_URI") or os.getenv("ADX_CLUSTER_URL")
@@ -53,7 +92,7 @@ _client = None
 _client_lock = Lock()
 
 
-def get_adx_client() -> Optional[KustoClient]:
+def get_adx_client() -> Optional['KustoClient']:
     """Get or create a singleton ADX client with connection reuse."""
     global _client
     
@@ -69,10 +108,12 @@ def get_adx_client() -> Optional[KustoClient]:
             return None
             
         try:
+            from azure.kusto.data import KustoConnectionStringBuilder, KustoClient
             kcsb = KustoConnectionStringBuilder.with_aad_application_key_authentication(
                 cluster, client_id, client_secret, tenant_id
             )
             _client = KustoClient(kcsb)
+            pools.configure_kusto_client(_client)
             logger.info("ADX client initialized successfully")
             return _client
         except Exception as e:
@@ -80,6 +121,31 @@ def get_adx_client() -> Optional[KustoClient]:
             return None
 
 
+def set_adx_client(client) -> None:
+    """Replace the shared client (fake clients for benchmarks and simulations)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def reset_after_fork() -> None:
+    """
+    Drop process-local ADX state inherited from a forking parent.
+
+    The client's HTTP sessions and token cache must not be shared between
+    processes, and a lock held by another thread at fork time would never
+    be released in the child.
+    """
+    global _client, _client_lock, _rate_limiter, _breaker, _latency, _cache_counters_lock
+    _client = None
+    _client_lock = Lock()
+    _rate_limiter = _make_rate_limiter()
+    _breaker = CircuitBreaker()
+    _latency = LatencyTracker()
+    _cache_counters_lock = Lock()
+    freshness.reset_after_fork()
+
+
 # =============================================================================
 # Rate Limiting
 # =============================================================================
@@ -117,7 +183,301 @@ class RateLimiter:
             return len(self.requests)
 
 
-_rate_limiter = RateLimiter()
+class RedisRateLimiter(RateLimiter):
+    """
+    Fixed-window limiter shared by every worker through the pooled Redis
+    client; falls back to the in-memory window while Redis is unreachable.
+    """
+
+    def _key(self) -> str:
+        return f"telemetry:adx_rate:{int(time.time() // RATE_LIMIT_WINDOW)}"
+
+    def is_allowed(self) -> bool:
+        try:
+            pipe = pools.get_redis().pipeline()
+            key = self._key()
+            pipe.incr(key)
+            pipe.expire(key, RATE_LIMIT_WINDOW * 2)
+            count = pipe.execute()[0]
+        except Exception as e:
+            logger.warning(f"Redis rate limiter unavailable, limiting locally: {e}")
+            return super().is_allowed()
+        if count > MAX_QUERIES_PER_MINUTE:
+            logger.warning(f"Rate limit exceeded: {count} queries this minute across workers")
+            return False
+        return True
+
+    def get_current_rate(self) -> int:
+        try:
+            return int(pools.get_redis().get(self._key()) or 0)
+        except Exception:
+            return super().get_current_rate()
+
+
+def _make_rate_limiter() -> RateLimiter:
+    if RATE_LIMIT_BACKEND == 'redis' and os.getenv('REDIS_URL'):
+        return RedisRateLimiter()
+    return RateLimiter()
+
+
+_rate_limiter = _make_rate_limiter()
+
+
+# =============================================================================
+# Circuit Breaker & Adaptive Timeouts
+# =============================================================================
+
+class AdxUnavailableError(Exception):
+    """Raised when ADX is failing (circuit open) and no stale result exists."""
+
+
+class AdxQueryError(Exception):
+    """Raised when a query fails (error, timeout) and no stale result exists."""
+
+
+class AdxRateLimitError(AdxUnavailableError):
+    """Raised when this worker is over MAX_QUERIES_PER_MINUTE."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around ADX calls.
+    
+    closed    -> normal operation; the circuit opens after BREAKER_FAILURE_THRESHOLD
+                 consecutive failures, or when failed and slow calls make up
+                 BREAKER_FAILURE_RATE of the last BREAKER_WINDOW calls
+    open      -> calls fail fast until BREAKER_RECOVERY_SECONDS have passed
+    half_open -> a limited number of probe calls; a fast success closes,
+                 a failure or slow call re-opens
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self):
+        self.state = self.CLOSED
+        self.window = deque(maxlen=BREAKER_WINDOW)
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.rejected = 0
+        self.lock = Lock()
+    
+    def allow_request(self) -> bool:
+        """Check whether a call may go to ADX (and reserve a probe slot if half-open)."""
+        if not BREAKER_ENABLED:
+            return True
+        
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < BREAKER_RECOVERY_SECONDS:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self.probes_in_flight = 0
+                logger.info("ADX circuit half-open, probing")
+            
+            if self.state == self.HALF_OPEN:
+                if self.probes_in_flight >= BREAKER_HALF_OPEN_PROBES:
+                    self.rejected += 1
+                    return False
+                self.probes_in_flight += 1
+            return True
+    
+    def record_success(self, slow: bool = False) -> None:
+        """Record a successful call; slow successes count against the failure rate."""
+        if slow:
+            self.record_failure(slow=True)
+            return
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                logger.info("ADX circuit closed")
+                self.window.clear()
+            self.state = self.CLOSED
+            self.window.append(False)
+            self.consecutive_failures = 0
+            self.probes_in_flight = 0
+    
+    def record_failure(self, slow: bool = False) -> None:
+        with self.lock:
+            self.window.append(True)
+            if not slow:
+                self.consecutive_failures += 1
+            bad_rate = sum(self.window) / len(self.window)
+            if (
+                self.state == self.HALF_OPEN
+                or self.consecutive_failures >= BREAKER_FAILURE_THRESHOLD
+                or (len(self.window) >= BREAKER_MIN_CALLS and bad_rate >= BREAKER_FAILURE_RATE)
+            ):
+                if self.state != self.OPEN:
+                    logger.warning(f"ADX circuit opened ({bad_rate:.0%} of recent calls failed or slow)")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probes_in_flight = 0
+    
+    def release_probe(self) -> None:
+        """Release a probe slot for a call that ended without a verdict (client error)."""
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.probes_in_flight > 0:
+                self.probes_in_flight -= 1
+    
+    def get_state(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'recent_failure_rate': round(sum(self.window) / len(self.window), 3) if self.window else 0.0,
+                'rejected': self.rejected,
+            }
+
+
+_breaker = CircuitBreaker()
+
+
+class LatencyTracker:
+    """Recent ADX latencies per query class, used to adapt timeouts."""
+    
+    def __init__(self, maxlen: int = 200):
+        self.samples: Dict[str, deque] = {name: deque(maxlen=maxlen) for name in QUERY_TIMEOUTS}
+        self.lock = Lock()
+    
+    def record(self, query_class: str, seconds: float) -> None:
+        with self.lock:
+            self.samples.setdefault(query_class, deque(maxlen=200)).append(seconds)
+    
+    def percentile(self, query_class: str, pct: float) -> Optional[float]:
+        with self.lock:
+            values = sorted(self.samples.get(query_class, ()))
+        if not values:
+            return None
+        return values[min(int(len(values) * pct), len(values) - 1)]
+    
+    def timeout_for(self, query_class: str) -> int:
+        """Class timeout, tightened to a multiple of the observed p95 once warmed up."""
+        ceiling = QUERY_TIMEOUTS.get(query_class, QUERY_TIMEOUTS['interactive'])
+        with self.lock:
+            warmed_up = len(self.samples.get(query_class, ())) >= 20
+        if not warmed_up:
+            return ceiling
+        p95 = self.percentile(query_class, 0.95)
+        return int(min(ceiling, max(TIMEOUT_MIN_SECONDS, p95 * TIMEOUT_P95_MULTIPLIER)))
+
+
+_latency = LatencyTracker()
+
+
+def classify_query(kql_query: str) -> str:
+    """Guess the query class (latest / historical / interactive) from the KQL text."""
+    lowered = kql_query.lower()
+    if 'arg_max' in lowered or 'top 1 ' in lowered or 'limit 1' in lowered or 'take 1' in lowered:
+        return 'latest'
+    if 'between' in lowered or 'ago(' in lowered:
+        return 'historical'
+    return 'interactive'
+
+
+def _is_service_failure(error: Exception) -> bool:
+    """Whether an error means ADX is unhealthy (as opposed to a bad query)."""
+    from azure.kusto.data.exceptions import KustoServiceError, KustoThrottlingError, KustoNetworkError
+    if isinstance(error, (KustoThrottlingError, KustoNetworkError)):
+        return True
+    if isinstance(error, KustoServiceError):
+        if error.is_semantic_error():
+            return False
+        response = error.get_raw_http_response()
+        status_code = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+        if status_code is not None and 400 <= status_code < 500 and status_code != 429:
+            return False
+    return True
+
+
+def execute_query(
+    kql_query: str,
+    query_class: str = None,
+    timeout_seconds: int = None,
+    limit: Dict[str, Any] = None,
+    mgmt: bool = False,
+) -> Dict[str, Any]:
+    """
+    Execute a query through the circuit breaker with a per-class timeout.
+    
+    Returns the primary table as a dict ({'name', 'kind', 'data'}), plus
+    'server_truncated': True when Kusto cut the result to `limit` (see
+    result_limits.py). `mgmt` runs a control command instead of a query.
+    
+    Raises:
+        AdxUnavailableError: if the circuit is open or the client is unavailable
+        Exception: whatever the Kusto client raised
+    """
+    client = get_adx_client()
+    if client is None:
+        raise AdxUnavailableError("ADX client not available")
+    
+    if not _breaker.allow_request():
+        raise AdxUnavailableError("ADX circuit open - failing fast")
+    
+    query_class = query_class or classify_query(kql_query)
+    timeout = timeout_seconds or _latency.timeout_for(query_class)
+    from azure.kusto.data import ClientRequestProperties
+    properties = ClientRequestProperties()
+    properties.set_option(ClientRequestProperties.request_timeout_option_name, timedelta(seconds=timeout))
+    if limit:
+        for option, value in kusto_limit_options(limit).items():
+            properties.set_option(option, value)
+        # Return the truncated rows instead of failing the whole query
+        properties.set_option(ClientRequestProperties.results_defer_partial_query_failures_option_name, True)
+    
+    started = time.monotonic()
+    try:
+        execute = client.execute_mgmt if mgmt else client.execute
+        with span('adx', query_class=query_class) as attributes:
+            response = execute(database, kql_query, properties)
+            result = response.primary_results[0].to_dict()
+            if attributes is not None:
+                attributes['rows'] = len(result.get('data') or [])
+        if limit and getattr(response, 'errors_count', 0):
+            result['server_truncated'] = any(is_truncation_error(e) for e in response.get_exceptions())
+    except Exception as e:
+        if _is_service_failure(e):
+            _breaker.record_failure()
+        else:
+            _breaker.release_probe()
+        raise
+    
+    elapsed = time.monotonic() - started
+    _breaker.record_success(slow=elapsed > timeout * BREAKER_SLOW_CALL_RATIO)
+    _latency.record(query_class, elapsed)
+    return result
+
+
+# =============================================================================
+# Stale Fallback
+# =============================================================================
+
+class QueryResult(list):
+    """Query rows, flagged when served from the last-good copy."""
+    stale = False
+    stale_age_seconds = None
+    truncation = None  # set when cut to a result-size limit (see result_limits)
+    cache_ttl = None  # freshness-aware TTL chosen for a freshly executed result
+
+
+def store_last_good(query: str, rows: List[Dict]) -> None:
+    """Keep a long-lived copy of a successful result for stale fallback."""
+    if len(rows) > STALE_MAX_ROWS:
+        return
+    payload = fast_json.dumps({'stored_at': time.time(), 'rows': rows})
+    cache.set(get_cache_key(query, prefix="adx_last_good"), payload, STALE_TTL_SECONDS)
+
+
+def get_last_good(query: str) -> Optional[Tuple[List[Dict], float]]:
+    """Return (rows, age in seconds) of the last good result, if any."""
+    payload = cache.get(get_cache_key(query, prefix="adx_last_good"))
+    if payload is None:
+        return None
+    data = fast_json.loads(payload) if isinstance(payload, (str, bytes)) else payload
+    return data['rows'], round(time.time() - data['stored_at'], 1)
 
 
 # =============================================================================
@@ -130,65 +490,171 @@ def get_cache_key(query: str, prefix: str = "adx") -> str:
     return f"{prefix}:{query_hash}"
 
 
-def get_cached_result(query: str) -> Optional[List[Dict]]:
-    """Get cached query result if available."""
+_cache_counters = {'hits': 0, 'misses': 0}
+_cache_counters_lock = Lock()
+
+
+def _read_cache(query: str) -> Any:
+    """Raw cache entry of a query (counted as a hit or miss)."""
     cache_key = get_cache_key(query)
-    result = cache.get(cache_key)
+    with span('cache') as attributes:
+        result = cache.get(cache_key)
+        if attributes is not None:
+            attributes['hit'] = result is not None
     
     if result is not None:
+        with _cache_counters_lock:
+            _cache_counters['hits'] += 1
         logger.debug(f"Cache HIT for query hash: {cache_key[-8:]}")
-        return json.loads(result) if isinstance(result, str) else result
+        return result
     
+    with _cache_counters_lock:
+        _cache_counters['misses'] += 1
     logger.debug(f"Cache MISS for query hash: {cache_key[-8:]}")
     return None
 
 
+def _decode_entry(entry: Any) -> List[Dict]:
+    # (row count, encoded rows); plain JSON strings from before that format
+    if isinstance(entry, tuple):
+        return fast_json.loads(entry[1])
+    return fast_json.loads(entry) if isinstance(entry, (str, bytes)) else entry
+
+
+def get_cached_result(query: str) -> Optional[List[Dict]]:
+    """Get cached query result if available."""
+    entry = _read_cache(query)
+    return _decode_entry(entry) if entry is not None else None
+
+
+def get_cached_encoded(query: str) -> Optional[Tuple[int, 'fast_json.PreEncodedJSON']]:
+    """
+    (row count, JSON-encoded rows) of a cached result, without decoding it,
+    so callers can send the bytes straight to the client.
+    """
+    entry = _read_cache(query)
+    if entry is None:
+        return None
+    if isinstance(entry, tuple):
+        count, payload = entry
+    else:
+        rows = _decode_entry(entry)
+        count, payload = len(rows), fast_json.dumps(rows)
+    return count, fast_json.PreEncodedJSON(payload)
+
+
+def get_cache_counters() -> Dict[str, Any]:
+    """Query cache hits/misses in this process since startup."""
+    with _cache_counters_lock:
+        hits, misses = _cache_counters['hits'], _cache_counters['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
 def set_cached_result(query: str, result: List[Dict], ttl: int = None) -> None:
-    """Cache a query result."""
+    """Cache a query result (encoded once, with its row count; see get_cached_encoded)."""
     cache_key = get_cache_key(query)
     ttl = ttl or CACHE_TTL_SECONDS
-    cache.set(cache_key, json.dumps(result), ttl)
+    cache.set(cache_key, (len(result), fast_json.dumps(result)), ttl)
     logger.debug(f"Cached result for query hash: {cache_key[-8:]} (TTL: {ttl}s)")
 
 
+# =============================================================================
+# Query Helpers
+# =============================================================================
+
+def escape_kql_string(value: str) -> str:
+    """Escape a value for use inside a single-quoted KQL string literal."""
+    return (value or '').replace("'", "''")
+
+
+def format_kql_datetime(value: datetime) -> str:
+    """Format a naive datetime as a KQL datetime() literal."""
+    return f"datetime({value.strftime('%Y-%m-%d %H:%M:%S.%f')})"
+
+
+def to_naive_datetime(value: Any) -> Optional[datetime]:
+    """
+    Normalize an ADX datetime value to a naive datetime.
+    
+    Fresh results contain datetime objects (flagged UTC by the SDK), while
+    cached results contain ISO strings. `localtime` is device-local time, so
+    the timezone flag is dropped rather than converted.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return None
+
+
 # =============================================================================
 # Core Query Functions
 # =============================================================================
 
-def query_adx(kql_query: str, use_cache: bool = True, cache_ttl: int = None) -> List[Dict]:
+@traced('query_adx')
+def query_adx(
+    kql_query: str,
+    use_cache: bool = True,
+    cache_ttl: int = None,
+    timeout_seconds: int = None,
+    endpoint: str = 'default',
+) -> List[Dict]:
     """
     Execute a KQL query against ADX with caching and rate limiting.
     
     Args:
         kql_query: The KQL query to execute
         use_cache: Whether to use caching (default: True)
-        cache_ttl: Custom cache TTL in seconds (default: uses CACHE_TTL_SECONDS)
+        cache_ttl: Custom cache TTL in seconds (default: adaptive, see freshness.py;
+            CACHE_TTL_SECONDS when the device cadence is unknown)
+        timeout_seconds: Server-side query timeout (default: adaptive per-class timeout)
+        endpoint: Key into result_limits.RESULT_LIMITS for row/byte limits
     
     Returns:
-        List of dictionaries containing query results
+        List of dictionaries containing query results. When ADX fails and a
+        last-good result exists, that result is returned with `.stale = True`.
+        Over-limit results are cut and carry `.truncation` (see result_limits).
+    
+    Raises:
+        AdxUnavailableError: if ADX is unavailable (circuit open, no client,
+            rate limited) and no stale result exists
+        AdxQueryError: if the query failed and no stale result exists
+        ResultTooLargeError: over the endpoint's limit in 'reject' mode
     """
+    started = time.monotonic()
+    limit = get_limit(endpoint)
+
     # Check cache first
     if use_cache:
         cached = get_cached_result(kql_query)
         if cached is not None:
-            return cached
+            record_query(kql_query, 'opt', 'hit', started, len(cached))
+            # Entries are complete results; a stricter endpoint still gets cut
+            rows, truncation = apply_limit(cached, limit)
+            if truncation is None:
+                return cached
+            result = QueryResult(rows)
+            result.truncation = truncation
+            return result
     
     # Check rate limit
     if not _rate_limiter.is_allowed():
         logger.warning("Query rejected due to rate limiting")
-        raise Exception("Rate limit exceeded. Please try again later.")
-    
-    # Execute query
-    client = get_adx_client()
-    if client is None:
-        logger.error("ADX client not available")
-        return []
+        raise AdxRateLimitError("Rate limit exceeded. Please try again later.")
     
     try:
         logger.info(f"Executing ADX query (rate: {_rate_limiter.get_current_rate()}/min)")
-        response = client.execute(database, kql_query)
-        table = response.primary_results[0]
-        result_dict = table.to_dict()
+        result_dict = execute_query(kql_query, timeout_seconds=timeout_seconds, limit=limit)
         
         # to_dict() returns {'name': 'PrimaryResult', 'kind': ..., 'data': [list of row dicts]}
         # The actual data rows are in result_dict['data']
@@ -198,19 +664,48 @@ def query_adx(kql_query: str, use_cache: bool = True, cache_ttl: int = None) ->
             logger.warning(f"Unexpected data format: {type(rows)}")
             rows = []
         
-        # Cache the result
-        if use_cache:
-            ttl = cache_ttl or CACHE_TTL_SECONDS
+        rows, truncation = apply_limit(rows, limit, result_dict.get('server_truncated', False))
+        
+        # Learn the device cadence and pick the TTL even when not caching
+        # here: the batch helpers cache the reshaped result themselves
+        ttl = freshness.observe_result(
+            kql_query, rows, classify_query(kql_query),
+            default_ttl=cache_ttl or CACHE_TTL_SECONDS, adaptive=cache_ttl is None,
+        )
+        
+        # Cache the result (partial results are never cached)
+        if use_cache and truncation is None:
             set_cached_result(kql_query, rows, ttl)
+            store_last_good(kql_query, rows)
         
         logger.debug(f"Returning {len(rows)} rows")
-        return rows
+        record_query(kql_query, 'opt', 'miss' if use_cache else 'bypass', started, len(rows))
+        result = QueryResult(rows)
+        result.cache_ttl = ttl
+        result.truncation = truncation
+        return result
+    
+    except ResultTooLargeError:
+        record_query(kql_query, 'opt', 'error', started)
+        raise
         
     except Exception as e:
         logger.error(f"ADX query failed: {e}")
         logger.debug(f"Failed query: {kql_query[:200]}...")
-        return []
-        return []
+        
+        last_good = get_last_good(kql_query) if use_cache else None
+        if last_good is not None:
+            stale = QueryResult(last_good[0])
+            stale.stale = True
+            stale.stale_age_seconds = last_good[1]
+            logger.warning(f"Serving stale result ({last_good[1]}s old)")
+            record_query(kql_query, 'opt', 'stale', started, len(stale))
+            return stale
+        
+        record_query(kql_query, 'opt', 'error', started)
+        if isinstance(e, AdxUnavailableError):
+            raise
+        raise AdxQueryError(f"ADX query failed: {e}") from e
 
 
 def query_adx_batch(queries: List[str], use_cache: bool = True) -> Dict[str, List[Dict]]:
@@ -219,6 +714,9 @@ def query_adx_batch(queries: List[str], use_cache: bool = True) -> Dict[str, Lis
     
     For queries that can be batched (same table, same serial), combines them.
     Returns a dictionary mapping original queries to their results.
+    
+    Raises:
+        AdxUnavailableError, AdxQueryError: as query_adx, for the first failing query
     """
     results = {}
     uncached_queries = []
@@ -241,137 +739,6 @@ def query_adx_batch(queries: List[str], use_cache: bool = True) -> Dict[str, Lis
     return results
 
 
-# =============================================================================
-# Optimized Batch Query for Telemetry
-# =============================================================================
-
-def query_latest_telemetry_batch(
-    serial: str, 
-    telemetry_names: List[str],
-    use_cache: bool = True
-) -> Dict[str, Dict[str, Any]]:
-    """
-    Fetch latest values for multiple telemetry metrics in a SINGLE query.
-    
-    This is the key optimization - instead of 30+ individual queries,
-    we make ONE query that returns all metrics at once.
-    
-    Args:
-        serial: Device serial number
-        telemetry_names: List of telemetry metric names
-        use_cache: Whether to use caching
-    
-    Returns:
-        Dictionary mapping telemetry_name to {value, localtime}
-    """
-    if not telemetry_names:
-        return {}
-    
-    # Build a single optimized query that gets latest value for each metric
-    # Using arg_max to get the row with the latest localtime for each name
-    # Using 'contains' for flexible matching (matching original behavior)
-    names_filter = " or ".join([f"name contains '{n}'" for n in telemetry_names])
-    
-    kql_query = f"""
-    Telemetry
-    | where comms_serial contains '{serial}'
-    | where {names_filter}
-    | summarize arg_max(localtime, value_double) by name
-    | project name, localtime, value_double
-    """.strip()
-    
-    # Check cache
-    cache_key = f"batch_telemetry:{serial}:{hashlib.md5(':'.join(sorted(telemetry_names)).encode()).hexdigest()}"
-    
-    if use_cache:
-        cached = cache.get(cache_key)
-        if cached:
-            logger.debug(f"Batch telemetry cache HIT for {serial}")
-            return json.loads(cached) if isinstance(cached, str) else cached
-    
-    # Execute query
-    rows = query_adx(kql_query, use_cache=False)  # Don't double-cache
-    
-    # Transform results into a dictionary
-    # Map results back to requested names (handle 'contains' matching)
-    results = {}
-    
-    # First, store raw results by the DB name
-    db_results = {}
-    for row in rows:
-        name = row.get('name')
-        if name:
-            db_results[name] = {
-                'value': row.get('value_double'),
-                'localtime': row.get('localtime'),
-            }
-    
-    # Now map each requested telemetry_name to the matching DB result
-    # This handles cases where DB name contains the requested name or vice versa
-    for requested_name in telemetry_names:
-        # Try exact match first
-        if requested_name in db_results:
-            results[requested_name] = db_results[requested_name]
-        else:
-            # Try contains match (requested name is in DB name or DB name is in requested name)
-            for db_name, db_value in db_results.items():
-                if requested_name in db_name or db_name in requested_name:
-                    results[requested_name] = db_value
-                    break
-    
-    # Cache the batch result
-    if use_cache:
-        cache.set(cache_key, json.dumps(results), CACHE_TTL_SECONDS)
-    
-    logger.info(f"Batch query returned {len(results)}/{len(telemetry_names)} metrics for {serial}")
-    return results
-
-
-def query_latest_alarms_batch(
-    serial: str,
-    alarm_names: List[str],
-    use_cache: bool = True
-) -> Dict[str, Dict[str, Any]]:
-    """
-    Fetch latest alarm values in a single query (similar to telemetry batch).
-    """
-    if not alarm_names:
-        return {}
-    
-    names_filter = " or ".join([f"name has '{n}'" for n in alarm_names])
-    
-    kql_query = f"""
-    Alarms
-    | where comms_serial contains '{serial}'
-    | where {names_filter}
-    | summarize arg_max(localtime, value) by name
-    | project name, localtime, value
-    """.strip()
-    
-    cache_key = f"batch_alarms:{serial}:{hashlib.md5(':'.join(sorted(alarm_names)).encode()).hexdigest()}"
-    
-    if use_cache:
-        cached = cache.get(cache_key)
-        if cached:
-            return json.loads(cached) if isinstance(cached, str) else cached
-    
-    rows = query_adx(kql_query, use_cache=False)
-    
-    results = {}
-    for row in rows:
-        name = row.get('name')
-        if name:
-            results[name] = {
-                'value': row.get('value'),
-                'localtime': row.get('localtime'),
-            }
-    
-    if use_cache:
-        cache.set(cache_key, json.dumps(results), CACHE_TTL_SECONDS)
-    
-    return results
-
-
 # =============================================================================
 # Statistics & Monitoring
 # =============================================================================
@@ -383,4 +750,10 @@ def get_query_stats() -> Dict[str, Any]:
         'max_queries_per_minute': MAX_QUERIES_PER_MINUTE,
         'cache_ttl_seconds': CACHE_TTL_SECONDS,
         'client_connected': _client is not None,
+        'circuit_breaker': _breaker.get_state(),
+        'timeouts': {name: _latency.timeout_for(name) for name in QUERY_TIMEOUTS},
+        'cache': get_cache_counters(),
+        'freshness': freshness.get_freshness_stats(),
+        'pools': pools.get_pool_stats(),
+        'cache_backend': cache.get_stats() if hasattr(cache, 'get_stats') else None,
     }
@@ -1,36 +1,119 @@
-import os
+import time
 import logging
-from azure.kusto.data import KustoConnectionStringBuilder, KustoClient
-from dotenv import load_dotenv
+
+from . import freshness
+from .fast_json import PreEncodedJSON
+from .query_log import record_query
+from .tracing import traced
+from .adx_optimized import (
+    execute_query,
+    store_last_good,
+    get_last_good,
+    get_cached_encoded,
+    get_cached_result,
+    set_cached_result,
+    classify_query,
+    AdxUnavailableError,
+    AdxQueryError,
+    CACHE_TTL_SECONDS,
+)
+from .result_limits import get_limit, apply_limit, ResultTooLargeError
 
 
 # Configure logging - reduce verbosity for production
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
-cluster = os.getenv("ADX_CLUSTER_URI")
-database = os.getenv("ADX_DATABASE")
-client_id = os.getenv("ADX_CLIENT_ID")
-client_secret = os.getenv("ADX_CLIENT_SECRET")
-tenant_id = os.getenv("ADX_TENANT_ID")
-
-# Build connection string
-kcsb = KustoConnectionStringBuilder.with_aad_application_key_authentication(
-    cluster, client_id, client_secret, tenant_id
-)
-
-client = KustoClient(kcsb)
 
-def query_adx(kql_query):
-    """Execute a KQL query against Azure Data Explorer."""
+@traced('query_adx')
+def query_adx(kql_query, endpoint='default', cache_result=False):
+    """
+    Execute a KQL query against Azure Data Explorer.
+    
+    Uses the shared client, circuit breaker and per-query-class timeouts from
+    adx_optimized. When ADX fails, the last good result for the same query is
+    returned with 'stale': True instead of an empty list.
+    
+    Results are held to the row/byte limits of `endpoint` (see
+    result_limits.py); a cut result carries 'truncated': True and a
+    'truncation' dict. With cache_result, complete results are also written
+    to the shared query cache (freshness-aware TTL) for cached_response().
+    
+    An empty list in 'data' always means the query returned no rows; a
+    failure is never reported as an empty result.
+    
+    Raises:
+        AdxUnavailableError: if ADX is unavailable and no stale result exists
+        AdxQueryError: if the query failed (error, timeout) and no stale result exists
+        ResultTooLargeError: over the endpoint's limit in 'reject' mode
+    """
+    started = time.monotonic()
+    limit = get_limit(endpoint)
     try:
-        response = client.execute(database, kql_query)
-        table = response.primary_results[0]
-        rows = table.to_dict()
+        result = execute_query(kql_query, limit=limit)
+        rows, truncation = apply_limit(
+            result.get('data', []), limit, result.pop('server_truncated', False)
+        )
+        if truncation is not None:
+            result.update(data=rows, truncated=True, truncation=truncation)
+        else:
+            store_last_good(kql_query, rows)
+            if cache_result:
+                ttl = freshness.observe_result(
+                    kql_query, rows, classify_query(kql_query), default_ttl=CACHE_TTL_SECONDS, adaptive=True,
+                )
+                set_cached_result(kql_query, rows, ttl)
+        record_query(kql_query, 'svc', 'bypass', started, len(rows))
         # Return the data portion of the result
-        return rows
+        return result
+    except ResultTooLargeError:
+        record_query(kql_query, 'svc', 'error', started)
+        raise
     except Exception as e:
         logger.error(f"ADX query failed: {e}")
-        return []
-        
\ No newline at end of file
+        last_good = get_last_good(kql_query)
+        if last_good is not None:
+            rows, age = last_good
+            record_query(kql_query, 'svc', 'stale', started, len(rows))
+            return {'data': rows, 'stale': True, 'stale_age_seconds': age}
+        record_query(kql_query, 'svc', 'error', started)
+        if isinstance(e, AdxUnavailableError):
+            raise
+        raise AdxQueryError(f"ADX query failed: {e}") from e
+
+
+def cached_response(kql_query, endpoint='default'):
+    """
+    A cached result as a ready-to-send response body, still encoded.
+    
+    Returns PreEncodedJSON of {"data": [...], "cached": true}, or None on a
+    miss or when the cached result is over the endpoint's limits (the
+    caller then runs the query, which cuts it).
+    """
+    started = time.monotonic()
+    cached = get_cached_encoded(kql_query)
+    if cached is None:
+        return None
+    count, rows_json = cached
+    limit = get_limit(endpoint)
+    if (limit['max_rows'] and count > limit['max_rows']) or (limit['max_bytes'] and len(rows_json) > limit['max_bytes']):
+        return None
+    record_query(kql_query, 'svc', 'hit', started, count)
+    return PreEncodedJSON(b'{"data":' + rows_json + b',"cached":true}')
+
+
+def query_adx_cached(kql_query, endpoint='default'):
+    """
+    query_adx for polling paths that need the rows, not a response body.
+    
+    Served from the shared query cache while its freshness-aware TTL (the
+    device's reporting cadence, see freshness.py) holds; otherwise the query
+    runs and its result is cached with that TTL. A hit is returned as
+    {'data': rows, 'cached': True}.
+    """
+    started = time.monotonic()
+    rows = get_cached_result(kql_query)
+    max_rows = get_limit(endpoint)['max_rows']
+    if rows is not None and not (max_rows and len(rows) > max_rows):
+        record_query(kql_query, 'svc', 'hit', started, len(rows))
+        return {'data': rows, 'cached': True}
+    return query_adx(kql_query, endpoint=endpoint, cache_result=True)
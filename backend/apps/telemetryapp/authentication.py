@@ -2,35 +2,231 @@
 Custom JWT Authentication that reads tokens from httpOnly cookies.
 
 This provides XSS protection by keeping tokens inaccessible to JavaScript.
+
+Hot-path design (every 10 s poll from every tab authenticates):
+1. Tokens issued by issue_tokens_for_user() carry the claims the API needs
+   (user id, username, email, group names), so a valid access token is
+   turned into a ClaimsUser without touching the database
+2. Tokens without claims (legacy /api/token/, tokens issued before the
+   claims existed) fall back to a short-TTL in-process cache of the user
+   and its group names
+3. Group or user changes (including deactivation) record an invalidation
+   time for that user in the shared Django cache. Every worker reads it
+   on each request (one cache get_many), distrusts claims issued before it
+   and reloads the user from the database, where is_active is checked, so
+   the change takes effect on the next request
+4. Both shortcuts need that cache to be shared by all workers
+   (CACHE_BACKEND=redis or shm). With a per-process cache (memory, dummy)
+   an invalidation would not reach the other workers, so every request
+   loads the user from the database instead
 """
 
+import os
+import time
+import logging
+import threading
+from typing import Dict, Tuple, Optional, FrozenSet
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Trust the user/group claims embedded in access tokens (no DB per request)
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv('AUTH_TRUST_TOKEN_CLAIMS', 'True').lower() in ('true', '1', 'yes')
+
+# Lifetime of the in-process user/group cache used for tokens without claims
+AUTH_USER_CACHE_TTL_SECONDS = int(os.getenv('AUTH_USER_CACHE_TTL_SECONDS', 60))
+
+# Bump when the claim layout changes; older tokens take the fallback path
+CLAIMS_VERSION = 1
+
+# Invalidation times only matter while a token issued before them is valid
+INVALIDATION_TTL_SECONDS = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()) + 60
+
+
+# =============================================================================
+# Token Claims
+# =============================================================================
+
+def apply_user_claims(token, user) -> None:
+    """Set the user claims on a token; access tokens derived from it inherit them."""
+    token['username'] = user.username
+    token['email'] = user.email
+    token['groups'] = sorted(user.groups.values_list('name', flat=True))
+    token['claims_version'] = CLAIMS_VERSION
+
+
+def issue_tokens_for_user(user) -> RefreshToken:
+    """
+    Refresh token (and, via .access_token, access token) carrying the
+    claims needed to authenticate without a database lookup.
+    """
+    refresh = RefreshToken.for_user(user)
+    apply_user_claims(refresh, user)
+    return refresh
+
+
+class ClaimsUser(TokenUser):
+    """Stateless user built from access token claims."""
+
+    @property
+    def group_names(self) -> FrozenSet[str]:
+        return frozenset(self.token.get('groups', ()))
+
+
+# =============================================================================
+# Invalidation & In-process User Cache
+# =============================================================================
+
+_user_cache: Dict[str, Tuple[float, object]] = {}
+# Local copy of the invalidation times, used when the shared cache fails
+_invalidated_at: Dict[str, float] = {}
+_cache_lock = threading.Lock()
+
+
+def _invalidation_key(key: str) -> str:
+    return f"auth:invalidated:{key}"
+
+
+def _record_invalidation(key: str, now: float) -> None:
+    with _cache_lock:
+        _invalidated_at[key] = now
+    try:
+        cache.set(_invalidation_key(key), now, INVALIDATION_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Could not share auth invalidation for {key}, other workers keep old claims: {e}")
 
 
+def invalidation_shared() -> bool:
+    """Whether invalidations reach every worker (the default cache is not per-process)."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def invalidated_since(user_id) -> float:
+    """Latest invalidation time (epoch seconds) affecting a user, from any worker."""
+    key = str(user_id)
+    with _cache_lock:
+        latest = max(_invalidated_at.get(key, 0), _invalidated_at.get('*', 0))
+    try:
+        shared = cache.get_many([_invalidation_key(key), _invalidation_key('*')])
+    except Exception:
+        shared = {}
+    return max(latest, *shared.values()) if shared else latest
+
+
+def get_cached_user(user_id) -> Optional[object]:
+    """User with a `group_names` attribute, from the TTL cache or the DB."""
+    key = str(user_id)
+    now = time.time()
+    shared = invalidation_shared()
+    with _cache_lock:
+        entry = _user_cache.get(key) if shared else None
+    if (
+        entry is not None
+        and now - entry[0] < AUTH_USER_CACHE_TTL_SECONDS
+        and entry[0] > invalidated_since(user_id)
+    ):
+        return entry[1]
+
+    user_model = get_user_model()
+    try:
+        user = user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+    except user_model.DoesNotExist:
+        return None
+    user.group_names = frozenset(user.groups.values_list('name', flat=True))
+
+    if shared:
+        with _cache_lock:
+            _user_cache[key] = (now, user)
+    return user
+
+
+def invalidate_user(user_id) -> None:
+    """Drop a user's cached data and distrust claims issued before now, in every worker."""
+    key = str(user_id)
+    with _cache_lock:
+        _user_cache.pop(key, None)
+    _record_invalidation(key, time.time())
+
+
+def invalidate_all_users() -> None:
+    """Drop every cached user (e.g. after a group is renamed or deleted)."""
+    with _cache_lock:
+        _user_cache.clear()
+    _record_invalidation('*', time.time())
+
+
+def _claims_trusted(token) -> bool:
+    if not AUTH_TRUST_TOKEN_CLAIMS or token.get('claims_version') != CLAIMS_VERSION:
+        return False
+    if not invalidation_shared():
+        return False
+    return token.get('iat', 0) > invalidated_since(token.get(api_settings.USER_ID_CLAIM))
+
+
+# =============================================================================
+# Authentication Class
+# =============================================================================
+
 class CookieJWTAuthentication(JWTAuthentication):
     """
     Custom JWT authentication class that extracts tokens from httpOnly cookies.
-    
+
     Falls back to Authorization header for backward compatibility and API testing.
     """
-    
+
     def authenticate(self, request):
+        with span('auth'):
+            return self._authenticate(request)
+
+    def _authenticate(self, request):
         # First, try to get the token from the cookie
         raw_token = request.COOKIES.get('access_token')
-        
+
         # If no cookie, fall back to Authorization header (for API testing)
         if raw_token is None:
             header = self.get_header(request)
             if header is not None:
                 raw_token = self.get_raw_token(header)
-        
+
         if raw_token is None:
             return None
-        
+
         # Validate the token
         try:
             validated_token = self.get_validated_token(raw_token)
             return self.get_user(validated_token), validated_token
         except (InvalidToken, TokenError):
             return None
+
+    def get_user(self, validated_token):
+        """Claims user when the token can be trusted, else the cached DB user."""
+        if _claims_trusted(validated_token):
+            return ClaimsUser(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
@@ -0,0 +1,268 @@
+"""
+Multi-device Comparison
+
+One metric across N devices over a time range, aligned on a common time
+grid, e.g. PV1 voltage of 20 inverters in one chart.
+
+Design:
+1. A single KQL query returns `avg(value_double)` per (comms_serial,
+   bin(localtime, step)) for all requested serials
+2. Rows are scattered into a dense (serial x bucket) NumPy matrix in one
+   vectorized assignment; buckets without data stay NaN (null in JSON)
+3. The grid is split into chunk-aligned bucket ranges, as in
+   adx_events. Closed chunks (older than EVENTS_CLOSED_AFTER_HOURS) are
+   cached per (serial, metric, step, chunk) as raw float64 bytes, so
+   overlapping comparisons share history and only missing chunks plus
+   the live tail are queried
+4. The response is columnar: the serial list, the grid start/step/count
+   and one value row per serial, plus per-serial min/max/mean/coverage
+"""
+
+import os
+import hashlib
+import warnings
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from django.core.cache import cache
+
+from .adx_optimized import (
+    query_adx,
+    escape_kql_string,
+    format_kql_datetime,
+    to_naive_datetime,
+    CACHE_TTL_SECONDS,
+)
+from .adx_events import (
+    choose_step,
+    floor_to_step,
+    format_step,
+    EVENTS_CLOSED_AFTER_HOURS,
+    EVENTS_CACHE_TTL_CLOSED,
+)
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+COMPARE_MAX_SERIALS = int(os.getenv('COMPARE_MAX_SERIALS', 50))
+COMPARE_TARGET_BUCKETS = int(os.getenv('COMPARE_TARGET_BUCKETS', 240))
+COMPARE_MAX_BUCKETS = int(os.getenv('COMPARE_MAX_BUCKETS', 2000))
+COMPARE_CHUNK_BUCKETS = int(os.getenv('COMPARE_CHUNK_BUCKETS', 48))
+COMPARE_DECIMALS = int(os.getenv('COMPARE_DECIMALS', 3))
+
+
+class CompareRequestError(ValueError):
+    """Raised for comparison parameters that cannot be served."""
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def parse_step(value: Any) -> Optional[int]:
+    """Step in seconds from an int or a '30s' / '5m' / '1h' / '1d' string."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        step = int(value)
+    else:
+        text = str(value).strip().lower()
+        units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+        try:
+            step = int(text[:-1]) * units[text[-1]] if text[-1] in units else int(text)
+        except (ValueError, IndexError):
+            raise CompareRequestError(f"Invalid step: {value}")
+    if step < 1:
+        raise CompareRequestError("step must be positive")
+    return step
+
+
+def _chunk_cache_key(serial: str, metric: str, step: int, chunk_start: datetime) -> str:
+    digest = hashlib.md5(f"{serial}|{metric}".encode()).hexdigest()[:16]
+    return f"adx_compare:{digest}:{step}:{chunk_start.strftime('%Y%m%d%H%M%S')}"
+
+
+def _build_compare_query(serials: List[str], metric: str, start: datetime, end: datetime, step: int) -> str:
+    serial_list = ', '.join(f"'{escape_kql_string(s)}'" for s in serials)
+    return f"""
+    Telemetry
+    | where localtime between ({format_kql_datetime(start)} .. {format_kql_datetime(end)})
+    | where comms_serial in ({serial_list})
+    | where name contains '{escape_kql_string(metric)}'
+    | summarize value = avg(value_double) by comms_serial, bucket = bin(localtime, {step}s)
+    | project comms_serial, bucket, value
+    """.strip()
+
+
+def _scatter(matrix: np.ndarray, rows: List[Dict[str, Any]], serial_index: Dict[str, int],
+             grid_start: datetime, step: int) -> None:
+    """Write (serial, bucket, value) rows into the matrix in one assignment."""
+    if not rows:
+        return
+    rows_idx = np.fromiter((serial_index.get(r.get('comms_serial'), -1) for r in rows), dtype=np.int64, count=len(rows))
+    buckets = np.array(
+        [to_naive_datetime(r.get('bucket')) or datetime.min for r in rows], dtype='datetime64[s]'
+    )
+    cols_idx = (buckets - np.datetime64(grid_start, 's')).astype(np.int64) // step
+    values = np.array([r.get('value') if r.get('value') is not None else np.nan for r in rows], dtype=np.float64)
+
+    valid = (rows_idx >= 0) & (cols_idx >= 0) & (cols_idx < matrix.shape[1])
+    matrix[rows_idx[valid], cols_idx[valid]] = values[valid]
+
+
+def _to_json(array: np.ndarray) -> list:
+    """Rounded nested lists with NaN as None (JSON has no NaN)."""
+    rounded = np.round(array, COMPARE_DECIMALS)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
+
+
+# =============================================================================
+# Comparison
+# =============================================================================
+
+def compare_devices(
+    serials: List[str],
+    metric: str,
+    start: datetime,
+    end: datetime,
+    step: Optional[int] = None,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Average of one metric per device and time bucket on a shared grid.
+
+    Args:
+        serials: Device serials (exact comms_serial values)
+        metric: Telemetry name (matched with `contains`, like batch_telemetry)
+        start: Range start (naive, device-local time)
+        end: Range end (naive, device-local time)
+        step: Bucket size in seconds (default: chosen from the range)
+        use_cache: Whether to use the closed-chunk cache
+
+    Raises:
+        CompareRequestError: invalid serial count or too many buckets
+    """
+    serials = list(dict.fromkeys(s for s in serials if s))
+    if not serials:
+        raise CompareRequestError("At least one serial is required")
+    if len(serials) > COMPARE_MAX_SERIALS:
+        raise CompareRequestError(f"At most {COMPARE_MAX_SERIALS} serials can be compared")
+
+    step = step or choose_step(start, end, COMPARE_TARGET_BUCKETS)
+    first_bucket = floor_to_step(start, step)
+    last_bucket = floor_to_step(end, step)
+    n_buckets = int((last_bucket - first_bucket).total_seconds() // step) + 1
+    if n_buckets > COMPARE_MAX_BUCKETS:
+        raise CompareRequestError(
+            f"{n_buckets} buckets requested (max {COMPARE_MAX_BUCKETS}); use a larger step"
+        )
+
+    # The matrix spans whole chunks so chunk slices map straight to cache entries
+    chunk_span = step * COMPARE_CHUNK_BUCKETS
+    grid_start = floor_to_step(first_bucket, chunk_span)
+    offset = int((first_bucket - grid_start).total_seconds() // step)
+    n_grid = offset + n_buckets
+    n_grid += -n_grid % COMPARE_CHUNK_BUCKETS
+    matrix = np.full((len(serials), n_grid), np.nan, dtype=np.float64)
+    serial_index = {serial: i for i, serial in enumerate(serials)}
+
+    closed_horizon = floor_to_step(
+        datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=EVENTS_CLOSED_AFTER_HOURS), step
+    )
+    closed_chunks = []
+    for k in range(n_grid // COMPARE_CHUNK_BUCKETS):
+        chunk_start = grid_start + timedelta(seconds=k * chunk_span)
+        chunk_end = chunk_start + timedelta(seconds=chunk_span)
+        if chunk_end > closed_horizon or chunk_end > last_bucket:
+            break
+        closed_chunks.append(chunk_start)
+    tail_start = grid_start + timedelta(seconds=len(closed_chunks) * chunk_span)
+    has_tail = tail_start <= last_bucket
+
+    # Closed chunks from cache, one round trip
+    keys = {
+        (serial, k): _chunk_cache_key(serial, metric, step, chunk)
+        for serial in serials for k, chunk in enumerate(closed_chunks)
+    }
+    cached = cache.get_many(list(keys.values())) if use_cache and keys else {}
+    missing = [pair for pair, key in keys.items() if key not in cached]
+
+    # One ADX query covers every missing chunk plus the live tail
+    stale = False
+    truncation = None
+    if missing or has_tail:
+        if missing:
+            first_k = min(k for _, k in missing)
+            query_start = grid_start + timedelta(seconds=first_k * chunk_span)
+        else:
+            query_start = max(tail_start, first_bucket)
+        if has_tail:
+            query_serials = serials
+            query_end = end
+        else:
+            query_serials = [s for s in serials if any(m[0] == s for m in missing)]
+            last_k = max(k for _, k in missing)
+            query_end = grid_start + timedelta(seconds=(last_k + 1) * chunk_span) - timedelta(microseconds=1)
+
+        rows = query_adx(
+            _build_compare_query(query_serials, metric, query_start, query_end, step),
+            use_cache=use_cache, cache_ttl=CACHE_TTL_SECONDS,
+        )
+        stale = getattr(rows, 'stale', False)
+        truncation = getattr(rows, 'truncation', None)
+        _scatter(matrix, rows, serial_index, grid_start, step)
+
+    # Cached chunks win over anything the wider query window re-fetched
+    width = COMPARE_CHUNK_BUCKETS
+    for (serial, k), key in keys.items():
+        if key in cached:
+            matrix[serial_index[serial], k * width:(k + 1) * width] = np.frombuffer(cached[key], dtype='<f8')
+
+    # Stale fallbacks and cut results are never promoted to closed chunks
+    if use_cache and missing and not stale and truncation is None:
+        cache.set_many({
+            keys[(serial, k)]: matrix[serial_index[serial], k * width:(k + 1) * width].astype('<f8').tobytes()
+            for serial, k in missing
+        }, EVENTS_CACHE_TTL_CLOSED)
+
+    values = matrix[:, offset:offset + n_buckets]
+    with warnings.catch_warnings():
+        # All-NaN rows (no data for a device) yield NaN stats, reported as null
+        warnings.simplefilter('ignore', RuntimeWarning)
+        stats = {
+            'min': np.nanmin(values, axis=1),
+            'max': np.nanmax(values, axis=1),
+            'mean': np.nanmean(values, axis=1),
+        }
+
+    logger.info(
+        f"Compare {metric} across {len(serials)} serials: {n_buckets} buckets, "
+        f"{len(keys) - len(missing)} cached / {len(missing)} queried chunk slices"
+    )
+    result = {
+        'metric': metric,
+        'serials': serials,
+        'start': first_bucket.isoformat(),
+        'end': end.isoformat(),
+        'step_seconds': step,
+        'step': format_step(step),
+        'bucket_count': n_buckets,
+        'values': _to_json(values),
+        'stats': {
+            **{name: _to_json(column) for name, column in stats.items()},
+            'coverage': np.round((~np.isnan(values)).mean(axis=1), 4).tolist(),
+        },
+        'stale': stale,
+        'cache': {
+            'chunks_cached': len(keys) - len(missing),
+            'chunks_queried': len(missing),
+        },
+    }
+    if truncation is not None:
+        result.update(truncated=True, truncation=truncation)
+    return result
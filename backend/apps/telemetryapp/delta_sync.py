@@ -0,0 +1,174 @@
+"""
+Delta Sync for Latest-Value Polling
+
+Dashboards poll batch_telemetry every few seconds for 30-60 metrics, and
+most values do not change between ticks. With delta sync the client sends
+the sync token from its previous response and only gets back the metrics
+whose value or localtime changed since then.
+
+Design:
+1. A snapshot maps metric keys ('telemetry:<name>', 'alarms:<name>') to
+   their [value, localtime] and is kept for SYNC_SNAPSHOT_TTL_SECONDS.
+   Every change to the latest values of a serial, including a requested
+   metric that no longer has a value, stores a new snapshot
+2. Snapshots are named by a hash of their content, not by a counter: with
+   a per-worker cache (CACHE_BACKEND=memory) each worker has its own
+   snapshots, and a counter would give unrelated snapshots the same name
+   on different workers. A token can only ever select the snapshot it was
+   issued for
+3. The sync token is "<snapshot hash>.<serial hash>"; an unknown, expired
+   or foreign token (e.g. one issued by another worker) makes the server
+   fall back to a full response
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# How long a snapshot can be used as a delta base. Clients that were away
+# longer get one full response and resume delta polling from there.
+SYNC_SNAPSHOT_TTL_SECONDS = int(os.getenv('SYNC_SNAPSHOT_TTL_SECONDS', 600))
+
+SECTIONS = ('telemetry', 'alarms')
+
+
+# =============================================================================
+# Snapshot Storage
+# =============================================================================
+
+def _serial_hash(serial: str) -> str:
+    return hashlib.sha256(serial.encode()).hexdigest()[:12]
+
+
+def _latest_key(serial: str) -> str:
+    return f"sync_latest:{_serial_hash(serial)}"
+
+
+def _snapshot_key(serial: str, snapshot_id: str) -> str:
+    return f"sync_snapshot:{_serial_hash(serial)}:{snapshot_id}"
+
+
+def _encode_snapshot(entries: Dict[str, List]) -> str:
+    return json.dumps(entries, sort_keys=True)
+
+
+def _snapshot_id(encoded: str) -> str:
+    return hashlib.sha256(encoded.encode()).hexdigest()[:20]
+
+
+def make_sync_token(serial: str, snapshot_id: str) -> str:
+    return f"{snapshot_id}.{_serial_hash(serial)}"
+
+
+def parse_sync_token(serial: str, token: Optional[str]) -> Optional[str]:
+    """Snapshot id from a sync token, or None if it is not for this serial."""
+    if not token or not isinstance(token, str):
+        return None
+    snapshot_id, _, digest = token.partition('.')
+    if digest != _serial_hash(serial) or len(snapshot_id) != 20 or not snapshot_id.isalnum():
+        return None
+    return snapshot_id
+
+
+def _load_snapshot(serial: str, snapshot_id: str) -> Optional[Dict[str, List]]:
+    """The snapshot with this id, or None if missing or not the content the id names."""
+    cached = cache.get(_snapshot_key(serial, snapshot_id))
+    if not cached or _snapshot_id(cached) != snapshot_id:
+        return None
+    return json.loads(cached)
+
+
+def _store_snapshot(serial: str, entries: Dict[str, List]) -> str:
+    """Store a snapshot, make it the serial's latest, and return its id."""
+    encoded = _encode_snapshot(entries)
+    snapshot_id = _snapshot_id(encoded)
+    cache.set(_snapshot_key(serial, snapshot_id), encoded, SYNC_SNAPSHOT_TTL_SECONDS)
+    cache.set(_latest_key(serial), snapshot_id, SYNC_SNAPSHOT_TTL_SECONDS)
+    return snapshot_id
+
+
+# =============================================================================
+# Delta Computation
+# =============================================================================
+
+def _flatten(result: Dict[str, Any]) -> Dict[str, List]:
+    """Snapshot entries for a batch result, normalized through JSON."""
+    entries = {}
+    for section in SECTIONS:
+        for name, item in result.get(section, {}).items():
+            entries[f"{section}:{name}"] = [item.get('value'), item.get('localtime')]
+    # Round-trip so datetimes compare equal to the cached (JSON) form
+    return json.loads(json.dumps(entries, cls=DjangoJSONEncoder))
+
+
+def apply_delta_sync(
+    serial: str,
+    requested: Dict[str, List[str]],
+    result: Dict[str, Any],
+    sync_token: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Record the latest values for a serial and reduce a batch result to a delta.
+
+    Args:
+        serial: Device serial number
+        requested: {'telemetry': [names], 'alarms': [names]} from the request
+        result: Full batch result ({'telemetry': {...}, 'alarms': {...}, ...})
+        sync_token: Token from the client's previous response, if any
+
+    Returns:
+        The result with 'sync_token' and 'full' added. When the token was
+        valid, 'telemetry'/'alarms' only contain changed metrics and
+        'removed' lists requested metrics that no longer have a value.
+    """
+    current = _flatten(result)
+
+    # Snapshot the serial's latest values; a new snapshot only when something changed.
+    # Requested metrics without a value leave the snapshot, so their removal is
+    # reported once and acknowledged by the next token
+    snapshot_id = cache.get(_latest_key(serial))
+    latest = _load_snapshot(serial, snapshot_id) if snapshot_id else None
+    merged = dict(latest or {})
+    for section in SECTIONS:
+        for name in requested.get(section, []):
+            merged.pop(f"{section}:{name}", None)
+    merged.update(current)
+    if latest is None or merged != latest:
+        snapshot_id = _store_snapshot(serial, merged)
+
+    base_id = parse_sync_token(serial, sync_token)
+    base = _load_snapshot(serial, base_id) if base_id else None
+
+    delta = dict(result)
+    delta['sync_token'] = make_sync_token(serial, snapshot_id)
+    if base is None:
+        delta['full'] = True
+        return delta
+
+    removed = []
+    for section in SECTIONS:
+        changed = {}
+        for name in requested.get(section, []):
+            key = f"{section}:{name}"
+            if key in current:
+                if base.get(key) != current[key]:
+                    changed[name] = result[section][name]
+            elif key in base:
+                removed.append(name)
+        delta[section] = changed
+
+    delta['full'] = False
+    if removed:
+        delta['removed'] = removed
+    return delta
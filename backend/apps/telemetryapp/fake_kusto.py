@@ -0,0 +1,225 @@
+"""
+Fake Kusto Clients
+
+In-process stand-ins for azure.kusto.data.KustoClient, used by simulations
+and benchmarks. No network access or credentials are needed; install one
+with adx_optimized.set_adx_client().
+"""
+
+import re
+import zlib
+import random
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+
+from azure.kusto.data import ClientRequestProperties
+from azure.kusto.data.exceptions import KustoThrottlingError, KustoNetworkError
+
+
+class FakeResultTable:
+    """Mimics KustoResultTable.to_dict()."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': 'PrimaryResult', 'kind': 'PrimaryResult', 'data': self.rows}
+
+
+class FakeResponse:
+    """Mimics KustoResponseDataSet (only primary_results is used)."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.primary_results = [FakeResultTable(rows)]
+
+
+class FakeKustoClient:
+    """
+    Answers every query after a fixed latency.
+
+    Subclasses override rows_for() to return synthetic data.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def rows_for(self, query: str) -> List[Dict[str, Any]]:
+        return [{'print_0': 1}]
+
+    def execute(self, database: str, query: str, properties: Optional[ClientRequestProperties] = None):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeResponse(self.rows_for(query))
+
+
+class FaultInjectingKustoClient(FakeKustoClient):
+    """
+    Fake client whose latency and failure rate can be changed at runtime,
+    e.g. to simulate an ADX brownout (slow responses plus throttling).
+
+    The server timeout from ClientRequestProperties is honoured: a call
+    slower than its timeout waits for the timeout and then fails.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        super().__init__(latency)
+        self.failure_rate = failure_rate
+        self.failures = 0
+        self._random = random.Random(seed)
+
+    def set_conditions(self, latency: float, failure_rate: float) -> None:
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def execute(self, database: str, query: str, properties: Optional[ClientRequestProperties] = None):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+
+        timeout = None
+        if properties is not None:
+            option = properties.get_option(ClientRequestProperties.request_timeout_option_name, None)
+            timeout = option.total_seconds() if option is not None else None
+
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            with self._lock:
+                self.failures += 1
+            raise KustoNetworkError('fake-cluster (request timed out)')
+
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            with self._lock:
+                self.failures += 1
+            raise KustoThrottlingError('Request was throttled (fault injected)')
+        return FakeResponse(self.rows_for(query))
+
+
+class SyntheticKustoClient(FakeKustoClient):
+    """
+    Fake client that serves plausible rows for the app's tables:
+    Telemetry, Alarms, DevInfo and the fast-telemetry stream
+    (sourcedatastreamingfornam).
+
+    - Latest-value queries (`summarize arg_max(...) by name`) return one
+      row per `name contains/has '<name>'` filter in the query
+    - Fleet queries (`by comms_serial, name`) return one row per serial
+      (`fleet_size` of them) and `has_any` name
+    - Comparison queries (`by comms_serial, bucket = bin(...)`) return one
+      averaged row per `comms_serial in (...)` serial and bucket in range,
+      with ~5% of buckets missing
+    - `take N` / `limit N` return N rows
+    - Anything else returns `row_count` rows (`fast_row_count` for the
+      fast-telemetry table), spaced `cadence_seconds` apart
+
+    Row values are derived from the query text, so identical queries get
+    identical rows.
+    """
+
+    TABLES = ('Telemetry', 'Alarms', 'DevInfo', 'sourcedatastreamingfornam')
+
+    _table_re = re.compile(r'\b(' + '|'.join(TABLES) + r')\b')
+    _name_re = re.compile(r"name (?:contains|has) [\"']([^\"']+)[\"']")
+    _serial_re = re.compile(r"comms_serial (?:contains|has|==) '([^']+)'")
+    _limit_re = re.compile(r'\|\s*(?:take|limit)\s+(\d+)')
+    _serial_in_re = re.compile(r"comms_serial in \(([^)]*)\)")
+    _between_re = re.compile(r"between \(datetime\(([^)]+)\) \.\. datetime\(([^)]+)\)\)")
+    _bin_re = re.compile(r"bin\(localtime, (\d+)s\)")
+    _has_any_re = re.compile(r"\b(Telemetry|Alarms)\b.*?name has_any \(([^)]*)\)")
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        row_count: int = 500,
+        fast_row_count: int = 5000,
+        cadence_seconds: int = 60,
+        fleet_size: int = 2000,
+    ):
+        super().__init__(latency)
+        self.fleet_size = fleet_size
+        self.row_count = row_count
+        self.fast_row_count = fast_row_count
+        self.cadence_seconds = cadence_seconds
+        self.now = datetime(2025, 1, 1)
+
+    def rows_for(self, query: str) -> List[Dict[str, Any]]:
+        table_match = self._table_re.search(query)
+        table = table_match.group(1) if table_match else 'Telemetry'
+        serial_match = self._serial_re.search(query)
+        serial = serial_match.group(1) if serial_match else 'SIM0000'
+        rng = random.Random(zlib.crc32(query.encode()))
+
+        limit_match = self._limit_re.search(query)
+        if table == 'DevInfo':
+            count = int(limit_match.group(1)) if limit_match else 1
+            return [self._devinfo_row(serial, i) for i in range(count)]
+
+        if 'by comms_serial, name' in query:
+            return self._fleet_rows(query, rng)
+        if 'by comms_serial, bucket' in query:
+            return self._bucket_rows(query, rng)
+
+        names = self._name_re.findall(query) or ['/SIM/VALUE']
+        if 'arg_max' in query:
+            return [self._row(table, serial, name, self.now, rng) for name in names]
+
+        if limit_match:
+            count = int(limit_match.group(1))
+        elif table == 'sourcedatastreamingfornam':
+            count = self.fast_row_count
+        else:
+            count = self.row_count
+        step = timedelta(seconds=1 if table == 'sourcedatastreamingfornam' else self.cadence_seconds)
+        return [
+            self._row(table, serial, names[i % len(names)], self.now - step * (count - i), rng)
+            for i in range(count)
+        ]
+
+    def _row(self, table: str, serial: str, name: str, localtime: datetime, rng: random.Random) -> Dict[str, Any]:
+        if table == 'Alarms':
+            return {'comms_serial': serial, 'name': name, 'localtime': localtime, 'value': rng.random() < 0.05}
+        return {
+            'comms_serial': serial,
+            'name': name,
+            'localtime': localtime,
+            'value_double': round(rng.uniform(0, 500), 3),
+        }
+
+    def _fleet_rows(self, query: str, rng: random.Random) -> List[Dict[str, Any]]:
+        rows = []
+        for table, names in self._has_any_re.findall(query):
+            for name in re.findall(r"'([^']+)'", names):
+                for i in range(self.fleet_size):
+                    row = self._row(table, f"SIM{i:04d}", name, self.now - timedelta(seconds=rng.randint(0, 600)), rng)
+                    row['value'] = float(row.pop('value_double', row.get('value')))
+                    rows.append(row)
+        return rows
+
+    def _bucket_rows(self, query: str, rng: random.Random) -> List[Dict[str, Any]]:
+        serials = re.findall(r"'([^']+)'", self._serial_in_re.search(query).group(1))
+        start, end = (datetime.fromisoformat(v) for v in self._between_re.search(query).groups())
+        step = int(self._bin_re.search(query).group(1))
+        first = datetime.min + timedelta(seconds=int((start - datetime.min).total_seconds()) // step * step)
+        rows = []
+        for serial in serials:
+            bucket = first
+            while bucket <= end:
+                if rng.random() >= 0.05:
+                    rows.append({'comms_serial': serial, 'bucket': bucket, 'value': round(rng.uniform(0, 500), 3)})
+                bucket += timedelta(seconds=step)
+        return rows
+
+    def _devinfo_row(self, serial: str, index: int) -> Dict[str, Any]:
+        return {
+            'comms_serial': serial if index == 0 else f"{serial}-{index}",
+            'device_type': 'SIM-INV',
+            'fw_version': '1.0.0',
+            'localtime': self.now,
+        }
@@ -0,0 +1,92 @@
+"""
+Fast JSON Encoding
+
+One JSON codec for API responses and cached ADX results, so large row
+lists are not pushed through the standard-library encoder twice (once
+into the cache, once into the response).
+
+Design:
+1. dumps() uses orjson when installed: compact UTF-8 bytes, NumPy arrays
+   and scalars natively. Datetimes, dates and times are passed through to
+   DjangoJSONEncoder.default, so they keep the wire format DRF's encoder
+   produced (milliseconds, UTC as 'Z'); orjson's own format would add
+   microseconds. Formatting them in Python costs most of orjson's gain on
+   datetime-heavy rows; FAST_JSON_DATETIME=native lets orjson write them
+   (microseconds) for deployments whose clients accept that. The same
+   fallback covers types orjson does not know (Decimal, timedelta, lazy
+   strings). Without orjson it is json.dumps with DjangoJSONEncoder
+2. PreEncodedJSON marks bytes that already are a JSON document, such as a
+   cached result; FastJSONRenderer (renderers.py) writes them to the
+   response as is instead of decoding and re-encoding
+3. ADX cache entries are stored as (row count, encoded rows), so a cache
+   hit can be checked against result limits and served without decoding
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import Any
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library is the fallback
+    orjson = None
+
+# 'compat': datetimes as DjangoJSONEncoder writes them (the API's wire format);
+# 'native': orjson's format (microseconds), much faster for large row lists
+FAST_JSON_DATETIME = os.getenv('FAST_JSON_DATETIME', 'compat')
+
+_DJANGO_ENCODER = DjangoJSONEncoder()
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | (
+        orjson.OPT_UTC_Z if FAST_JSON_DATETIME == 'native' else orjson.OPT_PASSTHROUGH_DATETIME
+    )
+    _SORTED_OPTIONS = _OPTIONS | orjson.OPT_SORT_KEYS
+
+
+class PreEncodedJSON(bytes):
+    """Bytes that already are a JSON document; renderers write them unchanged."""
+
+
+def _format_datetime(value: datetime) -> str:
+    # DjangoJSONEncoder's format (truncated to milliseconds, UTC as 'Z'),
+    # without its generic dispatch: this runs once per row
+    text = value.isoformat(timespec='milliseconds' if value.microsecond else 'seconds')
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+def _default(value: Any) -> Any:
+    if type(value) is datetime:
+        return _format_datetime(value)
+    # NumPy values orjson leaves out (e.g. object arrays), then Django's types
+    # (dates, times, Decimal, ...)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'item'):
+        return value.item()
+    return _DJANGO_ENCODER.default(value)
+
+
+def dumps(data: Any, sort_keys: bool = False) -> bytes:
+    """Encode data as compact JSON bytes."""
+    if isinstance(data, PreEncodedJSON):
+        return bytes(data)
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=_SORTED_OPTIONS if sort_keys else _OPTIONS)
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, separators=(',', ':'), sort_keys=sort_keys, ensure_ascii=False,
+    ).encode('utf-8')
+
+
+def loads(payload) -> Any:
+    """Decode JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def backend() -> str:
+    return 'orjson' if orjson is not None else 'json'
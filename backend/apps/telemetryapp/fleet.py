@@ -0,0 +1,213 @@
+"""
+Fleet Overview
+
+Latest status of every device for the NOC wall, without one
+batch_telemetry request per serial.
+
+Design:
+1. One KQL query per refresh window fetches the latest value of every
+   FLEET_METRICS name for every serial: Telemetry and Alarms are unioned
+   and reduced with `summarize arg_max(localtime, value) by comms_serial,
+   name`, limited to the last FLEET_LOOKBACK_HOURS
+2. The result is pivoted into a columnar snapshot (one list per metric,
+   aligned with a sorted serial list) and cached as a single unit for
+   FLEET_CACHE_TTL seconds; concurrent misses in a worker share one query
+3. If ADX fails, the last good snapshot (kept for ADX_STALE_TTL) is
+   served with stale=true
+4. Serial filters, metric selection and paging are applied to the cached
+   snapshot, so every page and every filtered view of the same refresh
+   window costs zero extra ADX queries
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable
+
+from django.core.cache import cache
+
+from .adx_optimized import query_adx, escape_kql_string, to_naive_datetime, STALE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+FLEET_CACHE_TTL = int(os.getenv('FLEET_CACHE_TTL', 60))
+FLEET_LOOKBACK_HOURS = int(os.getenv('FLEET_LOOKBACK_HOURS', 24))
+FLEET_PAGE_SIZE = int(os.getenv('FLEET_PAGE_SIZE', 500))
+FLEET_MAX_PAGE_SIZE = int(os.getenv('FLEET_MAX_PAGE_SIZE', 2000))
+FLEET_QUERY_TIMEOUT = int(os.getenv('FLEET_QUERY_TIMEOUT', 30))
+
+# column -> (ADX table, metric name)
+FLEET_METRICS: Dict[str, tuple] = {
+    'soc': ('Telemetry', '/BMS/MODULE1/STAT/USER_SOC'),
+    'grid_power': ('Telemetry', '/INV/ACPORT/STAT/GRID/P'),
+    'inverter_state': ('Telemetry', 'INV/DEV/STAT/OPERATING_STATE'),
+    'wifi_signal': ('Telemetry', '/SCC/WIFI/STAT/SIGNAL_STRENGTH'),
+    'main_relay_alarm': ('Alarms', '/BMS/CLUSTER/EVENT/ALARM/MAIN_RELAY_ERROR'),
+}
+
+FLEET_CACHE_KEY = 'fleet_snapshot:v1'
+FLEET_LAST_GOOD_KEY = 'fleet_snapshot:v1:last_good'
+
+_refresh_lock = threading.Lock()
+
+
+class FleetQueryError(Exception):
+    """Raised when the fleet snapshot cannot be built."""
+
+
+# =============================================================================
+# Query
+# =============================================================================
+
+def build_fleet_query(metrics: Dict[str, tuple] = FLEET_METRICS, lookback_hours: int = FLEET_LOOKBACK_HOURS) -> str:
+    """One query for the latest value of every fleet metric on every serial."""
+    def names_for(table):
+        return ', '.join(f"'{escape_kql_string(name)}'" for t, name in metrics.values() if t == table)
+
+    legs = []
+    telemetry_names = names_for('Telemetry')
+    if telemetry_names:
+        legs.append(
+            f"(Telemetry | where localtime > ago({lookback_hours}h) | where name has_any ({telemetry_names}) "
+            f"| project comms_serial, name, localtime, value = todouble(value_double))"
+        )
+    alarm_names = names_for('Alarms')
+    if alarm_names:
+        legs.append(
+            f"(Alarms | where localtime > ago({lookback_hours}h) | where name has_any ({alarm_names}) "
+            f"| project comms_serial, name, localtime, value = todouble(value))"
+        )
+
+    return f"""
+    union {', '.join(legs)}
+    | summarize arg_max(localtime, value) by comms_serial, name
+    | project comms_serial, name, localtime, value
+    """.strip()
+
+
+def _column_for(name: str, metrics: Dict[str, tuple]) -> Optional[str]:
+    """Map an ADX metric name back to its column (same contains matching as batch_telemetry)."""
+    for column, (_, requested) in metrics.items():
+        if requested in name or name in requested:
+            return column
+    return None
+
+
+def pivot_rows(rows: Iterable[Dict[str, Any]], metrics: Dict[str, tuple] = FLEET_METRICS) -> Dict[str, Any]:
+    """Pivot (serial, name, localtime, value) rows into aligned columns."""
+    by_serial: Dict[str, Dict[str, tuple]] = {}
+    for row in rows:
+        serial = row.get('comms_serial')
+        column = _column_for(row.get('name') or '', metrics)
+        if not serial or column is None:
+            continue
+        localtime = to_naive_datetime(row.get('localtime'))
+        current = by_serial.setdefault(serial, {}).get(column)
+        if current is None or (localtime and current[0] and localtime > current[0]):
+            by_serial[serial][column] = (localtime, row.get('value'))
+
+    serials = sorted(by_serial)
+    columns = {column: [] for column in metrics}
+    last_seen = []
+    for serial in serials:
+        values = by_serial[serial]
+        for column in metrics:
+            columns[column].append(values[column][1] if column in values else None)
+        times = [t for t, _ in values.values() if t]
+        last_seen.append(max(times).isoformat() if times else None)
+
+    return {'serials': serials, 'columns': columns, 'last_seen': last_seen}
+
+
+# =============================================================================
+# Snapshot
+# =============================================================================
+
+def get_fleet_snapshot(use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Cached columnar snapshot of the whole fleet.
+
+    Raises:
+        FleetQueryError: when ADX fails and no earlier snapshot exists
+    """
+    if use_cache:
+        snapshot = cache.get(FLEET_CACHE_KEY)
+        if snapshot is not None:
+            return snapshot
+
+    # One refresh per worker at a time; waiters pick up the fresh snapshot
+    with _refresh_lock:
+        if use_cache:
+            snapshot = cache.get(FLEET_CACHE_KEY)
+            if snapshot is not None:
+                return snapshot
+
+        started = time.monotonic()
+        try:
+            # Not cached by query_adx: the pivoted snapshot is the cache unit
+            rows = query_adx(
+                build_fleet_query(),
+                use_cache=False,
+                timeout_seconds=FLEET_QUERY_TIMEOUT,
+            )
+        except Exception as e:
+            last_good = cache.get(FLEET_LAST_GOOD_KEY)
+            if last_good is None:
+                raise FleetQueryError(str(e)) from e
+            logger.warning(f"Fleet query failed, serving snapshot from {last_good['generated_at']}: {e}")
+            return dict(last_good, stale=True)
+
+        snapshot = pivot_rows(rows)
+        snapshot['generated_at'] = datetime.utcnow().isoformat()
+        snapshot['stale'] = False
+        snapshot['query_ms'] = round((time.monotonic() - started) * 1000, 1)
+        cache.set(FLEET_CACHE_KEY, snapshot, FLEET_CACHE_TTL)
+        cache.set(FLEET_LAST_GOOD_KEY, snapshot, STALE_TTL_SECONDS)
+        logger.info(f"Fleet snapshot: {len(snapshot['serials'])} serials in {snapshot['query_ms']} ms")
+        return snapshot
+
+
+def fleet_page(
+    snapshot: Dict[str, Any],
+    metrics: Optional[List[str]] = None,
+    serials: Optional[List[str]] = None,
+    search: Optional[str] = None,
+    page: int = 1,
+    page_size: int = FLEET_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """Filter, project and page a fleet snapshot into a columnar response."""
+    metrics = metrics or list(FLEET_METRICS)
+    page_size = max(1, min(page_size, FLEET_MAX_PAGE_SIZE))
+    page = max(1, page)
+
+    indices = range(len(snapshot['serials']))
+    if serials:
+        wanted = set(serials)
+        indices = [i for i in indices if snapshot['serials'][i] in wanted]
+    if search:
+        needle = search.lower()
+        indices = [i for i in indices if needle in snapshot['serials'][i].lower()]
+    indices = list(indices)
+
+    total = len(indices)
+    selected = indices[(page - 1) * page_size:page * page_size]
+    return {
+        'columns': ['serial', *metrics, 'last_seen'],
+        'data': {
+            'serial': [snapshot['serials'][i] for i in selected],
+            **{m: [snapshot['columns'][m][i] for i in selected] for m in metrics},
+            'last_seen': [snapshot['last_seen'][i] for i in selected],
+        },
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'next_page': page + 1 if page * page_size < total else None,
+        'generated_at': snapshot['generated_at'],
+        'stale': snapshot['stale'],
+    }
@@ -0,0 +1,326 @@
+"""
+Freshness-aware Cache TTLs
+
+A single global ADX cache TTL is wrong for almost every device: a serial
+that reports every 5 seconds is served stale data for most of the TTL,
+while one that reports every 5 minutes is re-queried about ten times
+for the same rows. This module learns each serial's reporting cadence
+from the `localtime` values that pass through query_adx and picks the
+cache TTL per result.
+
+Design:
+1. Per-serial state (reporting interval, newest localtime seen, device
+   clock lag) lives in the Django cache, so every worker learns from
+   every other worker's queries
+2. The interval is learned from two sources: the median spacing of
+   samples in time-series results, and the step between successive
+   newest samples of latest-value results (an upper bound, used to pull
+   the estimate down and to drift it slowly upwards)
+3. `localtime` is device-local, so the next sample is placed on the
+   server clock through the smallest observed lag between "now" and the
+   newest sample (timezone offset plus ingestion delay)
+4. Latest-value entries expire right after the next sample is due. When
+   a device is overdue the TTL backs off with the time it has been
+   silent, so offline devices are not polled every few seconds
+5. Results whose `between(.. end)` lies fully in the past get
+   ADX_TTL_CLOSED; nothing can change them any more
+6. A query that returns exactly what the previous execution of the same
+   query returned is counted as wasted; counters are per process and
+   reported through get_query_stats()
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+ADAPTIVE_TTL_ENABLED = os.getenv('ADX_ADAPTIVE_TTL', 'True') == 'True'
+TTL_MIN_SECONDS = int(os.getenv('ADX_TTL_MIN', 5))
+TTL_MAX_LATEST_SECONDS = int(os.getenv('ADX_TTL_MAX_LATEST', 600))
+TTL_GRACE_SECONDS = float(os.getenv('ADX_TTL_GRACE', 2))  # ingestion slack after a sample is due
+TTL_CLOSED_SECONDS = int(os.getenv('ADX_TTL_CLOSED', 24 * 3600))
+# How long after its end a time range can still receive late rows (device-local clock)
+TTL_CLOSED_MARGIN_SECONDS = int(os.getenv('ADX_TTL_CLOSED_MARGIN', 900))
+# Without a learned clock lag, assume devices may run up to this far ahead of UTC
+MAX_DEVICE_UTC_OFFSET_HOURS = 14
+
+CADENCE_STATE_TTL = int(os.getenv('ADX_CADENCE_STATE_TTL', 7 * 24 * 3600))
+FINGERPRINT_TTL = int(os.getenv('ADX_FINGERPRINT_TTL', 24 * 3600))
+CADENCE_DRIFT_UP = 0.1  # weight of a larger interval observation
+CADENCE_MAX_SAMPLES = 5000  # rows used for the spacing median
+CADENCE_MAX_STEP_SECONDS = 6 * 3600  # longer steps are gaps (offline, old ranges), not cadence
+
+_SERIAL_RES = (
+    re.compile(r"comms_serial\s+(?:contains|has|==|=~)\s+'((?:[^']|'')+)'", re.IGNORECASE),
+    re.compile(r"\blet\s+s\s*=\s*'((?:[^']|'')+)'", re.IGNORECASE),
+)
+_RANGE_END_RES = (
+    re.compile(r"between\s*\(.*?\.\.\s*datetime\(([^)]*)\)\s*\)", re.IGNORECASE | re.DOTALL),
+    re.compile(r"\blet\s+end\s*=\s*datetime\(([^)]*)\)", re.IGNORECASE),
+)
+
+_counters_lock = Lock()
+_counters: Dict[str, Dict[str, int]] = {}
+_ttl_totals = {'count': 0, 'seconds': 0.0}
+
+
+def reset_after_fork() -> None:
+    """Recreate the counter lock in a forked worker."""
+    global _counters_lock
+    _counters_lock = Lock()
+
+
+# =============================================================================
+# Query & Row Inspection
+# =============================================================================
+
+def extract_serial(kql_query: str) -> Optional[str]:
+    """The single serial a query is filtered on, or None (no filter or several)."""
+    found = set()
+    for pattern in _SERIAL_RES:
+        found.update(m.replace("''", "'") for m in pattern.findall(kql_query))
+    return found.pop() if len(found) == 1 else None
+
+
+def extract_range_end(kql_query: str) -> Optional[datetime]:
+    """Upper bound of an absolute `between (.. datetime(...))` range, if any."""
+    if re.search(r'\bago\(|\bnow\(', kql_query, re.IGNORECASE):
+        return None
+    for pattern in _RANGE_END_RES:
+        match = pattern.search(kql_query)
+        if match:
+            try:
+                return datetime.fromisoformat(match.group(1).strip())
+            except ValueError:
+                return None
+    return None
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_naive(value: Any) -> Optional[datetime]:
+    # adx_optimized imports this module, so its helper is resolved on use
+    from .adx_optimized import to_naive_datetime
+    return to_naive_datetime(value)
+
+
+def _epoch(value: datetime) -> float:
+    """Seconds since the epoch for a naive datetime, without applying the server timezone."""
+    return (value - _EPOCH).total_seconds()
+
+
+def _row_times(rows: List[Dict]) -> List[datetime]:
+    return [t for t in (_to_naive(r.get('localtime')) for r in rows) if t is not None]
+
+
+def sample_spacing(rows: List[Dict]) -> Optional[float]:
+    """
+    Median spacing in seconds between consecutive samples of the same name.
+
+    Needs at least two gaps; latest-value results (one row per name) return None.
+    """
+    rows = rows[:CADENCE_MAX_SAMPLES]
+    pairs = [
+        (str(r.get('name', '')), _to_naive(r.get('localtime') or r.get('bucket')))
+        for r in rows
+    ]
+    pairs = [(n, t) for n, t in pairs if t is not None]
+    if len(pairs) < 3:
+        return None
+    names = np.array([n for n, _ in pairs])
+    times = np.array([t for _, t in pairs], dtype='datetime64[ms]').astype(np.int64)
+    order = np.lexsort((times, names))
+    names, times = names[order], times[order]
+    gaps = np.diff(times) / 1000.0
+    gaps = gaps[(names[1:] == names[:-1]) & (gaps > 0)]
+    if len(gaps) < 2:
+        return None
+    return float(np.median(gaps))
+
+
+def result_fingerprint(rows: List[Dict]) -> str:
+    """
+    Cheap identity of a result: row count plus newest localtime for
+    time-series rows, a content hash otherwise.
+    """
+    times = _row_times(rows)
+    if times:
+        return f"{len(rows)}|{max(times).isoformat()}"
+    payload = json.dumps(rows, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+# =============================================================================
+# Cadence State
+# =============================================================================
+
+def _state_key(serial: str) -> str:
+    return f"adx_cadence:{hashlib.md5(serial.encode()).hexdigest()}"
+
+
+def get_cadence(serial: str) -> Optional[Dict[str, Any]]:
+    """Learned state for a serial: interval, newest (ISO localtime) and lag seconds."""
+    return cache.get(_state_key(serial))
+
+
+def _update_cadence(serial: str, rows: List[Dict], now: float) -> Optional[Dict[str, Any]]:
+    times = _row_times(rows)
+    if not times:
+        return get_cadence(serial)
+
+    state = get_cadence(serial) or {'interval': None, 'newest': None, 'lag': None}
+    interval = state['interval']
+    newest = max(times)
+
+    spacing = sample_spacing(rows)
+    if spacing:
+        # Spacing within a series is the best evidence there is
+        interval = spacing if interval is None else (interval + spacing) / 2
+
+    previous = datetime.fromisoformat(state['newest']) if state['newest'] else None
+    if previous is not None and previous < newest <= previous + timedelta(seconds=CADENCE_MAX_STEP_SECONDS):
+        # Step between two latest samples: the interval or a multiple of it
+        step = (newest - previous).total_seconds()
+        if interval is None or step < interval:
+            interval = step
+        elif not spacing:
+            interval += CADENCE_DRIFT_UP * (step - interval)
+
+    if previous is None or newest >= previous:
+        # Smallest lag is the closest to offset + ingestion delay; drift up slowly
+        lag = now - _epoch(newest)
+        if state['lag'] is None or lag < state['lag']:
+            state['lag'] = lag
+        else:
+            state['lag'] += CADENCE_DRIFT_UP * (lag - state['lag'])
+        state['newest'] = newest.isoformat()
+
+    state['interval'] = interval
+    cache.set(_state_key(serial), state, CADENCE_STATE_TTL)
+    return state
+
+
+# =============================================================================
+# TTL Selection
+# =============================================================================
+
+def _clamp(value: float, low: float, high: float) -> int:
+    return int(max(low, min(high, value)))
+
+
+def cadence_ttl(state: Optional[Dict[str, Any]], now: float) -> Optional[int]:
+    """Seconds until the serial's next sample should be queryable, or None if unknown."""
+    if not state or not state.get('interval') or not state.get('newest') or state.get('lag') is None:
+        return None
+    newest = _epoch(datetime.fromisoformat(state['newest']))
+    due = newest + state['lag'] + state['interval'] + TTL_GRACE_SECONDS
+    remaining = due - now
+    if remaining < TTL_MIN_SECONDS:
+        # Overdue: back off with the silence so offline devices are not hammered
+        remaining = max(TTL_MIN_SECONDS, (now - due) / 2)
+    return _clamp(remaining, TTL_MIN_SECONDS, TTL_MAX_LATEST_SECONDS)
+
+
+def is_closed_range(range_end: Optional[datetime], state: Optional[Dict[str, Any]], now: float) -> bool:
+    """Whether a device-local range end is far enough in the past that no row can still arrive."""
+    if range_end is None:
+        return False
+    if state and state.get('lag') is not None:
+        device_now = _EPOCH + timedelta(seconds=now - state['lag'])
+    else:
+        device_now = _EPOCH + timedelta(seconds=now, hours=-MAX_DEVICE_UTC_OFFSET_HOURS)
+    return range_end + timedelta(seconds=TTL_CLOSED_MARGIN_SECONDS) < device_now
+
+
+def observe_result(
+    kql_query: str,
+    rows: List[Dict],
+    query_class: str,
+    default_ttl: int,
+    adaptive: bool = True,
+) -> int:
+    """
+    Learn from a freshly executed result and choose its cache TTL.
+
+    Args:
+        kql_query: The executed query
+        rows: Its result rows
+        query_class: latest / historical / interactive (see classify_query)
+        default_ttl: TTL used when nothing better is known
+        adaptive: Whether a cadence-based TTL may replace default_ttl
+            (False when the caller asked for an explicit TTL; closed
+            ranges are still extended)
+    """
+    now = time.time()
+    wasted = _record_fingerprint(kql_query, rows, query_class)
+    if not ADAPTIVE_TTL_ENABLED:
+        return default_ttl
+
+    serial = extract_serial(kql_query)
+    state = _update_cadence(serial, rows, now) if serial else None
+
+    if is_closed_range(extract_range_end(kql_query), state, now):
+        ttl = max(default_ttl, TTL_CLOSED_SECONDS)
+    elif adaptive and query_class != 'interactive':
+        ttl = cadence_ttl(state, now) or default_ttl
+    else:
+        ttl = default_ttl
+
+    with _counters_lock:
+        _ttl_totals['count'] += 1
+        _ttl_totals['seconds'] += ttl
+    logger.debug(f"Adaptive TTL {ttl}s for {query_class} query (serial={serial}, wasted={wasted})")
+    return ttl
+
+
+# =============================================================================
+# Wasted Query Accounting
+# =============================================================================
+
+def _record_fingerprint(kql_query: str, rows: List[Dict], query_class: str) -> bool:
+    """Count the execution, and count it as wasted if nothing changed since the last one."""
+    key = f"adx_fp:{hashlib.md5(kql_query.encode()).hexdigest()}"
+    fingerprint = result_fingerprint(rows)
+    wasted = cache.get(key) == fingerprint
+    cache.set(key, fingerprint, FINGERPRINT_TTL)
+
+    with _counters_lock:
+        counters = _counters.setdefault(query_class, {'executed': 0, 'wasted': 0})
+        counters['executed'] += 1
+        counters['wasted'] += int(wasted)
+    return wasted
+
+
+def get_freshness_stats() -> Dict[str, Any]:
+    """Executed vs. wasted ADX queries per class in this process."""
+    with _counters_lock:
+        by_class = {name: dict(c) for name, c in _counters.items()}
+        ttl_count, ttl_seconds = _ttl_totals['count'], _ttl_totals['seconds']
+    for counters in by_class.values():
+        counters['wasted_ratio'] = round(counters['wasted'] / counters['executed'], 4) if counters['executed'] else None
+    executed = sum(c['executed'] for c in by_class.values())
+    wasted = sum(c['wasted'] for c in by_class.values())
+    return {
+        'adaptive_ttl': ADAPTIVE_TTL_ENABLED,
+        'executed_queries': executed,
+        'wasted_queries': wasted,
+        'wasted_ratio': round(wasted / executed, 4) if executed else None,
+        'avg_ttl_seconds': round(ttl_seconds / ttl_count, 1) if ttl_count else None,
+        'by_class': by_class,
+    }
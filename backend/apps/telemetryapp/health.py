@@ -0,0 +1,227 @@
+"""
+Background Health Probes
+
+Keeps a health snapshot up to date in the background so the health
+endpoint, polled every few seconds by load balancers on every worker,
+never touches the database, Redis or ADX itself.
+
+Design:
+1. A daemon thread per worker wakes every HEALTH_PROBE_INTERVAL seconds.
+   One worker per interval wins a lease in the shared cache and runs the
+   probes: `SELECT 1` on the database, PING over the shared Redis pool
+   (pools.py), and a `print 1` ADX query through the shared client with
+   its latency measured
+2. The winner publishes the snapshot to the shared cache; every worker
+   copies it into process memory, where health_check() reads it. Without
+   a shared cache (or before the first publish) a worker probes itself
+3. Probe latencies are kept as a rolling window inside the snapshot, so
+   p50/p95/p99 survive the lease moving between workers and can be used
+   for load-aware routing
+4. The database is the only hard dependency: a failing database makes the
+   snapshot 'unhealthy' (503); Redis or ADX failures make it 'degraded'
+   (200), since queries still fall back to stale ADX results
+5. ADX counts as configured when adx_optimized found a cluster
+   (ADX_CLUSTER_URI or ADX_CLUSTER_URL), the same lookup queries use
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+HEALTH_PROBE_ENABLED = os.getenv('HEALTH_PROBE_ENABLED', 'True').lower() in ('true', '1', 'yes')
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', 10))
+HEALTH_ADX_PROBE = os.getenv('HEALTH_ADX_PROBE', 'True').lower() in ('true', '1', 'yes')
+HEALTH_ADX_TIMEOUT = int(os.getenv('HEALTH_ADX_TIMEOUT', 5))
+
+# Probe latencies kept for percentiles
+HEALTH_LATENCY_WINDOW = int(os.getenv('HEALTH_LATENCY_WINDOW', 60))
+
+# A snapshot older than this is re-probed inline by the reading worker
+HEALTH_SNAPSHOT_MAX_AGE = float(os.getenv('HEALTH_SNAPSHOT_MAX_AGE', HEALTH_PROBE_INTERVAL * 3))
+
+HEALTH_SNAPSHOT_KEY = 'health:snapshot:v1'
+HEALTH_LEASE_KEY = 'health:probe_lease'
+
+STATUS_HEALTHY = 'healthy'
+STATUS_DEGRADED = 'degraded'
+STATUS_UNHEALTHY = 'unhealthy'
+
+_snapshot: Optional[Dict[str, Any]] = None
+_probe_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+
+
+def reset_after_fork() -> None:
+    """Forget the probe thread and locks inherited from the master."""
+    global _thread, _thread_lock, _probe_lock, _snapshot
+    _thread = None
+    _thread_lock = threading.Lock()
+    _probe_lock = threading.Lock()
+    _snapshot = None
+
+
+# =============================================================================
+# Probes
+# =============================================================================
+
+def _timed(func) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        func()
+        result = {'status': 'ok'}
+    except Exception as e:
+        result = {'status': f'error: {e}'}
+    result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def probe_database() -> Dict[str, Any]:
+    from django.db import connection
+
+    def check():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            connection.close_if_unusable_or_obsolete()
+    return _timed(check)
+
+
+def probe_redis() -> Optional[Dict[str, Any]]:
+    from . import pools
+
+    try:
+        client = pools.get_redis()
+    except ImportError:
+        return {'status': 'not installed', 'latency_ms': None}
+    if client is None:
+        return None
+    return _timed(client.ping)
+
+
+def probe_adx() -> Dict[str, Any]:
+    from . import adx_optimized
+
+    if not adx_optimized.cluster:
+        return {'status': 'not configured', 'latency_ms': None}
+    if not HEALTH_ADX_PROBE:
+        return {'status': 'configured', 'latency_ms': None}
+
+    def check():
+        # Own query class, so probes do not tighten the 'latest' timeouts
+        adx_optimized.execute_query('print 1', query_class='probe', timeout_seconds=HEALTH_ADX_TIMEOUT)
+    result = _timed(check)
+    result['circuit_breaker'] = adx_optimized.get_query_stats()['circuit_breaker']['state']
+    return result
+
+
+# =============================================================================
+# Snapshot
+# =============================================================================
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    if not ordered:
+        return {'p50': None, 'p95': None, 'p99': None}
+
+    def pick(pct):
+        return round(ordered[min(int(len(ordered) * pct), len(ordered) - 1)], 2)
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99)}
+
+
+def run_probes(previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Probe every dependency and build a snapshot (latency windows continue from previous)."""
+    probes = {'database': probe_database(), 'adx': probe_adx()}
+    redis_result = probe_redis()
+    if redis_result is not None:
+        probes['redis'] = redis_result
+
+    windows = dict((previous or {}).get('latency_windows', {}))
+    for name, result in probes.items():
+        window = list(windows.get(name, []))
+        if result['latency_ms'] is not None and result['status'] == 'ok':
+            window.append(result['latency_ms'])
+        windows[name] = window[-HEALTH_LATENCY_WINDOW:]
+        result.update(_percentiles(windows[name]), samples=len(windows[name]))
+
+    if probes['database']['status'] != 'ok':
+        status = STATUS_UNHEALTHY
+    elif any(p['status'].startswith('error') for p in probes.values()):
+        status = STATUS_DEGRADED
+    else:
+        status = STATUS_HEALTHY
+
+    return {
+        'status': status,
+        'checked_at': time.time(),
+        'probed_by': os.getpid(),
+        'probes': probes,
+        'latency_windows': windows,
+    }
+
+
+def refresh(force: bool = False) -> Dict[str, Any]:
+    """
+    Bring this worker's snapshot up to date: probe if this worker holds the
+    lease (or the shared cache is unusable), else copy the shared snapshot.
+    """
+    global _snapshot
+    with _probe_lock:
+        shared = None
+        try:
+            shared = cache.get(HEALTH_SNAPSHOT_KEY)
+            lease = force or cache.add(HEALTH_LEASE_KEY, os.getpid(), max(int(HEALTH_PROBE_INTERVAL), 1))
+        except Exception as e:
+            logger.warning(f"Health snapshot cache unavailable, probing locally: {e}")
+            lease = True
+
+        fresh = shared is not None and time.time() - shared['checked_at'] < HEALTH_SNAPSHOT_MAX_AGE
+        if lease or not fresh:
+            _snapshot = run_probes(shared or _snapshot)
+            try:
+                cache.set(HEALTH_SNAPSHOT_KEY, _snapshot, int(HEALTH_SNAPSHOT_MAX_AGE * 2))
+            except Exception:
+                pass
+        else:
+            _snapshot = shared
+        return _snapshot
+
+
+def _probe_loop() -> None:
+    while True:
+        try:
+            refresh()
+        except Exception as e:
+            logger.warning(f"Health probe failed: {e}")
+        time.sleep(HEALTH_PROBE_INTERVAL)
+
+
+def ensure_probe_thread() -> None:
+    """Start this worker's probe thread once (after fork, never in the master)."""
+    global _thread
+    if not HEALTH_PROBE_ENABLED or (_thread is not None and _thread.is_alive()):
+        return
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_probe_loop, name='health-probe', daemon=True)
+            _thread.start()
+
+
+def get_snapshot() -> Dict[str, Any]:
+    """The current snapshot; probes inline only when there is none or it is too old."""
+    ensure_probe_thread()
+    snapshot = _snapshot
+    if snapshot is None or time.time() - snapshot['checked_at'] > HEALTH_SNAPSHOT_MAX_AGE:
+        snapshot = refresh()
+    return snapshot
@@ -0,0 +1,121 @@
+"""
+HTTP Revalidation for Telemetry Endpoints
+
+Polling clients re-request the same telemetry every few seconds, and most
+of the time nothing has changed. Responses carry a strong ETag built from
+the newest `localtime` in the payload plus a hash of the payload values;
+a client that sends it back in If-None-Match on a GET gets an empty 304
+instead of the full body. Other methods (the read-only POST endpoints)
+answer a match with 412 Precondition Failed, as RFC 9110 requires; a 304
+is only defined for GET and HEAD, and browsers do not reuse cached bodies
+for POST.
+
+The ETag is computed from the response data, not the request, so it only
+saves bandwidth and serialization, not the ADX query itself (which is
+already served from cache in the common case). The canonical encoding
+hashed for the ETag is also sent as the body when the response is rendered
+by FastJSONRenderer, so the payload is encoded once per request.
+Pre-encoded bodies (cache hits) are hashed as they are sent; their tag
+carries no localtime part, since finding it would mean decoding them.
+"""
+
+import hashlib
+from functools import wraps
+from typing import Any, Optional
+
+from rest_framework.response import Response
+
+from .fast_json import dumps, PreEncodedJSON
+from .renderers import FastJSONRenderer
+
+# Suffixes added to the ETag by ApiCompressionMiddleware, one per encoding,
+# so the compressed and identity representations have distinct strong ETags
+ENCODING_ETAG_SUFFIXES = ('-gzip', '-br')
+
+
+def _max_localtime(data: Any) -> Optional[str]:
+    """Newest `localtime` value anywhere in a (nested) response payload."""
+    newest = None
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            value = item.get('localtime')
+            if value is not None:
+                value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+                if newest is None or value > newest:
+                    newest = value
+            stack.extend(v for v in item.values() if isinstance(v, (dict, list)))
+        elif isinstance(item, list):
+            stack.extend(v for v in item if isinstance(v, (dict, list)))
+    return newest
+
+
+def telemetry_etag(data: Any, payload: Optional[bytes] = None) -> str:
+    """
+    Strong ETag for a telemetry payload.
+
+    Format: "<newest localtime>-<sha256 prefix of the canonical JSON>".
+    The localtime part makes the tag readable in logs; the hash catches
+    value changes that do not move the newest timestamp. payload is the
+    canonical (sorted-key) encoding of data, when already computed.
+    """
+    if payload is None:
+        payload = dumps(data, sort_keys=True)
+    digest = hashlib.sha256(payload).hexdigest()[:20]
+    newest = _max_localtime(data)
+    stamp = ''.join(c for c in newest if c.isalnum()) if newest else '0'
+    return f'"{stamp}-{digest}"'
+
+
+def _strip_encoding_suffix(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith('W/'):
+        # Weak tags never match under strong comparison
+        return ''
+    for suffix in ENCODING_ETAG_SUFFIXES:
+        if tag.endswith(f'{suffix}"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the current ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(_strip_encoding_suffix(tag) == etag for tag in if_none_match.split(','))
+
+
+def conditional_telemetry(view_func):
+    """
+    Add a strong ETag to successful responses and answer a match with 304
+    (GET/HEAD) or 412 (other methods).
+
+    Apply below @api_view/@permission_classes so authentication and
+    permissions run first:
+
+        @api_view(['POST'])
+        @permission_classes([IsAuthenticated])
+        @conditional_telemetry
+        def batch_telemetry_view(request): ...
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if not isinstance(response, Response) or response.status_code != 200:
+            return response
+
+        payload = dumps(response.data, sort_keys=True)
+        etag = telemetry_etag(response.data, payload)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            response = Response(status=304 if request.method in ('GET', 'HEAD') else 412)
+        elif isinstance(getattr(request, 'accepted_renderer', None), FastJSONRenderer):
+            response.data = PreEncodedJSON(payload)
+        response['ETag'] = etag
+        # Clients may keep the body but must revalidate before reusing it
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    return wrapper
@@ -0,0 +1,257 @@
+"""
+Bulk Telemetry Ingest
+
+Edge collectors push thousands of samples per second; one HTTP request and
+one INSERT per sample through TelemetrySerializer does not keep up.
+
+Design:
+1. Rows arrive as a JSON array or an NDJSON stream and are handled in
+   chunks of INGEST_CHUNK_ROWS, so memory stays bounded for large streams
+2. Validation is columnar: each model field is checked for the whole
+   chunk at once (numpy for numeric fields) instead of building one
+   serializer per row. The field rules come from the model's _meta, so
+   they follow model changes
+3. Valid rows are written with bulk_create in INGEST_BATCH_SIZE batches,
+   or with PostgreSQL COPY when INGEST_USE_COPY is enabled
+4. Invalid rows are rejected individually and reported (capped), valid
+   rows in the same chunk are still written
+5. A request is one transaction: a malformed payload (e.g. a bad NDJSON
+   line in a late chunk) or too many rows rolls back the chunks already
+   written, so a collector can retry the whole request without creating
+   duplicates
+"""
+
+import io
+import os
+import csv
+import json
+import logging
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+
+import numpy as np
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import Telemetry
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+INGEST_CHUNK_ROWS = int(os.getenv('INGEST_CHUNK_ROWS', 5000))
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 1000))
+INGEST_MAX_ROWS = int(os.getenv('INGEST_MAX_ROWS', 200000))
+INGEST_MAX_ERRORS = int(os.getenv('INGEST_MAX_ERRORS', 100))
+
+# Use COPY instead of INSERT on PostgreSQL
+INGEST_USE_COPY = os.getenv('INGEST_USE_COPY', 'True').lower() in ('true', '1', 'yes')
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+class IngestError(Exception):
+    """Raised for a malformed ingest payload (not for individual bad rows)."""
+
+
+# =============================================================================
+# Field Rules (from the model)
+# =============================================================================
+
+def _ingest_fields() -> List[models.Field]:
+    """Concrete fields a client supplies (no pk, no auto timestamps)."""
+    return [
+        f for f in Telemetry._meta.concrete_fields
+        if not f.primary_key and not getattr(f, 'auto_now_add', False) and not getattr(f, 'auto_now', False)
+    ]
+
+
+INGEST_FIELDS = _ingest_fields()
+FIELD_NAMES = [f.attname for f in INGEST_FIELDS]
+
+
+# =============================================================================
+# Parsing
+# =============================================================================
+
+def iter_json_rows(data: Any) -> Iterator[Any]:
+    """Rows from an already-parsed JSON body: a list, or {"rows": [...]}."""
+    if isinstance(data, dict):
+        data = data.get('rows')
+    if not isinstance(data, list):
+        raise IngestError('Body must be a JSON array of rows or {"rows": [...]}')
+    return iter(data)
+
+
+def iter_ndjson_rows(stream: Iterable[bytes]) -> Iterator[Any]:
+    """Rows from an NDJSON stream, read line by line (never fully buffered)."""
+    for line_number, raw in enumerate(stream, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            yield json.loads(raw)
+        except ValueError:
+            raise IngestError(f"Invalid JSON on line {line_number}")
+
+
+def chunked(rows: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# =============================================================================
+# Vectorized Validation
+# =============================================================================
+
+def _numeric_column(values: List[Any], integer: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Column as float64 plus a boolean mask of invalid entries."""
+    # bool is an int subclass but not a valid measurement
+    cleaned = [
+        v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan
+        for v in values
+    ]
+    column = np.asarray(cleaned, dtype=np.float64)
+    invalid = ~np.isfinite(column)
+    if integer:
+        invalid |= np.isfinite(column) & (column != np.round(column))
+    return column, invalid
+
+
+def validate_rows(rows: List[Any], offset: int = 0) -> Tuple[Dict[str, list], np.ndarray, List[Dict[str, Any]]]:
+    """
+    Validate a chunk of rows column by column.
+
+    Returns:
+        (columns, valid_mask, errors): columns maps field name -> values for
+        every row, valid_mask marks rows that passed every check, errors
+        lists (row, field, error) for the rejected rows.
+    """
+    count = len(rows)
+    is_dict = np.fromiter((isinstance(r, dict) for r in rows), dtype=bool, count=count)
+    errors: List[Dict[str, Any]] = [
+        {'row': offset + int(i), 'error': 'Row must be a JSON object'} for i in np.flatnonzero(~is_dict)
+    ]
+    dict_rows = [r if isinstance(r, dict) else {} for r in rows]
+    valid = is_dict.copy()
+    columns: Dict[str, list] = {}
+
+    for field in INGEST_FIELDS:
+        values = [r.get(field.attname) for r in dict_rows]
+        if isinstance(field, (models.FloatField, models.IntegerField)):
+            integer = isinstance(field, models.IntegerField)
+            column, invalid = _numeric_column(values, integer)
+            if integer:
+                # Invalid rows are never written, so their placeholder value is irrelevant
+                column = np.where(invalid, 0, column).astype(np.int64)
+            columns[field.attname] = column.tolist()
+            message = 'A valid integer is required' if integer else 'A valid number is required'
+        elif isinstance(field, models.CharField):
+            max_length = field.max_length
+            invalid = np.fromiter(
+                (not isinstance(v, str) or not v or len(v) > max_length for v in values),
+                dtype=bool, count=count,
+            )
+            columns[field.attname] = values
+            message = f"A non-empty string of at most {max_length} characters is required"
+        else:
+            columns[field.attname] = values
+            continue
+
+        invalid &= is_dict
+        if invalid.any():
+            valid &= ~invalid
+            errors.extend(
+                {'row': offset + int(i), 'field': field.attname, 'error': message}
+                for i in np.flatnonzero(invalid)
+            )
+
+    return columns, valid, errors
+
+
+# =============================================================================
+# Writing
+# =============================================================================
+
+def _use_copy() -> bool:
+    return INGEST_USE_COPY and connection.vendor == 'postgresql'
+
+
+def _write_bulk_create(columns: Dict[str, list], indices: np.ndarray) -> int:
+    objs = [
+        Telemetry(**{name: columns[name][i] for name in FIELD_NAMES})
+        for i in indices
+    ]
+    Telemetry.objects.bulk_create(objs, batch_size=INGEST_BATCH_SIZE)
+    return len(objs)
+
+
+def _write_copy(columns: Dict[str, list], indices: np.ndarray) -> int:
+    """COPY rows into the table (PostgreSQL only); created_at is set explicitly."""
+    now = timezone.now().isoformat()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for i in indices:
+        writer.writerow([columns[name][i] for name in FIELD_NAMES] + [now])
+    buffer.seek(0)
+
+    table = connection.ops.quote_name(Telemetry._meta.db_table)
+    column_list = ', '.join(
+        connection.ops.quote_name(Telemetry._meta.get_field(name).column) for name in FIELD_NAMES + ['created_at']
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return len(indices)
+
+
+def write_rows(columns: Dict[str, list], valid: np.ndarray) -> int:
+    """Insert the valid rows of a chunk in one transaction (a savepoint inside ingest_rows)."""
+    indices = np.flatnonzero(valid)
+    if not len(indices):
+        return 0
+    with transaction.atomic():
+        if _use_copy():
+            return _write_copy(columns, indices)
+        return _write_bulk_create(columns, indices)
+
+
+# =============================================================================
+# Entry Point
+# =============================================================================
+
+def ingest_rows(rows: Iterator[Any]) -> Dict[str, Any]:
+    """
+    Validate and insert rows chunk by chunk, all in one transaction.
+
+    Raises:
+        IngestError: for a malformed payload or more than INGEST_MAX_ROWS
+            rows; nothing from the request is inserted
+    """
+    received = inserted = rejected = 0
+    errors: List[Dict[str, Any]] = []
+
+    with transaction.atomic():
+        for chunk in chunked(rows, INGEST_CHUNK_ROWS):
+            if received + len(chunk) > INGEST_MAX_ROWS:
+                raise IngestError(f"Too many rows (max {INGEST_MAX_ROWS} per request)")
+            columns, valid, chunk_errors = validate_rows(chunk, offset=received)
+            inserted += write_rows(columns, valid)
+            rejected += len(chunk) - int(valid.sum())
+            if len(errors) < INGEST_MAX_ERRORS:
+                errors.extend(chunk_errors[:INGEST_MAX_ERRORS - len(errors)])
+            received += len(chunk)
+
+    logger.info(f"Ingested {inserted}/{received} telemetry rows ({'COPY' if _use_copy() else 'bulk_create'})")
+    return {
+        'received': received,
+        'inserted': inserted,
+        'rejected': rejected,
+        'errors': errors,
+    }
@@ -0,0 +1,371 @@
+"""
+Background Job Service
+
+Runs slow work (report rendering, long ADX queries) outside the request
+thread so web workers stay free for interactive traffic.
+
+Design:
+1. Each job kind has its own bounded thread pool, so one kind of work
+   cannot starve another or the web workers
+2. Job state and results live on disk under JOBS_DIR, so any gunicorn
+   worker on the host can answer status/download requests
+3. Job ids are random. A key derived from the job parameters and the
+   submitting user points at that user's current job for those
+   parameters, so repeated submissions of the same work reuse the running
+   or finished job instead of queueing duplicates, while the id cannot be
+   guessed from the parameters
+4. Jobs belong to the user who submitted them; the views answer 404 for
+   another user's job
+5. Finished jobs expire after JOB_TTL_SECONDS
+"""
+
+import os
+import json
+import secrets
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+JOBS_DIR = Path(getattr(settings, 'JOBS_DIR', settings.BASE_DIR / 'var' / 'jobs'))
+
+# Finished jobs (and their results) are kept this long
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', 3600))
+
+# A running job whose heartbeat is older than this is treated as lost
+# (e.g. the worker that owned it was recycled)
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))
+
+# Per-kind pool sizes and queue limits
+JOB_POOLS = {
+    'report': {
+        'workers': int(os.getenv('REPORT_JOB_WORKERS', 2)),
+        'max_pending': int(os.getenv('REPORT_JOB_MAX_PENDING', 10)),
+    },
+    'query': {
+        'workers': int(os.getenv('QUERY_JOB_WORKERS', 2)),
+        'max_pending': int(os.getenv('QUERY_JOB_MAX_PENDING', 20)),
+    },
+}
+
+# Long queries get a bigger server-side timeout than interactive ones
+QUERY_JOB_TIMEOUT_SECONDS = int(os.getenv('QUERY_JOB_TIMEOUT_SECONDS', 600))
+
+# Rows per stored result page
+QUERY_JOB_PAGE_SIZE = int(os.getenv('QUERY_JOB_PAGE_SIZE', 5000))
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    """Raised when a job pool already has its maximum number of pending jobs."""
+
+
+# =============================================================================
+# Executors
+# =============================================================================
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_pending: Dict[str, int] = {}
+_executor_lock = threading.Lock()
+
+
+def _get_executor(kind: str) -> ThreadPoolExecutor:
+    """Get or create the bounded executor for a job kind."""
+    with _executor_lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            workers = JOB_POOLS.get(kind, {}).get('workers', 1)
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{kind}")
+            _executors[kind] = executor
+            _pending[kind] = 0
+        return executor
+
+
+def reset_after_fork() -> None:
+    """Forget executors inherited from a forking parent (their threads did not survive)."""
+    global _executor_lock
+    _executors.clear()
+    _pending.clear()
+    _executor_lock = threading.Lock()
+
+
+# =============================================================================
+# Job Storage
+# =============================================================================
+
+def make_job_key(kind: str, params: Dict[str, Any], user: str = '') -> str:
+    """Deduplication key from the job kind, parameters and owner (never shown to clients)."""
+    payload = json.dumps({'kind': kind, 'params': params, 'user': user}, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _key_file(job_key: str) -> Path:
+    return JOBS_DIR / f"{job_key}.ref"
+
+
+def _find_job(job_key: str) -> Optional[Dict[str, Any]]:
+    """The job last submitted with this key, if it still exists."""
+    try:
+        job_id = _key_file(job_key).read_text().strip()
+    except OSError:
+        return None
+    return get_job(job_id)
+
+
+def _write_key(job_key: str, job_id: str) -> None:
+    tmp = JOBS_DIR / f"{job_key}.ref.{os.getpid()}.{threading.get_ident()}"
+    tmp.write_text(job_id)
+    os.replace(tmp, _key_file(job_key))
+
+
+def job_dir(job_id: str) -> Path:
+    return JOBS_DIR / job_id
+
+
+def job_file(job_id: str, filename: str) -> Path:
+    """Path of a result file inside a job's directory."""
+    return job_dir(job_id) / filename
+
+
+def _write_meta(job_id: str, meta: Dict[str, Any]) -> None:
+    JOBS_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    path = job_dir(job_id)
+    path.mkdir(mode=0o700, exist_ok=True)
+    tmp = path / f"meta.json.{os.getpid()}.{threading.get_ident()}"
+    tmp.write_text(json.dumps(meta, cls=DjangoJSONEncoder))
+    os.replace(tmp, path / 'meta.json')
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """Whether the process that owns a job is still running on this host."""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Load job metadata, or None if the job does not exist or has expired."""
+    if not job_id or not job_id.isalnum():
+        return None
+    try:
+        meta = json.loads((job_dir(job_id) / 'meta.json').read_text())
+    except (OSError, ValueError):
+        return None
+
+    now = time.time()
+    if meta['status'] in (STATUS_DONE, STATUS_FAILED) and now - meta.get('finished_at', now) > JOB_TTL_SECONDS:
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
+        return None
+    if meta['status'] in (STATUS_QUEUED, STATUS_RUNNING) and (
+        not _pid_alive(meta.get('pid'))
+        or (meta['status'] == STATUS_RUNNING and now - meta.get('heartbeat', now) > JOB_STALE_SECONDS)
+    ):
+        meta['status'] = STATUS_FAILED
+        meta['error'] = 'Job was lost (worker restarted)'
+        meta['finished_at'] = now
+    return meta
+
+
+def update_job(job_id: str, **fields) -> Dict[str, Any]:
+    """Merge fields into a job's metadata and refresh its heartbeat."""
+    meta = get_job(job_id) or {'id': job_id}
+    meta.update(fields)
+    meta['heartbeat'] = time.time()
+    _write_meta(job_id, meta)
+    return meta
+
+
+def report_progress(job_id: str, progress: float, message: str = '') -> None:
+    """Record progress (0.0 - 1.0) for a running job."""
+    update_job(job_id, progress=round(min(max(progress, 0.0), 1.0), 3), message=message)
+
+
+def cleanup_expired_jobs() -> int:
+    """Remove expired job directories. Returns the number removed."""
+    removed = 0
+    if not JOBS_DIR.exists():
+        return 0
+    for path in JOBS_DIR.iterdir():
+        if path.is_dir() and get_job(path.name) is None:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    for path in JOBS_DIR.glob('*.ref'):
+        if _find_job(path.stem) is None:
+            path.unlink(missing_ok=True)
+    return removed
+
+
+# =============================================================================
+# Submission
+# =============================================================================
+
+def submit_job(
+    kind: str,
+    params: Dict[str, Any],
+    func: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+    user: str = '',
+) -> Dict[str, Any]:
+    """
+    Submit a job, reusing the user's existing job with the same parameters.
+
+    Args:
+        kind: Job kind (selects the executor pool)
+        params: JSON-serializable job parameters
+        func: Callable(job_id, params) -> result metadata, run in the pool
+        user: Username of the submitter, who owns the job
+
+    Returns:
+        Job metadata
+
+    Raises:
+        JobQueueFull: if the pool already has max_pending jobs
+    """
+    job_key = make_job_key(kind, params, user)
+    existing = _find_job(job_key)
+    if existing is not None and existing['status'] != STATUS_FAILED:
+        return existing
+
+    executor = _get_executor(kind)
+    max_pending = JOB_POOLS.get(kind, {}).get('max_pending', 10)
+    with _executor_lock:
+        if _pending[kind] >= max_pending:
+            raise JobQueueFull(f"Too many pending {kind} jobs. Please try again later.")
+        _pending[kind] += 1
+
+    if cleanup_due():
+        cleanup_expired_jobs()
+
+    job_id = secrets.token_hex(16)
+    meta = {
+        'id': job_id,
+        'kind': kind,
+        'status': STATUS_QUEUED,
+        'params': params,
+        'user': user,
+        'progress': 0.0,
+        'message': '',
+        'submitted_at': time.time(),
+        'pid': os.getpid(),
+    }
+    meta = update_job(job_id, **meta)
+    _write_key(job_key, job_id)
+    executor.submit(_run_job, kind, job_id, params, func)
+    logger.info(f"Submitted {kind} job {job_id}")
+    return meta
+
+
+def _run_job(kind: str, job_id: str, params: Dict[str, Any], func: Callable) -> None:
+    started = time.time()
+    try:
+        update_job(job_id, status=STATUS_RUNNING, started_at=started)
+        result = func(job_id, params) or {}
+        update_job(
+            job_id,
+            status=STATUS_DONE,
+            progress=1.0,
+            result=result,
+            finished_at=time.time(),
+            duration_seconds=round(time.time() - started, 3),
+        )
+        logger.info(f"{kind} job {job_id} finished in {time.time() - started:.1f}s")
+    except Exception as e:
+        logger.error(f"{kind} job {job_id} failed: {e}")
+        update_job(job_id, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+    finally:
+        with _executor_lock:
+            _pending[kind] -= 1
+
+
+_last_cleanup = 0.0
+
+
+def cleanup_due() -> bool:
+    """Rate-limit disk cleanup to once per minute per process."""
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup < 60:
+        return False
+    _last_cleanup = now
+    return True
+
+
+def public_job(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Job metadata safe to return to clients."""
+    return {
+        key: meta.get(key)
+        for key in ('id', 'kind', 'status', 'progress', 'message', 'error', 'result', 'duration_seconds')
+        if meta.get(key) is not None
+    }
+
+
+# =============================================================================
+# Query Jobs (long historical queries)
+# =============================================================================
+
+def _page_filename(page: int) -> str:
+    return f"page_{page:05d}.json"
+
+
+def _run_query_job(job_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    from .adx_optimized import query_adx
+
+    report_progress(job_id, 0.1, 'Executing query')
+    rows = query_adx(
+        params['kql'],
+        use_cache=False,
+        timeout_seconds=QUERY_JOB_TIMEOUT_SECONDS,
+        endpoint='query_job',
+    )
+
+    total_pages = max((len(rows) + QUERY_JOB_PAGE_SIZE - 1) // QUERY_JOB_PAGE_SIZE, 1)
+    for page in range(total_pages):
+        chunk = rows[page * QUERY_JOB_PAGE_SIZE:(page + 1) * QUERY_JOB_PAGE_SIZE]
+        job_file(job_id, _page_filename(page)).write_text(json.dumps(chunk, cls=DjangoJSONEncoder))
+        report_progress(job_id, 0.5 + 0.5 * (page + 1) / total_pages, f"Stored page {page + 1}/{total_pages}")
+
+    result = {
+        'total_rows': len(rows),
+        'total_pages': total_pages,
+        'page_size': QUERY_JOB_PAGE_SIZE,
+    }
+    if getattr(rows, 'truncation', None):
+        result['truncation'] = rows.truncation
+    return result
+
+
+def submit_query_job(kql_query: str, user: str = '') -> Dict[str, Any]:
+    """Queue a long-running KQL query (or reuse one with the same text)."""
+    return submit_job('query', {'kql': kql_query}, _run_query_job, user=user)
+
+
+def read_result_page(job_id: str, page: int) -> Optional[list]:
+    """Load one stored page of a finished query job, or None if out of range."""
+    if page < 0:
+        return None
+    try:
+        return json.loads(job_file(job_id, _page_filename(page)).read_text())
+    except (OSError, ValueError):
+        return None
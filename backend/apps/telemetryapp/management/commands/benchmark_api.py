@@ -0,0 +1,288 @@
+"""
+Benchmark the API against an offline synthetic ADX.
+
+Swaps the shared ADX client for SyntheticKustoClient, creates a throwaway
+test database with a benchmark user, and drives the hot endpoints through
+the full Django/DRF stack at several concurrency levels. Reports, per
+scenario and concurrency level: throughput, p50/p95/p99 latency, ADX
+calls, query cache hit ratio and peak RSS, as JSON that can be stored as a
+baseline and compared against later runs.
+
+Usage:
+    python manage.py benchmark_api
+    python manage.py benchmark_api --concurrency 1,8,32 --requests 500 --output baseline.json
+    python manage.py benchmark_api --compare baseline.json --tolerance 0.15
+"""
+
+import gc
+import os
+import json
+import time
+import tempfile
+import platform
+import resource
+import threading
+from typing import Dict, Any, List, Callable
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from telemetryapp import adx_optimized
+from telemetryapp.adx_optimized import CircuitBreaker, get_cache_counters
+from telemetryapp.fake_kusto import SyntheticKustoClient
+
+BENCH_USERNAME = 'bench-user'
+BENCH_PASSWORD = 'bench-Password-123'
+
+# A dashboard-sized latest-value request (30 metrics + a few alarms)
+BATCH_TELEMETRY_NAMES = [f"/INV/SIM/STAT/METRIC{i:02d}" for i in range(30)]
+BATCH_ALARM_NAMES = [f"/BMS/SIM/EVENT/ALARM/ALARM{i:02d}" for i in range(5)]
+
+SCENARIOS = ('batch_telemetry', 'fleet_overview', 'query_adx', 'search_serial', 'auth_me', 'login')
+
+# Metrics where a higher value is a regression (others: lower is a regression)
+HIGHER_IS_WORSE = ('p50_ms', 'p95_ms', 'p99_ms', 'adx_calls', 'peak_rss_mb')
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if platform.system() == 'Darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+class Command(BaseCommand):
+    help = "Benchmark API endpoints against a synthetic ADX backend and emit a JSON baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated scenarios ({', '.join(SCENARIOS)})")
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated thread counts')
+        parser.add_argument('--requests', type=int, default=300, help='Requests per scenario and level')
+        parser.add_argument('--serials', type=int, default=20, help='Distinct device serials in the workload')
+        parser.add_argument('--adx-latency', type=float, default=0.05, help='Synthetic ADX latency (s)')
+        parser.add_argument('--rows', type=int, default=500, help='Rows per synthetic history query')
+        parser.add_argument('--fast-rows', type=int, default=5000, help='Rows per fast-telemetry query')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Baseline JSON to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.15,
+                            help='Allowed relative regression when comparing (default 0.15)')
+
+    def handle(self, *args, **options):
+        scenarios = [s.strip() for s in options['scenarios'].split(',') if s.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        levels = [int(c) for c in options['concurrency'].split(',') if c.strip()]
+
+        client = SyntheticKustoClient(
+            latency=options['adx_latency'],
+            row_count=options['rows'],
+            fast_row_count=options['fast_rows'],
+        )
+
+        # SQLite's in-memory test database fails concurrent writers with
+        # "table is locked"; a temporary file database waits for the lock
+        tmp_dir = tempfile.TemporaryDirectory()
+        if connection.vendor == 'sqlite':
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp_dir.name, 'bench.sqlite3')
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        original_client = adx_optimized._client
+        original_limit = adx_optimized.MAX_QUERIES_PER_MINUTE
+        adx_optimized.set_adx_client(client)
+        # The per-process rate limit would otherwise reject most of the load
+        adx_optimized.MAX_QUERIES_PER_MINUTE = 10 ** 9
+        adx_optimized._breaker = CircuitBreaker()
+
+        report: Dict[str, Any] = {
+            'config': {
+                'concurrency': levels,
+                'requests': options['requests'],
+                'serials': options['serials'],
+                'adx_latency': options['adx_latency'],
+                'rows': options['rows'],
+                'fast_rows': options['fast_rows'],
+                'cache_ttl_seconds': adx_optimized.CACHE_TTL_SECONDS,
+            },
+            'results': {},
+        }
+        try:
+            from django.contrib.auth.models import User
+            User.objects.create_user(BENCH_USERNAME, password=BENCH_PASSWORD)
+
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for scenario in scenarios:
+                    report['results'][scenario] = {}
+                    for threads in levels:
+                        cache.clear()
+                        gc.collect()
+                        report['results'][scenario][str(threads)] = self._run(
+                            scenario, threads, options['requests'], options['serials'], client
+                        )
+        finally:
+            adx_optimized.set_adx_client(original_client)
+            adx_optimized.MAX_QUERIES_PER_MINUTE = original_limit
+            adx_optimized._breaker = CircuitBreaker()
+            runner.teardown_databases(old_config)
+            tmp_dir.cleanup()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = self._compare(baseline, report, options['tolerance'])
+            for line in regressions:
+                self.stderr.write(self.style.ERROR(line))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stderr.write(self.style.SUCCESS('No regressions against baseline'))
+
+    # -------------------------------------------------------------------------
+    # Scenarios
+    # -------------------------------------------------------------------------
+
+    def _login(self, api: APIClient) -> None:
+        response = api.post('/api/login/', {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD}, format='json')
+        if response.status_code != 200:
+            raise CommandError(f"Benchmark login failed: {response.status_code}")
+
+    def _request_for(self, scenario: str, serials: int) -> Callable[[APIClient, int], Any]:
+        def serial(i: int) -> str:
+            return f"SIM{i % serials:04d}"
+
+        if scenario == 'batch_telemetry':
+            return lambda api, i: api.post('/api/batch_telemetry/', {
+                'serial': serial(i),
+                'telemetry_names': BATCH_TELEMETRY_NAMES,
+                'alarm_names': BATCH_ALARM_NAMES,
+            }, format='json')
+        if scenario == 'fleet_overview':
+            # A NOC wall paging through the whole fleet
+            return lambda api, i: api.post('/api/fleet/overview/', {'page': i % 4 + 1}, format='json')
+        if scenario == 'query_adx':
+            # Alternate a 24h history query and a fast-telemetry query
+            def history(api, i):
+                if i % 2:
+                    kql = (
+                        "sourcedatastreamingfornam | where header has '" + serial(i) + "' "
+                        "| where name contains \"/INV/ACPORT/STAT/VRMS_L1N\" | order by localtime asc"
+                    )
+                else:
+                    kql = (
+                        f"Telemetry | where comms_serial contains '{serial(i)}' "
+                        "| where name contains '/INV/DCPORT/STAT/PV1/V' | order by localtime asc"
+                    )
+                return api.post('/api/query_adx/', {'kql': kql}, format='json')
+            return history
+        if scenario == 'search_serial':
+            return lambda api, i: api.post('/api/search_serial/', {'serial': serial(i)}, format='json')
+        if scenario == 'auth_me':
+            return lambda api, i: api.get('/api/auth/me/')
+        if scenario == 'login':
+            return lambda api, i: api.post(
+                '/api/login/', {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD}, format='json'
+            )
+        raise CommandError(f"Unknown scenario: {scenario}")
+
+    def _run(self, scenario: str, threads: int, total: int, serials: int, client: SyntheticKustoClient) -> Dict[str, Any]:
+        send = self._request_for(scenario, serials)
+        latencies: List[float] = []
+        errors = 0
+        lock = threading.Lock()
+        counter = iter(range(total))
+
+        # Each thread is one browser session with its own cookies
+        sessions = []
+        for _ in range(threads):
+            api = APIClient()
+            if scenario != 'login':
+                self._login(api)
+            sessions.append(api)
+
+        calls_before = client.calls
+        counters_before = get_cache_counters()
+
+        def worker(api: APIClient):
+            nonlocal errors
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    failed = send(api, i).status_code >= 400
+                except Exception:
+                    failed = True
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if failed:
+                        errors += 1
+
+        pool = [threading.Thread(target=worker, args=(api,)) for api in sessions]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        counters_after = get_cache_counters()
+        hits = counters_after['hits'] - counters_before['hits']
+        misses = counters_after['misses'] - counters_before['misses']
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+            'adx_calls': client.calls - calls_before,
+            'cache_hits': hits,
+            'cache_misses': misses,
+            'cache_hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'peak_rss_mb': _peak_rss_mb(),
+        }
+
+    # -------------------------------------------------------------------------
+    # Baseline Comparison
+    # -------------------------------------------------------------------------
+
+    def _compare(self, baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+        regressions = []
+        for scenario, levels in current['results'].items():
+            for level, stats in levels.items():
+                base = baseline.get('results', {}).get(scenario, {}).get(level)
+                if not base:
+                    continue
+                for metric in ('throughput_rps',) + HIGHER_IS_WORSE:
+                    old, new = base.get(metric), stats.get(metric)
+                    if not old or new is None:
+                        continue
+                    change = (new - old) / old
+                    worse = change > tolerance if metric in HIGHER_IS_WORSE else change < -tolerance
+                    if worse:
+                        regressions.append(
+                            f"{scenario} @{level}: {metric} {old} -> {new} ({change:+.0%})"
+                        )
+        return regressions
@@ -0,0 +1,150 @@
+"""
+Benchmark bulk Telemetry ingest: rows per second at several batch sizes.
+
+Runs against a throwaway test database. For each batch size, inserts
+--rows synthetic rows through the ingest pipeline (vectorized validation
++ bulk_create or COPY), and optionally through the per-row
+TelemetrySerializer path for comparison, and reports rows/second.
+
+Usage:
+    python manage.py benchmark_ingest
+    python manage.py benchmark_ingest --rows 50000 --batch-sizes 100,1000,5000 --json
+    python manage.py benchmark_ingest --with-serializer --http
+"""
+
+import os
+import json
+import time
+import random
+import tempfile
+from typing import Dict, Any, List
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from telemetryapp import ingest
+from telemetryapp.models import Telemetry
+from telemetryapp.serializers import TelemetrySerializer
+
+BENCH_USERNAME = 'bench-ingest'
+BENCH_PASSWORD = 'bench-Password-123'
+
+
+def synthetic_rows(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Telemetry rows shaped like an edge collector upload."""
+    rng = random.Random(seed)
+    return [
+        {
+            'inverter_grid_L1_V_RMS': round(rng.uniform(225, 245), 2),
+            'inverter_grid_L2_V_RMS': round(rng.uniform(225, 245), 2),
+            'inverter_grid_L1_I_RMS': round(rng.uniform(0, 40), 2),
+            'BGCS_RELAY_STATUS': rng.choice(('CLOSED', 'OPEN')),
+            'ETP_CONTAINER_STATUS': rng.choice(('OK', 'WARN', 'FAULT')),
+            'WIFI_SIGNAL_STRENGTH': rng.randint(-90, -30),
+            'WIFI_FREQ_BAND': rng.choice(('2.4GHz', '5GHz')),
+        }
+        for _ in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Measure bulk ingest throughput (rows/second) at several batch sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Rows inserted per batch size')
+        parser.add_argument('--batch-sizes', default='100,500,1000,5000', help='Comma-separated batch sizes')
+        parser.add_argument('--with-serializer', action='store_true',
+                            help='Also measure the per-row TelemetrySerializer path')
+        parser.add_argument('--http', action='store_true',
+                            help='Also measure the full HTTP endpoint (JSON and NDJSON)')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def handle(self, *args, **options):
+        batch_sizes = [int(b) for b in options['batch_sizes'].split(',') if b.strip()]
+        rows = synthetic_rows(options['rows'])
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        if connection.vendor == 'sqlite':
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp_dir.name, 'bench.sqlite3')
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        saved = (ingest.INGEST_BATCH_SIZE, ingest.INGEST_CHUNK_ROWS, ingest.INGEST_MAX_ROWS)
+
+        report: Dict[str, Any] = {
+            'config': {
+                'rows': len(rows),
+                'vendor': connection.vendor,
+                'writer': 'COPY' if ingest._use_copy() else 'bulk_create',
+            },
+            'results': {},
+        }
+        try:
+            ingest.INGEST_MAX_ROWS = max(len(rows), ingest.INGEST_MAX_ROWS)
+            for size in batch_sizes:
+                # One chunk per batch so the batch size is the unit of work
+                ingest.INGEST_BATCH_SIZE = size
+                ingest.INGEST_CHUNK_ROWS = size
+                report['results'][f"ingest_{size}"] = self._measure(
+                    lambda: ingest.ingest_rows(iter(rows)), len(rows)
+                )
+
+            if options['with_serializer']:
+                report['results']['serializer_per_row'] = self._measure(
+                    lambda: self._serializer_insert(rows), len(rows)
+                )
+
+            if options['http']:
+                report['results'].update(self._measure_http(rows))
+        finally:
+            ingest.INGEST_BATCH_SIZE, ingest.INGEST_CHUNK_ROWS, ingest.INGEST_MAX_ROWS = saved
+            runner.teardown_databases(old_config)
+            tmp_dir.cleanup()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Ingest of {len(rows)} rows on {report['config']['vendor']} ({report['config']['writer']})"
+        ))
+        for name, stats in report['results'].items():
+            self.stdout.write(f"  {name:<24} {stats['rows_per_second']:>12,.0f} rows/s  {stats['seconds']:>8.3f} s")
+
+    def _measure(self, func, count: int) -> Dict[str, Any]:
+        Telemetry.objects.all().delete()
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        stored = Telemetry.objects.count()
+        return {
+            'seconds': round(elapsed, 4),
+            'rows_per_second': round(count / elapsed, 1) if elapsed else 0.0,
+            'stored': stored,
+        }
+
+    def _serializer_insert(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            serializer = TelemetrySerializer(data=row)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+    def _measure_http(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        User.objects.create_user(BENCH_USERNAME, password=BENCH_PASSWORD)
+        api = APIClient()
+        results = {}
+        ndjson = '\n'.join(json.dumps(row) for row in rows)
+        with override_settings(ALLOWED_HOSTS=['testserver'], DATA_UPLOAD_MAX_MEMORY_SIZE=None):
+            api.post('/api/login/', {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD}, format='json')
+            results['http_json'] = self._measure(
+                lambda: api.post('/api/telemetry/ingest/', rows, format='json'), len(rows)
+            )
+            results['http_ndjson'] = self._measure(
+                lambda: api.generic('POST', '/api/telemetry/ingest/', ndjson, content_type='application/x-ndjson'),
+                len(rows),
+            )
+        return results
@@ -0,0 +1,121 @@
+"""
+Benchmark JSON encoding of ADX results: rows per second and MB/s.
+
+Encodes a synthetic time series (--rows rows shaped like a Kusto result:
+tz-aware localtime, name, serial, value_double) through:
+  - DRF's JSONRenderer (standard-library json), the previous default
+  - FastJSONRenderer (fast_json; orjson when installed)
+  - a cache hit on the previous path: decode the cached JSON, re-encode it
+  - a cache hit passed through as PreEncodedJSON (no decode, no encode)
+  - NumPy columns (datetime64 + float64 arrays) through fast_json
+
+Each case reports the best of --repeat runs.
+
+Usage:
+    python manage.py benchmark_json
+    python manage.py benchmark_json --rows 100000 --repeat 5 --json
+"""
+
+import json
+import time
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Callable
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+from telemetryapp import adx_optimized, fast_json
+from telemetryapp.adx_service import cached_response
+from telemetryapp.renderers import FastJSONRenderer
+
+BENCH_QUERY = 'Telemetry | where comms_serial == "BENCH-JSON" | project localtime, name, value_double'
+
+
+def synthetic_series(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Rows of a 1 Hz time series as the Kusto SDK returns them."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            'localtime': start + timedelta(seconds=i),
+            'name': '/INV/DCPORT/STAT/PV1/V',
+            'comms_serial': 'BENCH-JSON',
+            'value_double': round(rng.uniform(300, 450), 3),
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Measure JSON encode throughput of ADX results (standard library vs fast_json vs pass-through)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000, help='Rows in the time series')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per case (best is reported)')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def handle(self, *args, **options):
+        rows = synthetic_series(options['rows'])
+        repeat = max(options['repeat'], 1)
+        drf, fast = JSONRenderer(), FastJSONRenderer()
+
+        # The cache entry as the previous code stored it, and as it is stored now
+        legacy_entry = json.dumps(rows, cls=DjangoJSONEncoder)
+        adx_optimized.set_cached_result(BENCH_QUERY, rows, ttl=600)
+
+        columns = {
+            'localtime': np.array([row['localtime'].replace(tzinfo=None) for row in rows], dtype='datetime64[s]'),
+            'value_double': np.array([row['value_double'] for row in rows], dtype=np.float64),
+        }
+
+        cases: Dict[str, Callable[[], bytes]] = {
+            'drf_json': lambda: drf.render({'data': rows}),
+            'fast_json': lambda: fast.render({'data': rows}),
+            'cache_hit_decode_reencode': lambda: drf.render({'data': json.loads(legacy_entry), 'cached': True}),
+            'cache_hit_passthrough': lambda: fast.render(cached_response(BENCH_QUERY)),
+            'numpy_columns_fast_json': lambda: fast_json.dumps(columns),
+            'numpy_columns_tolist_json': lambda: json.dumps(
+                {'localtime': columns['localtime'].astype(str).tolist(), 'value_double': columns['value_double'].tolist()}
+            ).encode(),
+        }
+
+        report: Dict[str, Any] = {
+            'config': {'rows': len(rows), 'repeat': repeat, 'backend': fast_json.backend()},
+            'results': {name: self._measure(func, len(rows), repeat) for name, func in cases.items()},
+        }
+        adx_optimized.cache.delete(adx_optimized.get_cache_key(BENCH_QUERY))
+
+        baseline = report['results']['drf_json']['seconds']
+        for stats in report['results'].values():
+            stats['speedup'] = round(baseline / stats['seconds'], 1) if stats['seconds'] else None
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"JSON encoding of {len(rows)} rows (best of {repeat}, fast_json backend: {fast_json.backend()})"
+        ))
+        for name, stats in report['results'].items():
+            self.stdout.write(
+                f"  {name:<28} {stats['rows_per_second']:>14,.0f} rows/s  {stats['mb_per_second']:>9,.1f} MB/s"
+                f"  {stats['seconds'] * 1000:>9.1f} ms  x{stats['speedup']}"
+            )
+
+    def _measure(self, func: Callable[[], bytes], count: int, repeat: int) -> Dict[str, Any]:
+        best, size = None, 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            size = len(body)
+        return {
+            'seconds': round(best, 5),
+            'rows_per_second': round(count / best, 1) if best else 0.0,
+            'mb_per_second': round(size / best / 1e6, 1) if best else 0.0,
+            'bytes': size,
+        }
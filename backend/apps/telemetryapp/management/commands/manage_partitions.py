@@ -0,0 +1,96 @@
+"""
+Create upcoming Telemetry partitions and drop expired ones.
+
+On partitioned PostgreSQL: creates partitions --ahead periods into the
+future and detaches/drops partitions entirely older than --retention-days.
+On SQLite or an unpartitioned table: applies retention with batched
+DELETEs instead. Safe to run repeatedly; schedule it daily, e.g.:
+
+    15 2 * * * cd /opt/mysite/backend && venv/bin/python manage.py manage_partitions
+
+Usage:
+    python manage.py manage_partitions
+    python manage.py manage_partitions --ahead 6 --retention-days 365
+    python manage.py manage_partitions --list --json
+    python manage.py manage_partitions --dry-run
+"""
+
+import json
+import time
+from typing import Dict, Any
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from telemetryapp import partitions
+
+
+class Command(BaseCommand):
+    help = "Create future Telemetry partitions and drop expired ones (retention)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=partitions.TELEMETRY_PARTITIONS_AHEAD,
+                            help='Periods to create ahead of the current one')
+        parser.add_argument('--interval', choices=('month', 'day'), default=partitions.TELEMETRY_PARTITION_INTERVAL,
+                            help='Partition size for newly created partitions')
+        parser.add_argument('--retention-days', type=int, default=partitions.TELEMETRY_RETENTION_DAYS,
+                            help='Drop data older than this many days (0 keeps everything)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be dropped, change nothing')
+        parser.add_argument('--list', action='store_true', help='Only list partitions')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        partitioned = partitions.is_partitioned(connection)
+        report: Dict[str, Any] = {
+            'vendor': connection.vendor,
+            'partitioned': partitioned,
+            'created': [],
+            'dropped': [],
+            'deleted_rows': 0,
+            'dry_run': options['dry_run'],
+        }
+
+        if not options['list']:
+            if partitioned:
+                if not options['dry_run']:
+                    report['created'] = partitions.create_partitions(
+                        ahead=options['ahead'], interval=options['interval'], connection=connection
+                    )
+                report['dropped'] = partitions.drop_expired_partitions(
+                    options['retention_days'], dry_run=options['dry_run'], connection=connection
+                )
+            else:
+                report['deleted_rows'] = partitions.delete_expired_rows(
+                    options['retention_days'], dry_run=options['dry_run']
+                )
+
+        if partitioned:
+            report['partitions'] = [
+                {
+                    'name': p['name'],
+                    'start': p['start'].isoformat() if p['start'] else None,
+                    'end': p['end'].isoformat() if p['end'] else None,
+                }
+                for p in partitions.list_partitions(connection)
+            ]
+        report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        mode = 'partitioned' if partitioned else 'unpartitioned (row deletes)'
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Telemetry storage on {connection.vendor}: {mode}"))
+        verb = 'Would drop' if options['dry_run'] else 'Dropped'
+        for name in report['created']:
+            self.stdout.write(self.style.SUCCESS(f"  Created {name}"))
+        for name in report['dropped']:
+            self.stdout.write(self.style.WARNING(f"  {verb} {name}"))
+        if not partitioned and options['retention_days'] > 0:
+            verb = 'Would delete' if options['dry_run'] else 'Deleted'
+            self.stdout.write(f"  {verb} {report['deleted_rows']} rows older than {options['retention_days']} days")
+        for p in report.get('partitions', []):
+            bounds = 'DEFAULT' if p['start'] is None else f"{p['start']} .. {p['end']}"
+            self.stdout.write(f"  {p['name']:<40} {bounds}")
+        self.stdout.write(f"  done in {report['elapsed_ms']} ms")
@@ -0,0 +1,171 @@
+"""
+Profile process startup: per-module import time and time to first response.
+
+Starts fresh Python processes (like a recycled gunicorn worker or a test
+run would) with `-X importtime`, loads Django and the WSGI application,
+serves one request in-process, and reports where the time went. Fails
+when startup exceeds a budget, or when a module that should be lazily
+imported shows up at startup.
+
+Usage:
+    python manage.py profile_startup
+    python manage.py profile_startup --runs 5 --top 30 --json
+    python manage.py profile_startup --budget-ms 1500 --forbid azure.kusto,msal
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+from statistics import median
+from typing import Dict, Any, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_BUDGET_MS = int(os.getenv('STARTUP_BUDGET_MS', 2000))
+
+# Runs in the child process; prints one JSON line with phase timings
+CHILD_SCRIPT = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t2 = time.perf_counter()
+from django.conf import settings
+from django.test import Client
+host = next((h for h in settings.ALLOWED_HOSTS if h and '*' not in h and not h.startswith('.')), 'localhost')
+response = Client(HTTP_HOST=host).get(sys.argv[1])
+t3 = time.perf_counter()
+print('STARTUP_PROFILE ' + json.dumps({
+    'django_setup_ms': (t1 - t0) * 1000,
+    'wsgi_load_ms': (t2 - t1) * 1000,
+    'first_response_ms': (t3 - t2) * 1000,
+    'status_code': response.status_code,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+def _parse_importtime(stderr: str) -> Dict[str, Dict[str, float]]:
+    """Parse `-X importtime` output into {module: {'self_ms', 'cumulative_ms'}}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+            modules[name.strip()] = {
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            }
+        except ValueError:
+            continue
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Profile import time per module and time to first response, with a startup budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Fresh processes to start (median is reported)')
+        parser.add_argument('--path', default='/api/health/', help='Request served as the first response')
+        parser.add_argument('--top', type=int, default=20, help='Slowest modules to list')
+        parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                            help='Fail if the median total startup time exceeds this (0 disables)')
+        parser.add_argument('--forbid', default='',
+                            help='Comma-separated module prefixes that must not be imported at startup')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def handle(self, *args, **options):
+        runs = [self._run_once(options['path']) for _ in range(max(options['runs'], 1))]
+
+        # Per-module figures from the median run by total time
+        runs.sort(key=lambda r: r['total_ms'])
+        representative = runs[len(runs) // 2]
+        top_modules = sorted(
+            representative['imports'].items(), key=lambda item: item[1]['cumulative_ms'], reverse=True
+        )[:options['top']]
+
+        forbidden = [p.strip() for p in options['forbid'].split(',') if p.strip()]
+        violations = sorted({
+            module for module in representative['modules']
+            for prefix in forbidden
+            if module == prefix or module.startswith(prefix + '.')
+        })
+
+        report: Dict[str, Any] = {
+            'runs': len(runs),
+            'path': options['path'],
+            'status_code': representative['status_code'],
+            'total_ms': round(median(r['total_ms'] for r in runs), 1),
+            'interpreter_ms': round(median(r['interpreter_ms'] for r in runs), 1),
+            'django_setup_ms': round(median(r['django_setup_ms'] for r in runs), 1),
+            'wsgi_load_ms': round(median(r['wsgi_load_ms'] for r in runs), 1),
+            'first_response_ms': round(median(r['first_response_ms'] for r in runs), 1),
+            'modules_imported': len(representative['modules']),
+            'budget_ms': options['budget_ms'],
+            'top_imports': [
+                {'module': name, 'cumulative_ms': round(t['cumulative_ms'], 1), 'self_ms': round(t['self_ms'], 1)}
+                for name, t in top_modules
+            ],
+            'forbidden_imports': violations,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+        problems = []
+        if options['budget_ms'] and report['total_ms'] > options['budget_ms']:
+            problems.append(f"startup {report['total_ms']} ms exceeds budget {options['budget_ms']} ms")
+        if violations:
+            problems.append(f"forbidden modules imported at startup: {', '.join(violations[:10])}")
+        if problems:
+            raise CommandError('; '.join(problems))
+
+    def _run_once(self, path: str) -> Dict[str, Any]:
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'))
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, path],
+            cwd=str(settings.BASE_DIR),
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        total_ms = (time.perf_counter() - started) * 1000
+
+        line = next((l for l in proc.stdout.splitlines() if l.startswith('STARTUP_PROFILE ')), None)
+        if proc.returncode != 0 or line is None:
+            tail = '\n'.join(l for l in proc.stderr.splitlines() if not l.startswith('import time:'))[-2000:]
+            raise CommandError(f"Startup child process failed (exit {proc.returncode}):\n{tail}")
+
+        result = json.loads(line[len('STARTUP_PROFILE '):])
+        result['imports'] = _parse_importtime(proc.stderr)
+        result['total_ms'] = total_ms
+        # Everything before django.setup() started: interpreter boot and site imports
+        result['interpreter_ms'] = max(
+            total_ms - result['django_setup_ms'] - result['wsgi_load_ms'] - result['first_response_ms'], 0.0
+        )
+        return result
+
+    def _print_report(self, report: Dict[str, Any]) -> None:
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Startup profile ({report['runs']} runs, median) - first request {report['path']} "
+            f"-> {report['status_code']}"
+        ))
+        for key in ('interpreter_ms', 'django_setup_ms', 'wsgi_load_ms', 'first_response_ms', 'total_ms'):
+            self.stdout.write(f"  {key:<20} {report[key]:>9.1f}")
+        self.stdout.write(f"  {'modules_imported':<20} {report['modules_imported']:>9}")
+        self.stdout.write(self.style.MIGRATE_HEADING('Slowest imports (cumulative ms / self ms)'))
+        for item in report['top_imports']:
+            self.stdout.write(f"  {item['cumulative_ms']:>9.1f} {item['self_ms']:>8.1f}  {item['module']}")
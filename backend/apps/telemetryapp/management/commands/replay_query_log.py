@@ -0,0 +1,217 @@
+"""
+Replay a recorded ADX query log against a local synthetic ADX.
+
+Reads files written by the query log recorder (QUERY_LOG_ENABLED=True),
+then re-issues the queries through the same entry points (adx_service or
+adx_optimized query_adx) on their original schedule, sped up 1x-10x, with
+a pool of threads standing in for gunicorn worker threads. Cache TTL, rate
+limit and thread count can be overridden to compare settings before a
+rollout.
+
+Usage:
+    python manage.py replay_query_log logs/query_log/
+    python manage.py replay_query_log logs/query_log/ --speed 5 --cache-ttl 60 --threads 8 --json
+"""
+
+import json
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from telemetryapp import adx_optimized, adx_service, query_log
+from telemetryapp.adx_optimized import CircuitBreaker, AdxRateLimitError, get_cache_counters
+from telemetryapp.fake_kusto import SyntheticKustoClient, FakeResponse
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = "Replay a recorded ADX query workload against a synthetic ADX at 1x-10x speed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Query log files or directories')
+        parser.add_argument('--speed', type=float, default=1.0, help='Replay speed multiplier (1-10)')
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent request threads')
+        parser.add_argument('--adx-latency', type=float, default=None,
+                            help='Synthetic ADX latency in seconds (default: recorded latency per query)')
+        parser.add_argument('--cache-ttl', type=int, help='Override ADX_CACHE_TTL for the replay')
+        parser.add_argument('--max-qpm', type=int, help='Override ADX_MAX_QUERIES_PER_MINUTE for the replay')
+        parser.add_argument('--limit', type=int, help='Replay only the first N queries')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def handle(self, *args, **options):
+        speed = options['speed']
+        if not 1 <= speed <= 10:
+            raise CommandError('--speed must be between 1 and 10')
+
+        workload = query_log.load_workload(options['paths'])
+        if options['limit']:
+            workload = workload[:options['limit']]
+        if not workload:
+            raise CommandError('No replayable queries found')
+
+        client = _ReplayKustoClient(workload, options['adx_latency'])
+        saved = {
+            'client': adx_optimized._client,
+            'ttl': adx_optimized.CACHE_TTL_SECONDS,
+            'qpm': adx_optimized.MAX_QUERIES_PER_MINUTE,
+            'recording': query_log.QUERY_LOG_ENABLED,
+        }
+        adx_optimized.set_adx_client(client)
+        adx_optimized._breaker = CircuitBreaker()
+        if options['cache_ttl'] is not None:
+            adx_optimized.CACHE_TTL_SECONDS = options['cache_ttl']
+        if options['max_qpm'] is not None:
+            adx_optimized.MAX_QUERIES_PER_MINUTE = options['max_qpm']
+        # Never record the replay itself
+        query_log.QUERY_LOG_ENABLED = False
+        cache.clear()
+
+        try:
+            report = self._replay(workload, speed, options['threads'], client)
+        finally:
+            adx_optimized.set_adx_client(saved['client'])
+            adx_optimized.CACHE_TTL_SECONDS = saved['ttl']
+            adx_optimized.MAX_QUERIES_PER_MINUTE = saved['qpm']
+            adx_optimized._breaker = CircuitBreaker()
+            query_log.QUERY_LOG_ENABLED = saved['recording']
+
+        report['settings'] = {
+            'speed': speed,
+            'threads': options['threads'],
+            'cache_ttl_seconds': options['cache_ttl'] if options['cache_ttl'] is not None else saved['ttl'],
+            'max_queries_per_minute': options['max_qpm'] if options['max_qpm'] is not None else saved['qpm'],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Replayed {report['queries']} queries ({report['recorded_span_seconds']}s recorded) "
+            f"in {report['wall_seconds']}s at {speed}x"
+        ))
+        for key in ('adx_calls', 'recorded_adx_calls', 'peak_adx_calls_per_minute',
+                    'cache_hit_ratio', 'recorded_cache_hit_ratio', 'rate_limited', 'errors',
+                    'p50_ms', 'p95_ms', 'p99_ms', 'max_lag_ms'):
+            self.stdout.write(f"  {key:<28} {report[key]}")
+        self.stdout.write('  by source:')
+        for source, count in report['by_source'].items():
+            self.stdout.write(f"    {source:<40} {count}")
+
+    def _replay(self, workload: List[Dict[str, Any]], speed: float, threads: int, client) -> Dict[str, Any]:
+        latencies: List[float] = []
+        lags: List[float] = []
+        outcomes = Counter()
+        lock = threading.Lock()
+        counters_before = get_cache_counters()
+
+        def run(entry: Dict[str, Any], scheduled: float):
+            started = time.monotonic()
+            try:
+                if entry.get('e') == 'opt':
+                    adx_optimized.query_adx(entry['query'])
+                else:
+                    adx_service.query_adx(entry['query'])
+                outcome = 'ok'
+            except Exception as e:
+                outcome = 'rate_limited' if isinstance(e, AdxRateLimitError) else 'error'
+            finished = time.monotonic()
+            with lock:
+                latencies.append(finished - started)
+                lags.append(started - scheduled)
+                outcomes[outcome] += 1
+
+        first_ts = workload[0]['ts']
+        replay_start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='replay') as pool:
+            for entry in workload:
+                scheduled = replay_start + (entry['ts'] - first_ts) / speed
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(run, entry, scheduled)
+        wall = time.monotonic() - replay_start
+
+        counters_after = get_cache_counters()
+        hits = counters_after['hits'] - counters_before['hits']
+        misses = counters_after['misses'] - counters_before['misses']
+        recorded = Counter(entry.get('c') for entry in workload)
+        recorded_lookups = recorded['hit'] + recorded['miss']
+        latencies.sort()
+
+        return {
+            'queries': len(workload),
+            'recorded_span_seconds': round(workload[-1]['ts'] - first_ts, 1),
+            'wall_seconds': round(wall, 1),
+            'adx_calls': client.calls,
+            'recorded_adx_calls': sum(recorded[c] for c in ('miss', 'bypass', 'error')),
+            'peak_adx_calls_per_minute': client.peak_calls_per_minute(speed),
+            'cache_hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'recorded_cache_hit_ratio': round(recorded['hit'] / recorded_lookups, 4) if recorded_lookups else None,
+            'rate_limited': outcomes['rate_limited'],
+            'errors': outcomes['error'],
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+            'max_lag_ms': round(max(lags) * 1000, 1) if lags else 0.0,
+            'by_source': dict(Counter(entry.get('src', '?') for entry in workload).most_common()),
+            'by_user_class': dict(Counter(entry.get('u', '?') for entry in workload)),
+        }
+
+
+class _ReplayKustoClient(SyntheticKustoClient):
+    """
+    Synthetic client that answers with the recorded row count and latency
+    of each query (unless a fixed latency is given), and tracks call times
+    for the peak ADX calls/minute figure.
+    """
+
+    def __init__(self, workload: List[Dict[str, Any]], latency: float = None):
+        super().__init__(latency=latency or 0.0)
+        self.fixed_latency = latency
+        self.recorded = {}
+        for entry in workload:
+            if entry.get('c') in ('miss', 'bypass'):
+                self.recorded[entry['query']] = (entry.get('ms', 0) / 1000, entry.get('n', 0))
+        self.call_times: List[float] = []
+
+    def rows_for(self, query: str):
+        rows = super().rows_for(query)
+        recorded = self.recorded.get(query)
+        if recorded is not None and rows:
+            count = recorded[1]
+            rows = (rows * (count // len(rows) + 1))[:count]
+        return rows
+
+    def execute(self, database, query, properties=None):
+        with self._lock:
+            self.calls += 1
+            self.call_times.append(time.monotonic())
+        latency = self.fixed_latency
+        if latency is None:
+            latency = self.recorded.get(query, (0.05, 0))[0]
+        if latency:
+            time.sleep(latency)
+        return FakeResponse(self.rows_for(query))
+
+    def peak_calls_per_minute(self, speed: float) -> int:
+        """Peak calls in any 60 s of recorded time (60 / speed s of wall time)."""
+        window = 60 / speed
+        times = sorted(self.call_times)
+        peak = start = 0
+        for end, t in enumerate(times):
+            while t - times[start] > window:
+                start += 1
+            peak = max(peak, end - start + 1)
+        return peak
@@ -0,0 +1,131 @@
+"""
+Simulate an ADX brownout against a fault-injecting fake client.
+
+Runs the same workload (healthy -> brownout -> recovery) with the circuit
+breaker enabled and disabled, and reports throughput, latency and how many
+responses were fresh, stale or empty in each phase.
+
+Usage:
+    python manage.py simulate_adx_brownout
+    python manage.py simulate_adx_brownout --threads 16 --phase-seconds 20 --json
+"""
+
+import json
+import time
+import threading
+from statistics import median
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from telemetryapp import adx_optimized
+from telemetryapp.adx_optimized import CircuitBreaker, AdxUnavailableError
+from telemetryapp.adx_service import query_adx
+from telemetryapp.fake_kusto import FaultInjectingKustoClient
+
+
+class Command(BaseCommand):
+    help = "Simulate an ADX brownout and compare throughput with and without the circuit breaker"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent request threads')
+        parser.add_argument('--phase-seconds', type=float, default=10, help='Duration of each phase')
+        parser.add_argument('--queries', type=int, default=20, help='Distinct queries in the workload')
+        parser.add_argument('--base-latency', type=float, default=0.05, help='Healthy ADX latency (s)')
+        parser.add_argument('--brownout-latency', type=float, default=3.0, help='ADX latency during brownout (s)')
+        parser.add_argument('--brownout-failure-rate', type=float, default=0.6, help='Failure rate during brownout')
+        parser.add_argument('--recovery-seconds', type=int, default=5, help='Breaker open -> half-open delay')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON')
+
+    def handle(self, *args, **options):
+        phases = [
+            ('healthy', options['base_latency'], 0.0),
+            ('brownout', options['brownout_latency'], options['brownout_failure_rate']),
+            ('recovery', options['base_latency'], 0.0),
+        ]
+        original_client = adx_optimized._client
+        original_enabled = adx_optimized.BREAKER_ENABLED
+        original_recovery = adx_optimized.BREAKER_RECOVERY_SECONDS
+        adx_optimized.BREAKER_RECOVERY_SECONDS = options['recovery_seconds']
+
+        report = {}
+        try:
+            for enabled in (True, False):
+                adx_optimized.BREAKER_ENABLED = enabled
+                adx_optimized._breaker = CircuitBreaker()
+                cache.clear()
+                client = FaultInjectingKustoClient(latency=options['base_latency'])
+                adx_optimized.set_adx_client(client)
+
+                label = 'breaker_on' if enabled else 'breaker_off'
+                report[label] = {}
+                for name, latency, failure_rate in phases:
+                    client.set_conditions(latency, failure_rate)
+                    report[label][name] = self._run_phase(
+                        options['threads'], options['phase_seconds'], options['queries']
+                    )
+                    report[label][name]['adx_calls'] = client.calls
+        finally:
+            adx_optimized.set_adx_client(original_client)
+            adx_optimized.BREAKER_ENABLED = original_enabled
+            adx_optimized.BREAKER_RECOVERY_SECONDS = original_recovery
+            adx_optimized._breaker = CircuitBreaker()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for label, results in report.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            for phase, stats in results.items():
+                self.stdout.write(
+                    f"  {phase:<9} {stats['throughput_rps']:>8.1f} req/s  "
+                    f"p50 {stats['p50_ms']:>7.1f} ms  p95 {stats['p95_ms']:>7.1f} ms  "
+                    f"fresh {stats['fresh']:>5}  stale {stats['stale']:>5}  "
+                    f"empty {stats['empty']:>5}  unavailable {stats['unavailable']:>5}"
+                )
+
+    def _run_phase(self, threads, seconds, distinct_queries):
+        latencies = []
+        counts = {'fresh': 0, 'stale': 0, 'empty': 0, 'unavailable': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def worker(offset):
+            i = offset
+            while time.monotonic() < deadline:
+                kql_query = f"Telemetry | where comms_serial contains 'SIM{i % distinct_queries}' | take 1"
+                started = time.monotonic()
+                try:
+                    data = query_adx(kql_query)
+                    if isinstance(data, dict) and data.get('stale'):
+                        outcome = 'stale'
+                    elif isinstance(data, dict):
+                        outcome = 'fresh'
+                    else:
+                        outcome = 'empty'
+                except AdxUnavailableError:
+                    outcome = 'unavailable'
+                elapsed = time.monotonic() - started
+                with lock:
+                    latencies.append(elapsed)
+                    counts[outcome] += 1
+                i += threads
+
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        started = time.monotonic()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+        return {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(median(latencies) * 1000, 1) if latencies else 0.0,
+            'p95_ms': round(p95 * 1000, 1),
+            **counts,
+        }
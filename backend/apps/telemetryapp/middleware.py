@@ -0,0 +1,213 @@
+"""
+Telemetry App Middleware
+
+FirstRequestTimingMiddleware records the duration of each worker's first
+request (see warmup.py) to measure cold-start cost after worker recycling.
+
+TracingMiddleware times each request as a trace of spans (see tracing.py),
+adds Server-Timing and X-Request-ID headers and exports sampled traces.
+
+ProfilingMiddleware runs a single request under a profiler when an admin
+asks for it with the X-Profile header or `_profile` parameter (see
+profiling.py).
+
+QueryLogContextMiddleware exposes the current request to the ADX query log
+recorder (query_log.py) so recorded queries carry their route and user class.
+
+ApiCompressionMiddleware compresses large API responses (history queries,
+batch telemetry, event lists) with brotli when the client accepts it and
+the `brotli` package is installed, otherwise with gzip.
+
+Only paths under API_COMPRESSION_PATH_PREFIX are touched: static files are
+already compressed by WhiteNoise, and small bodies are not worth the CPU.
+"""
+
+import os
+import gzip
+import time
+import logging
+
+from django.utils.cache import patch_vary_headers
+
+from . import profiling, query_log, tracing, warmup
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+API_COMPRESSION_ENABLED = os.getenv('API_COMPRESSION_ENABLED', 'True').lower() in ('true', '1', 'yes')
+
+# Responses smaller than this are sent uncompressed
+API_COMPRESSION_MIN_BYTES = int(os.getenv('API_COMPRESSION_MIN_BYTES', 1024))
+
+API_COMPRESSION_PATH_PREFIX = os.getenv('API_COMPRESSION_PATH_PREFIX', '/api/')
+
+# Moderate levels: responses are compressed on every request, so favour speed
+API_GZIP_LEVEL = int(os.getenv('API_GZIP_LEVEL', 6))
+API_BROTLI_QUALITY = int(os.getenv('API_BROTLI_QUALITY', 5))
+
+
+def _accepted_encodings(header: str) -> set:
+    """Encodings listed in Accept-Encoding, ignoring those with q=0."""
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+class FirstRequestTimingMiddleware:
+    """Time the first request of each worker process."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.done = False
+
+    def __call__(self, request):
+        if self.done:
+            return self.get_response(request)
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.done = True
+            warmup.record_first_request(time.perf_counter() - started)
+
+
+class TracingMiddleware:
+    """Trace each request, add Server-Timing / X-Request-ID and export sampled traces."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not tracing.TRACING_ENABLED:
+            return self.get_response(request)
+
+        trace = tracing.start_trace(request.headers.get('X-Request-ID'), request.headers.get('traceparent'))
+        request.request_id = trace.request_id
+        root_id = tracing.new_span_id()
+        tokens = tracing.activate(trace, root_id)
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            tracing.deactivate(tokens)
+            total_ms = (time.perf_counter() - trace.started) * 1000
+            status_code = response.status_code if response is not None else 500
+
+            if response is not None:
+                response['X-Request-ID'] = trace.request_id
+                if tracing.SERVER_TIMING_ENABLED:
+                    response['Server-Timing'] = tracing.server_timing_header(trace, total_ms)
+
+            if trace.sampled:
+                match = getattr(request, 'resolver_match', None)
+                route = f"/{match.route}" if match is not None and match.route else request.path
+                tracing.export_trace(trace, {
+                    'name': f"{request.method} {route}",
+                    'span_id': root_id,
+                    'parent_id': trace.parent_span_id,
+                    'start_ms': 0.0,
+                    'duration_ms': round(total_ms, 3),
+                    'status': 'error' if status_code >= 500 else 'ok',
+                    'attributes': {
+                        'http.method': request.method,
+                        'http.route': route,
+                        'http.status_code': status_code,
+                        'request_id': trace.request_id,
+                    },
+                })
+
+
+class ProfilingMiddleware:
+    """Profile admin-flagged requests; all other requests pass straight through."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.PROFILING_ENABLED:
+            return self.get_response(request)
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        user = profiling.admin_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        response, name = profiling.profile_call(mode, self.get_response, request, user)
+        if name:
+            response['X-Profile-Id'] = name
+        return response
+
+
+class QueryLogContextMiddleware:
+    """Make the request visible to the query log recorder while it is handled."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not query_log.QUERY_LOG_ENABLED:
+            return self.get_response(request)
+        token = query_log.current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            query_log.current_request.reset(token)
+
+
+class ApiCompressionMiddleware:
+    """Compress API responses above a size threshold (brotli or gzip)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not API_COMPRESSION_ENABLED or not request.path.startswith(API_COMPRESSION_PATH_PREFIX):
+            return response
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or response.status_code == 304
+            or len(response.content) < API_COMPRESSION_MIN_BYTES
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+            compressed = brotli.compress(response.content, quality=API_BROTLI_QUALITY)
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+            compressed = gzip.compress(response.content, compresslevel=API_GZIP_LEVEL, mtime=0)
+        else:
+            return response
+
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+
+        # Keep the ETag strong but distinct per representation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'{etag[:-1]}-{encoding}"'
+        return response
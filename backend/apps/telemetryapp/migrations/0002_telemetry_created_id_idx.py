@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetryapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='telemetry',
+            index=models.Index(fields=['-created_at', '-id'], name='telemetry_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Range-partition Telemetry by created_at on PostgreSQL (no-op on SQLite)
+#
+# The existing table is renamed, a partitioned table with the same columns
+# takes its name, partitions covering the existing data (plus a DEFAULT
+# partition) are created, rows are copied over and the old table dropped.
+# The primary key becomes (id, created_at), since PostgreSQL requires the
+# partition key in every unique constraint; id stays unique via its sequence.
+
+from django.db import migrations
+
+TABLE = 'telemetryapp_telemetry'
+LEGACY = f'{TABLE}_legacy'
+INDEX = 'telemetry_created_id_idx'
+
+
+def partition_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    from telemetryapp import partitions
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY}")
+        cursor.execute(f"ALTER INDEX {INDEX} RENAME TO {INDEX}_legacy")
+        cursor.execute(f"ALTER TABLE {LEGACY} RENAME CONSTRAINT {TABLE}_pkey TO {LEGACY}_pkey")
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [LEGACY])
+        legacy_sequence = cursor.fetchone()[0]
+
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {LEGACY} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_part_seq OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_part_seq')")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)")
+        cursor.execute(f"CREATE INDEX {INDEX} ON {TABLE} (created_at DESC, id DESC)")
+        cursor.execute(f"CREATE TABLE {partitions.DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute(f"SELECT MIN(created_at) FROM {LEGACY}")
+        oldest = cursor.fetchone()[0]
+
+    partitions.create_partitions(since=oldest, connection=connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {LEGACY}")
+        cursor.execute(
+            f"SELECT setval('{TABLE}_id_part_seq', GREATEST((SELECT MAX(id) FROM {LEGACY}), "
+            f"(SELECT last_value FROM {legacy_sequence}), 1))"
+        )
+        cursor.execute(f"DROP TABLE {LEGACY}")
+
+
+def unpartition_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY}")
+        cursor.execute(f"ALTER INDEX {INDEX} RENAME TO {INDEX}_legacy")
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {LEGACY})")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id)")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+        cursor.execute(f"CREATE INDEX {INDEX} ON {TABLE} (created_at DESC, id DESC)")
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {LEGACY}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+            f"GREATEST((SELECT MAX(id) FROM {TABLE}), 1))"
+        )
+        cursor.execute(f"DROP TABLE {LEGACY} CASCADE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetryapp', '0002_telemetry_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
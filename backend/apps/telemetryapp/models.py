@@ -17,5 +17,11 @@ class Telemetry(models.Model):
     # Timestamp
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination walks (created_at, id) newest first
+            models.Index(fields=['-created_at', '-id'], name='telemetry_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"Telemetry @ {self.created_at}"
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Keyset Pagination for Telemetry Listing
+
+OFFSET pagination gets slower the deeper a client pages (the database
+still walks every skipped row), and DRF's CursorPagination only keys on
+one field plus an offset for ties. The Telemetry listing pages on the
+(created_at, id) pair instead.
+
+Design:
+1. Ordering is fixed to newest first: ORDER BY created_at DESC, id DESC,
+   served by the telemetry_created_id_idx composite index
+2. The cursor is the (created_at, id) of the last row of the page, encoded
+   opaquely; the next page is WHERE (created_at, id) < cursor, so every
+   page costs the same index range scan however deep it is
+3. One extra row is fetched to know whether a next page exists; there is
+   no COUNT(*) over the table
+4. Time-range filters (start/end on created_at) narrow the same index scan
+"""
+
+import base64
+import binascii
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+def parse_timestamp(value: str, param: str) -> datetime:
+    """Parse an ISO timestamp query parameter into an aware datetime."""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValidationError({param: 'Invalid ISO 8601 timestamp'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def filter_time_range(queryset, params):
+    """Apply ?start= (inclusive) and ?end= (exclusive) on created_at."""
+    start = params.get('start')
+    end = params.get('end')
+    if start:
+        queryset = queryset.filter(created_at__gte=parse_timestamp(start, 'start'))
+    if end:
+        queryset = queryset.filter(created_at__lt=parse_timestamp(end, 'end'))
+    return queryset
+
+
+class TelemetryKeysetPagination(BasePagination):
+    """Newest-first keyset pagination on (created_at, id)."""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    ordering = ('-created_at', '-id')
+
+    def __init__(self):
+        self.next_cursor: Optional[str] = None
+        self.base_url: Optional[str] = None
+
+    # -------------------------------------------------------------------------
+    # Cursor encoding
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def encode_cursor(created_at: datetime, pk: int) -> str:
+        raw = f"{created_at.isoformat()}|{pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, binascii.Error, UnicodeDecodeError):
+            raise ValidationError({'cursor': 'Invalid cursor'})
+
+    # -------------------------------------------------------------------------
+    # BasePagination
+    # -------------------------------------------------------------------------
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: 'Must be an integer'})
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            # The created_at__lte bound lets the planner range-scan the index;
+            # the OR alone is not always recognised as sargable
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at),
+                Q(created_at__lt=created_at) | Q(id__lt=pk),
+            )
+
+        rows = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self.encode_cursor(rows[-1].created_at, rows[-1].pk) if has_next else None
+        return rows
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self) -> str:
+        return remove_query_param(self.base_url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
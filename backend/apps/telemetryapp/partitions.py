@@ -0,0 +1,242 @@
+"""
+Time-partitioned Telemetry Storage
+
+On PostgreSQL the Telemetry table is range-partitioned by created_at
+(migration 0003), monthly by default or daily for high-volume setups.
+Each partition is a small table with its own small indexes, so inserts
+and recent-data queries do not degrade as history accumulates, and
+retention is a metadata operation (DETACH + DROP a partition) instead of
+a DELETE over millions of rows.
+
+Design:
+1. Partitions are named <table>_pYYYYMM (monthly) or <table>_pYYYYMMDD
+   (daily) and cover [period start, next period start) in UTC
+2. A DEFAULT partition catches rows outside every partition so inserts
+   never fail; create_partitions() moves such rows into the proper
+   partition when it is created
+3. `manage.py manage_partitions` (run daily from cron) creates partitions
+   TELEMETRY_PARTITIONS_AHEAD periods ahead and drops those entirely older
+   than TELEMETRY_RETENTION_DAYS
+4. SQLite (development) keeps a plain table; retention there falls back to
+   batched DELETEs over the (created_at, id) index
+"""
+
+import os
+import re
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import List, Dict, Any, Optional
+
+from django.db import connection as default_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+TABLE = 'telemetryapp_telemetry'
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+# 'month' or 'day'
+TELEMETRY_PARTITION_INTERVAL = os.getenv('TELEMETRY_PARTITION_INTERVAL', 'month').lower()
+
+# Periods to create ahead of the current one
+TELEMETRY_PARTITIONS_AHEAD = int(os.getenv('TELEMETRY_PARTITIONS_AHEAD', 3))
+
+# Drop data older than this many days (0 keeps everything)
+TELEMETRY_RETENTION_DAYS = int(os.getenv('TELEMETRY_RETENTION_DAYS', 0))
+
+# Batch size of the SQLite / unpartitioned retention fallback
+RETENTION_DELETE_BATCH = int(os.getenv('TELEMETRY_RETENTION_DELETE_BATCH', 5000))
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+# =============================================================================
+# Periods
+# =============================================================================
+
+def _check_interval(interval: str) -> str:
+    if interval not in ('month', 'day'):
+        raise ValueError(f"Unsupported partition interval: {interval} (use 'month' or 'day')")
+    return interval
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    """Start (UTC midnight) of the period containing `moment`."""
+    moment = moment.astimezone(dt_timezone.utc)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if _check_interval(interval) == 'month':
+        start = start.replace(day=1)
+    return start
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    if _check_interval(interval) == 'day':
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(start: datetime, interval: str) -> str:
+    suffix = start.strftime('%Y%m') if _check_interval(interval) == 'month' else start.strftime('%Y%m%d')
+    return f"{TABLE}_p{suffix}"
+
+
+# =============================================================================
+# Introspection
+# =============================================================================
+
+def is_partitioned(connection=None) -> bool:
+    """True when Telemetry is a partitioned PostgreSQL table."""
+    connection = connection or default_connection
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions(connection=None) -> List[Dict[str, Any]]:
+    """Attached partitions with their bounds, oldest first (default last)."""
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = %s
+            """,
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or '')
+        if match:
+            start, end = (datetime.fromisoformat(v).astimezone(dt_timezone.utc) for v in match.groups())
+            partitions.append({'name': name, 'start': start, 'end': end, 'default': False})
+        elif 'DEFAULT' in (bound or ''):
+            partitions.append({'name': name, 'start': None, 'end': None, 'default': True})
+    partitions.sort(key=lambda p: (p['default'], p['start'] or datetime.max.replace(tzinfo=dt_timezone.utc)))
+    return partitions
+
+
+# =============================================================================
+# Maintenance
+# =============================================================================
+
+def create_partition(start: datetime, interval: str, connection=None) -> Optional[str]:
+    """
+    Create the partition for the period starting at `start`.
+
+    Rows already sitting in the DEFAULT partition for that period are moved
+    into the new partition first (PostgreSQL refuses to attach a range the
+    default partition has rows for). Returns the name, or None if it exists.
+    """
+    connection = connection or default_connection
+    end = next_period(start, interval)
+    name = partition_name(start, interval)
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_class WHERE relname = %s", [name])
+        if cursor.fetchone():
+            return None
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {qn(DEFAULT_PARTITION)} WHERE created_at >= %s AND created_at < %s)",
+            [start, end],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+        else:
+            cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS)")
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} "
+                f"WHERE created_at >= %s AND created_at < %s RETURNING *) "
+                f"INSERT INTO {qn(name)} SELECT * FROM moved",
+                [start, end],
+            )
+            logger.warning(f"Moved {cursor.rowcount} Telemetry rows from the default partition into {name}")
+            cursor.execute(
+                f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+    logger.info(f"Created Telemetry partition {name} [{start.isoformat()}, {end.isoformat()})")
+    return name
+
+
+def create_partitions(ahead: int = TELEMETRY_PARTITIONS_AHEAD, interval: str = TELEMETRY_PARTITION_INTERVAL,
+                      since: Optional[datetime] = None, now: Optional[datetime] = None,
+                      connection=None) -> List[str]:
+    """Create missing partitions from `since` (default: now) through `ahead` periods ahead."""
+    now = now or datetime.now(dt_timezone.utc)
+    start = period_start(since or now, interval)
+    last = period_start(now, interval)
+    for _ in range(ahead):
+        last = next_period(last, interval)
+
+    created = []
+    while start <= last:
+        name = create_partition(start, interval, connection=connection)
+        if name:
+            created.append(name)
+        start = next_period(start, interval)
+    return created
+
+
+def drop_expired_partitions(retention_days: int = TELEMETRY_RETENTION_DAYS, now: Optional[datetime] = None,
+                            dry_run: bool = False, connection=None) -> List[str]:
+    """
+    Detach and drop partitions whose whole range is older than the retention.
+
+    Each drop is a catalog operation, independent of how many rows the
+    partition holds. Expired rows that landed in the DEFAULT partition are
+    deleted (that partition is expected to stay near-empty).
+    """
+    if retention_days <= 0:
+        return []
+    connection = connection or default_connection
+    cutoff = (now or datetime.now(dt_timezone.utc)) - timedelta(days=retention_days)
+    qn = connection.ops.quote_name
+
+    expired = [p['name'] for p in list_partitions(connection) if not p['default'] and p['end'] <= cutoff]
+    if dry_run:
+        return expired
+
+    for name in expired:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}")
+            cursor.execute(f"DROP TABLE {qn(name)}")
+        logger.info(f"Dropped expired Telemetry partition {name} (cutoff {cutoff.isoformat()})")
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {qn(DEFAULT_PARTITION)} WHERE created_at < %s", [cutoff])
+    return expired
+
+
+def delete_expired_rows(retention_days: int = TELEMETRY_RETENTION_DAYS, now: Optional[datetime] = None,
+                        batch_size: int = RETENTION_DELETE_BATCH, dry_run: bool = False) -> int:
+    """Retention for an unpartitioned table (SQLite): batched DELETE by created_at."""
+    if retention_days <= 0:
+        return 0
+    from .models import Telemetry
+
+    cutoff = (now or datetime.now(dt_timezone.utc)) - timedelta(days=retention_days)
+    expired = Telemetry.objects.filter(created_at__lt=cutoff)
+    if dry_run:
+        return expired.count()
+
+    deleted = 0
+    while True:
+        ids = list(expired.order_by('created_at', 'id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Telemetry.objects.filter(id__in=ids).delete()[0]
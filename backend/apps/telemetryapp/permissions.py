@@ -1,5 +1,27 @@
 from rest_framework.permissions import BasePermission
 
+ADMIN_GROUP = 'AdminGroup'
+
+
+def get_group_names(user) -> frozenset:
+    """
+    Group names of a user without a per-request query.
+
+    ClaimsUser and cached users (see authentication.py) carry `group_names`;
+    other user objects (e.g. from session auth) are looked up once and the
+    result is kept on the object for the rest of the request.
+    """
+    names = getattr(user, 'group_names', None)
+    if names is None:
+        names = frozenset(user.groups.values_list('name', flat=True))
+        user.group_names = names
+    return names
+
+
 class IsAdminGroup(BasePermission):
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.groups.filter(name='AdminGroup').exists()
\ No newline at end of file
+        return bool(
+            request.user
+            and request.user.is_authenticated
+            and ADMIN_GROUP in get_group_names(request.user)
+        )
@@ -0,0 +1,366 @@
+"""
+Connection Pools
+
+Process-wide HTTP (Kusto) and Redis connection pools sized to a worker's
+concurrency, with wait-time and utilization metrics.
+
+Design:
+1. A gthread worker runs `threads` request threads plus a few background
+   threads (job pools, health probe). The Kusto client's per-host HTTP
+   pool and the shared Redis pool default to that many connections
+   (POOL_HEADROOM extra), so request threads do not queue for a
+   connection, and no request pays a TLS handshake for an overflow
+   connection that is thrown away afterwards
+2. configure_kusto_client() remounts the client's requests session with an
+   adapter whose urllib3 pools are instrumented. Pool size, the number of
+   hosts kept, blocking on a full pool (a hard per-host connection limit)
+   and TCP keep-alive are env tunable
+3. One redis BlockingConnectionPool per process and URL is shared by the
+   Django cache (as its pool_class), the ADX rate limiter and the health
+   probe; on an exhausted pool callers wait up to REDIS_POOL_TIMEOUT
+4. Every checkout records how long it waited; get_pool_stats() reports
+   waits (avg/p95/max), connections in use, peak use, new connections,
+   overflow and exhaustion per pool, through get_query_stats()
+"""
+
+import os
+import sys
+import time
+import socket
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Tuple
+
+import requests
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Request threads per worker (gunicorn `threads`; set per worker by set_worker_threads)
+WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', 2))
+
+# Connections on top of the request threads (job pools, health probe, warm-up)
+POOL_HEADROOM = int(os.getenv('POOL_HEADROOM', 4))
+
+# Kusto HTTP pool (0 = size from the worker's threads)
+ADX_HTTP_POOL_MAXSIZE = int(os.getenv('ADX_HTTP_POOL_MAXSIZE', 0))
+ADX_HTTP_POOL_CONNECTIONS = int(os.getenv('ADX_HTTP_POOL_CONNECTIONS', 4))  # hosts kept (cluster, ingest)
+ADX_HTTP_POOL_BLOCK = os.getenv('ADX_HTTP_POOL_BLOCK', 'False').lower() in ('true', '1', 'yes')
+ADX_HTTP_POOL_TIMEOUT = float(os.getenv('ADX_HTTP_POOL_TIMEOUT', 10))  # wait for a connection when blocking
+ADX_HTTP_KEEPALIVE_IDLE = int(os.getenv('ADX_HTTP_KEEPALIVE_IDLE', 30))
+ADX_HTTP_KEEPALIVE_INTERVAL = int(os.getenv('ADX_HTTP_KEEPALIVE_INTERVAL', 180))  # under Azure LB's 4 min idle
+ADX_HTTP_KEEPALIVE_COUNT = int(os.getenv('ADX_HTTP_KEEPALIVE_COUNT', 20))
+
+# Shared Redis pool (0 = size from the worker's threads)
+REDIS_POOL_MAX_CONNECTIONS = int(os.getenv('REDIS_POOL_MAX_CONNECTIONS', 0))
+REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 5))
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))  # ping idle connections before reuse
+
+# Recent checkout waits kept for percentiles
+POOL_WAIT_WINDOW = 1000
+
+
+def set_worker_threads(threads: Optional[int]) -> None:
+    """Size pools created from now on for a worker with this many request threads."""
+    global WORKER_THREADS
+    if threads:
+        WORKER_THREADS = int(threads)
+
+
+def adx_pool_size() -> int:
+    return ADX_HTTP_POOL_MAXSIZE or WORKER_THREADS + POOL_HEADROOM
+
+
+def redis_pool_size() -> int:
+    return REDIS_POOL_MAX_CONNECTIONS or WORKER_THREADS + POOL_HEADROOM
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+class PoolMetrics:
+    """Checkout waits and utilization of one connection pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits: deque = deque(maxlen=POOL_WAIT_WINDOW)
+        self.created = 0
+        self.overflow = 0
+        self.exhausted = 0
+        self.peak_in_use = 0
+        self.usage: Optional[Callable[[], Tuple[int, int, int]]] = None
+
+    def record_checkout(self, waited: float, in_use: int) -> None:
+        with self.lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.waits.append(waited)
+            self.peak_in_use = max(self.peak_in_use, in_use)
+
+    def count(self, field: str) -> None:
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            waits = sorted(self.waits)
+            stats = {
+                'checkouts': self.checkouts,
+                'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else None,
+                'wait_p95_ms': round(waits[min(int(len(waits) * 0.95), len(waits) - 1)] * 1000, 3) if waits else None,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'connections_created': self.created,
+                'overflow': self.overflow,
+                'exhausted': self.exhausted,
+                'peak_in_use': self.peak_in_use,
+            }
+        if self.usage is not None:
+            in_use, idle, size = self.usage()
+            stats.update(in_use=in_use, idle=idle, size=size, utilization=round(in_use / size, 3) if size else None)
+        return stats
+
+
+_metrics: Dict[str, PoolMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_metrics(name: str) -> PoolMetrics:
+    with _metrics_lock:
+        metrics = _metrics.get(name)
+        if metrics is None:
+            metrics = _metrics[name] = PoolMetrics(name)
+        return metrics
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Wait and utilization metrics per pool, plus the configured sizes."""
+    with _metrics_lock:
+        pools = list(_metrics.values())
+    return {
+        'worker_threads': WORKER_THREADS,
+        'adx_pool_size': adx_pool_size(),
+        'redis_pool_size': redis_pool_size(),
+        'pools': {metrics.name: metrics.snapshot() for metrics in pools},
+    }
+
+
+def reset_after_fork() -> None:
+    """Start this worker's metrics from zero (pools reset themselves on fork)."""
+    global _metrics_lock
+    _metrics_lock = threading.Lock()
+    for metrics in _metrics.values():
+        metrics.lock = threading.Lock()
+        usage = metrics.usage
+        metrics.reset()
+        metrics.usage = usage
+
+
+# =============================================================================
+# Kusto HTTP Pool
+# =============================================================================
+
+class _InstrumentedPoolMixin:
+    """urllib3 pool that records checkout waits, new connections and overflow."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = get_metrics(f"adx:{self.host}")
+        self.metrics.usage = self.usage
+
+    def usage(self) -> Tuple[int, int, int]:
+        # The queue holds a slot (idle connection or None) per connection not checked out
+        size = self.pool.maxsize if self.pool is not None else 0
+        free = self.pool.qsize() if self.pool is not None else 0
+        idle = sum(1 for conn in list(self.pool.queue) if conn is not None) if self.pool is not None else 0
+        return size - free, idle, size
+
+    def _get_conn(self, timeout=None):
+        if not self.block and self.pool is not None and self.pool.empty():
+            # urllib3 opens an extra connection and discards it on return
+            self.metrics.count('overflow')
+        started = time.perf_counter()
+        try:
+            conn = super()._get_conn(timeout if timeout is not None else ADX_HTTP_POOL_TIMEOUT)
+        except EmptyPoolError:
+            self.metrics.count('exhausted')
+            raise
+        self.metrics.record_checkout(time.perf_counter() - started, self.usage()[0])
+        return conn
+
+    def _new_conn(self):
+        self.metrics.count('created')
+        return super()._new_conn()
+
+
+class InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+def keepalive_socket_options() -> list:
+    """TCP keep-alive options for Kusto connections (Linux; elsewhere the SDK defaults)."""
+    options = list(HTTPConnection.default_socket_options or [])
+    if sys.platform == 'linux' and hasattr(socket, 'TCP_KEEPIDLE'):
+        options += [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, ADX_HTTP_KEEPALIVE_IDLE),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, ADX_HTTP_KEEPALIVE_INTERVAL),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, ADX_HTTP_KEEPALIVE_COUNT),
+        ]
+    else:
+        from azure.kusto.data import KustoClient
+        options += KustoClient.compose_socket_options()
+    return options
+
+
+class KustoHTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTP adapter with socket options and instrumented urllib3 pools."""
+
+    def __init__(self, *args, socket_options=None, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(*args, **kwargs)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['socket_options'] = self.socket_options
+        return state
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs['socket_options'] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': InstrumentedHTTPConnectionPool,
+            'https': InstrumentedHTTPSConnectionPool,
+        }
+
+
+def configure_kusto_client(client) -> None:
+    """Mount the sized, instrumented adapter on a KustoClient's session."""
+    session = getattr(client, '_session', None)
+    if not isinstance(session, requests.Session):
+        return  # fake clients
+    adapter = KustoHTTPAdapter(
+        pool_connections=ADX_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=adx_pool_size(),
+        pool_block=ADX_HTTP_POOL_BLOCK,
+        socket_options=keepalive_socket_options(),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    logger.info(
+        f"ADX HTTP pool: {adx_pool_size()} connections per host"
+        f"{' (blocking)' if ADX_HTTP_POOL_BLOCK else ''}, {ADX_HTTP_POOL_CONNECTIONS} hosts"
+    )
+
+
+# =============================================================================
+# Shared Redis Pool
+# =============================================================================
+
+_redis_pools: Dict[str, Any] = {}
+_redis_lock = threading.Lock()
+_redis_pool_class = None
+
+
+def _shared_pool_class():
+    """redis BlockingConnectionPool that feeds a PoolMetrics (redis is imported on first use)."""
+    global _redis_pool_class
+    if _redis_pool_class is not None:
+        return _redis_pool_class
+    import redis
+
+    class SharedRedisPool(redis.BlockingConnectionPool):
+        metrics: PoolMetrics = None
+
+        def get_connection(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                conn = super().get_connection(*args, **kwargs)
+            except redis.ConnectionError as e:
+                if 'No connection available' in str(e):
+                    self.metrics.count('exhausted')
+                raise
+            self.metrics.record_checkout(time.perf_counter() - started, self.usage()[0])
+            return conn
+
+        def make_connection(self):
+            self.metrics.count('created')
+            return super().make_connection()
+
+        def usage(self) -> Tuple[int, int, int]:
+            # Like urllib3, the queue holds a slot (idle connection or None) per connection not checked out
+            idle = sum(1 for conn in list(self.pool.queue) if conn is not None)
+            return self.max_connections - self.pool.qsize(), idle, self.max_connections
+
+    _redis_pool_class = SharedRedisPool
+    return _redis_pool_class
+
+
+def get_redis_pool(url: Optional[str] = None, **kwargs):
+    """
+    The process-wide Redis pool for a URL (REDIS_URL by default), or None
+    without a URL. kwargs only apply when this call creates the pool.
+    """
+    url = url or os.getenv('REDIS_URL')
+    if not url:
+        return None
+
+    with _redis_lock:
+        pool = _redis_pools.get(url)
+        if pool is None:
+            options = {
+                'max_connections': redis_pool_size(),
+                'timeout': REDIS_POOL_TIMEOUT,
+                'socket_timeout': REDIS_SOCKET_TIMEOUT,
+                'socket_connect_timeout': REDIS_SOCKET_TIMEOUT,
+                'socket_keepalive': True,
+                'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+            }
+            options.update(kwargs)
+            pool = _shared_pool_class().from_url(url, **options)
+            host = pool.connection_kwargs.get('host') or pool.connection_kwargs.get('path', 'redis')
+            pool.metrics = get_metrics(f"redis:{host}")
+            pool.metrics.usage = pool.usage
+            _redis_pools[url] = pool
+            logger.info(f"Redis pool: {options['max_connections']} connections to {host}")
+        return pool
+
+
+def get_redis(url: Optional[str] = None):
+    """Redis client on the shared pool, or None without REDIS_URL."""
+    import redis
+
+    pool = get_redis_pool(url)
+    return redis.Redis(connection_pool=pool) if pool is not None else None
+
+
+class SharedRedisConnectionPool:
+    """
+    Django RedisCache `pool_class` that hands out the shared pool, so cache
+    traffic counts against (and is measured with) the same connections.
+    """
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        return get_redis_pool(url, **kwargs)
@@ -0,0 +1,257 @@
+"""
+On-demand Request Profiling
+
+Profiles one production request on an admin's demand, so slow paths
+that do not reproduce in development (e.g. batch_telemetry_view under
+real data) can be inspected without a redeploy.
+
+Design:
+1. A request asks for a profile with the `X-Profile` header or the
+   `_profile` query parameter ('sample' or '1' for the sampling profiler,
+   'cprofile' for the deterministic one). The flag is honoured only for
+   users that pass IsAdminGroup, authenticated from the JWT cookie or
+   header; everyone else's requests are untouched
+2. The sampling profiler is a thread that snapshots the request thread's
+   stack every PROFILE_SAMPLE_INTERVAL_MS and writes collapsed stacks
+   ("frame;frame;frame count" per line), the input format of
+   flamegraph.pl, speedscope and inferno. 'cprofile' writes a pstats
+   file (snakeviz, flameprof)
+3. At most one request per process is profiled at a time; further
+   profile requests run unprofiled, so profiling never stacks up
+4. Profiles are kept under PROFILE_DIR, newest PROFILE_MAX_FILES only,
+   with a JSON sidecar (route, user, duration, request id) used by the
+   admin listing endpoint
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import cProfile
+import threading
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True').lower() in ('true', '1', 'yes')
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', settings.BASE_DIR / 'logs' / 'profiles'))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 1.0))
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_PARAM = '_profile'
+
+MODE_SAMPLE = 'sample'
+MODE_CPROFILE = 'cprofile'
+_MODE_ALIASES = {'1': MODE_SAMPLE, 'true': MODE_SAMPLE, MODE_SAMPLE: MODE_SAMPLE, MODE_CPROFILE: MODE_CPROFILE}
+_EXTENSIONS = {MODE_SAMPLE: '.folded', MODE_CPROFILE: '.prof'}
+
+_PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.(folded|prof)$')
+
+# One profiled request per process at a time
+_profile_slot = threading.Lock()
+
+
+# =============================================================================
+# Request Gate
+# =============================================================================
+
+def requested_mode(request) -> Optional[str]:
+    """Profiler mode asked for by the request, or None."""
+    value = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_QUERY_PARAM)
+    if not value:
+        return None
+    return _MODE_ALIASES.get(value.strip().lower())
+
+
+def admin_user(request):
+    """The JWT user of a request if it passes IsAdminGroup, else None."""
+    from .authentication import CookieJWTAuthentication
+    from .permissions import IsAdminGroup
+
+    try:
+        authenticated = CookieJWTAuthentication().authenticate(request)
+    except Exception:
+        return None
+    if authenticated is None:
+        return None
+    user = authenticated[0]
+    return user if IsAdminGroup().has_permission(SimpleNamespace(user=user), None) else None
+
+
+# =============================================================================
+# Profilers
+# =============================================================================
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    for root in (str(settings.BASE_DIR), *sys.path):
+        if root and filename.startswith(root):
+            filename = filename[len(root):].lstrip(os.sep)
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.counts[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """flamegraph.pl / speedscope collapsed-stack text."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+# =============================================================================
+# Storage
+# =============================================================================
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^\w-]+', '_', text).strip('_')[:60] or 'root'
+
+
+def save_profile(mode: str, payload: Any, meta: Dict[str, Any]) -> str:
+    """Write a profile and its sidecar, apply retention; returns the profile name."""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime(meta['started_at']))
+    name = f"{stamp}-{_slug(meta['route'])}-{_slug(meta.get('request_id') or str(os.getpid()))}{_EXTENSIONS[mode]}"
+    path = PROFILE_DIR / name
+    if mode == MODE_CPROFILE:
+        payload.dump_stats(str(path))
+    else:
+        path.write_text(payload, encoding='utf-8')
+    (PROFILE_DIR / f"{name}.json").write_text(json.dumps(dict(meta, name=name, bytes=path.stat().st_size)))
+    apply_retention()
+    return name
+
+
+def apply_retention(max_files: int = PROFILE_MAX_FILES) -> int:
+    """Delete all but the newest max_files profiles. Returns the number removed."""
+    profiles = sorted(
+        (p for p in PROFILE_DIR.glob('*') if _PROFILE_NAME_RE.match(p.name)),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for path in profiles[max_files:]:
+        path.unlink(missing_ok=True)
+        Path(f"{path}.json").unlink(missing_ok=True)
+    return max(len(profiles) - max_files, 0)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Sidecar metadata of stored profiles, newest first."""
+    if not PROFILE_DIR.exists():
+        return []
+    profiles = []
+    for sidecar in PROFILE_DIR.glob('*.json'):
+        try:
+            meta = json.loads(sidecar.read_text())
+        except (OSError, ValueError):
+            continue
+        if (PROFILE_DIR / meta.get('name', '')).exists():
+            profiles.append(meta)
+    return sorted(profiles, key=lambda m: m['started_at'], reverse=True)
+
+
+def profile_path(name: str) -> Optional[Path]:
+    """Path of a stored profile, or None for unknown or malformed names."""
+    if not _PROFILE_NAME_RE.match(name or ''):
+        return None
+    path = PROFILE_DIR / name
+    return path if path.is_file() else None
+
+
+# =============================================================================
+# Running a Profiled Request
+# =============================================================================
+
+def profile_call(mode: str, func, request, user):
+    """
+    Run func(request) under the profiler and store the result.
+
+    Returns (response, profile name). When another request of this process
+    is already being profiled, runs unprofiled and returns (response, None).
+    """
+    if not _profile_slot.acquire(blocking=False):
+        return func(request), None
+
+    try:
+        started_at = time.time()
+        started = time.perf_counter()
+        if mode == MODE_CPROFILE:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = func(request)
+            finally:
+                profiler.disable()
+            payload, samples = profiler, None
+        else:
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+            try:
+                response = func(request)
+            finally:
+                sampler.stop()
+            payload, samples = sampler.collapsed(), sampler.samples
+
+        match = getattr(request, 'resolver_match', None)
+        meta = {
+            'mode': mode,
+            'method': request.method,
+            'route': f"/{match.route}" if match is not None and match.route else request.path,
+            'path': request.path,
+            'status_code': response.status_code,
+            'user': getattr(user, 'username', ''),
+            'request_id': getattr(request, 'request_id', None),
+            'started_at': started_at,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'samples': samples,
+            'pid': os.getpid(),
+        }
+        try:
+            name = save_profile(mode, payload, meta)
+        except OSError as e:
+            logger.warning(f"Could not store profile: {e}")
+            name = None
+        else:
+            logger.info(f"Profiled {meta['method']} {meta['route']} for {meta['user']}: {name}")
+        return response, name
+    finally:
+        _profile_slot.release()
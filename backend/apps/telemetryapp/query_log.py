@@ -0,0 +1,263 @@
+"""
+ADX Query Log Recorder
+
+Opt-in recorder of the real query workload, for capacity planning: every
+ADX query made through query_adx is written as one compact JSON line so
+the workload can later be replayed against a fake ADX (see the
+replay_query_log management command) with different cache TTLs, rate
+limits or worker counts.
+
+Record format (one JSON object per line):
+    {"k": "tpl", "fp": "<fingerprint>", "q": "<query template>"}
+        written the first time a fingerprint appears in a file
+    {"ts": 1700000000.123, "fp": "...", "p": [params], "e": "svc|opt",
+     "u": "admin|user|anon|background", "src": "<route>",
+     "c": "hit|miss|bypass|stale|error", "ms": 12.3, "n": 42}
+
+Literals (strings, datetime(...), numbers) are lifted out of the query
+into "p", so queries that differ only by serial or time range share one
+fingerprint and template. Files are per process (no cross-process
+rotation races) and rotate at QUERY_LOG_MAX_BYTES.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+import contextvars
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+QUERY_LOG_ENABLED = os.getenv('QUERY_LOG_ENABLED', 'False').lower() in ('true', '1', 'yes')
+QUERY_LOG_DIR = Path(os.getenv('QUERY_LOG_DIR', settings.BASE_DIR / 'logs' / 'query_log'))
+QUERY_LOG_MAX_BYTES = int(os.getenv('QUERY_LOG_MAX_BYTES', 20 * 1024 * 1024))
+QUERY_LOG_BACKUP_COUNT = int(os.getenv('QUERY_LOG_BACKUP_COUNT', 5))
+
+# Fraction of queries recorded (1.0 = all)
+QUERY_LOG_SAMPLE_RATE = float(os.getenv('QUERY_LOG_SAMPLE_RATE', 1.0))
+
+# Placeholder for lifted literals in query templates (never valid in KQL)
+PARAM_MARKER = '\x00'
+
+_LITERAL_RE = re.compile(
+    r"'(?:[^']|'')*'"            # 'single quoted'
+    r'|"(?:[^"\\]|\\.)*"'        # "double quoted"
+    r'|datetime\([^)]*\)'        # datetime(2024-01-01 00:00:00)
+    r'|(?<![\w.])\d+(?:\.\d+)?(?![\w.])'  # bare numbers (not PV1, 1h, 1.2.3)
+)
+
+
+# =============================================================================
+# Fingerprinting
+# =============================================================================
+
+def fingerprint_query(kql_query: str) -> Tuple[str, str, List[str]]:
+    """
+    Split a query into (fingerprint, template, params).
+
+    The template has each literal replaced by PARAM_MARKER; whitespace is
+    collapsed so formatting differences do not create new fingerprints.
+    """
+    params = []
+
+    def lift(match):
+        params.append(match.group(0))
+        return PARAM_MARKER
+
+    template = ' '.join(_LITERAL_RE.sub(lift, kql_query).split())
+    fingerprint = hashlib.sha1(template.encode()).hexdigest()[:12]
+    return fingerprint, template, params
+
+
+def render_query(template: str, params: List[str]) -> str:
+    """Rebuild a query from its template and params."""
+    parts = template.split(PARAM_MARKER)
+    if len(parts) != len(params) + 1:
+        raise ValueError('Parameter count does not match template')
+    out = [parts[0]]
+    for param, part in zip(params, parts[1:]):
+        out.append(param)
+        out.append(part)
+    return ''.join(out)
+
+
+# =============================================================================
+# Request Context
+# =============================================================================
+
+# Set by QueryLogContextMiddleware; None in background threads
+current_request: contextvars.ContextVar = contextvars.ContextVar('query_log_request', default=None)
+
+
+def _user_class(request) -> str:
+    if request is None:
+        return 'background'
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return 'anon'
+    from .permissions import get_group_names, ADMIN_GROUP
+    return 'admin' if ADMIN_GROUP in get_group_names(user) else 'user'
+
+
+def _source(request) -> str:
+    if request is None:
+        return 'background'
+    match = getattr(request, 'resolver_match', None)
+    return f"/{match.route}" if match is not None and match.route else request.path
+
+
+# =============================================================================
+# Writer
+# =============================================================================
+
+class _QueryLogHandler(RotatingFileHandler):
+    """Rotating handler that re-emits templates after each rollover."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen = set()
+
+    def doRollover(self):
+        super().doRollover()
+        self.seen = set()
+
+
+_handler: Optional[_QueryLogHandler] = None
+_handler_pid: Optional[int] = None
+_write_lock = threading.Lock()
+
+
+def _get_handler() -> _QueryLogHandler:
+    global _handler, _handler_pid
+    pid = os.getpid()
+    if _handler is None or _handler_pid != pid:
+        # One file per process: gunicorn workers never share a file
+        QUERY_LOG_DIR.mkdir(parents=True, exist_ok=True)
+        _handler = _QueryLogHandler(
+            QUERY_LOG_DIR / f"queries-{pid}.jsonl",
+            maxBytes=QUERY_LOG_MAX_BYTES,
+            backupCount=QUERY_LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+        _handler.setFormatter(logging.Formatter('%(message)s'))
+        _handler_pid = pid
+    return _handler
+
+
+def _write(handler: _QueryLogHandler, lines: List[Dict[str, Any]]) -> None:
+    # One record per call, so a template and its first use never straddle a rollover
+    message = '\n'.join(json.dumps(line, separators=(',', ':')) for line in lines)
+    handler.handle(logging.LogRecord('query_log', logging.INFO, '', 0, message, None, None))
+
+
+def record_query(
+    kql_query: str,
+    entry: str,
+    cache_outcome: str,
+    started: float,
+    row_count: int = 0,
+) -> None:
+    """
+    Record one query if the recorder is enabled. Never raises.
+
+    Args:
+        kql_query: The executed KQL
+        entry: Entry point ('svc' for adx_service.query_adx, 'opt' for adx_optimized.query_adx)
+        cache_outcome: 'hit', 'miss', 'bypass', 'stale' or 'error'
+        started: time.monotonic() when the query started
+        row_count: Rows returned
+    """
+    if not QUERY_LOG_ENABLED:
+        return
+    if QUERY_LOG_SAMPLE_RATE < 1.0 and random.random() >= QUERY_LOG_SAMPLE_RATE:
+        return
+    try:
+        elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        fingerprint, template, params = fingerprint_query(kql_query)
+        request = current_request.get()
+        line = {
+            'ts': round(time.time() - elapsed_ms / 1000, 3),  # arrival time
+            'fp': fingerprint,
+            'p': params,
+            'e': entry,
+            'u': _user_class(request),
+            'src': _source(request),
+            'c': cache_outcome,
+            'ms': elapsed_ms,
+            'n': row_count,
+        }
+        with _write_lock:
+            handler = _get_handler()
+            lines = [line]
+            if fingerprint not in handler.seen:
+                lines.insert(0, {'k': 'tpl', 'fp': fingerprint, 'q': template})
+            _write(handler, lines)
+            handler.seen.add(fingerprint)
+    except Exception as e:
+        logger.warning(f"Query log write failed: {e}")
+
+
+# =============================================================================
+# Reader
+# =============================================================================
+
+def iter_log_files(paths: List[str]) -> List[Path]:
+    """Expand files/directories into log files, oldest rotation first."""
+    files = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            files.extend(p for p in path.iterdir() if p.is_file() and '.jsonl' in p.name)
+        elif path.exists():
+            files.append(path)
+
+    def rotation_order(p: Path):
+        # queries-12.jsonl.3 is older than queries-12.jsonl.1, which is older than queries-12.jsonl
+        suffix = p.name.rsplit('.', 1)[-1]
+        return (p.name.split('.jsonl')[0], -int(suffix) if suffix.isdigit() else 0)
+
+    return sorted(files, key=rotation_order)
+
+
+def load_workload(paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Load recorded queries from log files, sorted by timestamp.
+
+    Each entry gets a 'query' key with the rebuilt KQL. Entries whose
+    template is missing (e.g. lost with a rotated-away file) are skipped.
+    """
+    templates: Dict[str, str] = {}
+    entries = []
+    for path in iter_log_files(paths):
+        with open(path, encoding='utf-8') as f:
+            for raw in f:
+                try:
+                    line = json.loads(raw)
+                except ValueError:
+                    continue
+                if line.get('k') == 'tpl':
+                    templates[line['fp']] = line['q']
+                    continue
+                template = templates.get(line.get('fp'))
+                if template is None:
+                    continue
+                try:
+                    line['query'] = render_query(template, line.get('p', []))
+                except ValueError:
+                    continue
+                entries.append(line)
+    entries.sort(key=lambda e: e['ts'])
+    return entries
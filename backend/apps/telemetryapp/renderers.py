@@ -0,0 +1,45 @@
+"""
+DRF Renderers
+
+TracedJSONRenderer is DRF's JSONRenderer with a tracing span around
+rendering, so serialization time shows up in Server-Timing and exported
+traces (see tracing.py).
+
+FastJSONRenderer encodes with fast_json (orjson when installed) instead of
+the standard library, and passes PreEncodedJSON bodies, such as cached
+ADX results, through without decoding and re-encoding them. Requests for
+indented output still go through DRF's encoder.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+from . import fast_json
+from .tracing import span
+
+
+class TracedJSONRenderer(JSONRenderer):
+    """JSONRenderer timed as the 'render' span."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span('render') as attributes:
+            body = super().render(data, accepted_media_type, renderer_context)
+            if attributes is not None:
+                attributes['bytes'] = len(body)
+            return body
+
+
+class FastJSONRenderer(TracedJSONRenderer):
+    """TracedJSONRenderer encoding with fast_json; PreEncodedJSON is written as is."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        pre_encoded = isinstance(data, fast_json.PreEncodedJSON)
+        if not pre_encoded and self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        with span('render') as attributes:
+            body = bytes(data) if pre_encoded else fast_json.dumps(data)
+            if attributes is not None:
+                attributes.update(bytes=len(body), pre_encoded=pre_encoded)
+            return body
@@ -0,0 +1,326 @@
+"""
+Device Report Service
+
+Builds device reports (the server-side counterpart of DashboardPDFExport.tsx)
+as background jobs.
+
+Instead of one browser request per telemetry value, a report collects its
+data with a handful of batched ADX queries:
+1. DevInfo lookup for the device section
+2. One Telemetry summarize for every metric of every requested section
+   (latest value plus min/avg/max over the time range)
+3. The cached Events summary for the events section
+
+Queries run at export priority: before each ADX call the job waits while
+the query rate is above REPORT_RATE_SHARE of the rate limit, leaving the
+remaining budget to interactive dashboards.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from typing import List, Dict, Any
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .adx_optimized import (
+    query_adx,
+    escape_kql_string,
+    format_kql_datetime,
+    get_query_stats,
+    MAX_QUERIES_PER_MINUTE,
+    CACHE_TTL_HISTORICAL,
+)
+from .adx_events import query_events_summary
+from .jobs import submit_job, report_progress, job_file
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Export jobs only query ADX while the rate is below this share of the limit
+REPORT_RATE_SHARE = float(os.getenv('REPORT_RATE_SHARE', 0.5))
+
+# Maximum time an export query waits for headroom before running anyway
+REPORT_MAX_WAIT_SECONDS = int(os.getenv('REPORT_MAX_WAIT_SECONDS', 30))
+
+REPORT_FORMATS = ('pdf', 'json')
+
+# Inverter mode mapping (must match InverterModeDisplay.tsx)
+INVERTER_MODES = {
+    -1: 'INVALID',
+    0: 'UNDEFINED',
+    1: 'OFFLINE',
+    2: 'DISABLED',
+    3: 'STANDBY',
+    4: 'NORMAL',
+    5: 'LIMP MODE',
+    6: 'FAULT (AUTO)',
+    7: 'FAULT (MANUAL)',
+    8: 'FW UPDATE',
+    9: 'SELF TEST',
+}
+
+# Report sections: (telemetry name, label, unit) - matches DashboardPDFExport.tsx
+TELEMETRY_SECTIONS = {
+    'wifi_inverter': ('WiFi & Inverter', [
+        ('/SCC/WIFI/STAT/SIGNAL_STRENGTH', 'WiFi Signal', 'dBm'),
+        ('INV/DEV/STAT/OPERATING_STATE', 'Inverter Mode', ''),
+    ]),
+    'pv': ('Solar PV', [
+        ('/INV/DCPORT/STAT/PV1/V', 'PV1 Voltage', 'V'),
+        ('/INV/DCPORT/STAT/PV2/V', 'PV2 Voltage', 'V'),
+        ('/INV/DCPORT/STAT/PV3/V', 'PV3 Voltage', 'V'),
+        ('/INV/DCPORT/STAT/PV4/V', 'PV4 Voltage', 'V'),
+        ('/INV/DCPORT/STAT/PV1/I', 'PV1 Current', 'A'),
+        ('/INV/DCPORT/STAT/PV2/I', 'PV2 Current', 'A'),
+        ('/INV/DCPORT/STAT/PV3/I', 'PV3 Current', 'A'),
+        ('/INV/DCPORT/STAT/PV4/I', 'PV4 Current', 'A'),
+    ]),
+    'grid': ('Grid', [
+        ('/INV/ACPORT/STAT/VRMS_L1N', 'Grid V L1', 'V'),
+        ('/INV/ACPORT/STAT/VRMS_L2N', 'Grid V L2', 'V'),
+        ('/INV/ACPORT/STAT/IRMS_L1', 'Grid I L1', 'A'),
+        ('/INV/ACPORT/STAT/IRMS_L2', 'Grid I L2', 'A'),
+        ('/INV/ACPORT/STAT/FREQ_TOTAL', 'Grid Frequency', 'Hz'),
+    ]),
+    'battery': ('Battery', [
+        (f'/BMS/MODULE{m}/STAT/{name}', f'Bat {m} {label}', unit)
+        for m in (1, 2, 3)
+        for name, label, unit in (
+            ('V', 'Voltage', 'V'),
+            ('I', 'Current', 'A'),
+            ('USER_SOC', 'SoC', '%'),
+            ('TEMP', 'Temp', '°C'),
+        )
+    ]),
+    'load': ('Load', [
+        ('/SYS/MEAS/STAT/PANEL/VRMS_L1N', 'Load V L1', 'V'),
+        ('/SYS/MEAS/STAT/PANEL/VRMS_L2N', 'Load V L2', 'V'),
+        ('/SYS/MEAS/STAT/LOAD/IRMS_L1', 'Load I L1', 'A'),
+        ('/SYS/MEAS/STAT/LOAD/IRMS_L2', 'Load I L2', 'A'),
+        ('/SYS/MEAS/STAT/PANEL/FREQ_TOTAL', 'Load Frequency', 'Hz'),
+    ]),
+}
+
+REPORT_SECTIONS = ('device', *TELEMETRY_SECTIONS.keys(), 'events')
+
+
+# =============================================================================
+# Export Priority
+# =============================================================================
+
+def wait_for_export_slot() -> None:
+    """Block until the ADX query rate leaves headroom for interactive traffic."""
+    threshold = MAX_QUERIES_PER_MINUTE * REPORT_RATE_SHARE
+    deadline = time.monotonic() + REPORT_MAX_WAIT_SECONDS
+    while get_query_stats()['queries_last_minute'] >= threshold and time.monotonic() < deadline:
+        time.sleep(1)
+
+
+# =============================================================================
+# Data Collection
+# =============================================================================
+
+def _query_device_info(serial: str) -> Dict[str, Any]:
+    kql_query = f"DevInfo | where comms_serial contains '{escape_kql_string(serial)}' | limit 1"
+    wait_for_export_slot()
+    rows = query_adx(kql_query, cache_ttl=CACHE_TTL_HISTORICAL)
+    return rows[0] if rows else {}
+
+
+def _query_telemetry_stats(serial: str, start: datetime, end: datetime, names: List[str]) -> Dict[str, Dict]:
+    """Latest value and range statistics for every metric in one query."""
+    names_list = ', '.join(f"'{escape_kql_string(n)}'" for n in names)
+    kql_query = f"""
+    let s = '{escape_kql_string(serial)}';
+    Telemetry
+    | where comms_serial has s
+    | where localtime between ({format_kql_datetime(start)} .. {format_kql_datetime(end)})
+    | where name has_any (dynamic([{names_list}]))
+    | summarize arg_max(localtime, value_double), min_value = min(value_double), avg_value = avg(value_double), max_value = max(value_double), samples = count() by name
+    """.strip()
+    wait_for_export_slot()
+    rows = query_adx(kql_query, cache_ttl=CACHE_TTL_HISTORICAL)
+
+    results = {}
+    for row in rows:
+        db_name = row.get('name')
+        if not db_name:
+            continue
+        for requested in names:
+            if requested not in results and (requested in db_name or db_name in requested):
+                results[requested] = row
+                break
+    return results
+
+
+def _format_value(name: str, unit: str, value: Any) -> str:
+    if value is None:
+        return '-'
+    if 'OPERATING_STATE' in name:
+        return INVERTER_MODES.get(int(value), f"Mode {int(value)}")
+    return f"{value:.2f}" if unit in ('A', 'Hz') else f"{value:.1f}"
+
+
+def collect_report_data(job_id: str, serial: str, start: datetime, end: datetime, sections: List[str]) -> Dict[str, Any]:
+    """Collect everything a report needs with batched queries."""
+    report: Dict[str, Any] = {
+        'serial': serial,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'sections': {},
+    }
+
+    if 'device' in sections:
+        report_progress(job_id, 0.1, 'Fetching device info')
+        report['sections']['device'] = _query_device_info(serial)
+
+    telemetry_sections = [s for s in sections if s in TELEMETRY_SECTIONS]
+    if telemetry_sections:
+        report_progress(job_id, 0.3, 'Fetching telemetry')
+        metrics = [m for s in telemetry_sections for m in TELEMETRY_SECTIONS[s][1]]
+        stats = _query_telemetry_stats(serial, start, end, [name for name, _, _ in metrics])
+        for section in telemetry_sections:
+            title, section_metrics = TELEMETRY_SECTIONS[section]
+            rows = []
+            for name, label, unit in section_metrics:
+                row = stats.get(name, {})
+                rows.append({
+                    'name': name,
+                    'label': label,
+                    'unit': unit,
+                    'value': _format_value(name, unit, row.get('value_double')),
+                    'localtime': row.get('localtime'),
+                    'min': _format_value(name, unit, row.get('min_value')),
+                    'avg': _format_value(name, unit, row.get('avg_value')),
+                    'max': _format_value(name, unit, row.get('max_value')),
+                    'samples': row.get('samples', 0),
+                })
+            report['sections'][section] = {'title': title, 'metrics': rows}
+
+    if 'events' in sections:
+        report_progress(job_id, 0.6, 'Summarizing events')
+        wait_for_export_slot()
+        summary = query_events_summary(serial, start, end)
+        report['sections']['events'] = {
+            'total': summary['total'],
+            'by_severity': summary['by_severity'],
+            'top': summary['by_name'][:15],
+        }
+
+    return report
+
+
+# =============================================================================
+# Rendering
+# =============================================================================
+
+def render_report_pdf(report: Dict[str, Any], path) -> None:
+    """
+    Render a report as a multi-page A4 PDF (matplotlib, no display needed).
+
+    Pages are standalone Figure objects, not pyplot figures: pyplot's global
+    figure registry is not thread-safe and report jobs render in a pool.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    header = [
+        f"Device Report - {report['serial']}",
+        f"Range: {report['start']} to {report['end']}",
+        f"Generated: {report['generated_at']}",
+    ]
+
+    # Flatten sections into (title, column labels, rows) tables
+    tables = []
+    device = report['sections'].get('device')
+    if device is not None:
+        tables.append(('Device Info', ['Field', 'Value'], [[k, str(v)] for k, v in device.items()] or [['-', '-']]))
+    for section, content in report['sections'].items():
+        if section in TELEMETRY_SECTIONS:
+            tables.append((
+                content['title'],
+                ['Metric', 'Latest', 'Min', 'Avg', 'Max', 'Unit', 'Samples'],
+                [[m['label'], m['value'], m['min'], m['avg'], m['max'], m['unit'], str(m['samples'])]
+                 for m in content['metrics']],
+            ))
+    events = report['sections'].get('events')
+    if events is not None:
+        severity = ', '.join(f"{k}: {v}" for k, v in events['by_severity'].items())
+        tables.append((
+            f"Events ({events['total']} total - {severity})",
+            ['Event', 'Severity', 'Count'],
+            [[e['name'], e['severity'], str(e['count'])] for e in events['top']] or [['-', '-', '-']],
+        ))
+
+    rows_per_page = 34
+    with PdfPages(path) as pdf:
+        fig, y = None, 0.0
+        for title, columns, rows in tables:
+            needed = (len(rows) + 3) / rows_per_page
+            if fig is None or y - needed < 0.02:
+                if fig is not None:
+                    pdf.savefig(fig)
+                fig = Figure(figsize=(8.27, 11.69))
+                fig.text(0.05, 0.97, '\n'.join(header), va='top', fontsize=9)
+                y = 0.90
+            height = min(needed, y - 0.02)
+            ax = fig.add_axes([0.05, y - height, 0.9, height])
+            ax.axis('off')
+            ax.set_title(title, loc='left', fontsize=11, fontweight='bold')
+            table = ax.table(cellText=rows, colLabels=columns, loc='upper left', cellLoc='left')
+            table.auto_set_font_size(False)
+            table.set_fontsize(8)
+            y -= height + 0.04
+        if fig is None:
+            fig = Figure(figsize=(8.27, 11.69))
+            fig.text(0.05, 0.97, '\n'.join(header + ['', 'No sections selected']), va='top', fontsize=9)
+        pdf.savefig(fig)
+
+
+# =============================================================================
+# Jobs
+# =============================================================================
+
+def _run_report_job(job_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    start = datetime.fromisoformat(params['start'])
+    end = datetime.fromisoformat(params['end'])
+    report = collect_report_data(job_id, params['serial'], start, end, params['sections'])
+
+    report_progress(job_id, 0.8, 'Rendering report')
+    job_file(job_id, 'report.json').write_text(json.dumps(report, cls=DjangoJSONEncoder))
+    files = {'json': 'report.json'}
+    if params['format'] == 'pdf':
+        render_report_pdf(report, job_file(job_id, 'report.pdf'))
+        files['pdf'] = 'report.pdf'
+    return {'files': files}
+
+
+def submit_report_job(
+    serial: str,
+    start: datetime,
+    end: datetime,
+    sections: List[str],
+    report_format: str = 'pdf',
+    user: str = '',
+) -> Dict[str, Any]:
+    """
+    Queue a report job (or reuse one with identical parameters).
+
+    The range is truncated to whole minutes so repeated clicks on
+    "export" within the same minute share one job and one result.
+    """
+    params = {
+        'serial': serial,
+        'start': start.replace(second=0, microsecond=0).isoformat(),
+        'end': end.replace(second=0, microsecond=0).isoformat(),
+        'sections': [s for s in REPORT_SECTIONS if s in sections],
+        'format': report_format,
+    }
+    return submit_job('report', params, _run_report_job, user=user)
@@ -0,0 +1,237 @@
+"""
+Server-side Result Cursors
+
+Lets clients page through large ADX results without re-running the query
+for every page and without the worker ever holding the whole result.
+
+Design:
+1. Opening a cursor runs the query once into a Kusto stored query result
+   (`.set-or-replace stored_query_result ... <| query | serialize
+   __row = row_number()`), which lives in ADX until ADX_CURSOR_TTL
+2. A page is one small query over the stored result
+   (`stored_query_result(name) | where __row between (a .. b)`), cached
+   like any other query, so workers only ever hold one page
+3. Otherwise (the default) the result is fetched once, bounded by the
+   'cursor' limit in result_limits.py, and spooled to disk as JSON pages.
+   Stored results need a control command and database permissions, so they
+   are opt-in (ADX_CURSOR_BACKEND=stored) and only used for queries the
+   server built itself: client KQL never reaches execute_mgmt
+4. Cursor metadata lives on disk under CURSORS_DIR (like jobs.py), so any
+   gunicorn worker on the host can serve any page; cursors belong to the
+   user who opened them
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .adx_optimized import query_adx, execute_query, escape_kql_string, AdxUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Spooled pages hold raw results: kept outside MEDIA_ROOT, which nginx serves without auth
+CURSORS_DIR = Path(getattr(settings, 'CURSORS_DIR', settings.BASE_DIR / 'var' / 'cursors'))
+CURSOR_TTL_SECONDS = int(os.getenv('ADX_CURSOR_TTL', 3600))
+CURSOR_PAGE_SIZE = int(os.getenv('ADX_CURSOR_PAGE_SIZE', 1000))
+CURSOR_MAX_PAGE_SIZE = int(os.getenv('ADX_CURSOR_MAX_PAGE_SIZE', 10000))
+CURSOR_QUERY_TIMEOUT = int(os.getenv('ADX_CURSOR_QUERY_TIMEOUT', 120))
+# 'spool' always uses disk pages; 'stored' tries Kusto stored query results
+# first for trusted (server-built) queries
+CURSOR_BACKEND = os.getenv('ADX_CURSOR_BACKEND', 'spool')
+
+BACKEND_STORED = 'stored'
+BACKEND_SPOOL = 'spool'
+
+_CURSOR_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class CursorError(Exception):
+    """Raised when a cursor cannot be opened."""
+
+
+# =============================================================================
+# Storage
+# =============================================================================
+
+def _cursor_dir(cursor_id: str) -> Path:
+    return CURSORS_DIR / cursor_id
+
+
+def _write_meta(cursor_id: str, meta: Dict[str, Any]) -> None:
+    CURSORS_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    path = _cursor_dir(cursor_id)
+    path.mkdir(mode=0o700, exist_ok=True)
+    tmp = path / f"meta.json.{os.getpid()}.{threading.get_ident()}"
+    tmp.write_text(json.dumps(meta, cls=DjangoJSONEncoder))
+    os.replace(tmp, path / 'meta.json')
+
+
+def _page_filename(page: int) -> str:
+    return f"page_{page:05d}.json"
+
+
+def get_cursor(cursor_id: str) -> Optional[Dict[str, Any]]:
+    """Cursor metadata, or None if unknown or expired."""
+    if not _CURSOR_ID_RE.match(cursor_id or ''):
+        return None
+    try:
+        meta = json.loads((_cursor_dir(cursor_id) / 'meta.json').read_text())
+    except (OSError, ValueError):
+        return None
+    if meta['expires_at'] < time.time():
+        return None
+    return meta
+
+
+def cleanup_expired_cursors() -> int:
+    """Remove expired cursor directories. Returns the number removed."""
+    removed = 0
+    if not CURSORS_DIR.exists():
+        return 0
+    for path in CURSORS_DIR.iterdir():
+        if path.is_dir() and get_cursor(path.name) is None:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def public_cursor(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Cursor metadata safe to return to clients."""
+    return {
+        key: meta.get(key)
+        for key in ('cursor', 'backend', 'total_rows', 'total_pages', 'page_size', 'expires_at', 'truncation')
+        if meta.get(key) is not None
+    }
+
+
+# =============================================================================
+# Backends
+# =============================================================================
+
+def _stored_result_name(cursor_id: str) -> str:
+    return f"cursor_{cursor_id}"
+
+
+def _open_stored(cursor_id: str, kql_query: str) -> int:
+    """Materialize the query as a stored query result; returns its row count."""
+    name = _stored_result_name(cursor_id)
+    hours = max(CURSOR_TTL_SECONDS // 3600, 1)
+    command = (
+        f".set-or-replace stored_query_result {name} with (previewCount = 0, expiresAfter = {hours}h) <|\n"
+        f"{kql_query.strip().rstrip(';')}\n| serialize __row = row_number()"
+    )
+    execute_query(command, timeout_seconds=CURSOR_QUERY_TIMEOUT, mgmt=True)
+    counted = execute_query(f"stored_query_result('{escape_kql_string(name)}') | count")
+    rows = counted.get('data', [])
+    return int(rows[0].get('Count', 0)) if rows else 0
+
+
+def _open_spool(cursor_id: str, kql_query: str, page_size: int) -> Dict[str, Any]:
+    """Fetch the (bounded) result once and write it to disk in pages."""
+    rows = query_adx(
+        kql_query, use_cache=False, timeout_seconds=CURSOR_QUERY_TIMEOUT,
+        endpoint='cursor',
+    )
+    total_pages = max((len(rows) + page_size - 1) // page_size, 1)
+    CURSORS_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    path = _cursor_dir(cursor_id)
+    path.mkdir(mode=0o700, exist_ok=True)
+    for page in range(total_pages):
+        chunk = rows[page * page_size:(page + 1) * page_size]
+        (path / _page_filename(page)).write_text(json.dumps(chunk, cls=DjangoJSONEncoder))
+    return {'total_rows': len(rows), 'truncation': getattr(rows, 'truncation', None)}
+
+
+# =============================================================================
+# Cursors
+# =============================================================================
+
+def open_cursor(
+    kql_query: str,
+    page_size: int = CURSOR_PAGE_SIZE,
+    user: str = '',
+    trusted: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run a query once and keep its result for paging.
+
+    trusted marks a query built by the server; only those may be run as a
+    stored query result control command. Client-supplied KQL is always
+    spooled.
+
+    Raises:
+        CursorError: when neither backend could materialize the result
+    """
+    cleanup_expired_cursors()
+    page_size = max(1, min(page_size, CURSOR_MAX_PAGE_SIZE))
+    cursor_id = uuid.uuid4().hex
+    meta = {
+        'cursor': cursor_id,
+        'user': user,
+        'page_size': page_size,
+        'created_at': time.time(),
+        'expires_at': time.time() + CURSOR_TTL_SECONDS,
+    }
+
+    if CURSOR_BACKEND == BACKEND_STORED and trusted:
+        try:
+            meta['total_rows'] = _open_stored(cursor_id, kql_query)
+            meta['backend'] = BACKEND_STORED
+            meta['name'] = _stored_result_name(cursor_id)
+        except AdxUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning(f"Stored query result unavailable, spooling cursor to disk: {e}")
+
+    if 'backend' not in meta:
+        try:
+            meta.update(_open_spool(cursor_id, kql_query, page_size))
+        except Exception as e:
+            shutil.rmtree(_cursor_dir(cursor_id), ignore_errors=True)
+            if isinstance(e, AdxUnavailableError):
+                raise
+            raise CursorError(str(e)) from e
+        meta['backend'] = BACKEND_SPOOL
+
+    meta['total_pages'] = max((meta['total_rows'] + page_size - 1) // page_size, 1)
+    _write_meta(cursor_id, meta)
+    logger.info(f"Opened {meta['backend']} cursor {cursor_id}: {meta['total_rows']} rows")
+    return meta
+
+
+def read_cursor_page(meta: Dict[str, Any], page: int) -> Optional[list]:
+    """One page of a cursor, or None if out of range."""
+    if page < 0 or page >= meta['total_pages']:
+        return None
+
+    if meta['backend'] == BACKEND_SPOOL:
+        try:
+            return json.loads((_cursor_dir(meta['cursor']) / _page_filename(page)).read_text())
+        except (OSError, ValueError):
+            return None
+
+    first = page * meta['page_size'] + 1
+    last = first + meta['page_size'] - 1
+    rows = query_adx(
+        f"stored_query_result('{escape_kql_string(meta['name'])}')\n"
+        f"| where __row between ({first} .. {last})\n"
+        f"| order by __row asc\n"
+        f"| project-away __row",
+        cache_ttl=max(int(meta['expires_at'] - time.time()), 1),
+        endpoint='cursor',
+    )
+    return list(rows)
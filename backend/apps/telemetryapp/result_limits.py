@@ -0,0 +1,165 @@
+"""
+ADX Result-size Guardrails
+
+Caps how many rows and bytes one ADX result may bring into a worker, per
+endpoint, so a single unbounded KQL request cannot exhaust a worker's
+memory and get it OOM-killed.
+
+Design:
+1. Every endpoint has a row and a byte limit (RESULT_LIMITS, env
+   overridable) and a mode: 'truncate' returns the first rows with an
+   explicit truncation flag, 'reject' raises ResultTooLargeError
+2. Limits are pushed to Kusto as `truncationmaxrecords` (max_rows + 1,
+   so overflow is detectable) and `truncationmaxsize` with partial query
+   failures deferred: oversized results are cut on the server instead of
+   being streamed in full and failing the whole query
+3. The byte size of a result is estimated from an evenly spread sample of
+   rows serialized as JSON, not from serializing the whole result
+4. Results larger than a page are served through result_cursor.py
+   instead (server-side paging)
+"""
+
+import os
+import json
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+LIMIT_MODES = ('truncate', 'reject')
+
+# endpoint -> {'max_rows', 'max_bytes', 'mode'} (0 disables a limit)
+RESULT_LIMITS: Dict[str, Dict[str, Any]] = {
+    'default': {
+        'max_rows': int(os.getenv('ADX_RESULT_MAX_ROWS', 200_000)),
+        'max_bytes': int(os.getenv('ADX_RESULT_MAX_BYTES', 128 * 1024 * 1024)),
+        'mode': os.getenv('ADX_RESULT_LIMIT_MODE', 'truncate'),
+    },
+    # Legacy generic KQL endpoint: arbitrary user queries
+    'query_adx': {
+        'max_rows': int(os.getenv('QUERY_ADX_MAX_ROWS', 50_000)),
+        'max_bytes': int(os.getenv('QUERY_ADX_MAX_BYTES', 32 * 1024 * 1024)),
+        'mode': os.getenv('QUERY_ADX_LIMIT_MODE', 'truncate'),
+    },
+    # Async query jobs run in a background pool and page results to disk
+    'query_job': {
+        'max_rows': int(os.getenv('QUERY_JOB_MAX_ROWS', 1_000_000)),
+        'max_bytes': int(os.getenv('QUERY_JOB_MAX_BYTES', 512 * 1024 * 1024)),
+        'mode': 'truncate',
+    },
+    # Results spooled to disk for server-side cursors (see result_cursor.py)
+    'cursor': {
+        'max_rows': int(os.getenv('ADX_CURSOR_MAX_ROWS', 500_000)),
+        'max_bytes': int(os.getenv('ADX_CURSOR_MAX_BYTES', 256 * 1024 * 1024)),
+        'mode': 'truncate',
+    },
+}
+
+# Rows serialized to estimate the size of a result
+SIZE_SAMPLE_ROWS = 256
+
+# Partial-failure markers Kusto reports when it cut a result
+_SERVER_TRUNCATION_MARKERS = ('E_QUERY_RESULT_SET_TOO_LARGE', 'truncat')
+
+
+class ResultTooLargeError(Exception):
+    """Raised for over-limit results on endpoints in 'reject' mode."""
+
+    def __init__(self, info: Dict[str, Any]):
+        self.info = info
+        super().__init__(
+            f"Result exceeds the {info['endpoint']} limit ({info['reason']}: "
+            f"max {info['max_rows']} rows / {info['max_bytes']} bytes); "
+            "narrow the query or request it with page_size"
+        )
+
+
+# =============================================================================
+# Limits
+# =============================================================================
+
+def get_limit(endpoint: Optional[str]) -> Dict[str, Any]:
+    """Limits for an endpoint, falling back to 'default'."""
+    limit = dict(RESULT_LIMITS.get(endpoint or 'default', RESULT_LIMITS['default']))
+    if limit['mode'] not in LIMIT_MODES:
+        limit['mode'] = 'truncate'
+    limit['endpoint'] = endpoint or 'default'
+    return limit
+
+
+def kusto_limit_options(limit: Dict[str, Any]) -> Dict[str, Any]:
+    """ClientRequestProperties options that make Kusto enforce a limit."""
+    options = {}
+    if limit.get('max_rows'):
+        options['truncationmaxrecords'] = limit['max_rows'] + 1
+    if limit.get('max_bytes'):
+        options['truncationmaxsize'] = limit['max_bytes']
+    return options
+
+
+def is_truncation_error(error: Exception) -> bool:
+    """Whether a deferred Kusto partial failure is a result-size truncation."""
+    text = str(error)
+    return any(marker.lower() in text.lower() for marker in _SERVER_TRUNCATION_MARKERS)
+
+
+def estimate_bytes(rows: List[Dict]) -> int:
+    """Approximate JSON size of rows from an evenly spread sample."""
+    if not rows:
+        return 0
+    stride = max(len(rows) // SIZE_SAMPLE_ROWS, 1)
+    sample = rows[::stride][:SIZE_SAMPLE_ROWS]
+    sample_bytes = len(json.dumps(sample, cls=DjangoJSONEncoder))
+    return int(sample_bytes / len(sample) * len(rows))
+
+
+def apply_limit(
+    rows: List[Dict],
+    limit: Dict[str, Any],
+    server_truncated: bool = False,
+) -> Tuple[List[Dict], Optional[Dict[str, Any]]]:
+    """
+    Enforce a limit on a result.
+
+    Returns:
+        (rows, truncation) where truncation is None for a complete result,
+        else {'truncated', 'reason', 'returned_rows', 'max_rows', 'max_bytes', 'endpoint'}
+
+    Raises:
+        ResultTooLargeError: over the limit in 'reject' mode
+    """
+    reason = 'server' if server_truncated else None
+
+    max_rows = limit.get('max_rows')
+    if max_rows and len(rows) > max_rows:
+        rows = rows[:max_rows]
+        reason = 'rows'
+
+    max_bytes = limit.get('max_bytes')
+    if max_bytes and rows:
+        size = estimate_bytes(rows)
+        if size > max_bytes:
+            rows = rows[:int(len(rows) * max_bytes / size)]
+            reason = 'bytes'
+
+    if reason is None:
+        return rows, None
+
+    info = {
+        'truncated': True,
+        'reason': reason,
+        'returned_rows': len(rows),
+        'max_rows': max_rows,
+        'max_bytes': max_bytes,
+        'endpoint': limit['endpoint'],
+    }
+    if limit['mode'] == 'reject':
+        raise ResultTooLargeError(info)
+    logger.warning(f"Truncated ADX result for {limit['endpoint']} to {len(rows)} rows ({reason} limit)")
+    return rows, info
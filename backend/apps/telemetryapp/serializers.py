@@ -12,8 +12,34 @@ class TelemetrySerializer(serializers.ModelSerializer):
     class Meta:
         model = Telemetry
         fields = '__all__'
-        
-        
+
+
+class TelemetryListSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer for listing pages.
+
+    Reads attributes straight off the model instead of building a bound
+    field per column per row, and emits only the requested columns (which
+    the view loads with .only()). `id` and `created_at` are always included
+    since pagination keys on them.
+    """
+
+    ALWAYS = ('id', 'created_at')
+    FIELD_NAMES = tuple(
+        f.attname for f in Telemetry._meta.concrete_fields if f.attname not in ('id', 'created_at')
+    )
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selected = self.ALWAYS + tuple(fields or self.FIELD_NAMES)
+        self._datetime = serializers.DateTimeField()
+
+    def to_representation(self, instance):
+        data = {name: getattr(instance, name) for name in self.selected}
+        data['created_at'] = self._datetime.to_representation(instance.created_at)
+        return data
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
     
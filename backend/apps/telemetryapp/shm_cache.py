@@ -0,0 +1,565 @@
+"""
+Shared-memory Cache Backend
+
+A Django cache backend shared by every gunicorn worker on a host, for
+deployments without Redis: one copy of each ADX result per VM instead of
+one per worker (LocMemCache), read at in-process speed.
+
+Design:
+1. The cache is one file mapped into every process (mmap, MAP_SHARED),
+   under /dev/shm by default, so it outlives worker recycling and
+   restarts. Its full size is allocated when it is opened, so a tmpfs
+   that is too small fails at startup rather than with SIGBUS later. The layout (stripes, slots, ring size) is part of the file
+   name: a configuration change maps a new file instead of rewriting one
+   that running workers still use
+2. Keys are spread over SHM_CACHE_STRIPES stripes by hash. Each stripe
+   has its own open-addressing index and ring of records, guarded by a
+   thread lock plus an fcntl lock on the stripe header. Workers only
+   contend on the same stripe, and the kernel releases a lock held by a
+   killed worker
+3. Records are appended at a stripe's head. When the stripe's byte budget
+   (SHM_CACHE_MAX_BYTES / stripes) or its index is full, the oldest
+   records are evicted from the tail. A record read while in the older
+   half of the ring is copied to the head, so entries that are still
+   being read survive: LRU by bytes, approximated per stripe
+4. A stripe is flagged while it is being modified. A stripe found flagged
+   (its writer died mid-update) is reset before use
+5. Values are pickled like LocMemCache's. Expiry uses wall-clock time, so
+   it is the same in every process
+6. Unpickling trusts the file, so it must only be writable by this user:
+   it lives in a directory of its own (created 0700, default
+   /dev/shm/telemetryapp-<uid>/), is opened without following symlinks,
+   and both are checked to be owned by this user before use
+"""
+
+import os
+import errno
+import mmap
+import time
+import pickle
+import stat
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import fcntl
+except ImportError:  # Windows: use CACHE_BACKEND=memory or redis
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# File prefix; empty for <tmpfs>/telemetryapp-<uid>/cache
+SHM_CACHE_PATH = os.getenv('SHM_CACHE_PATH', '')
+SHM_CACHE_MAX_BYTES = int(os.getenv('SHM_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+SHM_CACHE_STRIPES = int(os.getenv('SHM_CACHE_STRIPES', 16))
+SHM_CACHE_MAX_ENTRIES = int(os.getenv('SHM_CACHE_MAX_ENTRIES', 65536))
+
+_MAGIC = b'TLMSHMC1'
+_LAYOUT_VERSION = 1
+_FILE_HEADER = struct.Struct('<8sIIIQ')  # magic, version, stripes, slots, ring bytes (per stripe)
+_FILE_HEADER_SIZE = 64
+_STRIPE_HEADER = struct.Struct('<QQIIIIQQQQ')  # head, tail, dirty, entries, tombstones, -, hits, misses, evictions, writes
+_STRIPE_HEADER_SIZE = 128
+_SLOT = struct.Struct('<QQdI4x')  # key hash, ring position, expires (0 = never), record bytes
+_RECORD = struct.Struct('<QIII4x')  # key hash (0 = padding), record bytes, key bytes, value bytes
+_SLOT_HASH = struct.Struct('<Q')
+
+_EMPTY = 0
+_TOMBSTONE = 1
+_ALIGN = 8
+_MAX_LOAD = 0.75
+
+
+def _default_location() -> str:
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, f"telemetryapp-{os.getuid()}", 'cache')
+
+
+def _check_owned(info: os.stat_result, what: str) -> None:
+    if info.st_uid != os.getuid():
+        raise ImproperlyConfigured(f"Shared cache {what} is owned by uid {info.st_uid}, not this user")
+
+
+def _private_directory(path: str) -> None:
+    """Create the cache directory (0700), or check an existing one is this user's alone to write."""
+    try:
+        os.makedirs(path, mode=0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise ImproperlyConfigured(f"Shared cache directory {path} is not a directory")
+    _check_owned(info, f"directory {path}")
+    if info.st_mode & 0o022:
+        raise ImproperlyConfigured(f"Shared cache directory {path} is writable by other users")
+
+
+def _open_private(path: str) -> int:
+    """Open (or create 0600) the cache file, refusing symlinks and files of other users."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+    try:
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode) or info.st_nlink != 1:
+            raise ImproperlyConfigured(f"Shared cache file {path} is not a plain file")
+        _check_owned(info, f"file {path}")
+        if info.st_mode & 0o077:
+            raise ImproperlyConfigured(f"Shared cache file {path} is accessible by other users")
+    except Exception:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _align(size: int) -> int:
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _hash(key: bytes) -> int:
+    value = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+    return value if value > _TOMBSTONE else value + 2
+
+
+# =============================================================================
+# Stripes
+# =============================================================================
+
+class _Stripe:
+    """One stripe's header and structures, for the duration of a locked operation."""
+
+    __slots__ = ('mm', 'base', 'slots', 'ring', 'index_at', 'ring_at', 'max_load',
+                 'head', 'tail', 'entries', 'tombstones', 'hits', 'misses', 'evictions', 'writes')
+
+    def __init__(self, region: '_Region', number: int):
+        self.mm = region.mm
+        self.base = region.stripe_offset(number)
+        self.slots = region.slots
+        self.ring = region.ring
+        self.index_at = self.base + _STRIPE_HEADER_SIZE
+        self.ring_at = self.index_at + self.slots * _SLOT.size
+        self.max_load = int(self.slots * _MAX_LOAD)
+
+    def load(self) -> bool:
+        """Read the header; returns whether the stripe was left mid-update."""
+        (self.head, self.tail, dirty, self.entries, self.tombstones, _,
+         self.hits, self.misses, self.evictions, self.writes) = _STRIPE_HEADER.unpack_from(self.mm, self.base)
+        return bool(dirty)
+
+    def save(self, dirty: bool) -> None:
+        _STRIPE_HEADER.pack_into(
+            self.mm, self.base, self.head, self.tail, int(dirty), self.entries, self.tombstones, 0,
+            self.hits, self.misses, self.evictions, self.writes,
+        )
+
+    def reset(self) -> None:
+        self.mm[self.index_at:self.ring_at] = bytes(self.ring_at - self.index_at)
+        self.head = self.tail = self.entries = self.tombstones = 0
+
+    # -- index ---------------------------------------------------------------
+
+    def _slot_at(self, index: int) -> int:
+        return self.index_at + index * _SLOT.size
+
+    def _probe(self, key_hash: int):
+        index = (key_hash >> 16) % self.slots
+        for _ in range(self.slots):
+            yield index
+            index = (index + 1) % self.slots
+
+    def read_slot(self, index: int) -> Tuple[int, int, float, int]:
+        return _SLOT.unpack_from(self.mm, self._slot_at(index))
+
+    def write_slot(self, index: int, key_hash: int, pos: int, expires: float, size: int) -> None:
+        _SLOT.pack_into(self.mm, self._slot_at(index), key_hash, pos, expires, size)
+
+    def record_key(self, pos: int) -> bytes:
+        at = self.ring_at + pos % self.ring
+        _, _, key_len, _ = _RECORD.unpack_from(self.mm, at)
+        return self.mm[at + _RECORD.size:at + _RECORD.size + key_len]
+
+    def find(self, key_hash: int, key: bytes) -> Optional[int]:
+        for index in self._probe(key_hash):
+            slot_hash, pos, _, _ = self.read_slot(index)
+            if slot_hash == _EMPTY:
+                return None
+            if slot_hash == key_hash and self.record_key(pos) == key:
+                return index
+        return None
+
+    def _find_position(self, key_hash: int, pos: int) -> Optional[int]:
+        for index in self._probe(key_hash):
+            slot_hash, slot_pos, _, _ = self.read_slot(index)
+            if slot_hash == _EMPTY:
+                return None
+            if slot_hash == key_hash and slot_pos == pos:
+                return index
+        return None
+
+    def remove(self, index: int) -> None:
+        self.write_slot(index, _TOMBSTONE, 0, 0.0, 0)
+        self.entries -= 1
+        self.tombstones += 1
+
+    def _rebuild_index(self) -> None:
+        live = [slot for slot in (self.read_slot(i) for i in range(self.slots)) if slot[0] > _TOMBSTONE]
+        self.mm[self.index_at:self.ring_at] = bytes(self.ring_at - self.index_at)
+        self.tombstones = 0
+        for slot in live:
+            for index in self._probe(slot[0]):
+                if _SLOT_HASH.unpack_from(self.mm, self._slot_at(index))[0] == _EMPTY:
+                    self.write_slot(index, *slot)
+                    break
+
+    # -- ring ----------------------------------------------------------------
+
+    def _evict_oldest(self) -> None:
+        offset = self.tail % self.ring
+        if self.ring - offset < _RECORD.size:
+            # Too short for a padding header: the rest of the ring is skipped
+            self.tail += self.ring - offset
+            return
+        key_hash, size, _, _ = _RECORD.unpack_from(self.mm, self.ring_at + offset)
+        if size < _RECORD.size:
+            logger.warning("Shared cache stripe corrupt, resetting it")
+            self.reset()
+            return
+        if key_hash != _EMPTY:
+            index = self._find_position(key_hash, self.tail)
+            if index is not None:
+                self.remove(index)
+                self.evictions += 1
+        self.tail += size
+
+    def _append(self, key_hash: int, key: bytes, value: bytes) -> Tuple[int, int]:
+        size = _align(_RECORD.size + len(key) + len(value))
+        offset = self.head % self.ring
+        pad = self.ring - offset if offset + size > self.ring else 0
+        while self.head + pad + size - self.tail > self.ring and self.tail < self.head:
+            self._evict_oldest()
+        if pad:
+            if pad >= _RECORD.size:
+                _RECORD.pack_into(self.mm, self.ring_at + offset, _EMPTY, pad, 0, 0)
+            self.head += pad
+
+        pos = self.head
+        at = self.ring_at + pos % self.ring
+        _RECORD.pack_into(self.mm, at, key_hash, size, len(key), len(value))
+        at += _RECORD.size
+        self.mm[at:at + len(key)] = key
+        self.mm[at + len(key):at + len(key) + len(value)] = value
+        self.head += size
+        self.writes += 1
+        return pos, size
+
+    def fits(self, key: bytes, value: bytes) -> bool:
+        return _align(_RECORD.size + len(key) + len(value)) <= self.ring // 2
+
+    def store(self, key_hash: int, key: bytes, value: bytes, expires: float) -> bool:
+        """Insert or replace an entry; False (and any old value dropped) when it is too large."""
+        existing = self.find(key_hash, key)
+        if existing is not None:
+            self.remove(existing)
+        if not self.fits(key, value):
+            return False
+        while self.entries >= self.max_load and self.tail < self.head:
+            self._evict_oldest()
+        pos, size = self._append(key_hash, key, value)
+        if self.entries + self.tombstones >= self.max_load:
+            self._rebuild_index()
+        for index in self._probe(key_hash):
+            slot_hash = _SLOT_HASH.unpack_from(self.mm, self._slot_at(index))[0]
+            if slot_hash in (_EMPTY, _TOMBSTONE):
+                if slot_hash == _TOMBSTONE:
+                    self.tombstones -= 1
+                self.write_slot(index, key_hash, pos, expires, size)
+                self.entries += 1
+                return True
+        return False
+
+    def fetch(self, key_hash: int, key: bytes, now: float) -> Optional[bytes]:
+        """Value bytes of a live entry (counted as hit or miss); refreshes old entries."""
+        index = self.find(key_hash, key)
+        if index is not None:
+            _, pos, expires, _ = self.read_slot(index)
+            if expires and expires <= now:
+                self.remove(index)
+                index = None
+        if index is None:
+            self.misses += 1
+            return None
+
+        at = self.ring_at + pos % self.ring
+        _, _, key_len, value_len = _RECORD.unpack_from(self.mm, at)
+        start = at + _RECORD.size + key_len
+        value = self.mm[start:start + value_len]
+        self.hits += 1
+        if self.head - pos > self.ring // 2:
+            # Read in the older half: move to the head so it is evicted last
+            self.store(key_hash, key, value, expires)
+        return value
+
+    def live_expiry(self, key_hash: int, key: bytes, now: float) -> Optional[int]:
+        """Index of a live entry, dropping it if expired."""
+        index = self.find(key_hash, key)
+        if index is None:
+            return None
+        expires = self.read_slot(index)[2]
+        if expires and expires <= now:
+            self.remove(index)
+            return None
+        return index
+
+
+# =============================================================================
+# Shared Region
+# =============================================================================
+
+class _Region:
+    """The mapped cache file of this process (one per location and layout)."""
+
+    def __init__(self, location: str, max_bytes: int, stripes: int, max_entries: int):
+        self.stripes = max(stripes, 1)
+        self.slots = max(int(max_entries / self.stripes / _MAX_LOAD), 64)
+        self.ring = max(max_bytes // self.stripes // _ALIGN * _ALIGN, 64 * 1024)
+        self.stripe_size = _STRIPE_HEADER_SIZE + self.slots * _SLOT.size + self.ring
+        self.size = _FILE_HEADER_SIZE + self.stripes * self.stripe_size
+        self.path = f"{location}.{self.stripes}x{self.slots}x{self.ring}.v{_LAYOUT_VERSION}"
+        self.thread_locks = [threading.Lock() for _ in range(self.stripes)]
+
+        _private_directory(os.path.dirname(os.path.abspath(self.path)))
+        self.fd = _open_private(self.path)
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            header = os.pread(self.fd, _FILE_HEADER.size, 0)
+            expected = _FILE_HEADER.pack(_MAGIC, _LAYOUT_VERSION, self.stripes, self.slots, self.ring)
+            if header != expected:
+                # New file (zero-filled): stripes start empty
+                os.ftruncate(self.fd, self.size)
+                os.pwrite(self.fd, expected, 0)
+                logger.info(f"Created shared cache {self.path} ({self.size // (1024 * 1024)} MB)")
+            self._reserve()
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, 0)
+        # The fd stays open for the life of the process: closing any descriptor
+        # of the file would drop this process's fcntl locks on it
+        self.mm = mmap.mmap(self.fd, self.size)
+
+    def _reserve(self) -> None:
+        """
+        Allocate the whole file now. Writing to a page of a sparse file on a
+        full tmpfs (e.g. Docker's 64 MB /dev/shm) raises SIGBUS in the worker,
+        so a cache that does not fit must fail here, at startup.
+        """
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(self.fd, 0, self.size)
+                return
+            info = os.statvfs(os.path.dirname(self.path))
+            missing = self.size - os.fstat(self.fd).st_blocks * 512
+            if missing > info.f_bavail * info.f_frsize:
+                raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+        except OSError as e:
+            raise ImproperlyConfigured(
+                f"Shared cache {self.path} needs {self.size // (1024 * 1024)} MB on its filesystem ({e}); "
+                f"lower SHM_CACHE_MAX_BYTES or enlarge /dev/shm (Docker: shm_size)"
+            ) from e
+
+    def stripe_offset(self, number: int) -> int:
+        return _FILE_HEADER_SIZE + number * self.stripe_size
+
+    def stripe_for(self, key_hash: int) -> int:
+        return key_hash % self.stripes
+
+    @contextmanager
+    def locked(self, number: int):
+        """Hold one stripe across threads and processes; yields its loaded _Stripe."""
+        offset = self.stripe_offset(number)
+        with self.thread_locks[number]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, offset)
+            stripe = _Stripe(self, number)
+            try:
+                if stripe.load():
+                    logger.warning(f"Shared cache stripe {number} was left mid-update, resetting it")
+                    stripe.reset()
+                stripe.save(dirty=True)
+                yield stripe
+            finally:
+                stripe.save(dirty=False)
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, offset)
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals over all stripes (read without locking)."""
+        totals = {'entries': 0, 'bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0, 'writes': 0}
+        for number in range(self.stripes):
+            stripe = _Stripe(self, number)
+            stripe.load()
+            totals['entries'] += stripe.entries
+            totals['bytes'] += stripe.head - stripe.tail
+            for key in ('hits', 'misses', 'evictions', 'writes'):
+                totals[key] += getattr(stripe, key)
+        lookups = totals['hits'] + totals['misses']
+        totals.update(
+            path=self.path,
+            max_bytes=self.ring * self.stripes,
+            max_entries=int(self.slots * _MAX_LOAD) * self.stripes,
+            stripes=self.stripes,
+            hit_ratio=round(totals['hits'] / lookups, 4) if lookups else None,
+        )
+        return totals
+
+
+_regions: Dict[str, _Region] = {}
+_regions_lock = threading.Lock()
+
+
+def _get_region(location: str, max_bytes: int, stripes: int, max_entries: int) -> _Region:
+    key = f"{location}:{max_bytes}:{stripes}:{max_entries}"
+    with _regions_lock:
+        region = _regions.get(key)
+        if region is None:
+            region = _regions[key] = _Region(location, max_bytes, stripes, max_entries)
+        return region
+
+
+def _reset_locks_after_fork() -> None:
+    # The mapping and fd are inherited and stay valid; fcntl locks are not
+    # inherited, and thread locks held by other threads at fork never unlock
+    global _regions_lock
+    _regions_lock = threading.Lock()
+    for region in _regions.values():
+        region.thread_locks = [threading.Lock() for _ in range(region.stripes)]
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+# =============================================================================
+# Django Backend
+# =============================================================================
+
+class SharedMemoryCache(BaseCache):
+    """
+    Cache shared by all processes on the host through a mapped file.
+
+    CACHES OPTIONS: MAX_BYTES, STRIPES, MAX_ENTRIES (defaults from the
+    SHM_CACHE_* environment variables); LOCATION is the file path prefix,
+    in a directory owned by this user and not writable by others.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location: str, params: Dict[str, Any]):
+        super().__init__(params)
+        if fcntl is None:
+            raise ImproperlyConfigured("SharedMemoryCache needs fcntl; use CACHE_BACKEND=memory or redis on Windows")
+        options = params.get('OPTIONS', {})
+        self._region = _get_region(
+            location or SHM_CACHE_PATH or _default_location(),
+            int(options.get('MAX_BYTES', SHM_CACHE_MAX_BYTES)),
+            int(options.get('STRIPES', SHM_CACHE_STRIPES)),
+            int(options.get('MAX_ENTRIES', SHM_CACHE_MAX_ENTRIES)),
+        )
+
+    def _locate(self, key: str, version: Optional[int]) -> Tuple[int, bytes, int]:
+        key_bytes = self.make_and_validate_key(key, version=version).encode('utf-8')
+        key_hash = _hash(key_bytes)
+        return key_hash, key_bytes, self._region.stripe_for(key_hash)
+
+    def _expiry(self, timeout) -> Optional[float]:
+        """Absolute expiry (0.0 = never), or None when the entry expires at once."""
+        expires = self.get_backend_timeout(timeout)
+        if expires is None:
+            return 0.0
+        return expires if expires > time.time() else None
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key_hash, key_bytes, number = self._locate(key, version)
+        payload = pickle.dumps(value, self.pickle_protocol)
+        expires = self._expiry(timeout)
+        with self._region.locked(number) as stripe:
+            if stripe.live_expiry(key_hash, key_bytes, time.time()) is not None:
+                return False
+            if expires is None:
+                return True
+            return stripe.store(key_hash, key_bytes, payload, expires)
+
+    def get(self, key, default=None, version=None):
+        key_hash, key_bytes, number = self._locate(key, version)
+        with self._region.locked(number) as stripe:
+            payload = stripe.fetch(key_hash, key_bytes, time.time())
+        if payload is None:
+            return default
+        return pickle.loads(payload)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> None:
+        key_hash, key_bytes, number = self._locate(key, version)
+        payload = pickle.dumps(value, self.pickle_protocol)
+        expires = self._expiry(timeout)
+        with self._region.locked(number) as stripe:
+            if expires is None:
+                index = stripe.find(key_hash, key_bytes)
+                if index is not None:
+                    stripe.remove(index)
+                return
+            if not stripe.store(key_hash, key_bytes, payload, expires):
+                logger.debug(f"Value for {key} ({len(payload)} bytes) too large for the shared cache")
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key_hash, key_bytes, number = self._locate(key, version)
+        expires = self._expiry(timeout)
+        with self._region.locked(number) as stripe:
+            index = stripe.live_expiry(key_hash, key_bytes, time.time())
+            if index is None:
+                return False
+            if expires is None:
+                stripe.remove(index)
+                return True
+            slot_hash, pos, _, size = stripe.read_slot(index)
+            stripe.write_slot(index, slot_hash, pos, expires, size)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key_hash, key_bytes, number = self._locate(key, version)
+        with self._region.locked(number) as stripe:
+            index = stripe.live_expiry(key_hash, key_bytes, time.time())
+            if index is None:
+                raise ValueError(f"Key '{key}' not found")
+            expires = stripe.read_slot(index)[2]
+            value = pickle.loads(stripe.fetch(key_hash, key_bytes, time.time())) + delta
+            stripe.store(key_hash, key_bytes, pickle.dumps(value, self.pickle_protocol), expires)
+            return value
+
+    def delete(self, key, version=None) -> bool:
+        key_hash, key_bytes, number = self._locate(key, version)
+        with self._region.locked(number) as stripe:
+            index = stripe.live_expiry(key_hash, key_bytes, time.time())
+            if index is None:
+                return False
+            stripe.remove(index)
+            return True
+
+    def has_key(self, key, version=None) -> bool:
+        key_hash, key_bytes, number = self._locate(key, version)
+        with self._region.locked(number) as stripe:
+            return stripe.live_expiry(key_hash, key_bytes, time.time()) is not None
+
+    def clear(self) -> None:
+        for number in range(self._region.stripes):
+            with self._region.locked(number) as stripe:
+                stripe.reset()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Entries, bytes, hits/misses and evictions across all processes."""
+        return dict(self._region.stats(), backend='shm')
@@ -0,0 +1,42 @@
+"""
+Signal handlers that keep the authentication cache consistent.
+
+Connected in TelemetryappConfig.ready().
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .authentication import invalidate_user, invalidate_all_users
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_user(instance.pk)
+    elif pk_set:
+        # group.user_set.add(...): instance is the Group
+        for user_id in pk_set:
+            invalidate_user(user_id)
+    else:
+        invalidate_all_users()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    # A new group has no members yet; renames and deletes affect everyone in it
+    if not created:
+        invalidate_all_users()
@@ -0,0 +1,172 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import adx_optimized, adx_service
+from telemetryapp.adx_optimized import (
+    AdxQueryError, AdxRateLimitError, AdxUnavailableError, CircuitBreaker, LatencyTracker, classify_query,
+)
+from telemetryapp.fake_kusto import FakeKustoClient
+
+from .utils import FailingKustoClient, FakeAdxMixin
+
+QUERY = "Telemetry | where comms_serial == 'S1' | summarize arg_max(localtime, *) by name"
+ROWS = [{'name': '/BMS/MODULE1/STAT/V', 'localtime': '2025-01-01T00:00:00', 'value_double': 52.1}]
+
+
+class RowsKustoClient(FakeKustoClient):
+    def rows_for(self, query):
+        return ROWS
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker()
+
+    def open_breaker(self):
+        for _ in range(adx_optimized.BREAKER_FAILURE_THRESHOLD):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_failure()
+
+    def test_consecutive_failures_open(self):
+        self.open_breaker()
+        self.assertEqual(self.breaker.get_state()['state'], CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.breaker.get_state()['rejected'], 1)
+
+    def test_success_resets_consecutive_failures(self):
+        for _ in range(adx_optimized.BREAKER_FAILURE_THRESHOLD - 1):
+            self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_state()['state'], CircuitBreaker.CLOSED)
+
+    def test_slow_calls_count_against_the_rate(self):
+        for _ in range(adx_optimized.BREAKER_MIN_CALLS):
+            self.breaker.record_success(slow=True)
+        state = self.breaker.get_state()
+        self.assertEqual((state['state'], state['consecutive_failures']), (CircuitBreaker.OPEN, 0))
+
+    def test_half_open_probe_closes(self):
+        self.open_breaker()
+        self.breaker.opened_at -= adx_optimized.BREAKER_RECOVERY_SECONDS
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.get_state()['state'], CircuitBreaker.HALF_OPEN)
+        for _ in range(adx_optimized.BREAKER_HALF_OPEN_PROBES - 1):
+            self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.get_state()['state'], CircuitBreaker.CLOSED)
+
+    def test_half_open_failure_reopens(self):
+        self.open_breaker()
+        self.breaker.opened_at -= adx_optimized.BREAKER_RECOVERY_SECONDS
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_state()['state'], CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_released_probe_frees_the_slot(self):
+        self.open_breaker()
+        self.breaker.opened_at -= adx_optimized.BREAKER_RECOVERY_SECONDS
+        for _ in range(adx_optimized.BREAKER_HALF_OPEN_PROBES):
+            self.assertTrue(self.breaker.allow_request())
+        self.breaker.release_probe()
+        self.assertTrue(self.breaker.allow_request())
+
+
+class TimeoutTests(SimpleTestCase):
+    def test_classify_query(self):
+        self.assertEqual(classify_query(QUERY), 'latest')
+        self.assertEqual(classify_query("Telemetry | where localtime > ago(1d)"), 'historical')
+        self.assertEqual(classify_query("DevInfo | distinct comms_serial"), 'interactive')
+
+    def test_timeout_tightens_after_warm_up(self):
+        tracker = LatencyTracker()
+        ceiling = adx_optimized.QUERY_TIMEOUTS['historical']
+        for _ in range(19):
+            tracker.record('historical', 0.1)
+        self.assertEqual(tracker.timeout_for('historical'), ceiling)
+        tracker.record('historical', 0.1)
+        self.assertEqual(tracker.timeout_for('historical'), min(ceiling, adx_optimized.TIMEOUT_MIN_SECONDS))
+
+
+class QueryAdxTests(FakeAdxMixin, SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_query_returns_rows(self):
+        client = self.install_client(RowsKustoClient())
+        self.assertEqual(list(adx_optimized.query_adx(QUERY)), ROWS)
+        self.assertEqual(list(adx_optimized.query_adx(QUERY)), ROWS)
+        self.assertEqual(client.calls, 1)
+
+    def test_failure_raises(self):
+        self.install_client(FailingKustoClient())
+        with self.assertRaises(AdxQueryError):
+            adx_optimized.query_adx(QUERY)
+
+    def test_failure_serves_last_good_result(self):
+        self.install_client(RowsKustoClient())
+        adx_optimized.query_adx(QUERY, use_cache=True)
+        cache.delete(adx_optimized.get_cache_key(QUERY))
+        self.install_client(FailingKustoClient())
+        rows = adx_optimized.query_adx(QUERY)
+        self.assertTrue(rows.stale)
+        self.assertEqual(len(rows), len(ROWS))
+
+    def test_open_circuit_fails_fast(self):
+        client = self.install_client(FailingKustoClient())
+        for _ in range(adx_optimized.BREAKER_FAILURE_THRESHOLD):
+            with self.assertRaises(AdxQueryError):
+                adx_optimized.query_adx(QUERY, use_cache=False)
+        with self.assertRaises(AdxUnavailableError):
+            adx_optimized.query_adx(QUERY, use_cache=False)
+        self.assertEqual(client.calls, adx_optimized.BREAKER_FAILURE_THRESHOLD)
+
+    def test_rate_limit_raises_typed_error(self):
+        client = self.install_client(RowsKustoClient())
+        with mock.patch.object(adx_optimized._rate_limiter, 'is_allowed', return_value=False):
+            with self.assertRaises(AdxRateLimitError):
+                adx_optimized.query_adx(QUERY)
+        self.assertEqual(client.calls, 0)
+
+
+class AdxServiceTests(FakeAdxMixin, SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_failure_raises_instead_of_empty_result(self):
+        self.install_client(FailingKustoClient())
+        with self.assertRaises(AdxQueryError):
+            adx_service.query_adx(QUERY)
+
+    def test_failure_serves_last_good_result(self):
+        self.install_client(RowsKustoClient())
+        rows = adx_service.query_adx(QUERY)['data']
+        self.install_client(FailingKustoClient())
+        result = adx_service.query_adx(QUERY)
+        self.assertTrue(result['stale'])
+        self.assertEqual(len(result['data']), len(rows))
+
+
+class ErrorStatusTests(TestCase):
+    times = {'start': '2024-06-01 00:00:00.0000', 'end': '2024-06-02 00:00:00.0000'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def post(self, url, body, error):
+        with mock.patch('telemetryapp.adx_events.query_adx', side_effect=error):
+            return self.client.post(url, dict(self.times, **body), format='json')
+
+    def test_events_and_alarm_views(self):
+        for url, body in (('/api/events/summary/', {'serial': 'S1'}), ('/api/alarms/series/', {'serial': 'S1', 'name': 'RELAY'})):
+            self.assertEqual(self.post(url, body, AdxQueryError('timed out')).status_code, 502)
+            self.assertEqual(self.post(url, body, AdxUnavailableError('circuit open')).status_code, 503)
+            self.assertEqual(self.post(url, body, AdxRateLimitError('rate limited')).status_code, 503)
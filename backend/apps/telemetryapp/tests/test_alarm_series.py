@@ -0,0 +1,68 @@
+from datetime import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp.adx_events import query_alarm_state_series, run_length_encode
+
+# Transitions only, plus the last sample (see _build_state_changes_query)
+ROWS = [
+    {'localtime': datetime(2024, 6, 1, 0, 10), 'value': 1},
+    {'localtime': '2024-06-01T00:00:00Z', 'value': 0},
+    {'localtime': datetime(2024, 6, 1, 2, 0), 'value': 0},
+    {'localtime': datetime(2024, 6, 1, 3, 0), 'value': 0},
+    {'localtime': None, 'value': 1},
+]
+
+
+class RunLengthEncodeTests(SimpleTestCase):
+    def test_numbers(self):
+        self.assertEqual(run_length_encode([0, 0, 1, 1, 1, 0, 2.0, 2]).tolist(), [0, 2, 5, 6])
+
+    def test_nan_runs(self):
+        nan = float('nan')
+        self.assertEqual(run_length_encode([nan, nan, 1, nan]).tolist(), [0, 2, 3])
+
+    def test_objects(self):
+        self.assertEqual(run_length_encode(['ON', 'ON', 'OFF', None, None]).tolist(), [0, 2, 3])
+
+    def test_empty(self):
+        self.assertEqual(run_length_encode([]).tolist(), [])
+
+
+class AlarmSeriesTests(SimpleTestCase):
+    def test_series(self):
+        with mock.patch('telemetryapp.adx_events.query_adx', return_value=ROWS):
+            series = query_alarm_state_series('S1', 'RELAY', datetime(2024, 6, 1), datetime(2024, 6, 2))
+
+        self.assertEqual(series['localtime'], ['2024-06-01T00:00:00', '2024-06-01T00:10:00', '2024-06-01T02:00:00'])
+        self.assertEqual(series['value'], [0, 1, 0])
+        self.assertEqual(series['duration_seconds'], [600.0, 6600.0, 3600.0])
+        self.assertEqual(series['last_seen'], '2024-06-01T03:00:00')
+        self.assertEqual((series['transitions'], series['rows_received']), (3, 5))
+
+    def test_no_rows(self):
+        with mock.patch('telemetryapp.adx_events.query_adx', return_value=[]):
+            series = query_alarm_state_series('S1', 'RELAY', datetime(2024, 6, 1), datetime(2024, 6, 2))
+        self.assertEqual((series['localtime'], series['duration_seconds'], series['last_seen']), ([], [], None))
+
+
+class AlarmSeriesViewTests(TestCase):
+    url = '/api/alarms/series/'
+    body = {'serial': 'S1', 'name': 'RELAY', 'start': '2024-06-01 00:00:00.0000', 'end': '2024-06-02 00:00:00.0000'}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_series(self):
+        with mock.patch('telemetryapp.adx_events.query_adx', return_value=ROWS):
+            response = self.client.post(self.url, self.body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['value'], [0, 1, 0])
+
+    def test_bad_requests(self):
+        for body in (dict(self.body, serial=''), dict(self.body, name=''), dict(self.body, start='')):
+            self.assertEqual(self.client.post(self.url, body, format='json').status_code, 400, body)
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from telemetryapp import authentication
+from telemetryapp.authentication import ClaimsUser, CookieJWTAuthentication, issue_tokens_for_user
+from telemetryapp.permissions import ADMIN_GROUP, get_group_names
+
+
+class AuthenticationMixin:
+    def setUp(self):
+        self.user = User.objects.create(username='viewer', email='viewer@example.com')
+        self.user.groups.add(Group.objects.create(name=ADMIN_GROUP))
+        self.clear_auth_state()
+        self.addCleanup(self.clear_auth_state)
+
+    def clear_auth_state(self):
+        cache.clear()
+        authentication._user_cache.clear()
+        authentication._invalidated_at.clear()
+
+    def authenticate(self, token, cookie=False):
+        if cookie:
+            request = RequestFactory().get('/api/auth/me/')
+            request.COOKIES['access_token'] = str(token)
+        else:
+            request = RequestFactory().get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return CookieJWTAuthentication().authenticate(request)[0]
+
+
+class SharedCacheAuthenticationTests(AuthenticationMixin, TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(authentication, 'invalidation_shared', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_tokens_carry_claims(self):
+        token = issue_tokens_for_user(self.user).access_token
+        self.assertEqual(
+            (token['username'], token['email'], token['groups']),
+            ('viewer', 'viewer@example.com', [ADMIN_GROUP]),
+        )
+
+    def test_claims_user_needs_no_queries(self):
+        token = issue_tokens_for_user(self.user).access_token
+        with self.assertNumQueries(0):
+            user = self.authenticate(token, cookie=True)
+            self.assertIsInstance(user, ClaimsUser)
+            self.assertEqual(get_group_names(user), {ADMIN_GROUP})
+
+    def test_group_change_distrusts_older_claims(self):
+        token = issue_tokens_for_user(self.user).access_token
+        self.user.groups.clear()
+        user = self.authenticate(token)
+        self.assertIsInstance(user, User)
+        self.assertEqual(get_group_names(user), frozenset())
+
+    def test_deactivated_user_is_rejected(self):
+        token = issue_tokens_for_user(self.user).access_token
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_tokens_without_claims_use_the_user_cache(self):
+        token = issue_tokens_for_user(self.user).access_token
+        del token['claims_version']
+        self.assertIsInstance(self.authenticate(token), User)
+        with self.assertNumQueries(0):
+            self.assertIsInstance(self.authenticate(token), User)
+
+
+class PerProcessCacheAuthenticationTests(AuthenticationMixin, TestCase):
+    def test_claims_are_not_trusted(self):
+        self.assertFalse(authentication.invalidation_shared())
+        token = issue_tokens_for_user(self.user).access_token
+        user = self.authenticate(token)
+        self.assertIsInstance(user, User)
+        self.assertEqual(get_group_names(user), {ADMIN_GROUP})
+
+    def test_every_request_checks_the_database(self):
+        token = issue_tokens_for_user(self.user).access_token
+        self.authenticate(token)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_auth_me(self):
+        client = APIClient()
+        token = issue_tokens_for_user(self.user).access_token
+        response = client.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.json()['user'], {'username': 'viewer', 'email': 'viewer@example.com'})
+        self.assertEqual(client.get('/api/auth/me/').status_code, 401)
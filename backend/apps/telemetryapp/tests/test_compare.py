@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp.compare import COMPARE_CHUNK_BUCKETS, CompareRequestError, _scatter, _to_json, compare_devices, parse_step
+from telemetryapp.fake_kusto import SyntheticKustoClient
+
+from .utils import FailingKustoClient, FakeAdxMixin
+
+
+class CompareTests(FakeAdxMixin, SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_step(self):
+        self.assertIsNone(parse_step(''))
+        self.assertEqual(parse_step(30), 30)
+        self.assertEqual(parse_step('90'), 90)
+        self.assertEqual(parse_step('5m'), 300)
+        self.assertEqual(parse_step('1h'), 3600)
+        self.assertEqual(parse_step('2d'), 172800)
+        for value in ('abc', '0', '-5m', 'm'):
+            with self.assertRaises(CompareRequestError):
+                parse_step(value)
+
+    def test_scatter(self):
+        start = datetime(2025, 1, 1)
+        matrix = np.full((2, 3), np.nan)
+        rows = [
+            {'comms_serial': 'A', 'bucket': start, 'value': 1.0},
+            {'comms_serial': 'B', 'bucket': start + timedelta(seconds=120), 'value': 2.0},
+            {'comms_serial': 'B', 'bucket': '2025-01-01T00:01:00Z', 'value': None},
+            {'comms_serial': 'C', 'bucket': start, 'value': 9.0},  # unknown serial
+            {'comms_serial': 'A', 'bucket': start + timedelta(seconds=600), 'value': 9.0},  # past the grid
+            {'comms_serial': 'A', 'bucket': start - timedelta(seconds=60), 'value': 9.0},  # before the grid
+        ]
+        _scatter(matrix, rows, {'A': 0, 'B': 1}, start, 60)
+        self.assertEqual(_to_json(matrix), [[1.0, None, None], [None, None, 2.0]])
+
+    def test_compare_devices(self):
+        client = self.install_client(SyntheticKustoClient())
+        start = datetime(2024, 6, 1)
+        end = start + timedelta(hours=10)
+        result = compare_devices(['S1', 'S2', 'S1'], '/BMS/MODULE1/STAT/V', start, end, step=300)
+
+        self.assertEqual(result['serials'], ['S1', 'S2'])
+        self.assertEqual(result['bucket_count'], 121)
+        self.assertEqual([len(row) for row in result['values']], [121, 121])
+        self.assertEqual(len(result['stats']['mean']), 2)
+        self.assertGreater(min(result['stats']['coverage']), 0.8)
+        self.assertEqual(result['cache'], {'chunks_cached': 0, 'chunks_queried': 4})
+
+        # The two closed chunks now come from the chunk cache; only the tail is queried
+        calls = client.calls
+        again = compare_devices(['S1', 'S2'], '/BMS/MODULE1/STAT/V', start, end, step=300)
+        self.assertEqual(again['cache'], {'chunks_cached': 4, 'chunks_queried': 0})
+        self.assertEqual(client.calls, calls + 1)
+        closed = 2 * COMPARE_CHUNK_BUCKETS
+        self.assertEqual([row[:closed] for row in again['values']], [row[:closed] for row in result['values']])
+
+    def test_limits(self):
+        start = datetime(2024, 6, 1)
+        with self.assertRaises(CompareRequestError):
+            compare_devices([], 'm', start, start + timedelta(hours=1))
+        with self.assertRaises(CompareRequestError):
+            compare_devices(['S1'], 'm', start, start + timedelta(days=30), step=60)
+
+
+class CompareViewTests(FakeAdxMixin, TestCase):
+    url = '/api/compare/'
+    body = {'serials': ['S1', 'S2'], 'metric': '/BMS/MODULE1/STAT/V',
+            'start': '2024-06-01 00:00:00.0000', 'end': '2024-06-01 06:00:00.0000', 'step': '1h'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_compare(self):
+        self.install_client(SyntheticKustoClient())
+        body = self.client.post(self.url, self.body, format='json').json()
+        self.assertEqual((body['serials'], body['step_seconds'], body['bucket_count']), (['S1', 'S2'], 3600, 7))
+
+    def test_bad_requests(self):
+        for body in (dict(self.body, serials=[]), dict(self.body, metric=''), dict(self.body, step='soon')):
+            self.assertEqual(self.client.post(self.url, body, format='json').status_code, 400, body)
+
+    def test_query_error_is_bad_gateway(self):
+        self.install_client(FailingKustoClient())
+        self.assertEqual(self.client.post(self.url, self.body, format='json').status_code, 502)
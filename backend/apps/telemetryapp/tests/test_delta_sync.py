@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp.delta_sync import apply_delta_sync, make_sync_token, parse_sync_token
+
+from .utils import FakeAdxMixin, LatestValueKustoClient
+
+
+class DeltaSyncTests(SimpleTestCase):
+    requested = {'telemetry': ['a', 'b'], 'alarms': []}
+
+    def setUp(self):
+        cache.clear()
+
+    def result(self, a, b):
+        return {
+            'telemetry': {'a': {'value': a, 'localtime': 't'}, 'b': {'value': b, 'localtime': 't'}},
+            'alarms': {},
+        }
+
+    def test_first_request_is_full(self):
+        response = apply_delta_sync('S1', self.requested, self.result(1, 2))
+        self.assertTrue(response['full'])
+        self.assertEqual(set(response['telemetry']), {'a', 'b'})
+
+    def test_token_returns_only_changes(self):
+        first = apply_delta_sync('S1', self.requested, self.result(1, 2))
+        second = apply_delta_sync('S1', self.requested, self.result(5, 2), first['sync_token'])
+        self.assertFalse(second['full'])
+        self.assertEqual(list(second['telemetry']), ['a'])
+
+        third = apply_delta_sync('S1', self.requested, self.result(5, 2), second['sync_token'])
+        self.assertEqual(third['telemetry'], {})
+        self.assertEqual(third['sync_token'], second['sync_token'])
+
+    def test_missing_metric_is_reported_removed(self):
+        first = apply_delta_sync('S1', self.requested, self.result(1, 2))
+        result = {'telemetry': {'a': {'value': 1, 'localtime': 't'}}, 'alarms': {}}
+        second = apply_delta_sync('S1', self.requested, result, first['sync_token'])
+        self.assertEqual(second['removed'], ['b'])
+        self.assertNotEqual(second['sync_token'], first['sync_token'])
+
+        # The removal is acknowledged by the new token, and a returning metric is sent again
+        third = apply_delta_sync('S1', self.requested, result, second['sync_token'])
+        self.assertEqual((third['telemetry'], third.get('removed', [])), ({}, []))
+        fourth = apply_delta_sync('S1', self.requested, self.result(1, 2), third['sync_token'])
+        self.assertEqual(list(fourth['telemetry']), ['b'])
+
+    def test_unknown_snapshot_gives_full_response(self):
+        first = apply_delta_sync('S1', self.requested, self.result(1, 2))
+        cache.clear()
+        second = apply_delta_sync('S1', self.requested, self.result(5, 2), first['sync_token'])
+        self.assertTrue(second['full'])
+
+    def test_token_is_bound_to_serial(self):
+        token = apply_delta_sync('S1', self.requested, self.result(1, 2))['sync_token']
+        self.assertIsNone(parse_sync_token('S2', token))
+        self.assertIsNone(parse_sync_token('S1', 'not-a-token'))
+        self.assertEqual(parse_sync_token('S1', make_sync_token('S1', 'a' * 20)), 'a' * 20)
+
+    def test_snapshot_id_follows_content(self):
+        one = apply_delta_sync('S1', self.requested, self.result(1, 2))['sync_token']
+        apply_delta_sync('S1', self.requested, self.result(3, 4))
+        again = apply_delta_sync('S1', self.requested, self.result(1, 2))['sync_token']
+        self.assertEqual(one, again)
+
+
+class BatchTelemetryDeltaTests(FakeAdxMixin, TestCase):
+    body = {'serial': 'S1', 'telemetry_names': ['/INV/DCPORT/STAT/PV1/V', '/BMS/MODULE1/STAT/V']}
+
+    def setUp(self):
+        cache.clear()
+        self.install_client(LatestValueKustoClient())
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def post(self, **extra):
+        return self.client.post('/api/batch_telemetry/', dict(self.body, **extra), format='json').json()
+
+    def test_sync_token_returns_only_changes(self):
+        first = self.post()
+        self.assertTrue(first['full'])
+        self.assertEqual(len(first['telemetry']), 2)
+
+        unchanged = self.post(sync_token=first['sync_token'])
+        self.assertFalse(unchanged['full'])
+        self.assertEqual(unchanged['telemetry'], {})
+        self.assertEqual(unchanged['sync_token'], first['sync_token'])
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp.adx_events import (
+    EVENTS_MAX_BUCKETS, EventsRequestError, choose_step, floor_to_step, format_step,
+    get_event_severity, query_events_summary,
+)
+
+ROWS = [
+    {'name': 'Inverter Fault', 'bucket': datetime(2024, 6, 1, 5), 'count_': 3},
+    {'name': 'Grid Warning', 'bucket': datetime(2024, 6, 4, 10), 'count_': 2},
+    {'name': 'Door open', 'bucket': '2024-06-02T00:00:00', 'count_': 1},
+]
+
+
+class EventsHelperTests(SimpleTestCase):
+    def test_severity(self):
+        self.assertEqual(get_event_severity('BMS Fault'), 'critical')
+        self.assertEqual(get_event_severity('grid_alarm'), 'warning')
+        self.assertEqual(get_event_severity('Door open'), 'info')
+        self.assertEqual(get_event_severity(None), 'info')
+
+    def test_choose_step(self):
+        start = datetime(2024, 6, 1)
+        self.assertEqual(choose_step(start, start + timedelta(hours=1)), 60)
+        self.assertEqual(choose_step(start, start + timedelta(days=1)), 15 * 60)
+        self.assertEqual(choose_step(start, start + timedelta(days=7)), 3 * 3600)
+        self.assertEqual(choose_step(start, start + timedelta(days=3650)), 7 * 86400)
+
+    def test_floor_and_format(self):
+        self.assertEqual(floor_to_step(datetime(2024, 6, 1, 5, 47, 12), 900), datetime(2024, 6, 1, 5, 45))
+        self.assertEqual(floor_to_step(datetime(2024, 6, 1, 5, 47), 86400), datetime(2024, 6, 1))
+        self.assertEqual([format_step(s) for s in (45, 300, 3600, 86400)], ['45s', '5m', '1h', '1d'])
+
+
+class EventsSummaryTests(SimpleTestCase):
+    start = datetime(2024, 6, 1)
+    end = datetime(2024, 6, 5)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_summary(self):
+        with mock.patch('telemetryapp.adx_events.query_adx', return_value=ROWS):
+            summary = query_events_summary('S1', self.start, self.end, step=3600)
+
+        self.assertEqual(summary['total'], 6)
+        self.assertEqual(summary['by_severity'], {'critical': 3, 'warning': 2, 'info': 1})
+        self.assertEqual(summary['by_name'][0], {'name': 'Inverter Fault', 'count': 3, 'severity': 'critical'})
+        histogram = summary['histogram']
+        self.assertEqual(len(histogram['buckets']), 4 * 24 + 1)
+        self.assertEqual(histogram['critical'][5], 3)
+        self.assertEqual(sum(histogram['total']), 6)
+        self.assertEqual(summary['step'], '1h')
+
+    def test_closed_chunks_are_cached(self):
+        with mock.patch('telemetryapp.adx_events.query_adx', return_value=ROWS) as query:
+            first = query_events_summary('S1', self.start, self.end, step=3600)
+            second = query_events_summary('S1', self.start, self.end, step=3600)
+
+        queried = first['cache']['closed_chunks_queried']
+        self.assertGreater(queried, 0)
+        self.assertEqual(second['cache'], {'closed_chunks_cached': queried, 'closed_chunks_queried': 0})
+        self.assertEqual(query.call_count, 2)  # the open tail is always queried
+        self.assertEqual(second['histogram'], first['histogram'])
+
+    def test_step_must_be_on_the_ladder(self):
+        with self.assertRaises(EventsRequestError):
+            query_events_summary('S1', self.start, self.end, step=90)
+
+    def test_bucket_cap(self):
+        end = self.start + timedelta(minutes=EVENTS_MAX_BUCKETS + 5)
+        with self.assertRaises(EventsRequestError):
+            query_events_summary('S1', self.start, end, step=60)
+
+
+class EventsSummaryViewTests(TestCase):
+    url = '/api/events/summary/'
+    body = {'serial': 'S1', 'start': '2024-06-01 00:00:00.0000', 'end': '2024-06-05 00:00:00.0000'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_summary(self):
+        with mock.patch('telemetryapp.adx_events.query_adx', return_value=ROWS):
+            response = self.client.post(self.url, self.body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 6)
+
+    def test_bad_requests(self):
+        for body in (
+            dict(self.body, serial=''),
+            dict(self.body, output_filter='2'),
+            dict(self.body, step_seconds=90),
+            dict(self.body, step_seconds=60, end='2024-07-01 00:00:00.0000'),
+            dict(self.body, end='2024-05-01 00:00:00.0000'),
+        ):
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, 400, body)
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from telemetryapp import adx_optimized
+from telemetryapp.fake_kusto import SyntheticKustoClient
+
+from .utils import FakeAdxMixin
+
+
+class SyntheticKustoClientTests(SimpleTestCase):
+    def setUp(self):
+        self.client = SyntheticKustoClient(row_count=10, fast_row_count=30)
+
+    def rows(self, query):
+        return self.client.execute('db', query).primary_results[0].to_dict()['data']
+
+    def test_latest_values_per_name(self):
+        rows = self.rows(
+            "Telemetry | where comms_serial contains 'S1' | where name contains '/A' or name contains '/B' "
+            "| summarize arg_max(localtime, value_double) by name"
+        )
+        self.assertEqual([(row['comms_serial'], row['name']) for row in rows], [('S1', '/A'), ('S1', '/B')])
+
+    def test_row_counts(self):
+        self.assertEqual(len(self.rows("Telemetry | where comms_serial contains 'S1'")), 10)
+        self.assertEqual(len(self.rows("sourcedatastreamingfornam | where comms_serial contains 'S1'")), 30)
+        self.assertEqual(len(self.rows("Telemetry | take 3")), 3)
+        self.assertEqual(len(self.rows("DevInfo | where comms_serial contains 'S1' | take 4")), 4)
+
+    def test_alarm_rows_are_boolean(self):
+        rows = self.rows("Alarms | where comms_serial contains 'S1' | take 5")
+        self.assertTrue(all(isinstance(row['value'], bool) for row in rows))
+
+    def test_rows_are_deterministic(self):
+        query = "Telemetry | where comms_serial contains 'S1' | take 5"
+        self.assertEqual(self.rows(query), SyntheticKustoClient().execute('db', query).primary_results[0].to_dict()['data'])
+        self.assertEqual(self.client.calls, 1)
+
+
+class CacheCounterTests(FakeAdxMixin, SimpleTestCase):
+    def test_hits_and_misses_are_counted(self):
+        cache.clear()
+        self.install_client(SyntheticKustoClient())
+        before = adx_optimized.get_query_stats()['cache']
+        query = "Telemetry | where comms_serial contains 'S1' | take 5"
+        adx_optimized.query_adx(query)
+        adx_optimized.query_adx(query)
+        after = adx_optimized.get_cache_counters()
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (1, 1))
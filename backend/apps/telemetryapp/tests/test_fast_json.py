@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from telemetryapp import fast_json
+from telemetryapp.renderers import FastJSONRenderer
+
+
+class FastJsonTests(SimpleTestCase):
+    def test_round_trip(self):
+        data = {'a': [1, 2.5, None, 'x'], 'b': {'c': True}}
+        self.assertEqual(fast_json.loads(fast_json.dumps(data)), data)
+
+    def test_numpy_values(self):
+        data = {'values': np.array([1.5, 2.0]), 'count': np.int64(3)}
+        self.assertEqual(fast_json.loads(fast_json.dumps(data)), {'values': [1.5, 2.0], 'count': 3})
+
+    def test_sort_keys(self):
+        self.assertEqual(fast_json.dumps({'b': 1, 'a': 2}, sort_keys=True), b'{"a":2,"b":1}')
+
+    def test_pre_encoded_passes_through(self):
+        payload = fast_json.PreEncodedJSON(b'{"data":[]}')
+        self.assertEqual(fast_json.dumps(payload), b'{"data":[]}')
+
+    def test_datetimes_match_django_format(self):
+        if fast_json.FAST_JSON_DATETIME != 'compat':
+            self.skipTest('FAST_JSON_DATETIME is not compat')
+        data = [
+            datetime(2025, 1, 1, 12, 0, 0),
+            datetime(2025, 1, 1, 12, 0, 0, 123456),
+            datetime(2025, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+            datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone(timedelta(hours=2))),
+        ]
+        self.assertEqual(
+            fast_json.loads(fast_json.dumps(data)),
+            ['2025-01-01T12:00:00', '2025-01-01T12:00:00.123', '2025-01-01T12:00:00.123Z', '2025-01-01T12:00:00+02:00'],
+        )
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    renderer = FastJSONRenderer()
+
+    def test_compact_output(self):
+        self.assertEqual(self.renderer.render({'data': [1, None]}), b'{"data":[1,null]}')
+        self.assertEqual(self.renderer.render(None), b'')
+
+    def test_pre_encoded_body_is_written_as_is(self):
+        payload = fast_json.PreEncodedJSON(b'{"data": []}')
+        self.assertEqual(self.renderer.render(payload, 'application/json; indent=2'), b'{"data": []}')
+
+    def test_indent_falls_back_to_drf(self):
+        body = self.renderer.render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(body, b'{\n  "a": 1\n}')
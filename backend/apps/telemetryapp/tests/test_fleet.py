@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import fleet
+from telemetryapp.fake_kusto import SyntheticKustoClient
+from telemetryapp.fleet import FLEET_METRICS, FleetQueryError, fleet_page, get_fleet_snapshot, pivot_rows
+
+from .utils import FailingKustoClient, FakeAdxMixin
+
+
+class PivotTests(SimpleTestCase):
+    def test_rows_are_pivoted_into_columns(self):
+        rows = [
+            {'comms_serial': 'S2', 'name': '/BMS/MODULE1/STAT/USER_SOC', 'localtime': '2025-01-01T00:00:00', 'value': 50.0},
+            {'comms_serial': 'S2', 'name': '/BMS/MODULE1/STAT/USER_SOC', 'localtime': '2025-01-01T00:05:00', 'value': 51.0},
+            {'comms_serial': 'S1', 'name': '/INV/ACPORT/STAT/GRID/P', 'localtime': '2025-01-01T00:01:00', 'value': 1200.0},
+            {'comms_serial': 'S1', 'name': '/UNKNOWN', 'localtime': '2025-01-01T00:09:00', 'value': 1.0},
+        ]
+        snapshot = pivot_rows(rows)
+        self.assertEqual(snapshot['serials'], ['S1', 'S2'])
+        self.assertEqual(snapshot['columns']['soc'], [None, 51.0])
+        self.assertEqual(snapshot['columns']['grid_power'], [1200.0, None])
+        self.assertEqual(snapshot['last_seen'], ['2025-01-01T00:01:00', '2025-01-01T00:05:00'])
+
+    def test_query_covers_both_tables(self):
+        query = fleet.build_fleet_query()
+        self.assertIn("Telemetry | where localtime > ago(24h) | where name has_any ('/BMS/MODULE1/STAT/USER_SOC'", query)
+        self.assertIn("Alarms | where localtime > ago(24h) | where name has_any ('/BMS/CLUSTER/EVENT/ALARM/MAIN_RELAY_ERROR')", query)
+
+    def test_page(self):
+        snapshot = dict(pivot_rows([
+            {'comms_serial': f'S{i}', 'name': '/BMS/MODULE1/STAT/USER_SOC', 'localtime': None, 'value': float(i)}
+            for i in range(5)
+        ]), generated_at='now', stale=False)
+        page = fleet_page(snapshot, metrics=['soc'], page=2, page_size=2)
+        self.assertEqual(page['columns'], ['serial', 'soc', 'last_seen'])
+        self.assertEqual(page['data']['serial'], ['S2', 'S3'])
+        self.assertEqual((page['total'], page['next_page']), (5, 3))
+        self.assertEqual(fleet_page(snapshot, serials=['S4', 'X'])['data']['soc'], [4.0])
+        self.assertEqual(fleet_page(snapshot, search='s1')['data']['serial'], ['S1'])
+
+
+class FleetSnapshotTests(FakeAdxMixin, SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_snapshot_is_cached(self):
+        client = self.install_client(SyntheticKustoClient(fleet_size=30))
+        snapshot = get_fleet_snapshot()
+        self.assertEqual(len(snapshot['serials']), 30)
+        self.assertEqual(set(snapshot['columns']), set(FLEET_METRICS))
+        self.assertTrue(all(len(column) == 30 for column in snapshot['columns'].values()))
+        self.assertEqual(get_fleet_snapshot(), snapshot)
+        self.assertEqual(client.calls, 1)
+
+    def test_failure_serves_last_good_snapshot(self):
+        self.install_client(SyntheticKustoClient(fleet_size=3))
+        get_fleet_snapshot()
+        self.install_client(FailingKustoClient())
+        snapshot = get_fleet_snapshot(use_cache=False)
+        self.assertTrue(snapshot['stale'])
+        self.assertEqual(len(snapshot['serials']), 3)
+
+    def test_failure_without_snapshot_raises(self):
+        self.install_client(FailingKustoClient())
+        with self.assertRaises(FleetQueryError):
+            get_fleet_snapshot()
+
+
+class FleetOverviewViewTests(FakeAdxMixin, TestCase):
+    url = '/api/fleet/overview/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='noc'))
+
+    def test_pages(self):
+        self.install_client(SyntheticKustoClient(fleet_size=25))
+        body = self.client.post(self.url, {'metrics': ['soc'], 'page_size': 10, 'page': 3}, format='json').json()
+        self.assertEqual((body['total'], body['next_page'], len(body['data']['soc'])), (25, None, 5))
+
+    def test_bad_requests(self):
+        for body in ({'metrics': ['nope']}, {'metrics': 'soc'}, {'serials': 'S1'}, {'page': 'x'}):
+            self.assertEqual(self.client.post(self.url, body, format='json').status_code, 400, body)
+
+    def test_unavailable(self):
+        self.install_client(FailingKustoClient())
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 503)
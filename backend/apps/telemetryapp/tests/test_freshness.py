@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from telemetryapp import adx_service, freshness
+from telemetryapp.freshness import (
+    TTL_CLOSED_SECONDS, TTL_MAX_LATEST_SECONDS, TTL_MIN_SECONDS, cadence_ttl, extract_range_end, extract_serial,
+    observe_result, sample_spacing,
+)
+
+from .utils import FakeAdxMixin, LatestValueKustoClient
+
+NEWEST = datetime(2025, 1, 1)
+SERIES = "Telemetry | where comms_serial contains 'S1' | where localtime > ago(1h)"
+
+
+def series_rows(count=5, spacing=60):
+    return [
+        {'name': '/BMS/MODULE1/STAT/V', 'localtime': (NEWEST - timedelta(seconds=spacing * i)).isoformat(), 'value_double': i}
+        for i in range(count)
+    ]
+
+
+class QueryInspectionTests(SimpleTestCase):
+    def test_extract_serial(self):
+        self.assertEqual(extract_serial(SERIES), 'S1')
+        self.assertEqual(extract_serial("let s = 'O''Brien'; Telemetry | where comms_serial == s"), "O'Brien")
+        self.assertIsNone(extract_serial("Telemetry | where comms_serial in ('S1', 'S2')"))
+
+    def test_extract_range_end(self):
+        query = "Telemetry | where localtime between (datetime(2024-06-01 00:00:00) .. datetime(2024-06-02 00:00:00))"
+        self.assertEqual(extract_range_end(query), datetime(2024, 6, 2))
+        self.assertIsNone(extract_range_end(query + " | where localtime > ago(1h)"))
+        self.assertIsNone(extract_range_end(SERIES))
+
+    def test_sample_spacing(self):
+        self.assertEqual(sample_spacing(series_rows(spacing=30)), 30.0)
+        self.assertIsNone(sample_spacing(series_rows(count=2)))
+        latest = [{'name': f'/M{i}', 'localtime': NEWEST.isoformat()} for i in range(5)]
+        self.assertIsNone(sample_spacing(latest))
+
+
+class CadenceTtlTests(SimpleTestCase):
+    state = {'interval': 60, 'newest': NEWEST.isoformat(), 'lag': 10}
+    newest = (NEWEST - freshness._EPOCH).total_seconds()
+
+    def test_next_sample_due(self):
+        self.assertEqual(cadence_ttl(self.state, self.newest + 30), 42)
+
+    def test_overdue_backs_off(self):
+        self.assertEqual(cadence_ttl(self.state, self.newest + 100), 14)
+        self.assertEqual(cadence_ttl(self.state, self.newest + 2000), TTL_MAX_LATEST_SECONDS)
+        self.assertEqual(cadence_ttl(self.state, self.newest + 75), TTL_MIN_SECONDS)
+
+    def test_unknown_cadence(self):
+        self.assertIsNone(cadence_ttl(None, self.newest))
+        self.assertIsNone(cadence_ttl(dict(self.state, interval=None), self.newest))
+
+
+class ObserveResultTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_learned_cadence_sets_the_ttl(self):
+        ttl = observe_result(SERIES, series_rows(spacing=60), 'historical', default_ttl=300)
+        self.assertIn(ttl, (61, 62))
+        self.assertEqual(freshness.get_cadence('S1')['interval'], 60.0)
+
+    def test_explicit_ttl_and_interactive_queries_keep_the_default(self):
+        self.assertEqual(observe_result(SERIES, series_rows(), 'historical', default_ttl=300, adaptive=False), 300)
+        self.assertEqual(observe_result(SERIES, series_rows(), 'interactive', default_ttl=300), 300)
+
+    def test_closed_range(self):
+        query = (
+            "Telemetry | where comms_serial contains 'S2' "
+            "| where localtime between (datetime(2024-06-01 00:00:00) .. datetime(2024-06-02 00:00:00))"
+        )
+        self.assertEqual(observe_result(query, series_rows(), 'historical', default_ttl=300), TTL_CLOSED_SECONDS)
+
+    def test_unchanged_results_are_counted_as_wasted(self):
+        before = freshness.get_freshness_stats()
+        observe_result(SERIES, series_rows(), 'historical', default_ttl=300)
+        observe_result(SERIES, series_rows(), 'historical', default_ttl=300)
+        after = freshness.get_freshness_stats()
+        self.assertEqual(after['executed_queries'] - before['executed_queries'], 2)
+        self.assertEqual(after['wasted_queries'] - before['wasted_queries'], 1)
+
+
+class CachedQueryTests(FakeAdxMixin, SimpleTestCase):
+    query = (
+        "Telemetry | where comms_serial contains 'S1' | where name contains '/BMS/MODULE1/STAT/V' "
+        "| summarize arg_max(localtime, value_double) by name"
+    )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_query_hits_cache(self):
+        client = self.install_client(LatestValueKustoClient(localtime=datetime.utcnow().isoformat()))
+        first = adx_service.query_adx_cached(self.query)
+        self.assertNotIn('cached', first)
+        second = adx_service.query_adx_cached(self.query)
+        self.assertTrue(second['cached'])
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(second['data'], first['data'])
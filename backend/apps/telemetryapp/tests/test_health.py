@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import health
+
+
+def probe(status='ok', latency_ms=1.0):
+    return lambda: {'status': status, 'latency_ms': latency_ms}
+
+
+class HealthMixin:
+    def setUp(self):
+        cache.clear()
+        for patcher in (
+            mock.patch.object(health, '_snapshot', None),
+            mock.patch.object(health, 'HEALTH_PROBE_ENABLED', False),
+            mock.patch.object(health, 'probe_redis', lambda: None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def use_probes(self, database=probe(), adx=probe()):
+        for patcher in (
+            mock.patch.object(health, 'probe_database', database),
+            mock.patch.object(health, 'probe_adx', adx),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class RunProbesTests(HealthMixin, SimpleTestCase):
+    def test_status(self):
+        self.use_probes()
+        self.assertEqual(health.run_probes()['status'], health.STATUS_HEALTHY)
+        self.use_probes(adx=probe('error: timeout', 5000.0))
+        self.assertEqual(health.run_probes()['status'], health.STATUS_DEGRADED)
+        self.use_probes(database=probe('error: locked'))
+        self.assertEqual(health.run_probes()['status'], health.STATUS_UNHEALTHY)
+
+    def test_latency_windows_continue(self):
+        self.use_probes(database=probe(latency_ms=2.0), adx=probe('not configured', None))
+        snapshot = health.run_probes(health.run_probes())
+        self.assertEqual(snapshot['latency_windows']['database'], [2.0, 2.0])
+        self.assertEqual((snapshot['probes']['database']['p50'], snapshot['probes']['database']['samples']), (2.0, 2))
+        self.assertEqual(snapshot['probes']['adx']['samples'], 0)
+
+    def test_failed_probes_are_not_sampled(self):
+        self.use_probes(adx=probe('error: timeout', 5000.0))
+        self.assertIsNone(health.run_probes()['probes']['adx']['p99'])
+
+
+class RefreshTests(HealthMixin, SimpleTestCase):
+    def test_lease_holder_probes_and_others_copy(self):
+        self.use_probes()
+        with mock.patch.object(health, 'run_probes', wraps=health.run_probes) as run_probes:
+            first = health.refresh()
+            self.assertEqual(health.refresh(), first)
+            self.assertEqual(run_probes.call_count, 1)
+            health.refresh(force=True)
+            self.assertEqual(run_probes.call_count, 2)
+
+    def test_snapshot_is_reused_until_it_expires(self):
+        self.use_probes()
+        snapshot = health.get_snapshot()
+        self.assertIs(health.get_snapshot(), snapshot)
+        with mock.patch.object(health.time, 'time', return_value=snapshot['checked_at'] + health.HEALTH_SNAPSHOT_MAX_AGE + 1):
+            self.assertIsNot(health.get_snapshot(), snapshot)
+
+
+class HealthCheckViewTests(HealthMixin, TestCase):
+    url = '/api/health/'
+
+    def test_healthy(self):
+        self.use_probes(adx=probe('not configured', None))
+        response = APIClient().get(self.url)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['checks'], {'database': 'ok', 'adx': 'not configured'})
+        self.assertIn('p95', body['probes']['database'])
+
+    def test_degraded_still_serves(self):
+        self.use_probes(adx=probe('error: timeout', 5000.0))
+        response = APIClient().get(self.url)
+        self.assertEqual((response.status_code, response.json()['status']), (200, health.STATUS_DEGRADED))
+
+    def test_unhealthy(self):
+        self.use_probes(database=probe('error: locked'))
+        response = APIClient().get(self.url)
+        self.assertEqual((response.status_code, response.json()['status']), (503, health.STATUS_UNHEALTHY))
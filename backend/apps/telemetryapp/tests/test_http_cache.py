@@ -0,0 +1,85 @@
+import gzip
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp.http_cache import etag_matches, telemetry_etag
+
+from .utils import FakeAdxMixin, LatestValueKustoClient
+
+
+class EtagTests(SimpleTestCase):
+    etag = '"20250101T000000-abc"'
+
+    def test_matches(self):
+        self.assertTrue(etag_matches(self.etag, self.etag))
+        self.assertTrue(etag_matches(f'"other", {self.etag}', self.etag))
+        self.assertTrue(etag_matches('*', self.etag))
+
+    def test_encoding_suffix_is_ignored(self):
+        self.assertTrue(etag_matches('"20250101T000000-abc-gzip"', self.etag))
+        self.assertTrue(etag_matches('"20250101T000000-abc-br"', self.etag))
+
+    def test_no_match(self):
+        self.assertFalse(etag_matches(None, self.etag))
+        self.assertFalse(etag_matches('"other"', self.etag))
+        self.assertFalse(etag_matches(f'W/{self.etag}', self.etag))
+
+    def test_etag_tracks_newest_localtime_and_content(self):
+        data = {'telemetry': {'a': {'value': 1, 'localtime': '2025-01-01T00:00:00'}}}
+        tag = telemetry_etag(data)
+        self.assertTrue(tag.startswith('"20250101T000000-'))
+        data['telemetry']['a']['value'] = 2
+        self.assertNotEqual(telemetry_etag(data), tag)
+
+
+class ConditionalBatchTelemetryTests(FakeAdxMixin, TestCase):
+    url = '/api/batch_telemetry/'
+    names = ['/INV/DCPORT/STAT/PV1/V', '/BMS/MODULE1/STAT/V']
+
+    def setUp(self):
+        cache.clear()
+        self.kusto = self.install_client(LatestValueKustoClient())
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_get_match_is_not_modified(self):
+        response = self.client.get(self.url, {'serial': 'S1', 'telemetry_names': ','.join(self.names)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['telemetry']), set(self.names))
+        again = self.client.get(self.url, {'serial': 'S1', 'telemetry_names': self.names}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_changed_data_is_sent_again(self):
+        response = self.client.get(self.url, {'serial': 'S1', 'telemetry_names': self.names})
+        cache.clear()
+        self.kusto.value = 2.0
+        again = self.client.get(self.url, {'serial': 'S1', 'telemetry_names': self.names}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertNotEqual(again['ETag'], response['ETag'])
+
+    def test_post_match_is_precondition_failed(self):
+        body = {'serial': 'S1', 'telemetry_names': self.names}
+        response = self.client.post(self.url, body, format='json')
+        self.assertEqual(response.status_code, 200)
+        again = self.client.post(self.url, body, format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 412)
+
+    def test_large_responses_are_compressed(self):
+        params = {'serial': 'S1', 'telemetry_names': [f'/SIM/METRIC/{i:03d}' for i in range(40)]}
+        plain = self.client.get(self.url, params)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertGreater(len(plain.content), 1024)
+
+        response = self.client.get(self.url, params, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'], f'{plain["ETag"][:-1]}-gzip"')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+
+        again = self.client.get(self.url, params, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
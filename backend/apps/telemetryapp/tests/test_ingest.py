@@ -0,0 +1,89 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import ingest
+from telemetryapp.models import Telemetry
+
+from .utils import telemetry_row
+
+
+class ValidateRowsTests(SimpleTestCase):
+    def test_valid_rows(self):
+        columns, valid, errors = ingest.validate_rows([telemetry_row(), telemetry_row()])
+        self.assertEqual(valid.tolist(), [True, True])
+        self.assertEqual(errors, [])
+        self.assertEqual(columns['WIFI_SIGNAL_STRENGTH'], [-50, -50])
+
+    def test_rejected_rows(self):
+        rows = [
+            telemetry_row(),
+            'not an object',
+            telemetry_row(inverter_grid_L1_V_RMS='230'),
+            telemetry_row(WIFI_SIGNAL_STRENGTH=1.5),
+            telemetry_row(WIFI_FREQ_BAND='x' * 21),
+            telemetry_row(inverter_grid_L1_I_RMS=True),
+        ]
+        _, valid, errors = ingest.validate_rows(rows, offset=10)
+        self.assertEqual(valid.tolist(), [True, False, False, False, False, False])
+        self.assertEqual(
+            sorted((e['row'], e.get('field')) for e in errors),
+            [
+                (11, None),
+                (12, 'inverter_grid_L1_V_RMS'),
+                (13, 'WIFI_SIGNAL_STRENGTH'),
+                (14, 'WIFI_FREQ_BAND'),
+                (15, 'inverter_grid_L1_I_RMS'),
+            ],
+        )
+
+    def test_chunked(self):
+        self.assertEqual(list(ingest.chunked(iter(range(5)), 2)), [[0, 1], [2, 3], [4]])
+
+
+class IngestTests(TestCase):
+    def test_inserts_valid_rows(self):
+        result = ingest.ingest_rows(iter([telemetry_row(), telemetry_row(WIFI_FREQ_BAND='')]))
+        self.assertEqual((result['received'], result['inserted'], result['rejected']), (2, 1, 1))
+        self.assertEqual(Telemetry.objects.count(), 1)
+
+    def test_malformed_payload_inserts_nothing(self):
+        lines = [json.dumps(telemetry_row()).encode()] * 3 + [b'{bad json']
+        with mock.patch.object(ingest, 'INGEST_CHUNK_ROWS', 2):
+            with self.assertRaises(ingest.IngestError):
+                ingest.ingest_rows(ingest.iter_ndjson_rows(lines))
+        self.assertEqual(Telemetry.objects.count(), 0)
+
+    def test_too_many_rows_inserts_nothing(self):
+        with mock.patch.object(ingest, 'INGEST_CHUNK_ROWS', 2), mock.patch.object(ingest, 'INGEST_MAX_ROWS', 3):
+            with self.assertRaises(ingest.IngestError):
+                ingest.ingest_rows(iter([telemetry_row()] * 4))
+        self.assertEqual(Telemetry.objects.count(), 0)
+
+
+class IngestViewTests(TestCase):
+    url = '/api/telemetry/ingest/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='device'))
+
+    def test_json_array(self):
+        response = self.client.post(self.url, [telemetry_row(), telemetry_row(WIFI_SIGNAL_STRENGTH='x')], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['inserted'], response.json()['rejected']), (1, 1))
+
+    def test_ndjson_stream(self):
+        body = b'\n'.join(json.dumps(telemetry_row()).encode() for _ in range(3))
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Telemetry.objects.count(), 3)
+
+    def test_only_invalid_rows_is_bad_request(self):
+        response = self.client.post(self.url, {'rows': [telemetry_row(WIFI_FREQ_BAND='')]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['field'], 'WIFI_FREQ_BAND')
+        self.assertEqual(self.client.post(self.url, {'rows': 'nope'}, format='json').status_code, 400)
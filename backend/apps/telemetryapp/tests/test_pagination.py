@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from telemetryapp.models import Telemetry
+from telemetryapp.pagination import TelemetryKeysetPagination, parse_timestamp
+
+from .utils import telemetry_row
+
+
+class PaginationTests(TestCase):
+    url = '/api/telemetry/'
+
+    @classmethod
+    def setUpTestData(cls):
+        Telemetry.objects.bulk_create([Telemetry(**telemetry_row()) for _ in range(7)])
+        # Shared timestamps for some rows so ties on created_at are paged by id
+        stamp = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        ids = list(Telemetry.objects.order_by('id').values_list('id', flat=True))
+        Telemetry.objects.filter(id__in=ids[:4]).update(created_at=stamp)
+        Telemetry.objects.filter(id__in=ids[4:]).update(created_at=stamp + timedelta(hours=1))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_cursor_round_trip(self):
+        created_at = datetime(2025, 1, 1, 12, 30, tzinfo=timezone.utc)
+        cursor = TelemetryKeysetPagination.encode_cursor(created_at, 42)
+        self.assertEqual(TelemetryKeysetPagination.decode_cursor(cursor), (created_at, 42))
+        with self.assertRaises(ValidationError):
+            TelemetryKeysetPagination.decode_cursor('not-a-cursor')
+
+    def test_parse_timestamp(self):
+        self.assertEqual(parse_timestamp('2025-01-01T00:00:00Z', 'start'), datetime(2025, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(parse_timestamp('2025-01-01T00:00:00', 'start').tzinfo, timezone.utc)
+        with self.assertRaises(ValidationError):
+            parse_timestamp('yesterday', 'start')
+
+    def test_pages_cover_every_row_once(self):
+        expected = list(Telemetry.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        seen = []
+        response = self.client.get(self.url, {'page_size': 3})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen.extend(row['id'] for row in body['results'])
+            if body['next'] is None:
+                break
+            response = self.client.get(body['next'])
+        self.assertEqual(seen, expected)
+
+    def test_time_range(self):
+        response = self.client.get(self.url, {'start': '2025-01-01T00:30:00Z'})
+        self.assertEqual(len(response.json()['results']), 3)
+        response = self.client.get(self.url, {'end': '2025-01-01T00:30:00Z'})
+        self.assertEqual(len(response.json()['results']), 4)
+
+    def test_bad_parameters(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'page_size': 'x'}, {'start': 'yesterday'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
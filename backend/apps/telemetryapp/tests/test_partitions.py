@@ -0,0 +1,66 @@
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from telemetryapp import partitions
+from telemetryapp.models import Telemetry
+
+from .utils import telemetry_row
+
+NOW = datetime(2025, 3, 15, 12, 0, tzinfo=timezone.utc)
+
+
+class PeriodTests(SimpleTestCase):
+    def test_month_periods(self):
+        start = partitions.period_start(NOW, 'month')
+        self.assertEqual(start, datetime(2025, 3, 1, tzinfo=timezone.utc))
+        self.assertEqual(partitions.partition_name(start, 'month'), 'telemetryapp_telemetry_p202503')
+        self.assertEqual(partitions.next_period(datetime(2025, 1, 1, tzinfo=timezone.utc), 'month'),
+                         datetime(2025, 2, 1, tzinfo=timezone.utc))
+        self.assertEqual(partitions.next_period(datetime(2025, 12, 1, tzinfo=timezone.utc), 'month'),
+                         datetime(2026, 1, 1, tzinfo=timezone.utc))
+
+    def test_day_periods(self):
+        start = partitions.period_start(NOW, 'day')
+        self.assertEqual(start, datetime(2025, 3, 15, tzinfo=timezone.utc))
+        self.assertEqual(partitions.partition_name(start, 'day'), 'telemetryapp_telemetry_p20250315')
+        self.assertEqual(partitions.next_period(start, 'day'), datetime(2025, 3, 16, tzinfo=timezone.utc))
+
+    def test_periods_are_utc(self):
+        local = NOW.astimezone(timezone(timedelta(hours=14)))  # already the 16th locally
+        self.assertEqual(partitions.period_start(local, 'day'), datetime(2025, 3, 15, tzinfo=timezone.utc))
+
+    def test_unsupported_interval(self):
+        with self.assertRaises(ValueError):
+            partitions.period_start(NOW, 'week')
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        Telemetry.objects.bulk_create([Telemetry(**telemetry_row()) for _ in range(5)])
+        ids = list(Telemetry.objects.order_by('id').values_list('id', flat=True))
+        Telemetry.objects.filter(id__in=ids[:3]).update(created_at=NOW - timedelta(days=40))
+        Telemetry.objects.filter(id__in=ids[3:]).update(created_at=NOW - timedelta(days=1))
+
+    def test_sqlite_is_not_partitioned(self):
+        self.assertFalse(partitions.is_partitioned())
+
+    def test_expired_rows_are_deleted_in_batches(self):
+        self.assertEqual(partitions.delete_expired_rows(30, now=NOW, dry_run=True), 3)
+        self.assertEqual(Telemetry.objects.count(), 5)
+        self.assertEqual(partitions.delete_expired_rows(30, now=NOW, batch_size=2), 3)
+        self.assertEqual(Telemetry.objects.count(), 2)
+
+    def test_retention_disabled(self):
+        self.assertEqual(partitions.delete_expired_rows(0, now=NOW), 0)
+        self.assertEqual(Telemetry.objects.count(), 5)
+
+    def test_manage_partitions_on_sqlite(self):
+        out = io.StringIO()
+        call_command('manage_partitions', '--retention-days', '3650', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['vendor'], report['partitioned'], report['deleted_rows']), ('sqlite', False, 0))
+        self.assertNotIn('partitions', report)
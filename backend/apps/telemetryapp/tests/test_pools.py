@@ -0,0 +1,85 @@
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+
+from telemetryapp import pools
+from telemetryapp.pools import InstrumentedHTTPConnectionPool, KustoHTTPAdapter, PoolMetrics
+
+
+class PoolsMixin:
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(pools, 'WORKER_THREADS', 8),
+            mock.patch.dict(pools._metrics, clear=True),
+            mock.patch.dict(pools._redis_pools, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class PoolSizeTests(PoolsMixin, SimpleTestCase):
+    def test_sizes_follow_worker_threads(self):
+        self.assertEqual((pools.adx_pool_size(), pools.redis_pool_size()), (12, 12))
+        pools.set_worker_threads(None)
+        self.assertEqual(pools.WORKER_THREADS, 8)
+        with mock.patch.object(pools, 'ADX_HTTP_POOL_MAXSIZE', 3):
+            self.assertEqual(pools.adx_pool_size(), 3)
+
+
+class PoolMetricsTests(PoolsMixin, SimpleTestCase):
+    def test_snapshot(self):
+        metrics = PoolMetrics('test')
+        for waited in (0.001, 0.003):
+            metrics.record_checkout(waited, in_use=2)
+        metrics.count('overflow')
+        metrics.usage = lambda: (2, 1, 4)
+        stats = metrics.snapshot()
+        self.assertEqual((stats['checkouts'], stats['wait_avg_ms'], stats['wait_max_ms']), (2, 2.0, 3.0))
+        self.assertEqual((stats['overflow'], stats['peak_in_use'], stats['utilization']), (1, 2, 0.5))
+
+    def test_reset_after_fork_keeps_usage(self):
+        metrics = pools.get_metrics('adx:cluster')
+        metrics.usage = lambda: (0, 0, 4)
+        metrics.record_checkout(0.01, in_use=1)
+        pools.reset_after_fork()
+        stats = pools.get_pool_stats()['pools']['adx:cluster']
+        self.assertEqual((stats['checkouts'], stats['size']), (0, 4))
+
+
+class InstrumentedPoolTests(PoolsMixin, SimpleTestCase):
+    def test_checkouts_and_overflow(self):
+        pool = InstrumentedHTTPConnectionPool('adx.local', maxsize=1)
+        first = pool._get_conn()
+        self.assertEqual(pool.usage(), (1, 0, 1))
+        pool._get_conn()
+        pool._put_conn(first)
+        stats = pools.get_pool_stats()['pools']['adx:adx.local']
+        self.assertEqual((stats['checkouts'], stats['connections_created'], stats['overflow']), (2, 2, 1))
+        self.assertEqual((stats['in_use'], stats['idle']), (0, 1))
+
+    def test_adapter_is_mounted_on_kusto_sessions(self):
+        client = mock.Mock(_session=requests.Session())
+        pools.configure_kusto_client(client)
+        adapter = client._session.get_adapter('https://cluster.kusto.windows.net')
+        self.assertIsInstance(adapter, KustoHTTPAdapter)
+        self.assertEqual(adapter._pool_maxsize, 12)
+        pool = adapter.poolmanager.connection_from_url('https://cluster.kusto.windows.net')
+        self.assertEqual(pool.metrics.name, 'adx:cluster.kusto.windows.net')
+        pools.configure_kusto_client(mock.Mock(_session=None))
+
+
+class RedisPoolTests(PoolsMixin, SimpleTestCase):
+    url = 'redis://cache.local:6379/1'
+
+    def test_one_pool_per_url(self):
+        pool = pools.get_redis_pool(self.url)
+        self.assertIs(pools.get_redis_pool(self.url, max_connections=1), pool)
+        self.assertEqual(pool.max_connections, 12)
+        self.assertEqual(pools.get_pool_stats()['pools']['redis:cache.local']['size'], 12)
+        self.assertIs(pools.SharedRedisConnectionPool.from_url(self.url), pool)
+
+    def test_without_url(self):
+        with mock.patch.dict('os.environ', {'REDIS_URL': ''}):
+            self.assertIsNone(pools.get_redis_pool())
+            self.assertIsNone(pools.get_redis())
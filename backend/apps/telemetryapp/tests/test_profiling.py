@@ -0,0 +1,95 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import profiling
+from telemetryapp.authentication import issue_tokens_for_user
+from telemetryapp.permissions import ADMIN_GROUP
+
+
+class ProfileDirMixin:
+    def use_temp_profile_dir(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.profile_dir = Path(tmp.name)
+        patcher = mock.patch.object(profiling, 'PROFILE_DIR', self.profile_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class ProfileStorageTests(ProfileDirMixin, SimpleTestCase):
+    def setUp(self):
+        self.use_temp_profile_dir()
+
+    def save(self, request_id, started_at):
+        meta = {'route': '/api/batch_telemetry/', 'request_id': request_id, 'started_at': started_at}
+        return profiling.save_profile(profiling.MODE_SAMPLE, 'view;query 3\n', meta)
+
+    def test_requested_mode(self):
+        factory = RequestFactory()
+        self.assertEqual(profiling.requested_mode(factory.get('/', HTTP_X_PROFILE='1')), 'sample')
+        self.assertEqual(profiling.requested_mode(factory.get('/', {'_profile': 'cprofile'})), 'cprofile')
+        self.assertIsNone(profiling.requested_mode(factory.get('/', HTTP_X_PROFILE='perf')))
+        self.assertIsNone(profiling.requested_mode(factory.get('/')))
+
+    def test_saved_profiles_are_listed_newest_first(self):
+        old = self.save('r1', time.time() - 60)
+        new = self.save('r2', time.time())
+        self.assertEqual([meta['name'] for meta in profiling.list_profiles()], [new, old])
+        self.assertEqual(profiling.profile_path(new).read_text(), 'view;query 3\n')
+        self.assertIsNone(profiling.profile_path('../settings.py'))
+        self.assertIsNone(profiling.profile_path('missing.folded'))
+
+    def test_retention_keeps_the_newest(self):
+        names = [self.save(f'r{i}', time.time()) for i in range(3)]
+        for age, name in enumerate(reversed(names)):
+            os.utime(self.profile_dir / name, (time.time() - age, time.time() - age))
+        self.assertEqual(profiling.apply_retention(max_files=2), 1)
+        self.assertEqual([meta['name'] for meta in profiling.list_profiles()], names[:0:-1])
+
+
+class ProfilingMiddlewareTests(ProfileDirMixin, TestCase):
+    def setUp(self):
+        self.use_temp_profile_dir()
+        self.admin = User.objects.create(username='admin')
+        self.admin.groups.add(Group.objects.create(name=ADMIN_GROUP))
+        self.viewer = User.objects.create(username='viewer')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens_for_user(user).access_token}')
+        return client
+
+    def test_admin_requests_are_profiled(self):
+        client = self.client_for(self.admin)
+        response = client.get('/api/auth/me/', HTTP_X_PROFILE='cprofile')
+        name = response['X-Profile-Id']
+        self.assertTrue(name.endswith('.prof'))
+
+        listing = client.get('/api/profiles/').json()
+        self.assertEqual(listing['profiles'][0]['route'], '/api/auth/me/')
+        self.assertEqual(listing['profiles'][0]['user'], 'admin')
+        download = client.get(f'/api/profiles/{name}/')
+        self.assertEqual(download.status_code, 200)
+        download.close()
+        self.assertEqual(client.get('/api/profiles/nope.prof/').status_code, 404)
+
+    def test_other_users_are_not_profiled(self):
+        client = self.client_for(self.viewer)
+        response = client.get('/api/auth/me/', HTTP_X_PROFILE='sample')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(list(self.profile_dir.iterdir()), [])
+        self.assertEqual(client.get('/api/profiles/').status_code, 403)
+
+    def test_one_profile_at_a_time(self):
+        request = RequestFactory().get('/api/auth/me/')
+        with profiling._profile_slot:
+            _, name = profiling.profile_call('sample', lambda r: mock.Mock(status_code=200), request, self.admin)
+        self.assertIsNone(name)
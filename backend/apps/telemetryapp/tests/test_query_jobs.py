@@ -0,0 +1,114 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import jobs
+
+ROWS = [{'localtime': f'2024-06-01T00:0{i}:00', 'value': i} for i in range(5)]
+
+
+class JobsDirMixin:
+    """Keep job files in a temporary directory."""
+
+    def use_temp_jobs_dir(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(jobs, 'JOBS_DIR', Path(tmp.name) / 'jobs')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait(self, job_id):
+        for _ in range(100):
+            meta = jobs.get_job(job_id)
+            if meta['status'] in (jobs.STATUS_DONE, jobs.STATUS_FAILED):
+                return meta
+            time.sleep(0.05)
+        self.fail(f"Job {job_id} did not finish")
+
+
+class JobTests(JobsDirMixin, SimpleTestCase):
+    def setUp(self):
+        self.use_temp_jobs_dir()
+
+    def test_job_runs_and_is_reused(self):
+        params = {'serial': 'S1', 'hours': 24}
+        job = jobs.submit_job('query', params, lambda job_id, p: {'rows': p['hours']})
+        self.assertEqual(len(job['id']), 32)
+        self.assertNotEqual(job['id'], jobs.make_job_key('query', params))
+
+        meta = self.wait(job['id'])
+        self.assertEqual(meta['status'], jobs.STATUS_DONE)
+        self.assertEqual(meta['result'], {'rows': 24})
+        self.assertEqual(jobs.submit_job('query', params, lambda job_id, p: {})['id'], job['id'])
+        self.assertEqual(os.stat(jobs.job_dir(job['id'])).st_mode & 0o777, 0o700)
+
+    def test_jobs_are_not_shared_between_users(self):
+        params = {'serial': 'S1'}
+        mine = jobs.submit_job('query', params, lambda job_id, p: {}, user='a')
+        theirs = jobs.submit_job('query', params, lambda job_id, p: {}, user='b')
+        self.assertNotEqual(mine['id'], theirs['id'])
+        self.assertEqual((self.wait(mine['id'])['user'], self.wait(theirs['id'])['user']), ('a', 'b'))
+
+    def test_failed_job_is_resubmitted(self):
+        def fail(job_id, params):
+            raise RuntimeError('boom')
+
+        params = {'serial': 'S2'}
+        job = jobs.submit_job('query', params, fail)
+        meta = self.wait(job['id'])
+        self.assertEqual((meta['status'], meta['error']), (jobs.STATUS_FAILED, 'boom'))
+
+        retry = jobs.submit_job('query', params, lambda job_id, p: {})
+        self.assertNotEqual(retry['id'], job['id'])
+        self.assertEqual(self.wait(retry['id'])['status'], jobs.STATUS_DONE)
+
+    def test_unknown_or_invalid_id(self):
+        self.assertIsNone(jobs.get_job('0' * 32))
+        self.assertIsNone(jobs.get_job('../etc'))
+
+
+class QueryJobViewTests(JobsDirMixin, TestCase):
+    def setUp(self):
+        self.use_temp_jobs_dir()
+        for patcher in (
+            mock.patch('telemetryapp.adx_optimized.query_adx', return_value=ROWS),
+            mock.patch.object(jobs, 'QUERY_JOB_PAGE_SIZE', 2),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.owner = APIClient()
+        self.owner.force_authenticate(User.objects.create(username='owner'))
+        self.other = APIClient()
+        self.other.force_authenticate(User.objects.create(username='other'))
+
+    def submit(self, client):
+        response = client.post('/api/query_jobs/', {'kql': 'Telemetry | take 5'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        self.wait(job_id)
+        return job_id
+
+    def test_results_are_paged(self):
+        job_id = self.submit(self.owner)
+        status = self.owner.get(f'/api/query_jobs/{job_id}/').json()
+        self.assertEqual(status['result'], {'total_rows': 5, 'total_pages': 3, 'page_size': 2})
+
+        pages = [self.owner.get(f'/api/query_jobs/{job_id}/results/', {'page': p}).json()['data'] for p in range(3)]
+        self.assertEqual([row for page in pages for row in page], ROWS)
+        self.assertEqual(self.owner.get(f'/api/query_jobs/{job_id}/results/', {'page': 3}).status_code, 404)
+        self.assertEqual(self.owner.get(f'/api/query_jobs/{job_id}/results/', {'page': 'x'}).status_code, 400)
+
+    def test_other_users_get_404(self):
+        job_id = self.submit(self.owner)
+        self.assertEqual(self.other.get(f'/api/query_jobs/{job_id}/').status_code, 404)
+        self.assertEqual(self.other.get(f'/api/query_jobs/{job_id}/results/').status_code, 404)
+        self.assertNotEqual(self.submit(self.other), job_id)
+
+    def test_kql_is_required(self):
+        self.assertEqual(self.owner.post('/api/query_jobs/', {}, format='json').status_code, 400)
@@ -0,0 +1,100 @@
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from telemetryapp import adx_optimized, query_log
+from telemetryapp.query_log import PARAM_MARKER, fingerprint_query, load_workload, record_query, render_query
+
+
+class QueryFingerprintTests(SimpleTestCase):
+    def test_literals_are_lifted(self):
+        query = "Telemetry | where comms_serial == 'S1' and value_double > 2.5 | take 10"
+        fingerprint, template, params = fingerprint_query(query)
+        self.assertEqual(params, ["'S1'", '2.5', '10'])
+        self.assertEqual(template.count(PARAM_MARKER), 3)
+        self.assertEqual(render_query(template, params), query)
+
+    def test_same_shape_same_fingerprint(self):
+        one = fingerprint_query("Telemetry | where comms_serial == 'S1' | take 10")
+        two = fingerprint_query("Telemetry\n|   where comms_serial == 'S2'\n| take 500")
+        other = fingerprint_query("Alarms | where comms_serial == 'S1' | take 10")
+        self.assertEqual(one[0], two[0])
+        self.assertNotEqual(one[0], other[0])
+
+    def test_names_are_not_lifted(self):
+        query = "Telemetry | where name has 'PV1' and localtime > ago(1h) | where localtime > datetime(2024-01-01 00:00:00)"
+        _, template, params = fingerprint_query(query)
+        self.assertEqual(params, ["'PV1'", 'datetime(2024-01-01 00:00:00)'])
+        self.assertIn('ago(1h)', template)
+
+    def test_render_checks_param_count(self):
+        _, template, params = fingerprint_query("Telemetry | take 10")
+        with self.assertRaises(ValueError):
+            render_query(template, params + ['1'])
+
+
+class QueryLogMixin:
+    """Record to a temporary directory with a fresh handler."""
+
+    def use_temp_log_dir(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.log_dir = Path(tmp.name)
+        for patcher in (
+            mock.patch.object(query_log, 'QUERY_LOG_ENABLED', True),
+            mock.patch.object(query_log, 'QUERY_LOG_DIR', self.log_dir),
+            mock.patch.object(query_log, '_handler', None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: query_log._handler and query_log._handler.close())
+
+
+class RecorderTests(QueryLogMixin, SimpleTestCase):
+    def setUp(self):
+        self.use_temp_log_dir()
+
+    def test_recorded_queries_are_replayable(self):
+        queries = [f"Telemetry | where comms_serial == 'S{i}' | take 10" for i in range(3)]
+        for query in queries:
+            record_query(query, 'svc', 'miss', time.monotonic(), row_count=10)
+
+        lines = [json.loads(line) for path in self.log_dir.iterdir() for line in path.read_text().splitlines()]
+        self.assertEqual(sum(line.get('k') == 'tpl' for line in lines), 1)
+        workload = load_workload([str(self.log_dir)])
+        self.assertEqual([entry['query'] for entry in workload], queries)
+        self.assertEqual({(entry['u'], entry['src'], entry['n']) for entry in workload}, {('background', 'background', 10)})
+
+    def test_disabled_recorder_writes_nothing(self):
+        with mock.patch.object(query_log, 'QUERY_LOG_ENABLED', False):
+            record_query("Telemetry | take 1", 'svc', 'miss', time.monotonic())
+        self.assertEqual(list(self.log_dir.iterdir()), [])
+
+
+class ReplayTests(QueryLogMixin, SimpleTestCase):
+    def setUp(self):
+        self.use_temp_log_dir()
+        patcher = mock.patch.object(adx_optimized, '_rate_limiter', adx_optimized.RateLimiter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for i in range(3):
+            record_query(f"Telemetry | where comms_serial == 'S{i}' | take 10", 'opt', 'miss', time.monotonic())
+
+    def replay(self, *args):
+        out = io.StringIO()
+        call_command('replay_query_log', str(self.log_dir), '--json', '--speed', '10', *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_replay_reports_calls(self):
+        report = self.replay()
+        self.assertEqual((report['queries'], report['adx_calls'], report['errors']), (3, 3, 0))
+
+    def test_rate_limited_queries_are_counted(self):
+        report = self.replay('--max-qpm', '1')
+        self.assertEqual((report['adx_calls'], report['rate_limited'], report['errors']), (1, 2, 0))
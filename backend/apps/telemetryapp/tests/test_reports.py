@@ -0,0 +1,141 @@
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import jobs
+from telemetryapp.reports import render_report_pdf
+
+DEVICE = [{'comms_serial': 'S1', 'device_type': 'INV', 'fw_version': '1.0.0'}]
+
+
+def fake_report_query(kql_query, **kwargs):
+    return DEVICE if 'DevInfo' in kql_query else []
+
+
+def make_report(serial, events=5):
+    return {
+        'serial': serial,
+        'start': '2024-06-01T00:00:00',
+        'end': '2024-06-02T00:00:00',
+        'generated_at': '2024-06-02T08:00:00',
+        'sections': {
+            'device': DEVICE[0],
+            'pv': {'title': 'Solar PV', 'metrics': [
+                {'label': 'PV1 Voltage', 'value': '310.2', 'min': '0.0', 'avg': '201.5', 'max': '402.1',
+                 'unit': 'V', 'samples': 1440},
+            ]},
+            'events': {
+                'total': events,
+                'by_severity': {'critical': events, 'warning': 0, 'info': 0},
+                'top': [{'name': f'Fault {i}', 'severity': 'critical', 'count': 1} for i in range(events)],
+            },
+        },
+    }
+
+
+def page_count(path):
+    return len(re.findall(rb'/Type\s*/Page\b(?!s)', Path(path).read_bytes()))
+
+
+class RenderReportTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def test_renders_pdf(self):
+        path = self.dir / 'report.pdf'
+        render_report_pdf(make_report('S1'), path)
+        self.assertTrue(path.read_bytes().startswith(b'%PDF'))
+        self.assertEqual(page_count(path), 1)
+        self.assertNotIn('matplotlib.pyplot', sys.modules)
+
+    def test_long_sections_continue_on_new_pages(self):
+        path = self.dir / 'report.pdf'
+        render_report_pdf(make_report('S1', events=80), path)
+        self.assertGreater(page_count(path), 1)
+
+    def test_empty_report(self):
+        path = self.dir / 'report.pdf'
+        render_report_pdf(dict(make_report('S1'), sections={}), path)
+        self.assertEqual(page_count(path), 1)
+
+    def test_concurrent_renders(self):
+        paths = [self.dir / f'report-{i}.pdf' for i in range(4)]
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda i: render_report_pdf(make_report(f'S{i}', events=40), paths[i]), range(4)))
+        for path in paths:
+            self.assertTrue(path.read_bytes().startswith(b'%PDF'))
+            self.assertEqual(page_count(path), page_count(paths[0]))
+
+
+class ReportJobTests(TestCase):
+    body = {'serial': 'S1', 'start': '2024-06-01 00:00:00.0000', 'end': '2024-06-02 00:00:00.0000'}
+
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for patcher in (
+            mock.patch.object(jobs, 'JOBS_DIR', Path(tmp.name) / 'jobs'),
+            mock.patch('telemetryapp.reports.query_adx', side_effect=fake_report_query),
+            mock.patch('telemetryapp.adx_events.query_adx', return_value=[]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.owner = APIClient()
+        self.owner.force_authenticate(User.objects.create(username='owner'))
+        self.other = APIClient()
+        self.other.force_authenticate(User.objects.create(username='other'))
+
+    def wait(self, job_id):
+        for _ in range(200):
+            meta = jobs.get_job(job_id)
+            if meta['status'] in (jobs.STATUS_DONE, jobs.STATUS_FAILED):
+                return meta
+            time.sleep(0.05)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_report_is_generated_and_downloaded(self):
+        response = self.owner.post('/api/reports/', self.body, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        self.assertEqual(self.wait(job_id)['status'], jobs.STATUS_DONE)
+
+        status = self.owner.get(f'/api/reports/{job_id}/')
+        self.assertEqual(status.json()['status'], jobs.STATUS_DONE)
+        pdf = self.owner.get(f'/api/reports/{job_id}/download/')
+        self.assertEqual(pdf.status_code, 200)
+        self.assertTrue(b''.join(pdf.streaming_content).startswith(b'%PDF'))
+        report = self.owner.get(f'/api/reports/{job_id}/download/', {'format': 'json'})
+        self.assertIn(b'"fw_version"', b''.join(report.streaming_content))
+
+        # Repeated clicks share the job
+        again = self.owner.post('/api/reports/', self.body, format='json')
+        self.assertEqual(again.json()['id'], job_id)
+
+    def test_other_users_cannot_see_a_report(self):
+        job_id = self.owner.post('/api/reports/', self.body, format='json').json()['id']
+        self.wait(job_id)
+        self.assertEqual(self.other.get(f'/api/reports/{job_id}/').status_code, 404)
+        self.assertEqual(self.other.get(f'/api/reports/{job_id}/download/').status_code, 404)
+
+        # The same request from another user is its own job
+        mine = self.other.post('/api/reports/', self.body, format='json').json()['id']
+        self.assertNotEqual(mine, job_id)
+        self.wait(mine)
+        self.assertEqual(self.other.get(f'/api/reports/{mine}/').status_code, 200)
+
+    def test_bad_requests(self):
+        for body in (dict(self.body, serial=''), dict(self.body, format='xls'), dict(self.body, sections=['nope'])):
+            self.assertEqual(self.owner.post('/api/reports/', body, format='json').status_code, 400, body)
+        self.assertEqual(self.owner.get('/api/reports/0123456789abcdef/').status_code, 404)
@@ -0,0 +1,159 @@
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import adx_optimized, result_cursor
+from telemetryapp.adx_events import query_events_summary
+from telemetryapp.compare import compare_devices
+from telemetryapp.fake_kusto import SyntheticKustoClient
+from telemetryapp.result_limits import (
+    RESULT_LIMITS, ResultTooLargeError, apply_limit, get_limit, is_truncation_error, kusto_limit_options,
+)
+
+from .utils import FakeAdxMixin
+
+ROWS = [{'name': f'/M{i}', 'value': i} for i in range(10)]
+
+
+def limit(**overrides):
+    return dict({'max_rows': 0, 'max_bytes': 0, 'mode': 'truncate', 'endpoint': 'test'}, **overrides)
+
+
+class ApplyLimitTests(SimpleTestCase):
+    def test_complete_result(self):
+        self.assertEqual(apply_limit(ROWS, limit(max_rows=10)), (ROWS, None))
+
+    def test_row_limit(self):
+        rows, info = apply_limit(ROWS, limit(max_rows=4))
+        self.assertEqual(rows, ROWS[:4])
+        self.assertEqual((info['reason'], info['returned_rows']), ('rows', 4))
+
+    def test_byte_limit(self):
+        rows, info = apply_limit(ROWS, limit(max_bytes=100))
+        self.assertLess(len(rows), len(ROWS))
+        self.assertEqual(info['reason'], 'bytes')
+
+    def test_server_truncation(self):
+        rows, info = apply_limit(ROWS, limit(), server_truncated=True)
+        self.assertEqual((rows, info['reason']), (ROWS, 'server'))
+
+    def test_reject_mode(self):
+        with self.assertRaises(ResultTooLargeError) as raised:
+            apply_limit(ROWS, limit(max_rows=4, mode='reject'))
+        self.assertEqual(raised.exception.info['reason'], 'rows')
+
+    def test_limits_and_options(self):
+        self.assertEqual(get_limit('unknown')['max_rows'], RESULT_LIMITS['default']['max_rows'])
+        self.assertEqual(get_limit(None)['endpoint'], 'default')
+        self.assertEqual(kusto_limit_options(limit(max_rows=4, max_bytes=100)),
+                         {'truncationmaxrecords': 5, 'truncationmaxsize': 100})
+        self.assertTrue(is_truncation_error(Exception('E_QUERY_RESULT_SET_TOO_LARGE: result was truncated')))
+        self.assertFalse(is_truncation_error(Exception('Semantic error')))
+
+
+class TruncatedResultTests(FakeAdxMixin, SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.kusto = self.install_client(SyntheticKustoClient())
+        patcher = mock.patch.dict(RESULT_LIMITS['default'], max_rows=20)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_query_adx_truncates_and_skips_the_cache(self):
+        query = "Telemetry | where comms_serial contains 'S1' | take 50"
+        rows = adx_optimized.query_adx(query)
+        self.assertEqual((len(rows), rows.truncation['reason']), (20, 'rows'))
+        adx_optimized.query_adx(query)
+        self.assertEqual(self.kusto.calls, 2)
+
+    def test_truncated_chunks_are_not_cached(self):
+        start = datetime(2024, 6, 1)
+        result = compare_devices(['S1', 'S2'], '/BMS/MODULE1/STAT/V', start, start + timedelta(hours=10), step=300)
+        self.assertTrue(result['truncated'])
+        again = compare_devices(['S1', 'S2'], '/BMS/MODULE1/STAT/V', start, start + timedelta(hours=10), step=300)
+        self.assertEqual(again['cache']['chunks_cached'], 0)
+
+    def test_truncated_event_chunks_are_not_cached(self):
+        rows = adx_optimized.QueryResult([])
+        rows.truncation = {'truncated': True, 'reason': 'rows'}
+        start = datetime(2024, 6, 1)
+        with mock.patch('telemetryapp.adx_events.query_adx', return_value=rows) as query:
+            summary = query_events_summary('S1', start, start + timedelta(days=3))
+            self.assertEqual(summary['truncation'], rows.truncation)
+            again = query_events_summary('S1', start, start + timedelta(days=3))
+        self.assertEqual(again['cache']['closed_chunks_cached'], 0)
+        self.assertEqual(query.call_count, 2)
+
+
+class CursorMixin(FakeAdxMixin):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(result_cursor, 'CURSORS_DIR', Path(tmp.name) / 'cursors')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.install_client(SyntheticKustoClient())
+
+
+class CursorTests(CursorMixin, SimpleTestCase):
+    query = "Telemetry | where comms_serial contains 'S1' | take 25"
+
+    def test_spooled_pages(self):
+        meta = result_cursor.open_cursor(self.query, page_size=10, user='a')
+        self.assertEqual((meta['backend'], meta['total_rows'], meta['total_pages']), ('spool', 25, 3))
+        pages = [result_cursor.read_cursor_page(meta, page) for page in range(3)]
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertIsNone(result_cursor.read_cursor_page(meta, 3))
+        self.assertEqual(result_cursor.get_cursor(meta['cursor'])['user'], 'a')
+        self.assertNotIn('user', result_cursor.public_cursor(meta))
+
+    def test_client_queries_never_become_control_commands(self):
+        with mock.patch.object(result_cursor, 'CURSOR_BACKEND', 'stored'), \
+                mock.patch.object(result_cursor, '_open_stored', return_value=25) as stored:
+            meta = result_cursor.open_cursor(self.query, page_size=10)
+            self.assertEqual(meta['backend'], 'spool')
+            stored.assert_not_called()
+            self.assertEqual(result_cursor.open_cursor(self.query, trusted=True)['backend'], 'stored')
+            stored.assert_called_once()
+
+    def test_expired_cursors_are_removed(self):
+        meta = result_cursor.open_cursor(self.query, page_size=10)
+        with mock.patch.object(result_cursor.time, 'time', return_value=meta['expires_at'] + 1):
+            self.assertIsNone(result_cursor.get_cursor(meta['cursor']))
+            self.assertEqual(result_cursor.cleanup_expired_cursors(), 1)
+        self.assertIsNone(result_cursor.get_cursor('../' + meta['cursor']))
+
+
+class QueryAdxViewTests(CursorMixin, TestCase):
+    url = '/api/query_adx/'
+    query = "Telemetry | where comms_serial contains 'S1' | take 25"
+
+    def setUp(self):
+        super().setUp()
+        self.owner = APIClient()
+        self.owner.force_authenticate(User.objects.create(username='owner'))
+
+    def test_cursor_pages_belong_to_their_user(self):
+        first = self.owner.post(self.url, {'kql': self.query, 'page_size': 10}, format='json').json()
+        self.assertEqual((len(first['data']), first['total_pages']), (10, 3))
+        page = self.owner.get(f"{self.url}cursor/{first['cursor']}/", {'page': 2}).json()
+        self.assertEqual(len(page['data']), 5)
+        self.assertEqual(self.owner.get(f"{self.url}cursor/{first['cursor']}/", {'page': 3}).status_code, 404)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create(username='other'))
+        self.assertEqual(other.get(f"{self.url}cursor/{first['cursor']}/").status_code, 404)
+
+    def test_over_limit_results(self):
+        with mock.patch.dict(RESULT_LIMITS['query_adx'], max_rows=5):
+            body = self.owner.post(self.url, {'kql': self.query}, format='json').json()
+            self.assertEqual((len(body['data']), body['truncated']), (5, True))
+            with mock.patch.dict(RESULT_LIMITS['query_adx'], mode='reject'):
+                self.assertEqual(self.owner.post(self.url, {'kql': self.query}, format='json').status_code, 413)
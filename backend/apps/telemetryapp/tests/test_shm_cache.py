@@ -0,0 +1,112 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from telemetryapp.shm_cache import SharedMemoryCache
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = os.path.join(tmp.name, 'cache')
+        self.cache = self.make_cache()
+        self.addCleanup(self.cache._region.mm.close)
+
+    def make_cache(self, location=None):
+        return SharedMemoryCache(location or os.path.join(self.directory, 'test'), {
+            'OPTIONS': {'MAX_BYTES': 64 * 1024, 'STRIPES': 1, 'MAX_ENTRIES': 100},
+        })
+
+    def test_set_get_delete(self):
+        self.cache.set('k', {'rows': [1, 2, 3]}, 30)
+        self.assertEqual(self.cache.get('k'), {'rows': [1, 2, 3]})
+        self.assertTrue(self.cache.has_key('k'))
+        self.assertFalse(self.cache.add('k', 'other', 30))
+        self.assertTrue(self.cache.delete('k'))
+        self.assertIsNone(self.cache.get('k'))
+        self.assertEqual(self.cache.get('k', 'default'), 'default')
+
+    def test_set_many_get_many(self):
+        self.cache.set_many({'a': 1, 'b': 2}, 30)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+
+    def test_expiry(self):
+        self.cache.set('k', 'v', 30)
+        with mock.patch('telemetryapp.shm_cache.time.time', return_value=time.time() + 31):
+            self.assertIsNone(self.cache.get('k'))
+        self.cache.set('k', 'v', 0)
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_incr(self):
+        self.cache.set('n', 1, 30)
+        self.assertEqual(self.cache.incr('n', 2), 3)
+        self.assertEqual(self.cache.get('n'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_oversized_replacement_drops_old_value(self):
+        self.cache.set('k', 'small', 30)
+        self.cache.set('k', b'x' * (128 * 1024), 30)
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_ring_evicts_oldest(self):
+        for i in range(40):
+            self.cache.set(f'k{i}', b'x' * 4096, 30)
+        self.assertIsNone(self.cache.get('k0'))
+        self.assertEqual(self.cache.get('k39'), b'x' * 4096)
+
+    def test_shared_between_instances(self):
+        self.cache.set('k', 'v', 30)
+        self.assertEqual(self.make_cache().get('k'), 'v')
+
+    def test_clear(self):
+        self.cache.set('k', 'v', 30)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_symlinked_file_is_refused(self):
+        target = os.path.join(self.directory, 'target')
+        Path(target).touch(mode=0o600)
+        location = os.path.join(self.directory, 'linked')
+        os.symlink(target, f"{location}.1x133x65536.v1")
+        with self.assertRaises(OSError):
+            self.make_cache(location)
+
+    def test_shared_directory_is_refused(self):
+        os.chmod(self.directory, 0o777)
+        self.addCleanup(os.chmod, self.directory, 0o700)
+        with self.assertRaises(ImproperlyConfigured):
+            self.make_cache(os.path.join(self.directory, 'other'))
+
+
+    def test_touch(self):
+        self.cache.set('k', 'v', 30)
+        with mock.patch('telemetryapp.shm_cache.time.time', return_value=time.time() + 20):
+            self.assertTrue(self.cache.touch('k', 30))
+        with mock.patch('telemetryapp.shm_cache.time.time', return_value=time.time() + 40):
+            self.assertEqual(self.cache.get('k'), 'v')
+        self.assertFalse(self.cache.touch('missing', 30))
+
+    def test_stats(self):
+        self.cache.set('k', 'v', 30)
+        self.cache.get('k')
+        self.cache.get('missing')
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['backend'], stats['entries'], stats['writes']), ('shm', 1, 1))
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+
+    def test_shared_between_processes(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.make_cache().set('k', 'from child', 30)
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(self.cache.get('k'), 'from child')
@@ -0,0 +1,32 @@
+import io
+import json
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from telemetryapp.management.commands.profile_startup import _parse_importtime
+
+
+class ProfileStartupTests(SimpleTestCase):
+    def test_parse_importtime(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:      2500 |       9000 | django.core\n"
+            "Traceback: not an import line\n"
+        )
+        self.assertEqual(_parse_importtime(stderr), {
+            '_io': {'self_ms': 0.12, 'cumulative_ms': 0.12},
+            'django.core': {'self_ms': 2.5, 'cumulative_ms': 9.0},
+        })
+
+    def test_adx_sdk_is_not_imported_at_startup(self):
+        out = io.StringIO()
+        call_command(
+            'profile_startup', '--runs', '1', '--path', '/api/auth/me/', '--budget-ms', '0',
+            '--forbid', 'azure.kusto,msal', '--json', stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['forbidden_imports'], [])
+        self.assertEqual(report['status_code'], 401)
+        self.assertGreater(report['modules_imported'], 0)
@@ -0,0 +1,110 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from telemetryapp import tracing
+from telemetryapp.tracing import Trace, server_timing_header, span, start_trace, to_otlp, traced
+
+TRACEPARENT = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+
+
+class TraceMixin:
+    def open_trace(self, **kwargs):
+        trace = Trace('req-1', **kwargs)
+        tokens = tracing.activate(trace, 'root')
+        self.addCleanup(tracing.deactivate, tokens)
+        return trace
+
+
+class SpanTests(TraceMixin, SimpleTestCase):
+    def test_outside_a_trace(self):
+        with span('adx') as attributes:
+            self.assertIsNone(attributes)
+
+    def test_spans_nest_and_record_errors(self):
+        trace = self.open_trace()
+        with span('outer', kind='batch') as attributes:
+            attributes['rows'] = 3
+            with self.assertRaises(ValueError), span('inner'):
+                raise ValueError('boom')
+        inner, outer = trace.spans
+        self.assertEqual((inner['parent_id'], inner['status']), (outer['span_id'], 'error'))
+        self.assertEqual((outer['parent_id'], outer['attributes']), ('root', {'kind': 'batch', 'rows': 3}))
+
+    def test_span_cap(self):
+        trace = self.open_trace()
+        with mock.patch.object(tracing, 'TRACE_MAX_SPANS', 2):
+            for _ in range(3):
+                traced('step')(lambda: None)()
+        self.assertEqual((len(trace.spans), trace.dropped), (2, 1))
+
+    def test_server_timing(self):
+        trace = self.open_trace()
+        for _ in range(2):
+            with span('adx'):
+                pass
+        header = server_timing_header(trace, 12.34)
+        self.assertRegex(header, r'^adx;dur=\d+\.\d;desc="2x", total;dur=12\.3$')
+
+
+class StartTraceTests(SimpleTestCase):
+    def test_traceparent_is_continued(self):
+        with mock.patch.object(tracing, 'TRACE_SAMPLE_RATE', 0):
+            trace = start_trace('abc-123', TRACEPARENT)
+        self.assertEqual((trace.request_id, trace.trace_id), ('abc-123', '0af7651916cd43dd8448eb211c80319c'))
+        self.assertEqual(trace.parent_span_id, 'b7ad6b7169203331')
+        self.assertTrue(trace.sampled)
+
+    def test_invalid_headers_are_replaced(self):
+        with mock.patch.object(tracing, 'TRACE_SAMPLE_RATE', 0):
+            trace = start_trace('bad id\n', 'garbage')
+        self.assertEqual(len(trace.request_id), 32)
+        self.assertIsNone(trace.parent_span_id)
+        self.assertFalse(trace.sampled)
+
+    def test_otlp(self):
+        trace = Trace('req-1', trace_id='a' * 32)
+        root = {'name': 'GET /api/x', 'span_id': 'b' * 16, 'parent_id': None, 'start_ms': 0.0,
+                'duration_ms': 5.0, 'status': 'error', 'attributes': {'http.status_code': 502, 'ok': False}}
+        spans = to_otlp(trace, root)['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual((spans[0]['kind'], spans[0]['status'], spans[0]['traceId']), (2, {'code': 2}, 'a' * 32))
+        self.assertEqual(spans[0]['attributes'], [
+            {'key': 'http.status_code', 'value': {'intValue': '502'}},
+            {'key': 'ok', 'value': {'boolValue': False}},
+        ])
+
+
+class TracingMiddlewareTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.export_dir = Path(tmp.name)
+        for patcher in (
+            mock.patch.object(tracing, 'TRACE_EXPORT_DIR', self.export_dir),
+            mock.patch.object(tracing, '_handler', None),
+            mock.patch.object(tracing, 'TRACE_SAMPLE_RATE', 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: tracing._handler and tracing._handler.close())
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+
+    def test_headers(self):
+        response = self.client.get('/api/auth/me/', HTTP_X_REQUEST_ID='abc-123')
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+        self.assertIn('render;dur=', response['Server-Timing'])
+        self.assertRegex(response['Server-Timing'], r'total;dur=\d+\.\d$')
+        self.assertEqual(list(self.export_dir.iterdir()), [])
+
+    def test_sampled_traces_are_exported(self):
+        self.client.get('/api/auth/me/', HTTP_TRACEPARENT=TRACEPARENT)
+        record = json.loads(next(self.export_dir.iterdir()).read_text())
+        self.assertEqual(record['trace_id'], '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(record['name'], 'GET /api/auth/me/')
+        self.assertEqual(record['attributes']['http.status_code'], 200)
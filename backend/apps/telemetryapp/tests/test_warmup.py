@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from telemetryapp import adx_optimized, jobs, warmup
+from telemetryapp.fake_kusto import FakeKustoClient
+from telemetryapp.reports import TELEMETRY_SECTIONS
+
+from .utils import FakeAdxMixin
+
+
+class WarmupTests(FakeAdxMixin, TestCase):
+    def setUp(self):
+        startup = mock.patch.dict(warmup._startup, first_request_ms=None)
+        startup.start()
+        self.addCleanup(startup.stop)
+        self.kusto = self.install_client(FakeKustoClient())
+
+    def test_disabled_by_default(self):
+        self.assertEqual(warmup.warm_up_worker(), {})
+        self.assertEqual(self.kusto.calls, 0)
+
+    def test_warm_up_acquires_the_token_with_a_probe(self):
+        latency = adx_optimized.LatencyTracker()
+        with mock.patch.object(warmup, 'WORKER_WARMUP', True), mock.patch.object(adx_optimized, '_latency', latency):
+            steps = warmup.warm_up_worker()
+        self.assertEqual(list(steps), ['urlconf', 'database', 'cache', 'adx_client', 'adx_token'])
+        self.assertEqual(self.kusto.calls, 1)
+        # The probe's latency does not tighten the timeouts of real queries
+        self.assertEqual({name for name, samples in latency.samples.items() if samples}, {'probe'})
+        self.assertEqual(warmup.get_startup_stats()['warmup_steps'], steps)
+
+    def test_first_request_is_recorded_once(self):
+        warmup.record_first_request(0.25)
+        warmup.record_first_request(1.0)
+        self.assertEqual(warmup.get_startup_stats()['first_request_ms'], 250.0)
+
+    def test_metric_catalog(self):
+        catalog = warmup.get_metric_catalog()
+        self.assertEqual(catalog, sorted(set(catalog)))
+        names = {name for _, metrics in TELEMETRY_SECTIONS.values() for name, _, _ in metrics}
+        self.assertEqual(set(catalog), names)
+
+
+class ReinitAfterForkTests(FakeAdxMixin, SimpleTestCase):
+    def setUp(self):
+        startup = mock.patch.dict(warmup._startup)
+        startup.start()
+        self.addCleanup(startup.stop)
+        self.install_client(FakeKustoClient())
+
+    def test_reinit_after_fork_drops_inherited_state(self):
+        breaker = adx_optimized._breaker
+        jobs._executors['query'] = object()
+        self.addCleanup(jobs._executors.clear)
+        warmup.reinit_after_fork()
+        self.assertIsNone(adx_optimized._client)
+        self.assertIsNot(adx_optimized._breaker, breaker)
+        self.assertEqual(jobs._executors, {})
+        self.assertEqual(warmup.get_startup_stats()['pid'], warmup.os.getpid())
@@ -0,0 +1,61 @@
+import re
+from unittest import mock
+
+from telemetryapp import adx_optimized
+from telemetryapp.fake_kusto import FakeKustoClient
+
+
+class FailingKustoClient(FakeKustoClient):
+    """Fake client whose queries fail with a (non-service) query error."""
+
+    def rows_for(self, query):
+        raise ValueError('Semantic error: unknown column')
+
+
+class FakeAdxMixin:
+    """
+    Install a fake Kusto client for the test and restore the previous one
+    after, with a fresh circuit breaker and rate limiter.
+    """
+
+    def install_client(self, client):
+        previous = adx_optimized._client
+        adx_optimized.set_adx_client(client)
+        self.addCleanup(adx_optimized.set_adx_client, previous)
+        for name, value in (('_breaker', adx_optimized.CircuitBreaker()), ('_rate_limiter', adx_optimized.RateLimiter())):
+            patcher = mock.patch.object(adx_optimized, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return client
+
+
+class LatestValueKustoClient(FakeKustoClient):
+    """Fake client answering latest-value queries with one row per `name contains/has '...'`."""
+
+    _name_re = re.compile(r"name (?:contains|has) '([^']+)'")
+
+    def __init__(self, value=1.0, localtime='2025-01-01T00:00:00'):
+        super().__init__()
+        self.value = value
+        self.localtime = localtime
+
+    def rows_for(self, query):
+        return [
+            {'name': name, 'localtime': self.localtime, 'value_double': self.value, 'value': self.value}
+            for name in self._name_re.findall(query)
+        ]
+
+
+def telemetry_row(**overrides):
+    """A valid Telemetry row (ingest payload / model kwargs)."""
+    row = {
+        'inverter_grid_L1_V_RMS': 230.1,
+        'inverter_grid_L2_V_RMS': 229.8,
+        'inverter_grid_L1_I_RMS': 4.2,
+        'BGCS_RELAY_STATUS': 'ON',
+        'ETP_CONTAINER_STATUS': 'OK',
+        'WIFI_SIGNAL_STRENGTH': -50,
+        'WIFI_FREQ_BAND': '5G',
+    }
+    row.update(overrides)
+    return row
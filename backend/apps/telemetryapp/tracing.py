@@ -0,0 +1,282 @@
+"""
+Request Tracing
+
+Lightweight spans that show where a slow request spent its time: JWT
+auth, cache lookups, ADX, view code and DRF rendering.
+
+Design:
+1. TracingMiddleware (middleware.py) opens a trace per request, keyed
+   by a request id (X-Request-ID from the client or proxy, else
+   generated) and returned in the X-Request-ID response header
+2. `span(name)` is a context manager (and `traced(name)` a decorator)
+   that records start and duration with perf_counter and links to the
+   enclosing span through a ContextVar; without an open trace (background
+   threads, management commands) it costs one ContextVar lookup
+3. Every traced request gets a `Server-Timing` header (total time per
+   span name), so browser dev tools show the breakdown directly
+4. A TRACE_SAMPLE_RATE share of traces (plus any request whose W3C
+   `traceparent` has the sampled flag) is exported to a per-process
+   rotating file: one JSON object per trace ('jsonl'), or one OTLP/JSON
+   `resourceSpans` export request per line ('otlp'), which OpenTelemetry
+   collectors can ingest with the otlpjsonfile receiver
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'True').lower() in ('true', '1', 'yes')
+
+# Share of requests exported (Server-Timing is sent for all traced requests)
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0.01))
+
+# 'jsonl' (one trace per line) or 'otlp' (OTLP/JSON export requests)
+TRACE_EXPORT_FORMAT = os.getenv('TRACE_EXPORT_FORMAT', 'jsonl')
+TRACE_EXPORT_DIR = Path(os.getenv('TRACE_EXPORT_DIR', settings.BASE_DIR / 'logs' / 'traces'))
+TRACE_EXPORT_MAX_BYTES = int(os.getenv('TRACE_EXPORT_MAX_BYTES', 20 * 1024 * 1024))
+TRACE_EXPORT_BACKUP_COUNT = int(os.getenv('TRACE_EXPORT_BACKUP_COUNT', 5))
+
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'True').lower() in ('true', '1', 'yes')
+
+# Spans beyond this per trace are counted but not kept
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', 200))
+
+SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'telemetryapp')
+
+_TRACEPARENT_RE = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+_REQUEST_ID_RE = re.compile(r'^[\w.:-]{1,128}$')
+
+
+# =============================================================================
+# Traces & Spans
+# =============================================================================
+
+class Trace:
+    """Spans of one request."""
+
+    __slots__ = ('trace_id', 'request_id', 'parent_span_id', 'sampled', 'started', 'started_ns', 'spans', 'dropped')
+
+    def __init__(self, request_id: str, trace_id: str = None, parent_span_id: str = None, sampled: bool = False):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.request_id = request_id
+        self.parent_span_id = parent_span_id
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.started_ns = time.time_ns()
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped = 0
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('trace', default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar('trace_span', default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a span of the current request's trace.
+
+    Yields the span's attribute dict (or None outside a trace) so callers
+    can add results such as row counts.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    span_id = new_span_id()
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        yield attributes
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        _current_span.reset(token)
+        if len(trace.spans) < TRACE_MAX_SPANS:
+            trace.spans.append({
+                'name': name,
+                'span_id': span_id,
+                'parent_id': parent,
+                'start_ms': round((started - trace.started) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                'status': status,
+                'attributes': attributes,
+            })
+        else:
+            trace.dropped += 1
+
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def activate(trace: Trace, span_id: str):
+    """Make a trace and its root span current; returns tokens for deactivate()."""
+    return _current_trace.set(trace), _current_span.set(span_id)
+
+
+def deactivate(tokens) -> None:
+    trace_token, span_token = tokens
+    _current_span.reset(span_token)
+    _current_trace.reset(trace_token)
+
+
+def start_trace(request_id: Optional[str] = None, traceparent: Optional[str] = None) -> Trace:
+    """Open a trace for the current context (see TracingMiddleware)."""
+    if not request_id or not _REQUEST_ID_RE.match(request_id):
+        request_id = uuid.uuid4().hex
+    trace_id = parent_span_id = None
+    sampled = random.random() < TRACE_SAMPLE_RATE
+    match = _TRACEPARENT_RE.match(traceparent or '')
+    if match:
+        trace_id, parent_span_id = match.group(1), match.group(2)
+        sampled = sampled or int(match.group(3), 16) & 1 == 1
+    return Trace(request_id, trace_id, parent_span_id, sampled)
+
+
+# =============================================================================
+# Server-Timing
+# =============================================================================
+
+def server_timing_header(trace: Trace, total_ms: float) -> str:
+    """Server-Timing value with the summed duration per span name."""
+    totals: Dict[str, List[float]] = {}
+    for item in trace.spans:
+        entry = totals.setdefault(item['name'], [0.0, 0])
+        entry[0] += item['duration_ms']
+        entry[1] += 1
+    parts = []
+    for name, (duration, count) in totals.items():
+        metric = re.sub(r'[^\w-]', '-', name)
+        desc = f';desc="{count}x"' if count > 1 else ''
+        parts.append(f"{metric};dur={duration:.1f}{desc}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ', '.join(parts)
+
+
+# =============================================================================
+# Export
+# =============================================================================
+
+_handler: Optional[RotatingFileHandler] = None
+_handler_pid: Optional[int] = None
+_write_lock = threading.Lock()
+
+
+def _get_handler() -> RotatingFileHandler:
+    global _handler, _handler_pid
+    pid = os.getpid()
+    if _handler is None or _handler_pid != pid:
+        # One file per process: gunicorn workers never share a file
+        TRACE_EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+        suffix = 'otlp.jsonl' if TRACE_EXPORT_FORMAT == 'otlp' else 'jsonl'
+        _handler = RotatingFileHandler(
+            TRACE_EXPORT_DIR / f"traces-{pid}.{suffix}",
+            maxBytes=TRACE_EXPORT_MAX_BYTES,
+            backupCount=TRACE_EXPORT_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+        _handler.setFormatter(logging.Formatter('%(message)s'))
+        _handler_pid = pid
+    return _handler
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp(trace: Trace, root: Dict[str, Any]) -> Dict[str, Any]:
+    """One OTLP/JSON ExportTraceServiceRequest for a finished trace."""
+    def otlp_span(item):
+        start_ns = trace.started_ns + int(item['start_ms'] * 1e6)
+        return {
+            'traceId': trace.trace_id,
+            'spanId': item['span_id'],
+            'parentSpanId': item['parent_id'] or '',
+            'name': item['name'],
+            'kind': 2 if item is root else 1,  # SERVER for the request, INTERNAL otherwise
+            'startTimeUnixNano': str(start_ns),
+            'endTimeUnixNano': str(start_ns + int(item['duration_ms'] * 1e6)),
+            'attributes': _otlp_attributes(item['attributes']),
+            'status': {'code': 2 if item['status'] == 'error' else 1},
+        }
+
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': SERVICE_NAME, 'process.pid': os.getpid()})},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [otlp_span(root)] + [otlp_span(item) for item in trace.spans],
+            }],
+        }],
+    }
+
+
+def export_trace(trace: Trace, root: Dict[str, Any]) -> None:
+    """Write a sampled trace to the per-process export file. Never raises."""
+    try:
+        if TRACE_EXPORT_FORMAT == 'otlp':
+            record = to_otlp(trace, root)
+        else:
+            record = {
+                'trace_id': trace.trace_id,
+                'request_id': trace.request_id,
+                'ts': trace.started_ns / 1e9,
+                **{key: root[key] for key in ('name', 'duration_ms', 'status')},
+                'attributes': root['attributes'],
+                'spans': trace.spans,
+                'dropped_spans': trace.dropped,
+            }
+        message = json.dumps(record, separators=(',', ':'), default=str)
+        with _write_lock:
+            _get_handler().handle(logging.LogRecord('tracing', logging.INFO, '', 0, message, None, None))
+    except Exception as e:
+        logger.warning(f"Trace export failed: {e}")
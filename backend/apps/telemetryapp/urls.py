@@ -5,10 +5,24 @@ from .views import (
     adx_telemetry, 
     search_serial, 
     query_adx_view, 
+    query_adx_cursor_view,
     health_check,
     batch_telemetry_view,  # NEW: Optimized batch endpoint
     adx_stats_view,        # NEW: Query statistics
     auth_me_view,          # Authentication status check
+    events_summary_view,   # Server-side Events aggregation
+    alarm_series_view,     # Run-length encoded alarm states
+    report_submit_view,    # Background report jobs
+    report_status_view,
+    report_download_view,
+    query_job_submit_view, # Async long-running queries
+    query_job_status_view,
+    query_job_results_view,
+    telemetry_ingest_view, # Bulk Telemetry inserts
+    fleet_overview_view,   # Latest metrics for all serials
+    compare_devices_view,  # One metric across devices
+    profiles_view,         # Admin: stored request profiles
+    profile_download_view,
 )
 
 router = DefaultRouter()
@@ -16,10 +30,12 @@ router.register(r'telemetry', TelemetryViewSet, basename='telemetry')
 
 
 urlpatterns = [
+    path('telemetry/ingest/', telemetry_ingest_view),  # Bulk insert (JSON array or NDJSON)
     path('', include(router.urls)),  # API routes for TelemetryViewSet
     path('adx/', adx_telemetry),     # Endpoint for ADX telemetry query
     path('search_serial/', search_serial), # Endpoint for serial number search
     path('query_adx/', query_adx_view), # Endpoint for generic KQL query (legacy)
+    path('query_adx/cursor/<str:cursor_id>/', query_adx_cursor_view),  # Page of a server-side cursor
     path('health/', health_check),   # Health check endpoint for monitoring
     
     # === AUTHENTICATION ===
@@ -28,5 +44,21 @@ urlpatterns = [
     # === OPTIMIZED ENDPOINTS (Use these for cost efficiency) ===
     path('batch_telemetry/', batch_telemetry_view),  # Batch telemetry (RECOMMENDED)
     path('adx_stats/', adx_stats_view),              # Query statistics/monitoring
+    path('profiles/', profiles_view),                # Admin: list request profiles
+    path('profiles/<str:name>/', profile_download_view),  # Admin: download a profile
+    path('events/summary/', events_summary_view),    # Events counts + timeline histogram
+    path('alarms/series/', alarm_series_view),       # Alarm state transitions (RLE)
+    path('fleet/overview/', fleet_overview_view),    # All serials, one cached query (NOC wall)
+    path('compare/', compare_devices_view),          # One metric, N serials, aligned buckets
+    
+    # === REPORT JOBS ===
+    path('reports/', report_submit_view),                            # Queue a device report
+    path('reports/<str:job_id>/', report_status_view),               # Poll status/progress
+    path('reports/<str:job_id>/download/', report_download_view),    # Download result
+    
+    # === ASYNC QUERY JOBS (long historical queries) ===
+    path('query_jobs/', query_job_submit_view),                          # Submit KQL
+    path('query_jobs/<str:job_id>/', query_job_status_view),             # Poll status/progress
+    path('query_jobs/<str:job_id>/results/', query_job_results_view),    # Fetch a result page
 ]
 
@@ -1,6 +1,7 @@
 from django.shortcuts import render
 from rest_framework.response import Response
-from .adx_service import query_adx
+from .adx_service import query_adx, query_adx_cached, cached_response
+from .adx_optimized import AdxUnavailableError, AdxQueryError
 from django.conf import settings
 
 from django.views.decorators.csrf import ensure_csrf_cookie
@@ -8,12 +9,15 @@ from django.views.decorators.csrf import ensure_csrf_cookie
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from .permissions import IsAdminGroup
+from .authentication import issue_tokens_for_user, apply_user_claims
 from django.contrib.auth import authenticate
 
 
 from rest_framework import viewsets
 from .models import Telemetry
-from .serializers import TelemetrySerializer, RegisterSerializer
+from .serializers import TelemetrySerializer, TelemetryListSerializer, RegisterSerializer
+from .pagination import TelemetryKeysetPagination, filter_time_range
+from rest_framework.exceptions import ValidationError as DRFValidationError
 
 from django.contrib.auth.models import User
 from rest_framework import status
@@ -24,6 +28,29 @@ from rest_framework.permissions import AllowAny
 
 from django.views.decorators.csrf import csrf_exempt
 
+import os
+import time
+import logging
+from datetime import datetime
+from django.http import FileResponse
+from .adx_events import query_events_summary, query_alarm_state_series, OUTPUT_FILTERS, EventsRequestError
+from .jobs import (
+    get_job, job_file, public_job, submit_query_job, read_result_page,
+    JobQueueFull, STATUS_DONE,
+)
+from .reports import submit_report_job, REPORT_SECTIONS, REPORT_FORMATS
+from .http_cache import conditional_telemetry
+from .delta_sync import apply_delta_sync
+from .compare import compare_devices, parse_step, CompareRequestError
+from .fleet import get_fleet_snapshot, fleet_page, FleetQueryError, FLEET_METRICS, FLEET_PAGE_SIZE
+from .ingest import ingest_rows, iter_json_rows, iter_ndjson_rows, IngestError, NDJSON_CONTENT_TYPES
+from .result_limits import ResultTooLargeError
+from .result_cursor import open_cursor, get_cursor, read_cursor_page, public_cursor, CursorError
+from .tracing import span
+from .profiling import list_profiles, profile_path, PROFILE_MAX_FILES
+
+logger = logging.getLogger(__name__)
+
 
 # =============================================================================
 # Cookie Configuration for JWT tokens
@@ -104,7 +131,8 @@ def login_view(request):
     user = authenticate(username=username, password=password)
     if user is not None:
         # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
+        # Tokens carry username/email/groups so API requests skip the DB
+        refresh = issue_tokens_for_user(user)
         access = refresh.access_token
         
         # Create response with user info (but NOT the tokens in body)
@@ -163,12 +191,17 @@ def token_refresh_view(request):
     
     try:
         refresh = RefreshToken(refresh_token)
-        access = refresh.access_token
+        
+        # Re-read the user so the new tokens carry current groups/claims
+        user = User.objects.get(pk=refresh.payload.get('user_id'), is_active=True)
         
         # Create new refresh token if rotation is enabled
         if getattr(settings, 'SIMPLE_JWT', {}).get('ROTATE_REFRESH_TOKENS', False):
             refresh.blacklist()
-            refresh = RefreshToken.for_user(refresh.payload.get('user_id'))
+            refresh = issue_tokens_for_user(user)
+        else:
+            apply_user_claims(refresh, user)
+        access = refresh.access_token
         
         response = Response({"detail": "Token refreshed"})
         set_auth_cookies(response, access, refresh)
@@ -201,15 +234,85 @@ def auth_me_view(request):
 @permission_classes([IsAuthenticated, IsAdminGroup])
 def adx_telemetry(request):
     kql_query = "DevInfo | limit 2"  # Example KQL query
-    data = query_adx(kql_query)
+    try:
+        data = query_adx(kql_query)
+    except AdxUnavailableError as e:
+        return Response({"error": str(e)}, status=503)
+    except AdxQueryError as e:
+        return Response({"error": str(e)}, status=502)
     return Response(data)
 
 
 # Telemetry ViewSet
 class TelemetryViewSet(viewsets.ModelViewSet):
-    queryset = Telemetry.objects.all().order_by('-created_at')
+    """
+    Telemetry CRUD. The list is keyset-paginated newest first and accepts:
+      ?start=&end=     ISO timestamps on created_at (end exclusive)
+      ?fields=a,b      only load and return these columns (plus id, created_at)
+      ?cursor=&page_size=
+    """
+    queryset = Telemetry.objects.all().order_by('-created_at', '-id')
     serializer_class = TelemetrySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TelemetryKeysetPagination
+
+    def get_projection(self):
+        """Validated ?fields= list, or None for all columns."""
+        raw = self.request.query_params.get('fields')
+        if not raw:
+            return None
+        requested = [f.strip() for f in raw.split(',') if f.strip()]
+        unknown = sorted(set(requested) - set(TelemetryListSerializer.FIELD_NAMES) - set(TelemetryListSerializer.ALWAYS))
+        if unknown:
+            raise DRFValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        return [f for f in requested if f not in TelemetryListSerializer.ALWAYS]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        queryset = filter_time_range(queryset, self.request.query_params)
+        projection = self.get_projection()
+        if projection is not None:
+            queryset = queryset.only(*TelemetryListSerializer.ALWAYS, *projection)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list':
+            return TelemetryListSerializer(*args, fields=self.get_projection(), **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
+
+# =============================================================================
+# Bulk Telemetry Ingest
+# =============================================================================
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def telemetry_ingest_view(request):
+    """
+    Insert many Telemetry rows in one request.
+
+    Body: a JSON array of rows (or {"rows": [...]}), or an NDJSON stream
+    with Content-Type: application/x-ndjson (one row per line, read
+    incrementally). Invalid rows are rejected and reported; valid rows are
+    inserted. A malformed payload (400) inserts nothing, so it is safe to
+    retry the whole request.
+
+    Returns: {received, inserted, rejected, errors: [{row, field, error}]}
+    """
+    try:
+        if request.content_type.split(';')[0].strip() in NDJSON_CONTENT_TYPES:
+            rows = iter_ndjson_rows(request.stream or [])
+        else:
+            rows = iter_json_rows(request.data)
+        result = ingest_rows(rows)
+    except IngestError as e:
+        return Response({"error": str(e)}, status=400)
+
+    if not result['inserted'] and result['errors']:
+        return Response(result, status=400)
+    return Response(result, status=201)
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -234,6 +337,10 @@ def search_serial(request):
             return Response({"message": "No serial number found"}, status=404)
         return Response(data)
         
+    except AdxUnavailableError as e:
+        return Response({"error": str(e)}, status=503)
+    except AdxQueryError as e:
+        return Response({"error": str(e)}, status=502)
     except Exception as e:
         return Response({"Error querying ADX": str(e)}, status=500)
 
@@ -241,38 +348,171 @@ def search_serial(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@conditional_telemetry
 def query_adx_view(request):
+    """
+    Run a KQL query.
+    
+    Request body: {"kql": "...", "page_size": 1000}  // page_size optional
+    
+    Results are held to the 'query_adx' row/byte limits: over-limit results
+    come back cut with "truncated": true (or 413 in reject mode). Complete
+    results are cached; a cache hit is sent as the stored JSON bytes with
+    "cached": true, without being decoded and re-encoded. With
+    page_size, the query runs once into a server-side cursor and the first
+    page is returned with a "cursor" to fetch the rest from
+    query_adx/cursor/<cursor>/?page=N.
+    """
     kql_query = request.data.get('kql')
     
     if not kql_query:
         return Response({"error": "KQL query is required"}, status=400)
 
+    page_size = request.data.get('page_size')
+    if page_size is not None:
+        try:
+            page_size = int(page_size)
+        except (TypeError, ValueError):
+            return Response({"error": "page_size must be an integer"}, status=400)
+
     try:
+        if page_size:
+            meta = open_cursor(kql_query, page_size=page_size, user=request.user.username)
+            return Response({'data': read_cursor_page(meta, 0), 'page': 0, **public_cursor(meta)})
+        body = cached_response(kql_query, endpoint='query_adx')
+        if body is not None:
+            return Response(body)
         # Reduced logging - only log errors, not every query
-        data = query_adx(kql_query)
+        data = query_adx(kql_query, endpoint='query_adx', cache_result=True)
         return Response(data)
+    except ResultTooLargeError as e:
+        return Response({"error": str(e), **e.info}, status=413)
+    except AdxUnavailableError as e:
+        return Response({"error": str(e)}, status=503)
+    except (AdxQueryError, CursorError) as e:
+        return Response({"error": str(e)}, status=502)
     except Exception as e:
         print(f"KQL Query Error: {str(e)}")
         return Response({"error querying KQL": str(e)}, status=500)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def query_adx_cursor_view(request, cursor_id):
+    """Fetch one page of a server-side cursor (?page=0) opened by query_adx_view."""
+    meta = get_cursor(cursor_id)
+    if meta is None or meta.get('user') != request.user.username:
+        return Response({"error": "Cursor not found or expired"}, status=404)
+    
+    try:
+        page = int(request.query_params.get('page', 0))
+    except ValueError:
+        return Response({"error": "page must be an integer"}, status=400)
+    
+    try:
+        rows = read_cursor_page(meta, page)
+    except AdxUnavailableError as e:
+        return Response({"error": str(e)}, status=503)
+    if rows is None:
+        return Response({"error": "Page out of range"}, status=404)
+    
+    return Response({'data': rows, 'page': page, **public_cursor(meta)})
+
+
 # =============================================================================
-# OPTIMIZED Batch Telemetry Endpoint (Cost-Efficient)
+# Async Query Jobs (long historical queries beyond the worker timeout)
 # =============================================================================
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+def query_job_submit_view(request):
+    """
+    Queue a long-running KQL query instead of running it in the request thread.
+    
+    Request body: {"kql": "..."}
+    Response (202): {"id": "...", "status": "queued", "progress": 0.0}
+    """
+    kql_query = request.data.get('kql')
+    
+    if not kql_query:
+        return Response({"error": "KQL query is required"}, status=400)
+    
+    try:
+        job = submit_query_job(kql_query, user=request.user.username)
+    except JobQueueFull as e:
+        return Response({"error": str(e)}, status=429)
+    
+    return Response(public_job(job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def query_job_status_view(request, job_id):
+    """Poll a query job's status and progress."""
+    job = get_job(job_id)
+    if job is None or job.get('kind') != 'query' or job.get('user') != request.user.username:
+        return Response({"error": "Query job not found"}, status=404)
+    return Response(public_job(job))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def query_job_results_view(request, job_id):
+    """
+    Fetch one page of a finished query job (?page=0).
+    
+    Response:
+    {
+        "data": [...],
+        "page": 0,
+        "total_pages": 12,
+        "total_rows": 58213,
+        "page_size": 5000
+    }
+    """
+    job = get_job(job_id)
+    if job is None or job.get('kind') != 'query' or job.get('user') != request.user.username:
+        return Response({"error": "Query job not found"}, status=404)
+    if job['status'] != STATUS_DONE:
+        return Response(public_job(job), status=409)
+    
+    try:
+        page = int(request.query_params.get('page', 0))
+    except ValueError:
+        return Response({"error": "page must be an integer"}, status=400)
+    
+    rows = read_result_page(job_id, page)
+    if rows is None:
+        return Response({"error": "Page out of range"}, status=404)
+    
+    return Response({'data': rows, 'page': page, **job['result']})
+
+
+# =============================================================================
+# OPTIMIZED Batch Telemetry Endpoint (Cost-Efficient)
+# =============================================================================
+def _query_list(params, name):
+    """A list query parameter, repeated (?a=x&a=y) or comma-separated (?a=x,y)."""
+    return [item.strip() for value in params.getlist(name) for item in value.split(',') if item.strip()]
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+@conditional_telemetry
 def batch_telemetry_view(request):
     """
     Fetch multiple telemetry metrics in a SINGLE optimized ADX query.
     
     This endpoint reduces ADX costs by:
     1. Combining multiple metric requests into one query
+    2. Serving repeat polls from the shared query cache, with a TTL that
+       follows the device's reporting cadence (freshness.py)
     
     Request body:
     {
         "serial": "device_serial_number",
         "telemetry_names": ["/INV/DCPORT/STAT/PV1/V", "/BMS/MODULE1/STAT/V", ...],
-        "alarm_names": ["/BMS/CLUSTER/EVENT/ALARM/MAIN_RELAY_ERROR", ...]  // optional
+        "alarm_names": ["/BMS/CLUSTER/EVENT/ALARM/MAIN_RELAY_ERROR", ...],  // optional
+        "sync_token": "9f2c...e1.ab12cd34ef56"  // optional, from the previous response
     }
     
     Response:
@@ -284,12 +524,34 @@ def batch_telemetry_view(request):
         "alarms": {
             "/BMS/CLUSTER/EVENT/ALARM/MAIN_RELAY_ERROR": {"value": 0, "localtime": "..."},
             ...
-        }
+        },
+        "sync_token": "4b7a...0c.ab12cd34ef56",
+        "full": true
     }
+
+    Delta sync: when a valid sync_token is sent, "telemetry"/"alarms" only
+    contain metrics whose value or localtime changed since that token,
+    "full" is false, and "removed" lists metrics that no longer have a value.
+
+    GET takes the same fields as query parameters, for polling clients
+    that revalidate: ?serial=...&telemetry_names=a,b&alarm_names=c
+    (names may also be repeated)&sync_token=...
+    
+    Responses carry a strong ETag. On GET, send it back in If-None-Match
+    to get an empty 304 when nothing changed (POST answers a match with
+    412, as HTTP requires for non-GET methods).
     """
-    serial = request.data.get('serial')
-    telemetry_names = request.data.get('telemetry_names', [])
-    alarm_names = request.data.get('alarm_names', [])
+    if request.method == 'GET':
+        params = request.query_params
+        serial = params.get('serial')
+        telemetry_names = _query_list(params, 'telemetry_names')
+        alarm_names = _query_list(params, 'alarm_names')
+        sync_token = params.get('sync_token')
+    else:
+        serial = request.data.get('serial')
+        telemetry_names = request.data.get('telemetry_names', [])
+        alarm_names = request.data.get('alarm_names', [])
+        sync_token = request.data.get('sync_token')
     
     if not serial:
         return Response({"error": "Serial number is required"}, status=400)
@@ -320,22 +582,27 @@ def batch_telemetry_view(request):
             """.strip()
             
             try:
-                data = query_adx(kql_query)
+                data = query_adx_cached(kql_query)
                 rows = data.get('data', []) if isinstance(data, dict) else data
+                if isinstance(data, dict) and data.get('stale'):
+                    result['stale'] = True
                 
-                for row in rows:
-                    name = row.get('name')
-                    if name:
-                        # Map back to requested names (handle contains matching)
-                        for requested in telemetry_names:
-                            if requested in name or name in requested:
-                                result['telemetry'][requested] = {
-                                    'value': row.get('value_double'),
-                                    'localtime': row.get('localtime'),
-                                }
-                                break
+                with span('batch.map', kind='telemetry', rows=len(rows)):
+                    for row in rows:
+                        name = row.get('name')
+                        if name:
+                            # Map back to requested names (handle contains matching)
+                            for requested in telemetry_names:
+                                if requested in name or name in requested:
+                                    result['telemetry'][requested] = {
+                                        'value': row.get('value_double'),
+                                        'localtime': row.get('localtime'),
+                                    }
+                                    break
+            except (AdxUnavailableError, AdxQueryError):
+                raise
             except Exception as e:
-                print(f"Error fetching telemetry batch: {e}")
+                logger.error(f"Error fetching telemetry batch: {e}")
         
         # Fetch alarms batch (single query for all alarms)
         if alarm_names:
@@ -350,34 +617,371 @@ def batch_telemetry_view(request):
             """.strip()
             
             try:
-                data = query_adx(kql_query)
+                data = query_adx_cached(kql_query)
                 rows = data.get('data', []) if isinstance(data, dict) else data
-                print(f"DEBUG alarms: got {len(rows)} rows for alarm_names={alarm_names}")
+                if isinstance(data, dict) and data.get('stale'):
+                    result['stale'] = True
+                logger.debug(f"Alarms batch: {len(rows)} rows for alarm_names={alarm_names}")
                 
-                for row in rows:
-                    name = row.get('name')
-                    print(f"DEBUG alarm row: name={name}, value={row.get('value')}")
-                    if name:
-                        for requested in alarm_names:
-                            if requested in name or name in requested:
-                                result['alarms'][requested] = {
-                                    'value': row.get('value'),
-                                    'localtime': row.get('localtime'),
-                                }
-                                print(f"DEBUG: matched alarm {requested} = {row.get('value')}")
-                                break
+                with span('batch.map', kind='alarms', rows=len(rows)):
+                    for row in rows:
+                        name = row.get('name')
+                        if name:
+                            for requested in alarm_names:
+                                if requested in name or name in requested:
+                                    result['alarms'][requested] = {
+                                        'value': row.get('value'),
+                                        'localtime': row.get('localtime'),
+                                    }
+                                    break
+            except (AdxUnavailableError, AdxQueryError):
+                raise
             except Exception as e:
-                print(f"Error fetching alarms batch: {e}")
+                logger.error(f"Error fetching alarms batch: {e}")
         
+        result = apply_delta_sync(
+            serial,
+            {'telemetry': telemetry_names, 'alarms': alarm_names},
+            result,
+            sync_token,
+        )
         return Response(result)
         
+    except AdxUnavailableError as e:
+        return Response({"error": str(e)}, status=503)
+    except AdxQueryError as e:
+        return Response({"error": str(e)}, status=502)
+    except Exception as e:
+        logger.exception(f"ERROR in batch_telemetry_view: {str(e)}")
+        return Response({"error": str(e)}, status=500)
+
+
+def parse_time_range(data):
+    """
+    Parse 'start'/'end' from request data into naive datetimes.
+    
+    Accepts ISO strings or the 'YYYY-MM-DD HH:MM:SS.0000' format used by the
+    frontend KQL builders. Raises ValueError on missing or invalid values.
+    """
+    start_raw = data.get('start')
+    end_raw = data.get('end')
+    if not start_raw or not end_raw:
+        raise ValueError("start and end are required")
+    
+    start = datetime.fromisoformat(str(start_raw).replace('Z', '+00:00')).replace(tzinfo=None)
+    end = datetime.fromisoformat(str(end_raw).replace('Z', '+00:00')).replace(tzinfo=None)
+    if end <= start:
+        raise ValueError("end must be after start")
+    return start, end
+
+
+# =============================================================================
+# Multi-device Comparison Endpoint (serial x bucket matrix)
+# =============================================================================
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@conditional_telemetry
+def compare_devices_view(request):
+    """
+    One metric across several devices, averaged on a shared time grid.
+
+    Request body:
+    {
+        "serials": ["SN1", "SN2", ...],          // up to COMPARE_MAX_SERIALS
+        "metric": "/INV/DCPORT/STAT/PV1/V",
+        "start": "2024-01-01T00:00:00",
+        "end": "2024-01-02T00:00:00",
+        "step": "5m"                             // optional, seconds or 30s/5m/1h/1d
+    }
+
+    Response:
+    {
+        "metric": "...", "serials": [...],
+        "start": "...", "step_seconds": 300, "step": "5m", "bucket_count": 288,
+        "values": [[v, null, ...], ...],         // one row per serial
+        "stats": {"min": [...], "max": [...], "mean": [...], "coverage": [...]},
+        "stale": false,
+        "cache": {"chunks_cached": 10, "chunks_queried": 2}
+    }
+    """
+    serials = request.data.get('serials')
+    metric = request.data.get('metric')
+    if not isinstance(serials, list) or not serials:
+        return Response({"error": "serials must be a non-empty list"}, status=400)
+    if not metric:
+        return Response({"error": "metric is required"}, status=400)
+
+    try:
+        start, end = parse_time_range(request.data)
+        step = parse_step(request.data.get('step'))
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=400)
+
+    try:
+        result = compare_devices([str(s).strip() for s in serials], metric, start, end, step=step)
+        return Response(result)
+    except CompareRequestError as e:
+        return Response({"error": str(e)}, status=400)
+    except AdxUnavailableError as e:
+        return Response({"error": str(e)}, status=503)
+    except AdxQueryError as e:
+        return Response({"error": str(e)}, status=502)
     except Exception as e:
-        import traceback
-        print(f"ERROR in batch_telemetry_view: {str(e)}")
-        traceback.print_exc()
         return Response({"error": str(e)}, status=500)
 
 
+# =============================================================================
+# Fleet Overview Endpoint (all serials, one cached ADX query)
+# =============================================================================
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@conditional_telemetry
+def fleet_overview_view(request):
+    """
+    Latest fleet metrics for all serials (or a subset) as a paged columnar table.
+
+    Request body (all optional):
+    {
+        "metrics": ["soc", "grid_power", "inverter_state", "wifi_signal", "main_relay_alarm"],
+        "serials": ["SN1", "SN2", ...],   // exact serials
+        "search": "SN1",                  // substring filter
+        "page": 1,
+        "page_size": 500                  // max FLEET_MAX_PAGE_SIZE
+    }
+
+    Response:
+    {
+        "columns": ["serial", "soc", ..., "last_seen"],
+        "data": {"serial": [...], "soc": [...], ..., "last_seen": [...]},
+        "total": 2000, "page": 1, "page_size": 500, "next_page": 2,
+        "generated_at": "...", "stale": false
+    }
+
+    Every page and filter of one refresh window is served from the same
+    cached fleet snapshot (one ADX query per FLEET_CACHE_TTL).
+    """
+    metrics = request.data.get('metrics') or None
+    serials = request.data.get('serials') or None
+    if metrics is not None:
+        if not isinstance(metrics, list):
+            return Response({"error": "metrics must be a list"}, status=400)
+        unknown = sorted(set(metrics) - set(FLEET_METRICS))
+        if unknown:
+            return Response({"error": f"Unknown metrics: {', '.join(unknown)}",
+                             "available": list(FLEET_METRICS)}, status=400)
+    if serials is not None and not isinstance(serials, list):
+        return Response({"error": "serials must be a list"}, status=400)
+    try:
+        page = int(request.data.get('page', 1))
+        page_size = int(request.data.get('page_size', FLEET_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return Response({"error": "page and page_size must be integers"}, status=400)
+
+    try:
+        snapshot = get_fleet_snapshot()
+    except FleetQueryError as e:
+        return Response({"error": str(e)}, status=503)
+
+    return Response(fleet_page(
+        snapshot,
+        metrics=metrics,
+        serials=[str(s).strip() for s in serials] if serials else None,
+        search=(request.data.get('search') or '').strip() or None,
+        page=page,
+        page_size=page_size,
+    ))
+
+
+# =============================================================================
+# Events Summary Endpoint (server-side aggregation)
+# =============================================================================
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def events_summary_view(request):
+    """
+    Aggregate alarm events for the Events page in a single cached call.
+    
+    Request body:
+    {
+        "serial": "device_serial_number",
+        "start": "2024-01-01 00:00:00.0000",
+        "end": "2024-01-08 00:00:00.0000",
+        "output_filter": "1",        // optional: 'all', '1' or '0' (default '1')
+        "step_seconds": 3600         // optional: histogram step (a STEP_LADDER value)
+    }
+    
+    Response:
+    {
+        "total": 1234,
+        "by_name": [{"name": "...", "count": 42, "severity": "critical"}, ...],
+        "by_severity": {"critical": 100, "warning": 300, "info": 834},
+        "histogram": {"buckets": [...], "total": [...], "critical": [...], ...},
+        "step": "1h",
+        ...
+    }
+    """
+    serial = (request.data.get('serial') or '').strip()
+    output_filter = str(request.data.get('output_filter', '1'))
+    
+    if not serial:
+        return Response({"error": "Serial number is required"}, status=400)
+    if output_filter not in OUTPUT_FILTERS:
+        return Response({"error": f"output_filter must be one of {', '.join(OUTPUT_FILTERS)}"}, status=400)
+    
+    try:
+        start, end = parse_time_range(request.data)
+        step = request.data.get('step_seconds')
+        step = int(step) if step else None
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
+        summary = query_events_summary(serial, start, end, output_filter=output_filter, step=step)
+        return Response(summary)
+    except EventsRequestError as e:
+        return Response({"error": str(e)}, status=400)
+    except AdxUnavailableError as e:
+        return Response({"error": str(e)}, status=503)
+    except AdxQueryError as e:
+        return Response({"error": str(e)}, status=502)
+    except Exception as e:
+        return Response({"error": str(e)}, status=500)
+
+
+# =============================================================================
+# Alarm State Series Endpoint (run-length encoded)
+# =============================================================================
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def alarm_series_view(request):
+    """
+    Return an alarm/status signal as state transitions only.
+    
+    Consecutive identical samples are collapsed on the server, so a relay
+    that changes a few times a day returns a few rows instead of thousands.
+    
+    Request body:
+    {
+        "serial": "device_serial_number",
+        "name": "/BMS/CLUSTER/EVENT/ALARM/MAIN_RELAY_ERROR",
+        "start": "2024-01-01 00:00:00.0000",
+        "end": "2024-01-08 00:00:00.0000"
+    }
+    
+    Response:
+    {
+        "localtime": ["2024-01-01T00:00:03", "2024-01-03T11:20:00", ...],
+        "value": [0, 1, ...],
+        "duration_seconds": [213600.0, 42.0, ...],
+        "last_seen": "2024-01-07T23:59:41",
+        ...
+    }
+    """
+    serial = (request.data.get('serial') or '').strip()
+    name = (request.data.get('name') or '').strip()
+    
+    if not serial:
+        return Response({"error": "Serial number is required"}, status=400)
+    if not name:
+        return Response({"error": "Alarm name is required"}, status=400)
+    
+    try:
+        start, end = parse_time_range(request.data)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
+        return Response(query_alarm_state_series(serial, name, start, end))
+    except AdxUnavailableError as e:
+        return Response({"error": str(e)}, status=503)
+    except AdxQueryError as e:
+        return Response({"error": str(e)}, status=502)
+    except Exception as e:
+        return Response({"error": str(e)}, status=500)
+
+
+# =============================================================================
+# Report Jobs (server-side PDF export)
+# =============================================================================
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def report_submit_view(request):
+    """
+    Queue a device report. A user's identical requests share one job and result.
+    
+    Request body:
+    {
+        "serial": "device_serial_number",
+        "start": "2024-01-01 00:00:00.0000",
+        "end": "2024-01-08 00:00:00.0000",
+        "sections": ["device", "pv", "battery", "events"],  // optional (default: all)
+        "format": "pdf"                                     // optional: 'pdf' or 'json'
+    }
+    
+    Response (202): {"id": "...", "status": "queued", "progress": 0.0, ...}
+    """
+    serial = (request.data.get('serial') or '').strip()
+    sections = request.data.get('sections') or list(REPORT_SECTIONS)
+    report_format = request.data.get('format', 'pdf')
+    
+    if not serial:
+        return Response({"error": "Serial number is required"}, status=400)
+    if not isinstance(sections, list) or not set(sections) <= set(REPORT_SECTIONS):
+        return Response({"error": f"sections must be a list of: {', '.join(REPORT_SECTIONS)}"}, status=400)
+    if report_format not in REPORT_FORMATS:
+        return Response({"error": f"format must be one of {', '.join(REPORT_FORMATS)}"}, status=400)
+    
+    try:
+        start, end = parse_time_range(request.data)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
+        job = submit_report_job(serial, start, end, sections, report_format, user=request.user.username)
+    except JobQueueFull as e:
+        return Response({"error": str(e)}, status=429)
+    
+    return Response(public_job(job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_status_view(request, job_id):
+    """Poll a report job's status and progress."""
+    job = get_job(job_id)
+    if job is None or job.get('kind') != 'report' or job.get('user') != request.user.username:
+        return Response({"error": "Report not found"}, status=404)
+    return Response(public_job(job))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_download_view(request, job_id):
+    """Download a finished report (?format=pdf|json)."""
+    job = get_job(job_id)
+    if job is None or job.get('kind') != 'report' or job.get('user') != request.user.username:
+        return Response({"error": "Report not found"}, status=404)
+    if job['status'] != STATUS_DONE:
+        return Response(public_job(job), status=409)
+    
+    report_format = request.query_params.get('format', job['params']['format'])
+    filename = job.get('result', {}).get('files', {}).get(report_format)
+    if not filename:
+        return Response({"error": f"Report is not available as {report_format}"}, status=404)
+    
+    try:
+        report_file = open(job_file(job_id, filename), 'rb')
+    except FileNotFoundError:
+        return Response({"error": "Report file no longer exists"}, status=404)
+    
+    serial = job['params']['serial']
+    return FileResponse(
+        report_file,
+        as_attachment=True,
+        filename=f"report-{serial}-{job_id[:8]}.{report_format}",
+    )
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def adx_stats_view(request):
@@ -385,11 +989,35 @@ def adx_stats_view(request):
     Get ADX query statistics for monitoring costs.
     """
     from .adx_optimized import get_query_stats
+    from .warmup import get_startup_stats
     
     stats = get_query_stats()
+    stats['worker'] = get_startup_stats()
     return Response(stats)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminGroup])
+def profiles_view(request):
+    """
+    List stored request profiles (newest first).
+    
+    Profile a request by sending it with `X-Profile: sample` (or
+    `cprofile`) as an admin; its name comes back in X-Profile-Id.
+    """
+    return Response({'profiles': list_profiles(), 'max_files': PROFILE_MAX_FILES})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminGroup])
+def profile_download_view(request, name):
+    """Download one profile (.folded collapsed stacks or .prof pstats)."""
+    path = profile_path(name)
+    if path is None:
+        return Response({"error": "Profile not found"}, status=404)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
 # =============================================================================
 # Health Check Endpoint
 # =============================================================================
@@ -398,46 +1026,22 @@ def adx_stats_view(request):
 def health_check(request):
     """
     Health check endpoint for load balancers, monitoring, and container orchestration.
-    Returns status of critical services (database, cache, etc.)
+    
+    Serves the snapshot kept by the background probes (see health.py), so
+    frequent polling costs no database, Redis or ADX round trips. Each probe
+    reports its status, last latency and p50/p95/p99 over recent probes.
     """
-    from django.db import connection
-    import os
+    from .health import get_snapshot, STATUS_UNHEALTHY
     
+    snapshot = get_snapshot()
     health_status = {
-        'status': 'healthy',
+        'status': snapshot['status'],
         'environment': os.getenv('DJANGO_ENVIRONMENT', 'development'),
-        'checks': {}
+        'checks': {name: probe['status'] for name, probe in snapshot['probes'].items()},
+        'probes': snapshot['probes'],
+        'checked_at': snapshot['checked_at'],
+        'age_seconds': round(time.time() - snapshot['checked_at'], 1),
     }
     
-    # Database connectivity check
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute('SELECT 1')
-        health_status['checks']['database'] = 'ok'
-    except Exception as e:
-        health_status['checks']['database'] = f'error: {str(e)}'
-        health_status['status'] = 'unhealthy'
-    
-    # Redis check (optional)
-    redis_url = os.getenv('REDIS_URL')
-    if redis_url:
-        try:
-            import redis
-            r = redis.from_url(redis_url)
-            r.ping()
-            health_status['checks']['redis'] = 'ok'
-        except ImportError:
-            health_status['checks']['redis'] = 'not installed'
-        except Exception as e:
-            health_status['checks']['redis'] = f'error: {str(e)}'
-            # Redis failure is not critical, don't mark as unhealthy
-    
-    # ADX connectivity check (optional, lightweight)
-    adx_url = os.getenv('ADX_CLUSTER_URL')
-    if adx_url:
-        health_status['checks']['adx'] = 'configured'
-    else:
-        health_status['checks']['adx'] = 'not configured'
-    
-    status_code = 200 if health_status['status'] == 'healthy' else 503
+    status_code = 503 if snapshot['status'] == STATUS_UNHEALTHY else 200
     return Response(health_status, status=status_code)
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+Worker Lifecycle: Preload, Post-fork Re-initialization and Warm-up
+
+Called from deploy/config/gunicorn.conf.py:
+
+1. prepare_master() - with preload_app, runs once in the gunicorn master
+   after Django is loaded: imports the heavy modules (azure-kusto, msal,
+   numpy) and builds read-only state (metric catalog) so forked workers
+   share those pages instead of importing them again after every recycle
+2. reinit_after_fork() - first thing in every worker: drops state that
+   must not be shared across fork (ADX client and its HTTP sessions, DB
+   and cache connections, job executors)
+3. warm_up_worker() - optional, before the worker accepts traffic: builds
+   the ADX client, acquires the AAD token with a trivial query, opens the
+   DB connection and loads the URLconf
+
+FirstRequestTimingMiddleware records how long each worker's first request
+took, so the effect of preloading and warm-up can be compared.
+"""
+
+import os
+import gc
+import time
+import logging
+import importlib
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+WORKER_WARMUP = os.getenv('WORKER_WARMUP', 'False').lower() in ('true', '1', 'yes')
+
+# Run a trivial ADX query during warm-up (acquires the AAD token)
+WORKER_WARMUP_ADX_PROBE = os.getenv('WORKER_WARMUP_ADX_PROBE', 'True').lower() in ('true', '1', 'yes')
+WORKER_WARMUP_ADX_TIMEOUT = int(os.getenv('WORKER_WARMUP_ADX_TIMEOUT', 5))
+
+# Modules imported in the master when preloading
+PRELOAD_MODULES = (
+    'azure.kusto.data',
+    'azure.kusto.data.exceptions',
+    'msal',
+    'numpy',
+    'telemetryapp.adx_optimized',
+    'telemetryapp.adx_events',
+    'telemetryapp.reports',
+    'telemetryapp.jobs',
+)
+
+_startup: Dict[str, Any] = {
+    'pid': os.getpid(),
+    'preloaded': False,
+    'forked_at': None,
+    'warmup_ms': None,
+    'warmup_steps': {},
+    'first_request_ms': None,
+    'first_response_after_fork_ms': None,
+}
+
+_metric_catalog: List[str] = []
+
+
+# =============================================================================
+# Master (preload)
+# =============================================================================
+
+def get_metric_catalog() -> List[str]:
+    """All telemetry metric names known to the backend (dashboard sections)."""
+    if not _metric_catalog:
+        from .reports import TELEMETRY_SECTIONS
+        _metric_catalog.extend(sorted({
+            name for _, metrics in TELEMETRY_SECTIONS.values() for name, _, _ in metrics
+        }))
+    return _metric_catalog
+
+
+def prepare_master() -> None:
+    """Import heavy modules and build shared read-only state in the master."""
+    started = time.perf_counter()
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Preload skipped {module}: {e}")
+    get_metric_catalog()
+
+    # Nothing opened in the master may leak into workers
+    from django.db import connections
+    connections.close_all()
+
+    # Keep preloaded objects out of the collector so their pages stay
+    # shared (copy-on-write) instead of being touched by each worker's GC
+    gc.collect()
+    gc.freeze()
+
+    _startup['preloaded'] = True
+    logger.info(f"Preloaded application in master ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+
+# =============================================================================
+# Worker
+# =============================================================================
+
+def reinit_after_fork(threads: Optional[int] = None) -> None:
+    """Reset per-process resources inherited from the master (threads: gunicorn `threads`)."""
+    _startup['pid'] = os.getpid()
+    _startup['forked_at'] = time.monotonic()
+
+    from django.db import connections
+    from django.core.cache import caches
+    connections.close_all()
+    caches.close_all()
+
+    from . import adx_optimized, health, jobs, pools
+    pools.set_worker_threads(threads)
+    pools.reset_after_fork()
+    adx_optimized.reset_after_fork()
+    health.reset_after_fork()
+    jobs.reset_after_fork()
+
+
+def warm_up_worker() -> Dict[str, float]:
+    """Pay first-request costs before the worker accepts traffic."""
+    steps: Dict[str, float] = {}
+    if not WORKER_WARMUP:
+        return steps
+    started = time.perf_counter()
+
+    def step(name, func):
+        t0 = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+        steps[name] = round((time.perf_counter() - t0) * 1000, 1)
+
+    from django.urls import get_resolver
+    from django.db import connection
+    from django.core.cache import cache
+    from . import adx_optimized
+
+    step('urlconf', lambda: get_resolver().url_patterns)
+    step('database', connection.ensure_connection)
+    step('cache', lambda: cache.get('warmup'))
+    step('adx_client', adx_optimized.get_adx_client)
+    if WORKER_WARMUP_ADX_PROBE and adx_optimized.get_adx_client() is not None:
+        # Own 'probe' query class: the first call includes the AAD token
+        # fetch and must not feed a slow sample into the 'latest' timeouts
+        step('adx_token', lambda: adx_optimized.execute_query(
+            'print 1', query_class='probe', timeout_seconds=WORKER_WARMUP_ADX_TIMEOUT
+        ))
+
+    _startup['warmup_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    _startup['warmup_steps'] = steps
+    logger.info(f"Worker {os.getpid()} warmed up in {_startup['warmup_ms']} ms: {steps}")
+    return steps
+
+
+def record_first_request(duration_seconds: float) -> None:
+    """Record the first request handled by this worker (once per process)."""
+    if _startup['first_request_ms'] is not None:
+        return
+    _startup['first_request_ms'] = round(duration_seconds * 1000, 1)
+    if _startup['forked_at'] is not None:
+        _startup['first_response_after_fork_ms'] = round((time.monotonic() - _startup['forked_at']) * 1000, 1)
+    logger.info(
+        f"Worker {os.getpid()} first request: {_startup['first_request_ms']} ms "
+        f"(preloaded={_startup['preloaded']}, warmup_ms={_startup['warmup_ms']})"
+    )
+
+
+def get_startup_stats() -> Dict[str, Any]:
+    """Startup timings of this worker process."""
+    return dict(_startup, forked_at=None, metric_catalog_size=len(_metric_catalog))
@@ -104,9 +104,14 @@ else:
 
 
 MIDDLEWARE = [
+    'telemetryapp.middleware.FirstRequestTimingMiddleware',  # Cold-start measurement per worker
+    'telemetryapp.middleware.TracingMiddleware',  # Request spans, Server-Timing, sampled trace export
+    'telemetryapp.middleware.ProfilingMiddleware',  # Admin-requested per-request profiles (X-Profile)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files efficiently
+    'telemetryapp.middleware.ApiCompressionMiddleware',  # gzip/brotli for large API responses
+    'telemetryapp.middleware.QueryLogContextMiddleware',  # Route/user for the opt-in ADX query log
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -197,6 +202,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated', 
     ),# Adjust later
+    'DEFAULT_RENDERER_CLASSES': (
+        # orjson-backed, traced JSON renderer; passes pre-encoded cache hits through
+        'telemetryapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -245,8 +255,12 @@ CORS_ALLOW_HEADERS = list(default_headers) + [
     'authorization',
     'content-type',
     'x-requested-with',
+    'if-none-match',
 ]
 
+# Response headers readable by the frontend (ETag for conditional polling)
+CORS_EXPOSE_HEADERS = ['ETag']
+
 # HTTP methods allowed in CORS requests
 CORS_ALLOW_METHODS = [
     'DELETE',
@@ -287,6 +301,11 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background job state and results (reports, long queries) - shared by all
+# workers on the host. Kept outside MEDIA_ROOT (served by nginx without auth):
+# results are only downloadable through the authenticated job views
+JOBS_DIR = Path(os.getenv('JOBS_DIR', BASE_DIR / 'var' / 'jobs'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -320,6 +339,7 @@ LOGGING = {
 # CACHING CONFIGURATION
 # =============================================================================
 # Redis cache for production (recommended for ADX query optimization)
+# 'shm' shares one cache between all workers of a host without Redis
 # Falls back to local memory cache for development
 
 CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
@@ -330,12 +350,23 @@ if CACHE_BACKEND == 'redis':
             'BACKEND': 'django.core.cache.backends.redis.RedisCache',
             'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
             'OPTIONS': {
-                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                # One pool per worker, shared with the rate limiter and health probe
+                'pool_class': 'telemetryapp.pools.SharedRedisConnectionPool',
             },
             'KEY_PREFIX': 'telemetry',
             'TIMEOUT': 30,  # Default cache timeout of 30 seconds
         }
     }
+elif CACHE_BACKEND == 'shm':
+    # Mapped file shared by every gunicorn worker on this host (Linux/macOS)
+    CACHES = {
+        'default': {
+            'BACKEND': 'telemetryapp.shm_cache.SharedMemoryCache',
+            'LOCATION': os.getenv('SHM_CACHE_PATH', ''),  # empty: /dev/shm/telemetryapp-<uid>/cache
+            'KEY_PREFIX': 'telemetry',
+            'TIMEOUT': 30,
+        }
+    }
 else:
     # Local memory cache for development
     CACHES = {
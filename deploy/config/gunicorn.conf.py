@@ -23,6 +23,13 @@ worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 50
 
+# Load Django and the ADX stack once in the master; recycled workers fork
+# from it instead of re-importing everything (see telemetryapp/warmup.py)
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() in ('true', '1', 'yes')
+
+# Optional warm-up before a worker accepts traffic (ADX client + token,
+# DB connection, URLconf). Enabled via WORKER_WARMUP=True.
+
 # ============================================================
 # Timeouts
 # ============================================================
@@ -75,6 +82,12 @@ def worker_int(worker):
     """Called when a worker receives SIGINT or SIGQUIT."""
     print(f"Worker {worker.pid} received interrupt signal")
 
+def when_ready(server):
+    """Called just after the server is started (after preloading the app)."""
+    if preload_app:
+        from telemetryapp import warmup
+        warmup.prepare_master()
+
 def pre_fork(server, worker):
     """Called just before a worker is forked."""
     pass
@@ -82,3 +95,15 @@ def pre_fork(server, worker):
 def post_fork(server, worker):
     """Called just after a worker has been forked."""
     print(f"Worker spawned (pid: {worker.pid})")
+    if preload_app:
+        # Connections and the ADX client must not be shared with the master;
+        # connection pools are sized to this worker's threads
+        from telemetryapp import warmup
+        warmup.reinit_after_fork(threads=worker.cfg.threads)
+
+def post_worker_init(worker):
+    """Called just after a worker has initialized the application."""
+    from telemetryapp import warmup
+    if not preload_app:
+        warmup.reinit_after_fork(threads=worker.cfg.threads)
+    warmup.warm_up_worker()
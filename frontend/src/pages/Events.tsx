@@ -95,28 +95,16 @@ function buildEventsKql(serial: string, from: Date, to: Date, limit: number = MA
   `.trim();
 }
 
-// Build KQL query for aggregation (event frequency)
-function buildAggregationKql(serial: string, from: Date, to: Date, limit: number = MAX_EVENTS_FETCH, outputFilter: 'all' | '1' | '0' = '1'): string {
-  const s = escapeKqlString(serial);
-  const startLocal = toLocalKqlDatetime(from);
-  const endLocal = toLocalKqlDatetime(to);
-  
-  // Build output filter clause
-  const outputClause = outputFilter === 'all' ? '' : `| where value == ${outputFilter}`;
-  
-  return `
-    let s = '${s}';
-    let start = datetime(${startLocal});
-    let finish = datetime(${endLocal});
-    Alarms
-    | where comms_serial contains s
-    | where localtime between (start .. finish)
-    ${outputClause}
-    | summarize count() by name
-    | where count_ > 4
-    | order by count_ desc
-    | take ${limit}
-  `.trim();
+// Minimum occurrences for an event name to appear in the Pareto chart
+const MIN_PARETO_COUNT = 5;
+
+// Server-side aggregation returned by /events/summary/
+interface EventsSummary {
+  total: number;
+  by_name: { name: string; count: number; severity: 'critical' | 'warning' | 'info' }[];
+  by_severity: { critical: number; warning: number; info: number };
+  histogram: { buckets: string[]; total: number[]; critical: number[]; warning: number[]; info: number[] };
+  step: string;
 }
 
 // Get severity level from event name
@@ -229,6 +217,7 @@ export default function Events() {
   // State
   const [events, setEvents] = useState<AlarmEvent[]>([]);
   const [aggregation, setAggregation] = useState<{ name: string; count_: number }[]>([]);
+  const [summary, setSummary] = useState<EventsSummary | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [isTableExpanded, setIsTableExpanded] = useState(false);
@@ -281,17 +270,27 @@ export default function Events() {
       const eventsData = Array.isArray(eventsRes.data?.data) ? eventsRes.data.data : [];
       setEvents(eventsData);
       
-      // Fetch aggregation
-      const aggKql = buildAggregationKql(serial, fromDT, toDT, MAX_EVENTS_FETCH, outputFilter);
-      const aggRes = await api.post('/query_adx/', { kql: aggKql });
-      const aggData = Array.isArray(aggRes.data?.data) ? aggRes.data.data : [];
-      setAggregation(aggData);
+      // Fetch aggregation (counts computed and cached server-side)
+      const summaryRes = await api.post('/events/summary/', {
+        serial,
+        start: toLocalKqlDatetime(fromDT),
+        end: toLocalKqlDatetime(toDT),
+        output_filter: outputFilter,
+      });
+      const summaryData: EventsSummary | null = summaryRes.data ?? null;
+      setSummary(summaryData);
+      setAggregation(
+        (summaryData?.by_name ?? [])
+          .filter(item => item.count >= MIN_PARETO_COUNT)
+          .map(item => ({ name: item.name, count_: item.count }))
+      );
       
     } catch (err: any) {
       if (err?.response?.status === 401) await logout();
       setError(err?.response?.data?.error ?? 'Error fetching events');
       setEvents([]);
       setAggregation([]);
+      setSummary(null);
     } finally {
       setLoading(false);
     }
@@ -485,14 +484,17 @@ export default function Events() {
     },
   };
   
-  // Summary stats
+  // Summary stats (server-side counts are not capped by MAX_EVENTS_FETCH)
   const stats = useMemo(() => {
+    if (summary) {
+      return { total: summary.total, ...summary.by_severity };
+    }
     const total = events.length;
     const critical = events.filter(e => getSeverityFromName(e.name) === 'critical').length;
     const warning = events.filter(e => getSeverityFromName(e.name) === 'warning').length;
     const info = events.filter(e => getSeverityFromName(e.name) === 'info').length;
     return { total, critical, warning, info };
-  }, [events]);
+  }, [events, summary]);
   
   return (
     <DashboardLayout title="Events" showFilters={false}>